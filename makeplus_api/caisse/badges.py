@@ -0,0 +1,213 @@
+"""
+Bulk badge printing: every badge for an event as one multi-page PDF.
+
+Reception desks print the whole event's badges the day before it opens --
+thousands of them -- and print_badge (one HTML page per participant, one
+browser print dialog each) was the only way to do it. Here the badges are
+laid out BADGES_PER_PAGE to an A4 sheet, pages are rendered in parallel in
+a process pool (QR encoding and Pillow drawing are CPU-bound, so threads
+wouldn't help), and each page is written into the PDF as soon as it's
+ready, as a JPEG, so memory stays flat however many pages there are.
+The process pool is for the print_event_badges management command; the
+caisse's download view renders in its own process and refuses events with
+more than CAISSE_BADGES_PER_REQUEST badges, pointing at the command.
+
+The rendering functions only use qrcode/Pillow, never the ORM, so they run
+in worker processes under any multiprocessing start method.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+from events.qr_cache import badge_qr_content, render_qr_image
+
+# Same QR render options as the single-badge print page (views.print_badge)
+BADGE_QR_OPTIONS = {'box_size': 10, 'border': 4, 'error_correction': 'L'}
+
+DPI = 150
+PAGE_SIZE = (1240, 1754)  # A4 at 150 dpi, in pixels
+PAGE_SIZE_PT = (595.28, 841.89)  # A4 in PDF points
+BADGE_COLUMNS, BADGE_ROWS = 2, 4
+BADGES_PER_PAGE = BADGE_COLUMNS * BADGE_ROWS
+PAGE_MARGIN = 40
+CELL_PADDING = 24
+QR_SIZE = 220
+
+
+def event_badges(event):
+    """
+    (user_id, full name, badge_id) for every participant registered for
+    `event`, ordered the way a reception desk sorts printed badges.
+    """
+    from events.models import Participant
+
+    rows = Participant.objects.filter(registrations__event=event).order_by(
+        'user__last_name', 'user__first_name', 'user__username',
+    ).values_list('user_id', 'user__first_name', 'user__last_name', 'user__username', 'badge_id')
+    for user_id, first_name, last_name, username, badge_id in rows.iterator(chunk_size=2000):
+        yield user_id, f"{first_name} {last_name}".strip() or username, badge_id
+
+
+def event_badge_count(event):
+    """How many badges event_badges(event) yields."""
+    from events.models import Participant
+
+    return Participant.objects.filter(registrations__event=event).count()
+
+
+def _font(size, bold=False):
+    """DejaVu Sans when the system has it (covers accented names), else Pillow's bundled font."""
+    try:
+        return ImageFont.truetype('DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf', size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def _fit(draw, text, font, width):
+    """`text`, cut down with an ellipsis until it fits in `width` pixels."""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(f"{text}…", font=font) > width:
+        text = text[:-1]
+    return f"{text}…"
+
+
+def _wrap(draw, text, font, width, max_lines=2):
+    """Word-wrap `text` into at most `max_lines` lines of `width` pixels."""
+    lines = []
+    words = text.split()
+    while words and len(lines) < max_lines:
+        line = words.pop(0)
+        while words and draw.textlength(f"{line} {words[0]}", font=font) <= width:
+            line = f"{line} {words.pop(0)}"
+        lines.append(line)
+    if words:
+        lines[-1] = f"{lines[-1]} {' '.join(words)}"
+    return [_fit(draw, line, font, width) for line in lines]
+
+
+def render_badge_page(event_name, badges):
+    """One A4 sheet of up to BADGES_PER_PAGE badges, as grayscale JPEG bytes."""
+    page = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    title_font = _font(22)
+    name_font = _font(30, bold=True)
+    badge_font = _font(20)
+
+    cell_width = (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // BADGE_COLUMNS
+    cell_height = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // BADGE_ROWS
+    text_width = cell_width - QR_SIZE - 3 * CELL_PADDING
+
+    for index, (user_id, name, badge_id) in enumerate(badges):
+        left = PAGE_MARGIN + (index % BADGE_COLUMNS) * cell_width
+        top = PAGE_MARGIN + (index // BADGE_COLUMNS) * cell_height
+        draw.rectangle(
+            [left + 4, top + 4, left + cell_width - 4, top + cell_height - 4],
+            outline=0, width=3,
+        )
+
+        qr = render_qr_image(badge_qr_content(user_id), **BADGE_QR_OPTIONS)
+        qr = qr.convert('L').resize((QR_SIZE, QR_SIZE), Image.NEAREST)
+        page.paste(qr, (left + cell_width - QR_SIZE - CELL_PADDING, top + (cell_height - QR_SIZE) // 2))
+
+        text_left = left + CELL_PADDING
+        for line_number, line in enumerate(_wrap(draw, event_name, title_font, text_width)):
+            draw.text((text_left, top + CELL_PADDING + 10 + line_number * 28), line, font=title_font, fill=80)
+        for line_number, line in enumerate(_wrap(draw, name.upper(), name_font, text_width)):
+            draw.text((text_left, top + cell_height // 2 - 40 + line_number * 38), line, font=name_font, fill=0)
+        draw.text((text_left, top + cell_height - CELL_PADDING - 40), _fit(draw, badge_id, badge_font, text_width),
+                  font=badge_font, fill=0)
+
+    buffer = io.BytesIO()
+    page.save(buffer, format='JPEG', quality=85, dpi=(DPI, DPI))
+    return buffer.getvalue()
+
+
+def _render_page_args(args):
+    return render_badge_page(*args)
+
+
+class _PdfWriter:
+    """
+    Just enough PDF to hold one full-page JPEG per page, written out page
+    by page (the JPEG data goes in as-is, DCTDecode) -- Pillow's own PDF
+    output would need every page image in memory at once.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.position = 0
+        self.offsets = {}  # object number -> byte offset
+        self.page_numbers = []
+        self.next_number = 3  # 1 = catalog, 2 = page tree (written last)
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body, stream=None):
+        self.offsets[number] = self.position
+        self._write(f"{number} 0 obj\n".encode() + body)
+        if stream is not None:
+            self._write(b"\nstream\n" + stream + b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_jpeg_page(self, jpeg):
+        with Image.open(io.BytesIO(jpeg)) as image:
+            width, height = image.size
+        image_number, content_number, page_number = range(self.next_number, self.next_number + 3)
+        self.next_number += 3
+        page_width, page_height = PAGE_SIZE_PT
+
+        self._object(image_number, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>"
+        ).encode(), jpeg)
+        content = f"q {page_width} 0 0 {page_height} 0 0 cm /Im0 Do Q".encode()
+        self._object(content_number, f"<< /Length {len(content)} >>".encode(), content)
+        self._object(page_number, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] "
+            f"/Resources << /XObject << /Im0 {image_number} 0 R >> >> /Contents {content_number} 0 R >>"
+        ).encode())
+        self.page_numbers.append(page_number)
+
+    def close(self):
+        kids = " ".join(f"{number} 0 R" for number in self.page_numbers)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_numbers)} >>".encode())
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self.position
+        size = self.next_number
+        self._write(f"xref\n0 {size}\n".encode())
+        self._write(b"0000000000 65535 f \n")
+        for number in range(1, size):
+            self._write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+        self._write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def render_event_badges_pdf(event, fileobj, workers=None):
+    """
+    Write every badge for `event` to `fileobj` as a PDF. `workers` is the
+    process pool size (None = one per CPU, 0 = render in this process).
+
+    Returns (badge_count, page_count).
+    """
+    badges = list(event_badges(event))
+    pages = [
+        (event.name, badges[start:start + BADGES_PER_PAGE])
+        for start in range(0, len(badges), BADGES_PER_PAGE)
+    ]
+
+    writer = _PdfWriter(fileobj)
+    if workers == 0 or len(pages) <= 1:
+        for jpeg in map(_render_page_args, pages):
+            writer.add_jpeg_page(jpeg)
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for jpeg in pool.map(_render_page_args, pages):
+                writer.add_jpeg_page(jpeg)
+    writer.close()
+    return len(badges), len(pages)
@@ -0,0 +1,279 @@
+"""
+Per-participant, per-event paid-items index (ParticipantEntitlement).
+
+Badge scans (events/views.py: ParticipantViewSet.scan_participant,
+RoomViewSet.scan_participant) used to rebuild a participant's paid items on
+every single scan -- every completed CaisseTransaction, every item, de-duped
+in Python. That answer only ever changes when a transaction is created or
+cancelled, so it's computed once here at write time instead, and a scan
+becomes one indexed lookup on (participant, event).
+
+Writers: every place that creates or cancels a CaisseTransaction calls
+schedule_refresh() -- caisse/views.py (process_transaction,
+cancel_transaction), caisse/services.py (the event-owner confirm/cancel
+flows) and dashboard/views_event_owner.py (registration_delete) -- and
+events/signals.py when a registration is created or deleted, and when a
+PayableItem or Session whose name, price, times or room the rows copy is
+edited (schedule_item_refresh). The rebuild_entitlements management command rebuilds the whole
+table from scratch and checks it against the transactions, for drift.
+
+Each row also carries a per-event version, bumped whenever its content
+changes (the counter lives in EntitlementEventState), which is what the offline gate snapshot (event_snapshot() below,
+served by EventViewSet.entitlements) uses to hand controller devices only
+the rows that changed since their last pull.
+"""
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+
+from caisse.models import CaisseTransaction, EntitlementEventState, ParticipantEntitlement
+from events.models import ParticipantEventRegistration
+
+
+def _paid_items_from_transactions(transactions):
+    """
+    The scan endpoints' paid-items list for one participant, from their
+    completed transactions newest first (items must be prefetched with
+    their session/room). Same de-dup rule the scans always used: a session
+    counts once however many transactions include it; any other item
+    counts once per PayableItem.
+
+    Returns (paid_items, total_amount).
+    """
+    paid_items = []
+    seen_items = set()
+    total_amount = Decimal('0')
+    for txn in transactions:
+        for item in txn.items.all():
+            if item.session_id:
+                unique_key = f"session-{item.session_id}"
+            else:
+                unique_key = f"{item.item_type}-{item.id}"
+            if unique_key in seen_items:
+                continue
+            seen_items.add(unique_key)
+
+            paid_item = {
+                'type': item.item_type,
+                'id': str(item.session_id) if item.session_id else str(item.id),
+                'title': item.name,
+                'amount_paid': float(item.price),
+                'transaction_date': txn.created_at.isoformat(),
+            }
+            if item.session_id:
+                session = item.session
+                paid_item['session_details'] = {
+                    'start_time': session.start_time.isoformat() if session.start_time else None,
+                    'end_time': session.end_time.isoformat() if session.end_time else None,
+                    'room': session.room.name if session.room_id else None,
+                    'room_id': str(session.room_id) if session.room_id else None,
+                }
+            paid_items.append(paid_item)
+            total_amount += item.price
+    return paid_items, total_amount
+
+
+def _completed_transactions(event):
+    return CaisseTransaction.objects.filter(
+        caisse__event=event, status='completed'
+    ).prefetch_related('items__session__room').order_by('-created_at')
+
+
+def compute_entitlement(participant_id, event):
+    """Fresh (paid_items, total_amount) straight from the transactions."""
+    return _paid_items_from_transactions(_completed_transactions(event).filter(participant_id=participant_id))
+
+
+def compute_event_entitlements(event):
+    """
+    compute_entitlement() for every participant with a completed
+    transaction at this event, in one pass over the transactions.
+
+    Returns {participant_id: (paid_items, total_amount)}.
+    """
+    by_participant = {}
+    for txn in _completed_transactions(event):
+        by_participant.setdefault(txn.participant_id, []).append(txn)
+    return {
+        participant_id: _paid_items_from_transactions(transactions)
+        for participant_id, transactions in by_participant.items()
+    }
+
+
+def _lock_state(event):
+    """
+    The event's EntitlementEventState, locked until the surrounding
+    transaction commits. Serializes the event's entitlement writes: whatever
+    is read after this sees every write committed before it.
+    """
+    state, _created = EntitlementEventState.objects.select_for_update().get_or_create(event=event)
+    return state
+
+
+def _bump(state):
+    state.version += 1
+    state.save(update_fields=['version'])
+    return state.version
+
+
+def next_version(event):
+    """
+    The next snapshot version for `event`. Must be called inside a
+    transaction: the state row stays locked until commit, so versions
+    become visible in the order they were handed out and a "changes since
+    N" pull can never miss a row committed late with a lower version.
+    """
+    return _bump(_lock_state(event))
+
+
+def refresh_entitlement(participant_id, event):
+    """
+    Recompute and store one participant's entitlement row for `event`,
+    bumping its version only if something actually changed.
+    """
+    with db_transaction.atomic():
+        # Lock first, then read: two refreshes of one participant can't
+        # store their results out of order.
+        state = _lock_state(event)
+        paid_items, total_amount = compute_entitlement(participant_id, event)
+        is_registered = ParticipantEventRegistration.objects.filter(
+            participant_id=participant_id, event=event
+        ).exists()
+        entitlement = ParticipantEntitlement.objects.filter(participant_id=participant_id, event=event).first()
+        if (entitlement is not None and entitlement.paid_items == paid_items
+                and entitlement.total_amount == total_amount
+                and entitlement.is_registered == is_registered):
+            return entitlement
+        entitlement, _created = ParticipantEntitlement.objects.update_or_create(
+            participant_id=participant_id, event=event,
+            defaults={
+                'paid_items': paid_items, 'total_amount': total_amount,
+                'is_registered': is_registered, 'version': _bump(state),
+            },
+        )
+    return entitlement
+
+
+def schedule_refresh(participant_id, event):
+    """
+    refresh_entitlement() once the surrounding DB transaction commits (or
+    right away outside of one) -- so the index never reflects a transaction
+    that ended up rolled back.
+    """
+    db_transaction.on_commit(lambda: refresh_entitlement(participant_id, event))
+
+
+def _refresh_item_holders(item_ids, event):
+    participant_ids = CaisseTransaction.objects.filter(
+        caisse__event=event, status='completed', items__in=item_ids,
+    ).values_list('participant_id', flat=True).distinct()
+    for participant_id in participant_ids:
+        refresh_entitlement(participant_id, event)
+
+
+def schedule_item_refresh(items, event):
+    """
+    refresh_entitlement(), after commit, for every participant whose
+    completed transactions include one of `items` (PayableItems of `event`)
+    -- their rows copy the items' name and price and their sessions' times
+    and room.
+    """
+    item_ids = list(items.values_list('id', flat=True))
+    if item_ids:
+        db_transaction.on_commit(lambda: _refresh_item_holders(item_ids, event))
+
+
+def get_entitlement(participant, event):
+    """
+    The scan-time read: one indexed lookup. A missing row (participant with
+    nothing paid yet, or the table not rebuilt since deploy) is computed
+    and stored on the spot, so the next scan is a plain hit.
+    """
+    entitlement = ParticipantEntitlement.objects.filter(participant=participant, event=event).first()
+    if entitlement is None:
+        entitlement = refresh_entitlement(participant.id, event)
+    return entitlement
+
+
+def get_entitlements(participant_ids, event):
+    """
+    get_entitlement() for many participants at once (the offline scan sync):
+    one lookup for the stored rows, and the missing ones computed from a
+    single pass over their transactions and stored with one bulk_create.
+
+    Returns {participant_id: ParticipantEntitlement}.
+    """
+    participant_ids = set(participant_ids)
+    entitlements = {
+        row.participant_id: row
+        for row in ParticipantEntitlement.objects.filter(event=event, participant_id__in=participant_ids)
+    }
+    missing = participant_ids - set(entitlements)
+    if missing:
+        with db_transaction.atomic():
+            version = next_version(event)
+            by_participant = {}
+            for txn in _completed_transactions(event).filter(participant_id__in=missing):
+                by_participant.setdefault(txn.participant_id, []).append(txn)
+            registered_ids = set(
+                ParticipantEventRegistration.objects.filter(
+                    event=event, participant_id__in=missing
+                ).values_list('participant_id', flat=True)
+            )
+            rows = []
+            for participant_id in missing:
+                paid_items, total_amount = _paid_items_from_transactions(by_participant.get(participant_id, []))
+                rows.append(ParticipantEntitlement(
+                    participant_id=participant_id, event=event,
+                    paid_items=paid_items, total_amount=total_amount,
+                    is_registered=participant_id in registered_ids, version=version,
+                ))
+            # ignore_conflicts: a concurrent scan may have stored one of
+            # these in the meantime -- same content either way.
+            ParticipantEntitlement.objects.bulk_create(rows, ignore_conflicts=True)
+        entitlements.update((row.participant_id, row) for row in rows)
+    return entitlements
+
+
+def paid_items_for_scan(entitlement):
+    """Expand the stored compact rows into the scan endpoints' response shape."""
+    return [
+        {**item, 'is_paid': True, 'payment_status': 'paid', 'has_access': True}
+        for item in entitlement.paid_items
+    ]
+
+
+def event_snapshot(event, since=0):
+    """
+    The offline gate snapshot for `event`: (version, rows) where version is
+    the event's current snapshot version and rows yields, lazily and in
+    version order, one (user_id, entry) pair per participant whose row
+    changed after `since` (every participant when since is 0). entry is
+    {'registered', 'badge_id', 'paid_sessions'}; a participant whose
+    registration was removed comes through with registered=False.
+
+    Registrations without a row yet (made before the index existed) get
+    theirs first, under a new version, so they reach delta pulls as well.
+    """
+    unindexed = ParticipantEventRegistration.objects.filter(event=event).exclude(
+        participant__entitlements__event=event,
+    ).values_list('participant_id', flat=True)
+    missing = list(unindexed)
+    if missing:
+        get_entitlements(missing, event)
+    version = EntitlementEventState.objects.filter(event=event).values_list('version', flat=True).first() or 0
+    queryset = ParticipantEntitlement.objects.filter(
+        event=event, version__gt=since, version__lte=version,
+    ).order_by('version', 'id').values_list(
+        'participant__user_id', 'participant__badge_id', 'is_registered', 'paid_items',
+    )
+
+    def rows():
+        for user_id, badge_id, is_registered, paid_items in queryset.iterator(chunk_size=2000):
+            yield user_id, {
+                'registered': is_registered,
+                'badge_id': badge_id,
+                'paid_sessions': [item['id'] for item in paid_items if 'session_details' in item],
+            }
+
+    return version, rows()
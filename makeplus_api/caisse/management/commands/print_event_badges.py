@@ -0,0 +1,35 @@
+"""
+Render every badge for an event into one printable PDF (caisse/badges.py),
+for the reception desk's print run the day before the event.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from caisse.badges import render_event_badges_pdf
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Render all badges for an event into a multi-page PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=str, required=True, help='Event ID')
+        parser.add_argument('--output', type=str, required=True, help='Path of the PDF to write')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Render processes (default: one per CPU, 0 renders in this process)',
+        )
+
+    def handle(self, *args, **options):
+        event = Event.objects.filter(id=options['event']).first()
+        if event is None:
+            raise CommandError(f"Event with ID {options['event']} not found")
+
+        started = time.monotonic()
+        with open(options['output'], 'wb') as output:
+            badge_count, page_count = render_event_badges_pdf(event, output, workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {badge_count} badges on {page_count} pages to {options['output']} "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
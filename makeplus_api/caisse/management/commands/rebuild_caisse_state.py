@@ -0,0 +1,58 @@
+"""
+Rebuild the caisse dashboard read model (caisse/read_model.py) from the
+registration orders and completed CaisseTransactions it's derived from, and
+check it against them.
+
+Events are built on their first dashboard load, so this is only needed to
+check the model -- or to repair it after orders or transactions were edited
+by hand. --check-only reports drift without writing anything.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from caisse.models import CaisseEventState
+from caisse.read_model import build_event, check_event
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the caisse dashboard read model from orders and transactions and verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Event ID to rebuild (optional, rebuilds all built events if not provided)',
+        )
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help='Only compare the stored read model against orders and transactions; write nothing',
+        )
+
+    def handle(self, *args, **options):
+        event_id = options.get('event')
+        check_only = options['check_only']
+
+        if event_id:
+            events = Event.objects.filter(id=event_id)
+            if not events.exists():
+                raise CommandError(f"Event with ID {event_id} not found")
+        else:
+            events = Event.objects.filter(
+                id__in=CaisseEventState.objects.values('event_id')
+            )
+
+        total_drift = 0
+        for event in events:
+            if check_only:
+                drift = check_event(event.id)
+                for what, identifier in drift:
+                    self.stdout.write(self.style.WARNING(f"  {what} {identifier}: out of step"))
+                total_drift += len(drift)
+                self.stdout.write(f"{event.name} ({event.id}): {len(drift)} mismatches")
+            else:
+                version = build_event(event.id)
+                self.stdout.write(f"{event.name} ({event.id}): rebuilt at version {version}")
+
+        if total_drift:
+            raise CommandError(f"{total_drift} read model rows do not match the orders and transactions")
+        self.stdout.write(self.style.SUCCESS("Caisse read model matches the orders and transactions"))
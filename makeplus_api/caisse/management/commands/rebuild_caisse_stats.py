@@ -0,0 +1,48 @@
+"""
+Re-sum the caisse statistics buckets (caisse/stats.py) from the
+CaisseTransactions and report the buckets that had drifted.
+
+The buckets are kept current on every transaction write, so this is only
+needed to check them -- or to repair them after transactions were edited
+by hand. --check-only reports drift without writing anything.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from caisse.models import Caisse
+from caisse.stats import rebuild_buckets
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Re-sum the per-hour caisse statistics from caisse transactions and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Event ID to rebuild (optional, rebuilds all caisses if not provided)',
+        )
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help='Only compare the stored buckets against the transactions; write nothing',
+        )
+
+    def handle(self, *args, **options):
+        event_id = options.get('event')
+        caisses = Caisse.objects.all()
+        if event_id:
+            if not Event.objects.filter(id=event_id).exists():
+                raise CommandError(f"Event with ID {event_id} not found")
+            caisses = caisses.filter(event_id=event_id)
+        caisse_ids = list(caisses.values_list('id', flat=True))
+
+        drift = rebuild_buckets(caisse_ids, check_only=options['check_only'])
+        for (caisse_id, hour, payment_method), (stored, summed) in sorted(drift.items(), key=str):
+            self.stdout.write(self.style.WARNING(
+                f"  caisse {caisse_id} {hour:%Y-%m-%d %H}h {payment_method}: "
+                f"{stored} transactions stored, {summed} counted"
+            ))
+        self.stdout.write(f"{len(caisse_ids)} caisses checked, {len(drift)} buckets out of step")
+        if drift and options['check_only']:
+            raise CommandError(f"{len(drift)} statistics buckets do not match the transactions")
+        self.stdout.write(self.style.SUCCESS("Caisse statistics match the transactions"))
@@ -0,0 +1,111 @@
+"""
+Rebuild the ParticipantEntitlement index (caisse/entitlements.py) from
+scratch and check it against the completed CaisseTransactions it's derived
+from.
+
+Run once after deploying the table, and any time scans look out of step
+with the caisse. --check-only reports drift without writing anything.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from caisse.entitlements import compute_event_entitlements, next_version
+from caisse.models import ParticipantEntitlement
+from events.models import Event, ParticipantEventRegistration
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-participant entitlement index from caisse transactions and verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Event ID to rebuild (optional, rebuilds all events if not provided)',
+        )
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help='Only compare the stored index against the transactions; write nothing',
+        )
+
+    def handle(self, *args, **options):
+        event_id = options.get('event')
+        check_only = options['check_only']
+
+        if event_id:
+            events = Event.objects.filter(id=event_id)
+            if not events.exists():
+                raise CommandError(f"Event with ID {event_id} not found")
+        else:
+            events = Event.objects.all()
+
+        total_rows = 0
+        total_drift = 0
+        for event in events:
+            expected = compute_event_entitlements(event)
+
+            registered_ids = set(
+                ParticipantEventRegistration.objects.filter(event=event).values_list('participant_id', flat=True)
+            )
+            if not check_only:
+                # Everyone registered gets a row (an empty one if nothing is
+                # paid yet), so scans never have to fall back to computing.
+                # Rows already stored are kept too, even for participants no
+                # longer registered: offline devices learn about the removal
+                # from them. All rows share one fresh version, so every
+                # device's next "changes since" pull picks the rebuild up.
+                with transaction.atomic():
+                    version = next_version(event)
+                    stored_ids = set(
+                        ParticipantEntitlement.objects.filter(event=event).values_list('participant_id', flat=True)
+                    )
+                    rows = []
+                    for participant_id in registered_ids | set(expected) | stored_ids:
+                        paid_items, total_amount = expected.get(participant_id, ([], 0))
+                        rows.append(ParticipantEntitlement(
+                            participant_id=participant_id, event=event,
+                            paid_items=paid_items, total_amount=total_amount,
+                            is_registered=participant_id in registered_ids, version=version,
+                        ))
+                    ParticipantEntitlement.objects.filter(event=event).delete()
+                    ParticipantEntitlement.objects.bulk_create(rows, batch_size=500)
+                total_rows += len(rows)
+
+            drift = self._check(event, expected, registered_ids)
+            total_drift += drift
+            self.stdout.write(f"{event.name} ({event.id}): {len(expected)} paying participants, {drift} mismatches")
+
+        if not check_only:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {total_rows} entitlement rows"))
+        if total_drift:
+            raise CommandError(f"{total_drift} entitlement rows do not match the transactions")
+        self.stdout.write(self.style.SUCCESS("Entitlement index matches the transactions"))
+
+    def _check(self, event, expected, registered_ids):
+        """Count stored rows that disagree with the transactions or registrations, reporting each one."""
+        drift = 0
+        stored = {
+            row.participant_id: row
+            for row in ParticipantEntitlement.objects.filter(event=event)
+        }
+        for participant_id, (paid_items, total_amount) in expected.items():
+            row = stored.get(participant_id)
+            if row is None or row.paid_items != paid_items or row.total_amount != total_amount:
+                drift += 1
+                self.stdout.write(self.style.WARNING(
+                    f"  participant {participant_id}: "
+                    f"{'missing' if row is None else 'stale'} entitlement"
+                ))
+        for participant_id, row in stored.items():
+            if participant_id not in expected and row.paid_items:
+                drift += 1
+                self.stdout.write(self.style.WARNING(
+                    f"  participant {participant_id}: has paid items but no completed transaction"
+                ))
+        for participant_id, row in stored.items():
+            if row.is_registered != (participant_id in registered_ids):
+                drift += 1
+                self.stdout.write(self.style.WARNING(
+                    f"  participant {participant_id}: registration status out of date"
+                ))
+        return drift
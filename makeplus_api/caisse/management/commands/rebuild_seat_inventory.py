@@ -0,0 +1,59 @@
+"""
+Recount the workshop seat inventory (caisse/seats.py) from the completed
+CaisseTransactions and report the sessions whose counter had drifted.
+
+Rows are created on first use, so this is only needed to check the
+counters -- or to repair them after transactions were edited by hand.
+--check-only reports drift without writing anything.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from caisse.models import SessionSeatInventory
+from caisse.seats import count_sold, recount_seats
+from events.models import Event, Session
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-session seat inventory from caisse transactions and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Event ID to recount (optional, recounts all events if not provided)',
+        )
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help='Only compare the stored counters against the transactions; write nothing',
+        )
+
+    def handle(self, *args, **options):
+        event_id = options.get('event')
+        sessions = Session.objects.filter(seat_inventory__isnull=False)
+        if event_id:
+            if not Event.objects.filter(id=event_id).exists():
+                raise CommandError(f"Event with ID {event_id} not found")
+            sessions = sessions.filter(event_id=event_id)
+        session_ids = set(sessions.values_list('id', flat=True))
+
+        if options['check_only']:
+            stored = dict(
+                SessionSeatInventory.objects.filter(session_id__in=session_ids).values_list('session_id', 'sold')
+            )
+            counted = count_sold(session_ids)
+            drift = {
+                session_id: (sold, counted.get(session_id, 0))
+                for session_id, sold in stored.items()
+                if sold != counted.get(session_id, 0)
+            }
+        else:
+            drift = recount_seats(session_ids)
+
+        for session_id, (stored_sold, counted_sold) in drift.items():
+            self.stdout.write(self.style.WARNING(
+                f"  session {session_id}: {stored_sold} seats stored, {counted_sold} sold"
+            ))
+        self.stdout.write(f"{len(session_ids)} sessions checked, {len(drift)} out of step")
+        if drift and options['check_only']:
+            raise CommandError(f"{len(drift)} seat counters do not match the transactions")
+        self.stdout.write(self.style.SUCCESS("Seat inventory matches the transactions"))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0006_payableitem_bloc_item_and_more'),
+        ('events', '0039_add_password_reset_verification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantEntitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paid_items', models.JSONField(blank=True, default=list)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participant_entitlements', to='events.event')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entitlements', to='events.participant')),
+            ],
+            options={
+                'verbose_name': 'Participant Entitlement',
+                'verbose_name_plural': 'Participant Entitlements',
+                'unique_together': {('participant', 'event')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:30
+
+from django.db import migrations, models
+
+
+def backfill_is_registered(apps, schema_editor):
+    ParticipantEntitlement = apps.get_model('caisse', 'ParticipantEntitlement')
+    ParticipantEventRegistration = apps.get_model('events', 'ParticipantEventRegistration')
+    registered = ParticipantEventRegistration.objects.filter(
+        participant_id=models.OuterRef('participant_id'), event_id=models.OuterRef('event_id'),
+    )
+    ParticipantEntitlement.objects.update(is_registered=models.Exists(registered), version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0007_participantentitlement'),
+        ('events', '0040_controllerscan_offline_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participantentitlement',
+            name='is_registered',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='participantentitlement',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='participantentitlement',
+            index=models.Index(fields=['event', 'version'], name='caisse_part_event_i_87aa59_idx'),
+        ),
+        migrations.RunPython(backfill_is_registered, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0008_participantentitlement_snapshot_version'),
+        ('events', '0043_room_daily_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionSeatInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sold', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='seat_inventory', to='events.session')),
+            ],
+            options={
+                'verbose_name': 'Session Seat Inventory',
+                'verbose_name_plural': 'Session Seat Inventories',
+            },
+        ),
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('caisse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to='caisse.caisse')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to='events.participant')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to='events.session')),
+            ],
+            options={
+                'verbose_name': 'Seat Hold',
+                'verbose_name_plural': 'Seat Holds',
+                'indexes': [models.Index(fields=['session', 'expires_at'], name='caisse_seat_session_b2dda1_idx')],
+                'unique_together': {('session', 'participant')},
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-17 13:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0009_sessionseatinventory_seathold'),
+        ('events', '0043_room_daily_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaisseEventState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('built_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='caisse_state', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Caisse Event State',
+                'verbose_name_plural': 'Caisse Event States',
+            },
+        ),
+        migrations.CreateModel(
+            name='CaisseItemTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('reserved', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='caisse_item_tallies', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Caisse Item Tally',
+                'verbose_name_plural': 'Caisse Item Tallies',
+                'indexes': [models.Index(fields=['event', 'version'], name='caisse_cais_event_i_db9379_idx')],
+                'unique_together': {('event', 'key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CaisseParticipantState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reserved_keys', models.JSONField(blank=True, default=list)),
+                ('paid_keys', models.JSONField(blank=True, default=list)),
+                ('paid_item_ids', models.JSONField(blank=True, default=list)),
+                ('pending_order', models.JSONField(blank=True, default=dict)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='caisse_participant_states', to='events.event')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='caisse_states', to='events.participant')),
+            ],
+            options={
+                'verbose_name': 'Caisse Participant State',
+                'verbose_name_plural': 'Caisse Participant States',
+                'indexes': [models.Index(fields=['event', 'version'], name='caisse_cais_event_i_e23dd5_idx')],
+                'unique_together': {('participant', 'event')},
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def add_search_trigram_index(apps, schema_editor):
+    """Trigram index for the roster's substring search. Postgres-only; SQLite scans the event's rows."""
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS caisse_roster_search_trgm_idx
+            ON caisse_caisserosterentry USING gin (search_text gin_trgm_ops);
+        """)
+
+
+def drop_search_trigram_index(apps, schema_editor):
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("DROP INDEX IF EXISTS caisse_roster_search_trgm_idx;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0010_caisse_dashboard_read_model'),
+        ('events', '0043_room_daily_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaisseRosterEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sort_name', models.CharField(max_length=255)),
+                ('search_text', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='caisse_roster_entries', to='events.event')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='caisse_roster_entries', to='events.participant')),
+            ],
+            options={
+                'verbose_name': 'Caisse Roster Entry',
+                'verbose_name_plural': 'Caisse Roster Entries',
+                'indexes': [models.Index(fields=['event', 'sort_name', 'id'], name='caisse_cais_event_i_f6d744_idx')],
+                'unique_together': {('event', 'participant')},
+            },
+        ),
+        migrations.RunPython(add_search_trigram_index, drop_search_trigram_index),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-17 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour
+
+
+def fill_stats_buckets(apps, schema_editor):
+    """Sum the existing transactions into their buckets (caisse/stats.py keeps them current after this)."""
+    CaisseTransaction = apps.get_model('caisse', 'CaisseTransaction')
+    CaisseStatsBucket = apps.get_model('caisse', 'CaisseStatsBucket')
+
+    zero = Value(0, output_field=DecimalField(max_digits=14, decimal_places=2))
+    completed, cancelled = Q(status='completed'), Q(status='cancelled')
+    rows = (
+        CaisseTransaction.objects.annotate(hour=TruncHour('created_at'))
+        .values('caisse_id', 'hour', 'payment_method')
+        .annotate(
+            sold=Count('id', filter=completed),
+            sold_amount=Coalesce(Sum('total_amount', filter=completed), zero),
+            voided=Count('id', filter=cancelled),
+            voided_amount=Coalesce(Sum('total_amount', filter=cancelled), zero),
+        )
+        .order_by()
+    )
+    CaisseStatsBucket.objects.bulk_create(
+        [
+            CaisseStatsBucket(
+                caisse_id=row['caisse_id'], hour=row['hour'], payment_method=row['payment_method'],
+                transaction_count=row['sold'], total_amount=row['sold_amount'],
+                cancelled_count=row['voided'], cancelled_amount=row['voided_amount'],
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0011_caisse_roster_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaisseStatsBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('payment_method', models.CharField(max_length=20)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('caisse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats_buckets', to='caisse.caisse')),
+            ],
+            options={
+                'verbose_name': 'Caisse Stats Bucket',
+                'verbose_name_plural': 'Caisse Stats Buckets',
+                'ordering': ['caisse', 'hour', 'payment_method'],
+                'unique_together': {('caisse', 'hour', 'payment_method')},
+            },
+        ),
+        migrations.RunPython(fill_stats_buckets, migrations.RunPython.noop),
+    ]
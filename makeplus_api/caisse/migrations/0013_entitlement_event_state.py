@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_entitlement_states(apps, schema_editor):
+    """Start each event's counter at its highest stored entitlement version."""
+    ParticipantEntitlement = apps.get_model('caisse', 'ParticipantEntitlement')
+    EntitlementEventState = apps.get_model('caisse', 'EntitlementEventState')
+
+    rows = ParticipantEntitlement.objects.values('event_id').annotate(version=Max('version')).order_by()
+    EntitlementEventState.objects.bulk_create(
+        [EntitlementEventState(event_id=row['event_id'], version=row['version']) for row in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0012_caisse_stats_bucket'),
+        ('events', '0043_room_daily_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntitlementEventState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='entitlement_state', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Entitlement Event State',
+                'verbose_name_plural': 'Entitlement Event States',
+            },
+        ),
+        migrations.RunPython(fill_entitlement_states, migrations.RunPython.noop),
+    ]
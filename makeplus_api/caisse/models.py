@@ -34,18 +34,22 @@ class Caisse(models.Model):
         """Check if provided password matches"""
         return check_password(raw_password, self.password)
 
+    def get_stats(self):
+        """Totals, participants and the per-payment-method split (caisse/stats.py)"""
+        from caisse.stats import caisse_stats
+        return caisse_stats(self)
+
     def get_total_amount(self):
         """Get total amount collected by this caisse"""
-        completed_transactions = self.transactions.filter(status='completed')
-        return sum(t.total_amount for t in completed_transactions)
+        return self.get_stats()['total_amount']
 
     def get_total_participants(self):
         """Get total number of participants processed"""
-        return self.transactions.filter(status='completed').values('participant').distinct().count()
+        return self.get_stats()['total_participants']
 
     def get_transaction_count(self):
         """Get total number of completed transactions"""
-        return self.transactions.filter(status='completed').count()
+        return self.get_stats()['transaction_count']
 
 
 class PayableItem(models.Model):
@@ -145,3 +149,232 @@ class CaisseTransaction(models.Model):
     def get_items_list(self):
         """Get comma-separated list of item names"""
         return ", ".join([item.name for item in self.items.all()])
+
+
+class ParticipantEntitlement(models.Model):
+    """
+    Materialized "what has this participant paid for at this event" --
+    one row per participant and event, derived entirely from completed
+    CaisseTransactions (see caisse/entitlements.py, the only writer).
+    Badge scans read this instead of walking every transaction and its
+    items on each scan.
+    """
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='entitlements')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='participant_entitlements')
+
+    # Compact, already de-duplicated list of paid items, in the exact shape
+    # the scan endpoints return (minus the constant is_paid/has_access keys).
+    paid_items = models.JSONField(default=list, blank=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # Whether the participant is (still) registered for the event. Rows are
+    # kept when a registration goes away, so the offline snapshot's
+    # "changes since" pulls see the removal.
+    is_registered = models.BooleanField(default=False)
+    # Per-event, monotonically increasing: bumped every time the row's
+    # content changes (see entitlements.next_version).
+    version = models.PositiveBigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Participant Entitlement"
+        verbose_name_plural = "Participant Entitlements"
+        unique_together = ('participant', 'event')
+        indexes = [
+            models.Index(fields=['event', 'version']),
+        ]
+
+    def __str__(self):
+        return f"{self.participant_id} @ {self.event_id} ({len(self.paid_items)} items)"
+
+
+class EntitlementEventState(models.Model):
+    """
+    Snapshot version counter of an event's ParticipantEntitlement rows
+    (caisse/entitlements.py). Locked and bumped for every entitlement write,
+    so versions are handed out -- and committed -- in order.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='entitlement_state')
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Entitlement Event State"
+        verbose_name_plural = "Entitlement Event States"
+
+    def __str__(self):
+        return f"{self.event_id} @ v{self.version}"
+
+
+class SessionSeatInventory(models.Model):
+    """
+    Seats sold for one session: the number of participants with a completed
+    CaisseTransaction covering it. Kept by caisse/seats.py (the only
+    writer) under a row lock, so a capacity check is one row read instead
+    of a distinct count over the transactions.
+    """
+    session = models.OneToOneField(Session, on_delete=models.CASCADE, related_name='seat_inventory')
+    sold = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Session Seat Inventory"
+        verbose_name_plural = "Session Seat Inventories"
+
+    def __str__(self):
+        return f"{self.session_id}: {self.sold} sold"
+
+
+class SeatHold(models.Model):
+    """
+    A seat kept for a participant while a caisse operator builds their
+    cart, until expires_at -- other caisses see it as taken.
+    """
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='seat_holds')
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='seat_holds')
+    caisse = models.ForeignKey(Caisse, on_delete=models.CASCADE, related_name='seat_holds')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Seat Hold"
+        verbose_name_plural = "Seat Holds"
+        unique_together = ('session', 'participant')
+        indexes = [
+            models.Index(fields=['session', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.participant_id} @ {self.session_id} until {self.expires_at:%H:%M:%S}"
+
+
+class CaisseEventState(models.Model):
+    """
+    Version counter of an event's caisse dashboard read model
+    (caisse/read_model.py). The row exists once the read model has been
+    built for the event; until then writes leave it alone.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='caisse_state')
+    version = models.PositiveBigIntegerField(default=0)
+    built_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Caisse Event State"
+        verbose_name_plural = "Caisse Event States"
+
+    def __str__(self):
+        return f"{self.event_id} @ v{self.version}"
+
+
+class CaisseParticipantState(models.Model):
+    """
+    What the caisse dashboard shows for one participant at one event --
+    reserved, paid and still-pending items -- derived from their
+    RegistrationOrders and completed CaisseTransactions by
+    caisse/read_model.py, the only writer. Reservation keys are
+    "item:<BlocItem id>" or "session:<Session id>".
+    """
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='caisse_states')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='caisse_participant_states')
+
+    # Keys reserved by any non-rejected order / covered by a completed transaction
+    reserved_keys = models.JSONField(default=list, blank=True)
+    paid_keys = models.JSONField(default=list, blank=True)
+    # PayableItem ids of the event's items the participant has paid for
+    paid_item_ids = models.JSONField(default=list, blank=True)
+    # Latest order's still-unconfirmed keys and its discount summary, {} if none
+    pending_order = models.JSONField(default=dict, blank=True)
+
+    # CaisseEventState.version of the last change, for "changes since" pulls
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Caisse Participant State"
+        verbose_name_plural = "Caisse Participant States"
+        unique_together = ('participant', 'event')
+        indexes = [
+            models.Index(fields=['event', 'version']),
+        ]
+
+    def __str__(self):
+        return f"{self.participant_id} @ {self.event_id} (v{self.version})"
+
+
+class CaisseItemTally(models.Model):
+    """
+    Per reservation key at an event: participants who reserved it and have
+    not paid yet, and participants who paid for it (caisse/read_model.py).
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='caisse_item_tallies')
+    key = models.CharField(max_length=64)
+    reserved = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Caisse Item Tally"
+        verbose_name_plural = "Caisse Item Tallies"
+        unique_together = ('event', 'key')
+        indexes = [
+            models.Index(fields=['event', 'version']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} @ {self.event_id}: {self.reserved} reserved, {self.confirmed} confirmed"
+
+
+class CaisseRosterEntry(models.Model):
+    """
+    Search row of a participant registered for an event, for the caisse
+    roster (caisse/roster.py): their name, email, username and badge id,
+    lowercased and accent-stripped, kept in step with the registration,
+    user and participant by events/signals.py.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='caisse_roster_entries')
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='caisse_roster_entries')
+
+    # Roster order (keyset pagination on sort_name, id)
+    sort_name = models.CharField(max_length=255)
+    # Searched with a plain substring match; trigram-indexed on PostgreSQL
+    search_text = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Caisse Roster Entry"
+        verbose_name_plural = "Caisse Roster Entries"
+        unique_together = ('event', 'participant')
+        indexes = [
+            models.Index(fields=['event', 'sort_name', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.sort_name} @ {self.event_id}"
+
+
+class CaisseStatsBucket(models.Model):
+    """
+    One caisse's transactions for one hour and payment method, summed
+    (caisse/stats.py): the rolling summary the caisse statistics read, so
+    they cost the same whatever the transaction volume. Keyed by the hour
+    the transaction was created; cancelling moves it to the cancelled
+    columns of the same bucket.
+    """
+    caisse = models.ForeignKey(Caisse, on_delete=models.CASCADE, related_name='stats_buckets')
+    hour = models.DateTimeField()
+    payment_method = models.CharField(max_length=20)
+
+    transaction_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    cancelled_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Caisse Stats Bucket"
+        verbose_name_plural = "Caisse Stats Buckets"
+        unique_together = ('caisse', 'hour', 'payment_method')
+        ordering = ['caisse', 'hour', 'payment_method']
+
+    def __str__(self):
+        return f"{self.caisse_id} {self.hour:%Y-%m-%d %H}h {self.payment_method}: {self.transaction_count}"
@@ -0,0 +1,339 @@
+"""
+Caisse dashboard read model: reservation/confirmation state per participant
+and tallies per reservation key, kept up to date at write time.
+
+caisse_dashboard (never cached) used to rebuild all of this on every page
+load -- every RegistrationOrder's items_snapshot for the event, a grouped
+query over the completed transactions, and a prefetch of every
+participant's transactions and items -- which is what timed the caisse
+login out on large events. That answer only changes when an order or a
+transaction does, so it is maintained here instead:
+
+- CaisseParticipantState: per participant and event, the reservation keys
+  of their non-rejected orders, the keys and PayableItems their completed
+  transactions cover, and the still-unconfirmed part of their latest order
+  (with its discount summary);
+- CaisseItemTally: per reservation key, how many participants reserved it
+  without paying yet and how many paid for it -- moved by F() deltas when
+  a participant's state changes, never recounted;
+- CaisseEventState: the event's version counter. Every change bumps it and
+  stamps the rows it touched, so the dashboard can pull only what changed
+  since the version it rendered (changes_since(), served at caisse/state/).
+
+Writers: events/signals.py refreshes a participant in the same DB
+transaction as the RegistrationOrder or CaisseTransaction write (right
+after commit for a deleted order). Keys are
+stored rather than PayableItem ids, and mapped onto the event's current
+items when read, so adding a PayableItem needs no rebuild. An event is
+built in full on its first dashboard load (build_event()); `manage.py
+rebuild_caisse_state` rebuilds and checks it.
+"""
+from collections import defaultdict
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from caisse.models import (
+    CaisseEventState, CaisseItemTally, CaisseParticipantState, CaisseTransaction, PayableItem,
+)
+
+STATE_FIELDS = ('reserved_keys', 'paid_keys', 'paid_item_ids', 'pending_order')
+EMPTY_STATE = {'reserved_keys': [], 'paid_keys': [], 'paid_item_ids': [], 'pending_order': {}}
+
+
+def item_key(payable_item):
+    """Reservation key of a PayableItem mirroring a BlocItem or a Session, else None."""
+    return _key(payable_item.bloc_item_id, payable_item.session_id)
+
+
+def _key(bloc_item_id, session_id):
+    if bloc_item_id:
+        return f'item:{bloc_item_id}'
+    if session_id:
+        return f'session:{session_id}'
+    return None
+
+
+def order_keys(items_snapshot):
+    """Reservation keys of a RegistrationOrder's items_snapshot."""
+    # Snapshot ids are ints (BlocItem) or UUID strings (Session); formatting
+    # both keeps them comparable with the PayableItem side
+    return {
+        f"{entry['type']}:{entry['id']}"
+        for entry in items_snapshot or []
+        if entry.get('type') in ('item', 'session') and entry.get('id') is not None
+    }
+
+
+def _orders(event_id, participant_ids=None):
+    from dashboard.models_blocs import RegistrationOrder
+
+    orders = RegistrationOrder.objects.exclude(status='rejected').filter(
+        event_id=event_id, participant__isnull=False,
+    )
+    if participant_ids is not None:
+        orders = orders.filter(participant_id__in=participant_ids)
+    return orders.order_by('-created_at').only(
+        'id', 'participant_id', 'items_snapshot', 'total_before_reduction', 'period_discount_percent',
+        'blocs_discount_percent', 'total_discount_percent', 'total_after_reduction',
+    )
+
+
+def _paid_rows(event_id, participant_ids=None):
+    """(participant_id, payable_item_id, bloc_item_id, session_id) of completed transactions."""
+    transactions = CaisseTransaction.objects.filter(status='completed', items__event_id=event_id)
+    if participant_ids is not None:
+        transactions = transactions.filter(participant_id__in=participant_ids)
+    return transactions.values_list(
+        'participant_id', 'items__id', 'items__bloc_item_id', 'items__session_id',
+    ).distinct()
+
+
+def _compute(orders, paid_rows):
+    """One participant's state fields from their orders (newest first) and paid rows."""
+    reserved = set()
+    for order in orders:
+        reserved |= order_keys(order.items_snapshot)
+    paid_item_ids = sorted({row[1] for row in paid_rows})
+    paid_keys = {_key(row[2], row[3]) for row in paid_rows} - {None}
+
+    pending_order = {}
+    if orders:
+        # Only the latest order counts -- see _pending_orders_with_payable_ids
+        latest = orders[0]
+        pending = order_keys(latest.items_snapshot) - paid_keys
+        if pending:
+            pending_order = {
+                'order_id': str(latest.id),
+                'keys': sorted(pending),
+                'total_before': str(latest.total_before_reduction),
+                'period_discount_percent': str(latest.period_discount_percent),
+                'blocs_discount_percent': str(latest.blocs_discount_percent),
+                'discount_percent': str(latest.total_discount_percent),
+                'total_after': str(latest.total_after_reduction),
+            }
+    return {
+        'reserved_keys': sorted(reserved),
+        'paid_keys': sorted(paid_keys),
+        'paid_item_ids': paid_item_ids,
+        'pending_order': pending_order,
+    }
+
+
+def compute_event_states(event_id):
+    """{participant_id: state fields} for everyone with an order or a payment at the event."""
+    orders = defaultdict(list)
+    for order in _orders(event_id):
+        orders[order.participant_id].append(order)
+    paid = defaultdict(list)
+    for row in _paid_rows(event_id):
+        paid[row[0]].append(row)
+    return {
+        participant_id: _compute(orders.get(participant_id, []), paid.get(participant_id, []))
+        for participant_id in set(orders) | set(paid)
+    }
+
+
+def _tally_deltas(old, new):
+    """{key: [reserved delta, confirmed delta]} between two states of one participant."""
+    deltas = defaultdict(lambda: [0, 0])
+    old_pending = set(old['reserved_keys']) - set(old['paid_keys'])
+    new_pending = set(new['reserved_keys']) - set(new['paid_keys'])
+    for key in new_pending - old_pending:
+        deltas[key][0] += 1
+    for key in old_pending - new_pending:
+        deltas[key][0] -= 1
+    for key in set(new['paid_keys']) - set(old['paid_keys']):
+        deltas[key][1] += 1
+    for key in set(old['paid_keys']) - set(new['paid_keys']):
+        deltas[key][1] -= 1
+    return deltas
+
+
+def refresh_participant(participant_id, event_id):
+    """
+    Recompute one participant's state at an event and move the tallies by
+    the difference. Runs in the caller's transaction; a no-op for events
+    whose read model has not been built yet.
+    """
+    with db_transaction.atomic():
+        # Serializes the event's refreshes, so deltas apply in order
+        event_state = CaisseEventState.objects.select_for_update().filter(event_id=event_id).first()
+        if event_state is None:
+            return None
+        orders = list(_orders(event_id, [participant_id]))
+        new = _compute(orders, list(_paid_rows(event_id, [participant_id])))
+
+        state = CaisseParticipantState.objects.filter(participant_id=participant_id, event_id=event_id).first()
+        old = {field: getattr(state, field) for field in STATE_FIELDS} if state else EMPTY_STATE
+        if old == new:
+            return state
+
+        event_state.version += 1
+        event_state.save(update_fields=['version'])
+        deltas = _tally_deltas(old, new)
+        if deltas:
+            CaisseItemTally.objects.bulk_create(
+                [CaisseItemTally(event_id=event_id, key=key) for key in deltas], ignore_conflicts=True,
+            )
+            for key, (reserved, confirmed) in deltas.items():
+                CaisseItemTally.objects.filter(event_id=event_id, key=key).update(
+                    reserved=F('reserved') + reserved, confirmed=F('confirmed') + confirmed,
+                    version=event_state.version,
+                )
+        state, _created = CaisseParticipantState.objects.update_or_create(
+            participant_id=participant_id, event_id=event_id,
+            defaults={**new, 'version': event_state.version},
+        )
+    return state
+
+
+def build_event(event_id):
+    """Rebuild an event's read model from its orders and transactions; returns the new version."""
+    with db_transaction.atomic():
+        event_state, _created = CaisseEventState.objects.select_for_update().get_or_create(event_id=event_id)
+        # Read under the lock: a refresh_participant committed meanwhile
+        # would otherwise be overwritten by the older rows
+        states = compute_event_states(event_id)
+        tallies = _tallies_of(states)
+        event_state.version += 1
+        event_state.built_at = timezone.now()
+        event_state.save(update_fields=['version', 'built_at'])
+        version = event_state.version
+
+        CaisseParticipantState.objects.filter(event_id=event_id).delete()
+        CaisseParticipantState.objects.bulk_create(
+            [
+                CaisseParticipantState(participant_id=participant_id, event_id=event_id, version=version, **fields)
+                for participant_id, fields in states.items()
+            ],
+            batch_size=500,
+        )
+        CaisseItemTally.objects.filter(event_id=event_id).delete()
+        CaisseItemTally.objects.bulk_create(
+            [
+                CaisseItemTally(event_id=event_id, key=key, reserved=reserved, confirmed=confirmed, version=version)
+                for key, (reserved, confirmed) in tallies.items()
+            ],
+            batch_size=500,
+        )
+    return version
+
+
+def _tallies_of(states):
+    tallies = defaultdict(lambda: [0, 0])
+    for fields in states.values():
+        for key, (reserved, confirmed) in _tally_deltas(EMPTY_STATE, fields).items():
+            tallies[key][0] += reserved
+            tallies[key][1] += confirmed
+    return {key: tuple(counts) for key, counts in tallies.items() if counts != [0, 0]}
+
+
+def check_event(event_id):
+    """
+    Compare an event's stored read model with its orders and transactions
+
+    Returns:
+        list: (what, identifier) for every participant state or tally out of step
+    """
+    expected = compute_event_states(event_id)
+    stored = {
+        state.participant_id: {field: getattr(state, field) for field in STATE_FIELDS}
+        for state in CaisseParticipantState.objects.filter(event_id=event_id)
+    }
+    drift = [
+        ('participant', participant_id)
+        for participant_id in set(expected) | set(stored)
+        if expected.get(participant_id, EMPTY_STATE) != stored.get(participant_id, EMPTY_STATE)
+    ]
+    expected_tallies = _tallies_of(expected)
+    stored_tallies = {key: counts for key, counts in item_tallies(event_id).items() if counts != (0, 0)}
+    drift += [
+        ('tally', key)
+        for key in set(expected_tallies) | set(stored_tallies)
+        if expected_tallies.get(key) != stored_tallies.get(key)
+    ]
+    return drift
+
+
+def current_version(event_id):
+    """The event's read-model version, building it first if it never was."""
+    version = CaisseEventState.objects.filter(event_id=event_id).values_list('version', flat=True).first()
+    if version is None:
+        version = build_event(event_id)
+    return version
+
+
+def key_to_payable_ids(payable_items):
+    """{reservation key: [PayableItem id, ...]} for the event's items"""
+    mapping = {}
+    for item in payable_items:
+        key = item_key(item)
+        if key:
+            mapping.setdefault(key, []).append(item.id)
+    return mapping
+
+
+def participant_views(states, mapping):
+    """
+    The dashboard's per-participant maps, keyed by str(participant id)
+
+    Returns:
+        paid: [PayableItem id, ...] already paid
+        reserved: [PayableItem id, ...] reserved but not paid yet (pre-checked)
+        summary: [{total_before, ..., payable_ids}] for the latest pending order
+    """
+    paid, reserved, summary = {}, {}, {}
+    for state in states:
+        participant_id = str(state.participant_id)
+        paid_ids = set(state.paid_item_ids)
+        paid[participant_id] = sorted(paid_ids)
+
+        reserved_ids = {pid for key in state.reserved_keys for pid in mapping.get(key, [])} - paid_ids
+        if reserved_ids:
+            reserved[participant_id] = sorted(reserved_ids)
+
+        pending = state.pending_order
+        pending_ids = {pid for key in pending.get('keys', []) for pid in mapping.get(key, [])} - paid_ids
+        if pending_ids:
+            entry = {name: value for name, value in pending.items() if name not in ('keys', 'order_id')}
+            summary[participant_id] = [{**entry, 'payable_ids': sorted(pending_ids)}]
+    return paid, reserved, summary
+
+
+def item_tallies(event_id, since=None):
+    """{key: (reserved, confirmed)}, only the keys changed after `since` if given."""
+    tallies = CaisseItemTally.objects.filter(event_id=event_id)
+    if since is not None:
+        tallies = tallies.filter(version__gt=since)
+    return {key: (reserved, confirmed) for key, reserved, confirmed in tallies.values_list('key', 'reserved', 'confirmed')}
+
+
+def changes_since(event_id, since, participant_ids=None):
+    """
+    Everything that changed after version `since`, shaped like the
+    dashboard's own data (a delta feed for the page it rendered)
+
+    Returns:
+        dict: {'version', 'paid', 'reserved', 'summary', 'tallies'}, where
+            tallies maps PayableItem id -> {'reserved', 'confirmed'}
+    """
+    version = current_version(event_id)
+    mapping = key_to_payable_ids(
+        PayableItem.objects.filter(event_id=event_id, is_active=True).only('id', 'bloc_item_id', 'session_id')
+    )
+    states = CaisseParticipantState.objects.filter(event_id=event_id, version__gt=since)
+    if participant_ids is not None:
+        states = states.filter(participant_id__in=participant_ids)
+    paid, reserved, summary = participant_views(states, mapping)
+    # Participants whose pending sets emptied must be cleared client-side
+    for participant_id in paid:
+        reserved.setdefault(participant_id, [])
+        summary.setdefault(participant_id, [])
+
+    tallies = {}
+    for key, (reserved_count, confirmed_count) in item_tallies(event_id, since).items():
+        for payable_id in mapping.get(key, []):
+            tallies[payable_id] = {'reserved': reserved_count, 'confirmed': confirmed_count}
+    return {'version': version, 'paid': paid, 'reserved': reserved, 'summary': summary, 'tallies': tallies}
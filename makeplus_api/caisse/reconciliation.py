@@ -0,0 +1,269 @@
+"""
+End-of-day reconciliation report of the caisses: every transaction with
+its items, payment method and cancellation, then the totals per caisse and
+payment method -- as CSV or XLSX.
+
+Finance used to page through transaction_history (100 rows, and one
+get_items_list() query per row). Exports can run to 100k+ transactions, so
+nothing here holds more than one batch in memory:
+
+- transactions are read in REPORT_BATCH_SIZE batches, keyset paginated on
+  (created_at, id), each batch a values() query plus one query for the
+  item names of the whole batch. Not QuerySet.iterator(): its server-side
+  cursor needs a transaction open around it on PostgreSQL behind the
+  Supabase pooler (transaction mode, port 6543), and a streamed response
+  is consumed after the view has returned. Short batches hold nothing open
+  between two chunks of the response;
+- totals are summed while the rows go by, one entry per caisse and payment
+  method;
+- CSV is a generator served by a StreamingHttpResponse;
+- text that would start a formula (=, +, -, @) is prefixed with a quote in
+  both formats: names, notes and cancelled_by are typed in by users;
+- XLSX is an openpyxl write-only workbook, which spills its rows to disk
+  as they are appended; the caller saves it to a temporary file.
+"""
+import csv
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Q
+from django.utils import timezone
+
+from caisse.models import CaisseTransaction
+
+REPORT_BATCH_SIZE = 2000
+
+PAYMENT_METHOD_LABELS = {
+    'cash': 'Espèces',
+    'bank_transfer': 'Virement bancaire',
+    'mixed': 'Mixte (espèces + virement)',
+}
+
+STATUS_LABELS = {
+    'completed': 'Effectuée',
+    'cancelled': 'Annulée',
+}
+
+TRANSACTION_HEADERS = [
+    'Date', 'Caisse', 'Transaction', 'Participant', 'E-mail', 'Badge', 'Articles',
+    'Mode de paiement', 'Montant (DZD)', 'Statut', 'Annulée le', 'Annulée par', 'Notes',
+]
+
+TOTAL_HEADERS = [
+    'Caisse', 'Mode de paiement', 'Transactions effectuées', 'Montant encaissé (DZD)',
+    'Transactions annulées', 'Montant annulé (DZD)',
+]
+
+_FIELDS = (
+    'id', 'created_at', 'caisse_id', 'caisse__name', 'participant__user__first_name',
+    'participant__user__last_name', 'participant__user__username', 'participant__user__email',
+    'participant__badge_id', 'payment_method', 'total_amount', 'status', 'cancelled_at', 'cancelled_by',
+    'notes',
+)
+
+
+def _day_start(value):
+    return timezone.make_aware(datetime.combine(date.fromisoformat(value), time.min))
+
+
+def report_transactions(event_id=None, caisse_id=None, status='', date_from='', date_to=''):
+    """
+    The transactions of the report. Dates are 'YYYY-MM-DD' days of local
+    time, both included.
+
+    Raises:
+        ValueError: an event, caisse, date or status that can't be used
+    """
+    transactions = CaisseTransaction.objects.all()
+    if event_id:
+        try:
+            event_id = uuid.UUID(str(event_id))
+        except ValueError:
+            raise ValueError(f'Invalid event: {event_id}')
+        transactions = transactions.filter(caisse__event_id=event_id)
+    if caisse_id:
+        try:
+            caisse_id = int(caisse_id)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid caisse: {caisse_id}')
+        transactions = transactions.filter(caisse_id=caisse_id)
+    if status:
+        if status not in STATUS_LABELS:
+            raise ValueError(f'Unknown status: {status}')
+        transactions = transactions.filter(status=status)
+    # Bounds on created_at itself rather than created_at__date, so the
+    # created_at index still applies
+    if date_from:
+        transactions = transactions.filter(created_at__gte=_day_start(date_from))
+    if date_to:
+        transactions = transactions.filter(created_at__lt=_day_start(date_to) + timedelta(days=1))
+    return transactions
+
+
+def _batches(transactions, batch_size):
+    """Lists of up to batch_size value rows, in (created_at, id) order"""
+    transactions = transactions.order_by('created_at', 'id').values(*_FIELDS)
+    after = None
+    while True:
+        batch = transactions
+        if after:
+            batch = batch.filter(Q(created_at__gt=after[0]) | Q(created_at=after[0], id__gt=after[1]))
+        rows = list(batch[:batch_size])
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1]['created_at'], rows[-1]['id'])
+
+
+def _item_names(transaction_ids):
+    """{transaction id: 'item, item'} in one query"""
+    through = CaisseTransaction.items.through
+    names = {}
+    links = through.objects.filter(caissetransaction_id__in=transaction_ids).order_by(
+        'payableitem__item_type', 'payableitem__name',
+    ).values_list('caissetransaction_id', 'payableitem__name')
+    for transaction_id, name in links:
+        names.setdefault(transaction_id, []).append(name)
+    return {transaction_id: ', '.join(items) for transaction_id, items in names.items()}
+
+
+def _local(moment):
+    # Excel has no time zones: local time, naive
+    return timezone.localtime(moment).replace(tzinfo=None) if moment else None
+
+
+def _participant_name(row):
+    name = f"{row['participant__user__first_name']} {row['participant__user__last_name']}".strip()
+    return name or row['participant__user__username']
+
+
+def _add_to_totals(totals, row):
+    entry = totals.setdefault(
+        (row['caisse__name'], row['caisse_id'], row['payment_method']),
+        {'count': 0, 'amount': Decimal('0'), 'cancelled': 0, 'cancelled_amount': Decimal('0')},
+    )
+    if row['status'] == 'cancelled':
+        entry['cancelled'] += 1
+        entry['cancelled_amount'] += row['total_amount']
+    else:
+        entry['count'] += 1
+        entry['amount'] += row['total_amount']
+
+
+def transaction_rows(transactions, totals, batch_size=REPORT_BATCH_SIZE):
+    """
+    Rows of the report (TRANSACTION_HEADERS order), two queries per batch,
+    summing each into `totals` as it goes -- read total_rows(totals) once
+    this is exhausted.
+    """
+    for batch in _batches(transactions, batch_size):
+        items = _item_names([row['id'] for row in batch])
+        for row in batch:
+            _add_to_totals(totals, row)
+            yield [
+                _local(row['created_at']), row['caisse__name'], row['id'], _participant_name(row),
+                row['participant__user__email'], row['participant__badge_id'] or '', items.get(row['id'], ''),
+                PAYMENT_METHOD_LABELS.get(row['payment_method'], row['payment_method']), row['total_amount'],
+                STATUS_LABELS.get(row['status'], row['status']), _local(row['cancelled_at']),
+                row['cancelled_by'], row['notes'],
+            ]
+
+
+def total_rows(totals):
+    """Rows of the totals (TOTAL_HEADERS order): per caisse and payment method, per caisse, overall"""
+    rows = []
+    grand = [0, Decimal('0'), 0, Decimal('0')]
+    caisse_key, caisse_sum = None, None
+    for (caisse_name, caisse_id, method), entry in sorted(totals.items()):
+        if (caisse_name, caisse_id) != caisse_key:
+            if caisse_key:
+                rows.append([f'Total {caisse_key[0]}', ''] + caisse_sum)
+            caisse_key, caisse_sum = (caisse_name, caisse_id), [0, Decimal('0'), 0, Decimal('0')]
+        values = [entry['count'], entry['amount'], entry['cancelled'], entry['cancelled_amount']]
+        rows.append([caisse_name, PAYMENT_METHOD_LABELS.get(method, method)] + values)
+        caisse_sum = [a + b for a, b in zip(caisse_sum, values)]
+        grand = [a + b for a, b in zip(grand, values)]
+    if caisse_key:
+        rows.append([f'Total {caisse_key[0]}', ''] + caisse_sum)
+    rows.append(['Total général', ''] + grand)
+    return rows
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+# Leading characters that make Excel read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell_value(value):
+    """Text typed in by users (names, notes...) can't start a formula: prefixed with a quote."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return '' if value is None else _cell_value(value)
+
+
+def stream_csv(transactions, batch_size=REPORT_BATCH_SIZE):
+    """
+    The report as CSV lines, for a StreamingHttpResponse: the transactions,
+    a blank line, then the totals. Starts with a BOM so Excel reads it as
+    UTF-8.
+    """
+    writer = csv.writer(_Echo())
+    totals = {}
+    yield '\ufeff' + writer.writerow(TRANSACTION_HEADERS)
+    for row in transaction_rows(transactions, totals, batch_size):
+        yield writer.writerow([_csv_value(value) for value in row])
+    yield writer.writerow([])
+    yield writer.writerow(TOTAL_HEADERS)
+    for row in total_rows(totals):
+        yield writer.writerow([_cell_value(value) for value in row])
+
+
+def write_xlsx(transactions, output, batch_size=REPORT_BATCH_SIZE):
+    """Save the report to `output` (a binary file) as a two-sheet workbook: Transactions, Totaux."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+
+    workbook = Workbook(write_only=True)
+    header_fill = PatternFill(start_color="2D1B6B", end_color="2D1B6B", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+
+    def header(sheet, titles):
+        cells = []
+        for title in titles:
+            cell = WriteOnlyCell(sheet, value=title)
+            cell.fill = header_fill
+            cell.font = header_font
+            cells.append(cell)
+        return cells
+
+    sheet = workbook.create_sheet('Transactions')
+    for column, width in zip('ABCDEFGHIJKLM', (18, 18, 12, 26, 30, 14, 40, 22, 14, 12, 18, 18, 40)):
+        sheet.column_dimensions[column].width = width
+    sheet.append(header(sheet, TRANSACTION_HEADERS))
+    totals = {}
+    for row in transaction_rows(transactions, totals, batch_size):
+        sheet.append([_cell_value(value) for value in row])
+
+    totals_sheet = workbook.create_sheet('Totaux')
+    for column, width in zip('ABCDEF', (26, 26, 22, 22, 22, 22)):
+        totals_sheet.column_dimensions[column].width = width
+    totals_sheet.append(header(totals_sheet, TOTAL_HEADERS))
+    for row in total_rows(totals):
+        totals_sheet.append([_cell_value(value) for value in row])
+
+    workbook.save(output)
@@ -0,0 +1,185 @@
+"""
+Participant roster of the caisse: paged listing and search.
+
+caisse_dashboard rendered every registered participant (with a prefetch of
+all their transactions) into the page, and search_participant matched five
+icontains ORs -- over four joined user columns and the participant's QR
+JSON -- then ran two more queries per result. Every keystroke was a scan of
+the event's users. Instead:
+
+- CaisseRosterEntry holds one row per registration with the searchable
+  text already normalized (lowercased, accents stripped): name, email,
+  username and badge id. events/signals.py keeps it in step with the
+  registration, the user and the participant; ensure_roster() fills in
+  registrations made behind the signals' back (bulk loads), on each
+  dashboard load;
+- search is one substring match on that column (trigram-indexed on
+  PostgreSQL, see migration 0011; a scan of the event's rows on SQLite);
+- pages are ROSTER_PAGE_SIZE rows in (sort_name, id) order, keyset
+  paginated with an opaque cursor -- no OFFSET, so page 40 costs what page
+  1 does;
+- checked_in (a completed transaction at this caisse) and
+  transaction_count are subquery annotations of the same query.
+"""
+import base64
+import json
+import unicodedata
+
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from caisse.models import CaisseRosterEntry, CaisseTransaction
+
+ROSTER_PAGE_SIZE = 50
+
+
+def normalize(text):
+    """Lowercased, accent-stripped, whitespace-collapsed text"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.lower().split())
+
+
+def display_name(user):
+    return user.get_full_name() or user.username
+
+
+def entry_fields(participant):
+    """sort_name and search_text of a participant (with its user loaded)"""
+    user = participant.user
+    name = normalize(display_name(user))
+    return {
+        'sort_name': name[:255],
+        'search_text': ' '.join(
+            part for part in (name, normalize(user.email), normalize(user.username), normalize(participant.badge_id)) if part
+        ),
+    }
+
+
+def sync_participant(participant):
+    """Rewrite the search rows of every registration of `participant`."""
+    CaisseRosterEntry.objects.filter(participant=participant).update(**entry_fields(participant))
+
+
+def add_registration(participant, event_id):
+    CaisseRosterEntry.objects.update_or_create(
+        event_id=event_id, participant=participant, defaults=entry_fields(participant),
+    )
+
+
+def ensure_roster(event):
+    """Create the rows missing for the event's registrations; returns how many."""
+    from events.models import ParticipantEventRegistration
+
+    missing = (
+        ParticipantEventRegistration.objects.filter(event=event)
+        .exclude(participant_id__in=CaisseRosterEntry.objects.filter(event=event).values('participant_id'))
+        .select_related('participant__user')
+    )
+    entries = [
+        CaisseRosterEntry(event=event, participant=registration.participant, **entry_fields(registration.participant))
+        for registration in missing
+    ]
+    CaisseRosterEntry.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+    return len(entries)
+
+
+def search_terms(query):
+    """
+    Normalized search words. A scanned QR payload (JSON) is searched by
+    its badge id.
+    """
+    query = (query or '').strip()
+    if query.startswith('{'):
+        try:
+            payload = json.loads(query)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and payload.get('badge_id'):
+            return [normalize(str(payload['badge_id']))]
+    return normalize(query).split()
+
+
+def encode_cursor(sort_name, entry_id):
+    raw = json.dumps([sort_name, entry_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(sort_name, id) of the last row of the previous page; ValueError if malformed"""
+    try:
+        sort_name, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(sort_name, str) or not isinstance(entry_id, int):
+        raise ValueError('Invalid cursor')
+    return sort_name, entry_id
+
+
+def roster_queryset(caisse, query=''):
+    """
+    The caisse event's roster rows matching `query` -- participants only
+    (a 'participant' UserEventAssignment), as the dashboard always listed
+    -- in page order, with checked_in and transaction_count annotated.
+    """
+    from events.models import UserEventAssignment
+
+    entries = CaisseRosterEntry.objects.filter(
+        event_id=caisse.event_id,
+        participant__user_id__in=UserEventAssignment.objects.filter(
+            event_id=caisse.event_id, role='participant',
+        ).values('user_id'),
+    )
+    for term in search_terms(query):
+        entries = entries.filter(search_text__contains=term)
+
+    completed = CaisseTransaction.objects.filter(participant_id=OuterRef('participant_id'), status='completed')
+    transaction_count = (
+        completed.order_by().values('participant_id').annotate(count=Count('id')).values('count')
+    )
+    return entries.annotate(
+        checked_in=Exists(completed.filter(caisse_id=caisse.id)),
+        transaction_count=Coalesce(Subquery(transaction_count, output_field=IntegerField()), Value(0)),
+    ).order_by('sort_name', 'id')
+
+
+def roster_page(caisse, query='', cursor=None, limit=ROSTER_PAGE_SIZE):
+    """
+    One page of the roster
+
+    Returns:
+        dict: {'participants': [{id, name, email, badge_id, checked_in,
+            transaction_count}], 'next_cursor': cursor of the next page
+            or None}
+    """
+    entries = roster_queryset(caisse, query)
+    if cursor:
+        sort_name, entry_id = decode_cursor(cursor)
+        entries = entries.filter(Q(sort_name__gt=sort_name) | Q(sort_name=sort_name, id__gt=entry_id))
+
+    rows = list(
+        entries.values(
+            'id', 'sort_name', 'participant_id', 'participant__badge_id', 'participant__user__first_name',
+            'participant__user__last_name', 'participant__user__username', 'participant__user__email',
+            'checked_in', 'transaction_count',
+        )[:limit + 1]
+    )
+    participants = [
+        {
+            'id': row['participant_id'],
+            'name': (
+                f"{row['participant__user__first_name']} {row['participant__user__last_name']}".strip()
+                or row['participant__user__username']
+            ),
+            'email': row['participant__user__email'],
+            'badge_id': row['participant__badge_id'],
+            'checked_in': row['checked_in'],
+            'transaction_count': row['transaction_count'],
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last['sort_name'], last['id'])
+    return {'participants': participants, 'next_cursor': next_cursor}
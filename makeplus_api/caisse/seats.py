@@ -0,0 +1,261 @@
+"""
+Seat inventory for capacity-limited sessions (workshops) sold at the caisse.
+
+process_transaction used to check a workshop's capacity with a distinct
+count over the completed transactions of every selected session item, then
+insert -- so two caisses selling the last seat at the same moment both
+passed the check. Seats are now counted in SessionSeatInventory, one row
+per session:
+
+- claim_seats() runs inside the DB transaction that records the sale,
+  before the CaisseTransaction is created: it locks the sessions' rows
+  (select_for_update, in session order so two carts never deadlock),
+  refuses any session whose sold + held-by-others seats already reach
+  max_participants, and bumps `sold` with an F() increment. The second of
+  two concurrent sales waits on the lock, then sees the first one's seat;
+- release_seats() gives the seats of a transaction being cancelled back,
+  unless another completed transaction of the participant still covers
+  the session. It runs before cancel(), so a cancel locks the seat rows
+  before the stats bucket and caisse event state its signals lock -- the
+  same order as a sale, which claims before creating its transaction;
+- hold_seats() keeps the seats of a cart in progress (SeatHold, for
+  CAISSE_SEAT_HOLD_SECONDS) so other caisses cannot sell them meanwhile;
+  the sale consumes the holds and expired ones simply stop counting;
+- seat_status() is the "seats left" feed of the caisse dashboard.
+
+Like the old check, `sold` counts participants: buying a session again
+does not take a second seat. Rows are created on first use, counted from
+the transactions; `manage.py rebuild_seat_inventory` recounts them all
+(recount_seats) and reports drift. Event-owner confirmations
+(caisse/services.py) claim without enforcing the limit -- the participant
+reserved and paid through the registration form before.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from caisse.models import CaisseTransaction, SeatHold, SessionSeatInventory
+
+
+class SeatsUnavailable(Exception):
+    """Raised by claim_seats(); `items` are the PayableItems without a seat left."""
+
+    def __init__(self, items):
+        self.items = items
+        super().__init__(', '.join(item.name for item in items))
+
+
+def _by_session(items, limited_only=False):
+    """{session_id: PayableItem} for the session-backed items (the first one per session)."""
+    by_session = {}
+    for item in items:
+        if item.session_id and (not limited_only or item.session.max_participants):
+            by_session.setdefault(item.session_id, item)
+    return by_session
+
+
+def count_sold(session_ids):
+    """{session_id: participants with a completed transaction covering it}, from the transactions."""
+    rows = (
+        CaisseTransaction.objects.filter(status='completed', items__session_id__in=session_ids)
+        .values('items__session_id')
+        .annotate(participants=Count('participant', distinct=True))
+    )
+    return {row['items__session_id']: row['participants'] for row in rows}
+
+
+def _inventory_sold(session_ids):
+    """
+    {session_id: sold}, creating the missing rows from the transactions
+
+    Returns:
+        tuple: (sold by session, ids of the rows just created)
+    """
+    sold = dict(
+        SessionSeatInventory.objects.filter(session_id__in=session_ids).values_list('session_id', 'sold')
+    )
+    missing = set(session_ids) - set(sold)
+    if missing:
+        counted = count_sold(missing)
+        # ignore_conflicts: another caisse may be creating the same rows
+        SessionSeatInventory.objects.bulk_create(
+            [SessionSeatInventory(session_id=session_id, sold=counted.get(session_id, 0)) for session_id in missing],
+            ignore_conflicts=True,
+        )
+        sold.update({session_id: counted.get(session_id, 0) for session_id in missing})
+    return sold, missing
+
+
+def _lock(session_ids):
+    """Lock the sessions' inventory rows; returns ({session_id: sold}, ids just created)."""
+    _sold, created = _inventory_sold(session_ids)
+    rows = (
+        SessionSeatInventory.objects.select_for_update()
+        .filter(session_id__in=session_ids).order_by('session_id')
+        .values_list('session_id', 'sold')
+    )
+    return dict(rows), created
+
+
+def _held(session_ids, exclude_participant_id=None, now=None):
+    """{session_id: active holds}, leaving out one participant's own."""
+    holds = SeatHold.objects.filter(session_id__in=session_ids, expires_at__gt=now or timezone.now())
+    if exclude_participant_id is not None:
+        holds = holds.exclude(participant_id=exclude_participant_id)
+    return {row['session_id']: row['holds'] for row in holds.values('session_id').annotate(holds=Count('id'))}
+
+
+def _paid_session_ids(participant_id, session_ids, exclude_transaction_id=None):
+    transactions = CaisseTransaction.objects.filter(
+        participant_id=participant_id, status='completed', items__session_id__in=session_ids,
+    )
+    if exclude_transaction_id is not None:
+        transactions = transactions.exclude(pk=exclude_transaction_id)
+    return set(transactions.values_list('items__session_id', flat=True))
+
+
+def _bump(session_ids, delta):
+    if session_ids:
+        rows = SessionSeatInventory.objects.filter(session_id__in=session_ids)
+        if delta < 0:
+            rows = rows.filter(sold__gte=-delta)
+        rows.update(sold=F('sold') + delta, updated_at=timezone.now())
+
+
+def claim_seats(participant, items, enforce=True):
+    """
+    Take a seat for `participant` in every session among `items`
+    (PayableItems), releasing their holds on them. Call it inside the
+    transaction that creates the CaisseTransaction, before creating it:
+    the seats stay locked until that transaction ends.
+
+    Raises SeatsUnavailable, claiming nothing, when `enforce` and a
+    capacity-limited session has no seat left.
+    """
+    by_session = _by_session(items)
+    if not by_session:
+        return
+    with db_transaction.atomic():
+        sold, _created = _lock(by_session)
+        to_claim = set(by_session) - _paid_session_ids(participant.pk, by_session)
+        if enforce:
+            held = _held(to_claim, exclude_participant_id=participant.pk)
+            full = [
+                by_session[session_id] for session_id in to_claim
+                if by_session[session_id].session.max_participants
+                and sold[session_id] + held.get(session_id, 0) >= by_session[session_id].session.max_participants
+            ]
+            if full:
+                raise SeatsUnavailable(full)
+        _bump(to_claim, 1)
+        SeatHold.objects.filter(participant=participant, session_id__in=by_session).delete()
+
+
+def release_seats(caisse_transaction):
+    """
+    Give back the seats of a transaction about to be cancelled. Call it
+    inside the transaction that cancels it, before cancel(): the seat rows
+    must be locked ahead of the rows cancel()'s signals lock.
+    """
+    session_ids = set(
+        caisse_transaction.items.filter(session__isnull=False).values_list('session_id', flat=True)
+    )
+    if not session_ids:
+        return
+    with db_transaction.atomic():
+        # Rows created now are counted with the transaction, still completed
+        _lock(session_ids)
+        still_paid = _paid_session_ids(
+            caisse_transaction.participant_id, session_ids, exclude_transaction_id=caisse_transaction.pk,
+        )
+        _bump(session_ids - still_paid, -1)
+
+
+def hold_seats(caisse, participant, items, ttl=None):
+    """
+    Keep seats in the capacity-limited sessions among `items` -- the cart
+    being built for `participant` at `caisse` -- for `ttl` seconds
+    (CAISSE_SEAT_HOLD_SECONDS). The caisse's other holds are dropped: it
+    works on one cart at a time. participant=None just drops them.
+
+    Returns:
+        list: PayableItems that could not be held, no seat being left
+    """
+    ttl = ttl or getattr(settings, 'CAISSE_SEAT_HOLD_SECONDS', 300)
+    now = timezone.now()
+    by_session = _by_session(items, limited_only=True) if participant is not None else {}
+
+    with db_transaction.atomic():
+        stale = SeatHold.objects.filter(caisse=caisse)
+        if participant is not None:
+            stale = stale.exclude(participant=participant, session_id__in=by_session)
+        stale.delete()
+        if not by_session:
+            return []
+
+        sold, _created = _lock(by_session)
+        wanted = set(by_session) - _paid_session_ids(participant.pk, by_session)
+        held = _held(wanted, exclude_participant_id=participant.pk, now=now)
+        unavailable = []
+        for session_id in sorted(wanted, key=str):
+            item = by_session[session_id]
+            if sold[session_id] + held.get(session_id, 0) >= item.session.max_participants:
+                unavailable.append(item)
+                continue
+            SeatHold.objects.update_or_create(
+                session_id=session_id, participant=participant,
+                defaults={'caisse': caisse, 'expires_at': now + timedelta(seconds=ttl)},
+            )
+    return unavailable
+
+
+def seat_status(items):
+    """
+    Live capacity of the capacity-limited sessions among `items`
+
+    Returns:
+        dict: session_id -> {'max_participants', 'sold', 'held',
+            'available', 'is_full'}
+    """
+    by_session = _by_session(items, limited_only=True)
+    if not by_session:
+        return {}
+    sold, _created = _inventory_sold(by_session)
+    held = _held(by_session)
+    status = {}
+    for session_id, item in by_session.items():
+        limit = item.session.max_participants
+        available = max(0, limit - sold[session_id] - held.get(session_id, 0))
+        status[session_id] = {
+            'max_participants': limit,
+            'sold': sold[session_id],
+            'held': held.get(session_id, 0),
+            'available': available,
+            'is_full': available <= 0,
+        }
+    return status
+
+
+def recount_seats(session_ids):
+    """
+    Reset `sold` from the transactions for these sessions
+
+    Returns:
+        dict: session_id -> (stored sold, counted sold) where they differed
+    """
+    session_ids = set(session_ids)
+    drift = {}
+    with db_transaction.atomic():
+        stored, created = _lock(session_ids)
+        counted = count_sold(session_ids)
+        for session_id in session_ids - created:
+            expected = counted.get(session_id, 0)
+            if stored[session_id] != expected:
+                drift[session_id] = (stored[session_id], expected)
+                SessionSeatInventory.objects.filter(session_id=session_id).update(
+                    sold=expected, updated_at=timezone.now(),
+                )
+    return drift
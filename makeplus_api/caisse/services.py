@@ -24,7 +24,9 @@ from django.db import transaction as db_transaction
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 
+from caisse.entitlements import schedule_refresh
 from caisse.models import Caisse, CaisseTransaction, PayableItem
+from caisse.seats import claim_seats, release_seats
 from dashboard.email_sender import send_email
 from dashboard.models_blocs import BlocItem, CUSTOM_BLOC_CHOICES
 
@@ -120,6 +122,8 @@ def confirm_registration_order(order, confirmed_by=None):
             )
 
     with db_transaction.atomic():
+        # Already reserved and paid through the form: counted even past capacity
+        claim_seats(participant, payable_items, enforce=False)
         caisse_txn = CaisseTransaction.objects.create(
             caisse=caisse,
             participant=participant,
@@ -129,8 +133,7 @@ def confirm_registration_order(order, confirmed_by=None):
             notes=f'Confirmed by event owner for registration {order.id}.',
             marked_present=True,
         )
-        for payable_item in payable_items:
-            caisse_txn.items.add(payable_item)
+        caisse_txn.items.add(*payable_items)
 
         order.status = 'approved'
         order.reviewed_by_caisse = caisse
@@ -151,6 +154,8 @@ def confirm_registration_order(order, confirmed_by=None):
                     },
                 )
 
+        schedule_refresh(participant.id, order.event)
+
     updated_qr_data = UserProfile.get_qr_for_user(participant.user)
     participant.qr_code_data = updated_qr_data
     participant.save(update_fields=['qr_code_data'])
@@ -269,9 +274,12 @@ def cancel_registration_order(order, cancelled_by=None, reason=''):
     """
     if order.caisse_transaction_id and order.caisse_transaction.status == 'completed':
         cancelled_label = (cancelled_by.get_full_name() or cancelled_by.email) if cancelled_by else 'Event owner'
-        order.caisse_transaction.cancel(
-            cancelled_by=cancelled_label, reason=reason or 'Registration cancelled by event owner.',
-        )
+        with db_transaction.atomic():
+            release_seats(order.caisse_transaction)
+            order.caisse_transaction.cancel(
+                cancelled_by=cancelled_label, reason=reason or 'Registration cancelled by event owner.',
+            )
+            schedule_refresh(order.participant_id, order.event)
     _revoke_session_access_for_order(order)
 
     order.status = 'rejected'
@@ -304,10 +312,13 @@ def unconfirm_registration_order(order, new_status, changed_by=None):
     """
     if order.caisse_transaction_id and order.caisse_transaction.status == 'completed':
         changed_label = (changed_by.get_full_name() or changed_by.email) if changed_by else 'Event owner'
-        order.caisse_transaction.cancel(
-            cancelled_by=changed_label,
-            reason=f'Status changed from Confirmed to {new_status} by event owner.',
-        )
+        with db_transaction.atomic():
+            release_seats(order.caisse_transaction)
+            order.caisse_transaction.cancel(
+                cancelled_by=changed_label,
+                reason=f'Status changed from Confirmed to {new_status} by event owner.',
+            )
+            schedule_refresh(order.participant_id, order.event)
     _revoke_session_access_for_order(order)
 
     order.status = new_status
@@ -381,10 +392,12 @@ def resync_confirmed_registration_order(order, result, edited_by=None):
     edited_label = (edited_by.get_full_name() or edited_by.email) if edited_by else 'Event owner'
 
     with db_transaction.atomic():
+        release_seats(old_txn)
         old_txn.cancel(
             cancelled_by=edited_label,
             reason=f'Superseded: blocs modified by event owner for registration {order.id}.',
         )
+        claim_seats(participant, payable_items, enforce=False)
 
         new_txn = CaisseTransaction.objects.create(
             caisse=caisse,
@@ -395,8 +408,7 @@ def resync_confirmed_registration_order(order, result, edited_by=None):
             notes=f'Confirmed by event owner (blocs edit) for registration {order.id}. Replaces transaction {old_txn.id}.',
             marked_present=True,
         )
-        for payable_item in payable_items:
-            new_txn.items.add(payable_item)
+        new_txn.items.add(*payable_items)
 
         order.period_id = result['active_period_id']
         order.items_snapshot = result['snapshot']
@@ -434,4 +446,6 @@ def resync_confirmed_registration_order(order, result, edited_by=None):
                 has_access=False, payment_status='pending', amount_paid=0,
             )
 
+        schedule_refresh(participant.id, order.event)
+
     return new_txn
@@ -0,0 +1,261 @@
+"""
+Caisse statistics: totals, distinct participants, split by payment method
+and by hour.
+
+Caisse.get_total_amount() loaded every completed transaction to sum it in
+Python, and get_total_participants() / get_transaction_count() ran two
+more queries -- per caisse, so caisse_list cost three scans of each
+caisse's transactions. Two ways to get the numbers now:
+
+- transaction_stats() / hourly_breakdown(): one aggregate query over any
+  CaisseTransaction queryset (a caisse, an event, a date range), with
+  conditional aggregates for the completed / cancelled / per-method
+  figures;
+- summary_stats() / event_stats() / hourly_summary(): the same numbers
+  read from CaisseStatsBucket, one row per caisse, hour and payment method,
+  so the caisse dashboard and caisse_list no longer grow with the
+  transaction volume. events/signals.py re-sums a transaction's bucket
+  whenever it is saved (sold, cancelled) or deleted, in the same DB
+  transaction, with the bucket row locked first so two concurrent sales
+  can't each miss the other's. Distinct participants don't add up across buckets; they
+  are counted from the transactions, in one query for all the caisses
+  asked for.
+
+Migration 0012 filled the buckets from the existing transactions;
+`manage.py rebuild_caisse_stats` re-sums them all (rebuild_buckets) and
+reports drift, e.g. after a transaction's created_at or payment method was
+edited by hand.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour
+from django.utils import timezone
+
+from caisse.models import CaisseStatsBucket, CaisseTransaction
+
+PAYMENT_METHODS = [method for method, _label in CaisseTransaction.PAYMENT_METHOD_CHOICES]
+
+COMPLETED = Q(status='completed')
+CANCELLED = Q(status='cancelled')
+
+
+def _zero():
+    return Value(Decimal('0'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _amount(field, condition):
+    return Coalesce(Sum(field, filter=condition), _zero())
+
+
+def _bucket_aggregates():
+    # Aliased apart from the field names: an alias can't shadow the
+    # total_amount it sums
+    return {
+        'sold': Count('id', filter=COMPLETED),
+        'sold_amount': _amount('total_amount', COMPLETED),
+        'voided': Count('id', filter=CANCELLED),
+        'voided_amount': _amount('total_amount', CANCELLED),
+    }
+
+
+def _bucket_fields(row):
+    """CaisseStatsBucket's fields from a row of _bucket_aggregates()"""
+    return {
+        'transaction_count': row['sold'],
+        'total_amount': row['sold_amount'],
+        'cancelled_count': row['voided'],
+        'cancelled_amount': row['voided_amount'],
+    }
+
+
+def _empty_stats():
+    return {
+        'total_amount': Decimal('0'),
+        'transaction_count': 0,
+        'total_participants': 0,
+        'cancelled_count': 0,
+        'cancelled_amount': Decimal('0'),
+        'by_payment_method': {method: {'count': 0, 'amount': Decimal('0')} for method in PAYMENT_METHODS},
+    }
+
+
+def transaction_stats(transactions):
+    """
+    Statistics of a CaisseTransaction queryset, in one aggregate query
+
+    Returns:
+        dict: total_amount, transaction_count and total_participants (of
+            the completed transactions), cancelled_count, cancelled_amount,
+            and by_payment_method: {method: {'count', 'amount'}}
+    """
+    aggregates = {
+        **_bucket_aggregates(),
+        'participants': Count('participant', filter=COMPLETED, distinct=True),
+    }
+    for method in PAYMENT_METHODS:
+        completed_with_method = COMPLETED & Q(payment_method=method)
+        aggregates[f'{method}_count'] = Count('id', filter=completed_with_method)
+        aggregates[f'{method}_amount'] = _amount('total_amount', completed_with_method)
+    row = transactions.order_by().aggregate(**aggregates)
+
+    stats = _bucket_fields(row)
+    stats['total_participants'] = row['participants']
+    stats['by_payment_method'] = {
+        method: {'count': row[f'{method}_count'], 'amount': row[f'{method}_amount']} for method in PAYMENT_METHODS
+    }
+    return stats
+
+
+def hourly_breakdown(transactions):
+    """[{'hour', 'count', 'amount'}] of the completed transactions, one grouped query"""
+    rows = (
+        transactions.filter(COMPLETED).annotate(hour=TruncHour('created_at'))
+        .values('hour').annotate(count=Count('id'), amount=Sum('total_amount'))
+        .order_by('hour')
+    )
+    return [{'hour': row['hour'], 'count': row['count'], 'amount': row['amount']} for row in rows]
+
+
+# ==================== Rolling summary (CaisseStatsBucket) ====================
+
+def bucket_hour(moment):
+    """Start of the (local time) hour a transaction created at `moment` is summed into"""
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def _bucket_sums(transactions):
+    """{(caisse_id, hour, payment_method): bucket fields}, one grouped query"""
+    rows = transactions.annotate(hour=TruncHour('created_at')).values(
+        'caisse_id', 'hour', 'payment_method',
+    ).annotate(**_bucket_aggregates()).order_by()
+    return {
+        (row['caisse_id'], row['hour'], row['payment_method']): _bucket_fields(row)
+        for row in rows
+    }
+
+
+def refresh_bucket(caisse_id, created_at, payment_method):
+    """Re-sum the bucket a transaction falls in, from the transactions."""
+    hour = bucket_hour(created_at)
+    transactions = CaisseTransaction.objects.filter(
+        caisse_id=caisse_id, payment_method=payment_method,
+        created_at__gte=hour, created_at__lt=hour + timedelta(hours=1),
+    )
+    with db_transaction.atomic():
+        # Locked before summing: a concurrent sale in the same bucket has
+        # either committed (and is summed here) or waits to re-sum after us
+        bucket, _created = CaisseStatsBucket.objects.select_for_update().get_or_create(
+            caisse_id=caisse_id, hour=hour, payment_method=payment_method,
+        )
+        row = _bucket_fields(transactions.order_by().aggregate(**_bucket_aggregates()))
+        if not row['transaction_count'] and not row['cancelled_count']:
+            bucket.delete()
+            return
+        for field, value in row.items():
+            setattr(bucket, field, value)
+        bucket.save()
+
+
+def rebuild_buckets(caisse_ids, check_only=False):
+    """
+    Re-sum the buckets of these caisses from their transactions
+
+    Returns:
+        dict: (caisse_id, hour, payment_method) -> (stored, summed) counts
+            for the buckets that differed
+    """
+    fields = ('transaction_count', 'total_amount', 'cancelled_count', 'cancelled_amount')
+    with db_transaction.atomic():
+        summed = _bucket_sums(CaisseTransaction.objects.filter(caisse_id__in=caisse_ids))
+        stored = {
+            (bucket.caisse_id, bucket.hour, bucket.payment_method): bucket
+            for bucket in CaisseStatsBucket.objects.filter(caisse_id__in=caisse_ids)
+        }
+        drift = {}
+        for key in set(summed) | set(stored):
+            row, bucket = summed.get(key), stored.get(key)
+            stored_values = tuple(getattr(bucket, field) for field in fields) if bucket else (0, 0, 0, 0)
+            summed_values = tuple(row[field] for field in fields) if row else (0, 0, 0, 0)
+            if stored_values != summed_values:
+                drift[key] = (stored_values[0], summed_values[0])
+
+        if not check_only:
+            CaisseStatsBucket.objects.filter(caisse_id__in=caisse_ids).delete()
+            CaisseStatsBucket.objects.bulk_create(
+                [
+                    CaisseStatsBucket(caisse_id=caisse_id, hour=hour, payment_method=payment_method, **fields)
+                    for (caisse_id, hour, payment_method), fields in summed.items()
+                ],
+                batch_size=500,
+            )
+    return drift
+
+
+def _bucket_totals(buckets, *group_by):
+    return buckets.values(*group_by, 'payment_method').annotate(
+        count=Sum('transaction_count'), amount=Sum('total_amount'),
+        cancelled=Sum('cancelled_count'), cancelled_amount=Sum('cancelled_amount'),
+    ).order_by()
+
+
+def _add_bucket_totals(stats, row):
+    stats['transaction_count'] += row['count']
+    stats['total_amount'] += row['amount']
+    stats['cancelled_count'] += row['cancelled']
+    stats['cancelled_amount'] += row['cancelled_amount']
+    by_method = stats['by_payment_method'].setdefault(row['payment_method'], {'count': 0, 'amount': Decimal('0')})
+    by_method['count'] += row['count']
+    by_method['amount'] += row['amount']
+
+
+def summary_stats(caisse_ids):
+    """
+    transaction_stats() of each caisse, read from the buckets: one grouped
+    query on them plus one for the distinct participants
+
+    Returns:
+        dict: caisse_id -> stats
+    """
+    stats = {caisse_id: _empty_stats() for caisse_id in caisse_ids}
+    for row in _bucket_totals(CaisseStatsBucket.objects.filter(caisse_id__in=caisse_ids), 'caisse_id'):
+        _add_bucket_totals(stats[row['caisse_id']], row)
+
+    participants = (
+        CaisseTransaction.objects.filter(COMPLETED, caisse_id__in=caisse_ids)
+        .values('caisse_id').annotate(participants=Count('participant', distinct=True)).order_by()
+    )
+    for row in participants:
+        stats[row['caisse_id']]['total_participants'] = row['participants']
+    return stats
+
+
+def caisse_stats(caisse):
+    """summary_stats() of one caisse"""
+    return summary_stats([caisse.pk])[caisse.pk]
+
+
+def event_stats(event):
+    """
+    summary_stats() of all the event's caisses together -- participants
+    counted once even if they went through several caisses
+    """
+    stats = _empty_stats()
+    for row in _bucket_totals(CaisseStatsBucket.objects.filter(caisse__event=event)):
+        _add_bucket_totals(stats, row)
+    stats['total_participants'] = CaisseTransaction.objects.filter(
+        COMPLETED, caisse__event=event,
+    ).values('participant').distinct().count()
+    return stats
+
+
+def hourly_summary(buckets):
+    """hourly_breakdown() read from a CaisseStatsBucket queryset (a caisse's, an event's)"""
+    rows = (
+        buckets.filter(transaction_count__gt=0)
+        .values('hour').annotate(count=Sum('transaction_count'), amount=Sum('total_amount'))
+        .order_by('hour')
+    )
+    return [{'hour': row['hour'], 'count': row['count'], 'amount': row['amount']} for row in rows]
@@ -1,17 +1,32 @@
+import json
+import tempfile
 from datetime import timedelta
 from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
-from django.test import TestCase
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from rest_framework.test import APIClient
 
-from events.models import Event, Room, Session
+from events.models import Event, Room, Session, UserEventAssignment
 from events.form_validation_service import create_participant_for_event
+from events.qr_cache import clear_memory_cache as clear_qr_memory_cache
 from dashboard.models_blocs import BlocItem, BlocItemStatusRule, EventBlocConfig, RegistrationOrder
-from .models import Caisse, CaisseTransaction, PayableItem
+from .entitlements import refresh_entitlement
+from .models import (
+    Caisse, CaisseRosterEntry, CaisseStatsBucket, CaisseTransaction, EntitlementEventState, ParticipantEntitlement,
+    PayableItem, SeatHold, SessionSeatInventory,
+)
+from .reconciliation import report_transactions, total_rows, transaction_rows
+from .roster import roster_page
+from .seats import release_seats
+from .stats import event_stats, hourly_breakdown, hourly_summary, summary_stats, transaction_stats
 
 
 class BlocItemSyncTests(TestCase):
@@ -660,3 +675,779 @@ class BackfillRegistrationOrderParticipantTests(TestCase):
         self.assertIsNotNone(order.participant)
         self.assertEqual(order.participant.user.email, 'ghost@example.com')
         self.assertFalse(order.participant.user.has_usable_password())
+
+
+class ParticipantEntitlementTests(TestCase):
+    """
+    The per-participant entitlement index badge scans read from
+    (caisse/entitlements.py) must follow every caisse write, and the
+    rebuild command must be able to restore it from the transactions.
+    """
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name="Congress", start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location="Algiers",
+        )
+        room = Room.objects.create(event=self.event, name='Hall A', capacity=100, location='1st floor')
+        self.session = Session.objects.create(
+            event=self.event, room=room, title='Machine Learning', session_type='atelier',
+            start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1),
+            is_paid=True, price=Decimal('2000'),
+        )
+        self.session_payable = PayableItem.objects.get(session=self.session)
+        self.dinner = PayableItem.objects.create(
+            event=self.event, name='Gala Dinner', price=Decimal('500'), item_type='dinner'
+        )
+
+        self.user = User.objects.create_user(username='karim', email='k@example.com', password='x')
+        self.participant = create_participant_for_event(self.user, self.event)
+
+        self.caisse = Caisse.objects.create(name='Caisse 1', email='caisse4@example.com', event=self.event)
+        self.caisse.set_password('x')
+        self.caisse.save()
+
+        session = self.client.session
+        session['caisse_id'] = str(self.caisse.id)
+        session['caisse_name'] = self.caisse.name
+        session.save()
+
+    def _process(self, *items):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('caisse:process_transaction'),
+                data={'participant_id': str(self.participant.id), 'items': [str(i.id) for i in items], 'notes': ''},
+                content_type='application/json',
+            )
+        payload = response.json()
+        self.assertTrue(payload['success'], payload)
+        return payload['transaction_id']
+
+    def _entitlement(self):
+        return ParticipantEntitlement.objects.get(participant=self.participant, event=self.event)
+
+    def test_process_transaction_updates_entitlement(self):
+        self._process(self.session_payable, self.dinner)
+
+        entitlement = self._entitlement()
+        self.assertEqual(
+            {item['id'] for item in entitlement.paid_items},
+            {str(self.session.id), str(self.dinner.id)},
+        )
+        self.assertEqual(entitlement.total_amount, Decimal('2500'))
+
+    def test_cancel_transaction_clears_entitlement(self):
+        transaction_id = self._process(self.dinner)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('caisse:cancel_transaction', args=[transaction_id]),
+                data={'reason': 'Mistake'}, content_type='application/json',
+            )
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(self._entitlement().paid_items, [])
+
+    def test_scan_reads_paid_items_from_entitlement(self):
+        self._process(self.session_payable)
+        controller = User.objects.create_user(username='ctrl', email='ctrl@example.com', password='x')
+        UserEventAssignment.objects.create(user=controller, event=self.event, role='controlleur_des_badges')
+
+        client = APIClient()
+        client.force_authenticate(controller)
+        response = client.post('/api/participants/scan/', {'qr_data': str(self.user.id)}, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([item['id'] for item in response.data['paid_items']], [str(self.session.id)])
+        self.assertEqual(response.data['paid_items'][0]['session_details']['room'], 'Hall A')
+        self.assertEqual(response.data['total_amount'], 2000.0)
+
+    def test_rebuild_command_restores_index_and_check_reports_drift(self):
+        txn = CaisseTransaction.objects.create(
+            caisse=self.caisse, participant=self.participant, total_amount=Decimal('500'), status='completed',
+        )
+        txn.items.add(self.dinner)
+
+        # Written behind the index's back -- --check-only must flag it.
+        with self.assertRaises(CommandError):
+            call_command('rebuild_entitlements', '--check-only', stdout=StringIO())
+
+        call_command('rebuild_entitlements', stdout=StringIO())
+        self.assertEqual([item['id'] for item in self._entitlement().paid_items], [str(self.dinner.id)])
+        call_command('rebuild_entitlements', '--check-only', stdout=StringIO())
+
+    def test_item_and_session_edits_refresh_the_buyers_rows(self):
+        self._process(self.session_payable, self.dinner)
+        hall_b = Room.objects.create(event=self.event, name='Hall B', capacity=50, location='2nd floor')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dinner.name = 'Closing Dinner'
+            self.dinner.save()
+            self.session.room = hall_b
+            self.session.save()
+
+        paid_items = {item['id']: item for item in self._entitlement().paid_items}
+        self.assertEqual(paid_items[str(self.dinner.id)]['title'], 'Closing Dinner')
+        self.assertEqual(paid_items[str(self.session.id)]['session_details']['room'], 'Hall B')
+
+    def test_version_counter_only_moves_on_changes(self):
+        self._process(self.dinner)
+        version = EntitlementEventState.objects.get(event=self.event).version
+        self.assertEqual(self._entitlement().version, version)
+
+        refresh_entitlement(self.participant.id, self.event)
+        self.assertEqual(EntitlementEventState.objects.get(event=self.event).version, version)
+
+        self._process(self.session_payable)
+        self.assertEqual(EntitlementEventState.objects.get(event=self.event).version, version + 1)
+        self.assertEqual(self._entitlement().version, version + 1)
+
+
+class SeatInventoryTests(TestCase):
+    """
+    Workshop capacity is enforced by the seat inventory (caisse/seats.py):
+    a sale claims a seat under a row lock, cancelling gives it back, and a
+    cart in progress at one caisse holds its seats against the others.
+    """
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name="Congress", start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location="Algiers",
+        )
+        room = Room.objects.create(event=self.event, name='Lab', capacity=10, location='2nd floor')
+        self.session = Session.objects.create(
+            event=self.event, room=room, title='Suturing', session_type='atelier',
+            start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1),
+            is_paid=True, price=Decimal('3000'), max_participants=1,
+        )
+        self.workshop = PayableItem.objects.get(session=self.session)
+
+        self.first = create_participant_for_event(
+            User.objects.create_user(username='amel', email='amel@example.com', password='x'), self.event,
+        )
+        self.second = create_participant_for_event(
+            User.objects.create_user(username='yacine', email='yacine@example.com', password='x'), self.event,
+        )
+        self.caisse = Caisse.objects.create(name='Caisse 1', email='seats1@example.com', event=self.event)
+        self.other_caisse = Caisse.objects.create(name='Caisse 2', email='seats2@example.com', event=self.event)
+
+    def _login(self, caisse):
+        session = self.client.session
+        session['caisse_id'] = str(caisse.id)
+        session['caisse_name'] = caisse.name
+        session.save()
+
+    def _process(self, participant, caisse=None):
+        self._login(caisse or self.caisse)
+        return self.client.post(
+            reverse('caisse:process_transaction'),
+            data={'participant_id': str(participant.id), 'items': [str(self.workshop.id)], 'notes': ''},
+            content_type='application/json',
+        ).json()
+
+    def _sold(self):
+        return SessionSeatInventory.objects.get(session=self.session).sold
+
+    def test_last_seat_is_sold_once(self):
+        self.assertTrue(self._process(self.first)['success'])
+        self.assertEqual(self._sold(), 1)
+
+        payload = self._process(self.second, self.other_caisse)
+        self.assertFalse(payload['success'])
+        self.assertIn('Suturing is full', payload['message'])
+        self.assertEqual(CaisseTransaction.objects.filter(participant=self.second).count(), 0)
+
+        # Paying again for a session already paid for takes no second seat
+        self.assertTrue(self._process(self.first)['success'])
+        self.assertEqual(self._sold(), 1)
+
+    def test_cancel_gives_the_seat_back(self):
+        transaction_id = self._process(self.first)['transaction_id']
+        self._login(self.caisse)
+        response = self.client.post(
+            reverse('caisse:cancel_transaction', args=[transaction_id]),
+            data={'reason': 'Changed workshop'}, content_type='application/json',
+        )
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(self._sold(), 0)
+        self.assertTrue(self._process(self.second)['success'])
+
+    def test_cancel_before_the_inventory_row_exists(self):
+        transaction = CaisseTransaction.objects.get(pk=self._process(self.first)['transaction_id'])
+        SessionSeatInventory.objects.all().delete()
+        # release_seats runs first, while the transaction still counts as sold
+        release_seats(transaction)
+        transaction.cancel(cancelled_by='test')
+        self.assertEqual(self._sold(), 0)
+
+    def test_cart_hold_blocks_other_caisses_until_it_expires(self):
+        self._login(self.caisse)
+        response = self.client.post(
+            reverse('caisse:hold_cart_seats'),
+            data={'participant_id': str(self.first.id), 'items': [str(self.workshop.id)]},
+            content_type='application/json',
+        ).json()
+        self.assertEqual(response['unavailable'], [])
+        self.assertEqual(response['seats'][0]['available'], 0)
+
+        self.assertFalse(self._process(self.second, self.other_caisse)['success'])
+
+        SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(self._process(self.second, self.other_caisse)['success'])
+        # The hold's owner now finds the seat gone
+        self._login(self.caisse)
+        response = self.client.post(
+            reverse('caisse:hold_cart_seats'),
+            data={'participant_id': str(self.first.id), 'items': [str(self.workshop.id)]},
+            content_type='application/json',
+        ).json()
+        self.assertEqual([item['name'] for item in response['unavailable']], ['Atelier - Suturing'])
+
+    def test_sale_consumes_the_buyers_own_hold(self):
+        self._login(self.caisse)
+        self.client.post(
+            reverse('caisse:hold_cart_seats'),
+            data={'participant_id': str(self.first.id), 'items': [str(self.workshop.id)]},
+            content_type='application/json',
+        )
+        self.assertTrue(self._process(self.first)['success'])
+        self.assertFalse(SeatHold.objects.exists())
+
+        feed = self.client.get(reverse('caisse:seat_inventory')).json()['seats']
+        self.assertEqual(
+            [(seat['sold'], seat['held'], seat['available'], seat['is_full']) for seat in feed],
+            [(1, 0, 0, True)],
+        )
+
+    def test_rebuild_command_recounts_drift(self):
+        self._process(self.first)
+        SessionSeatInventory.objects.update(sold=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_seat_inventory', '--check-only', stdout=StringIO())
+        call_command('rebuild_seat_inventory', stdout=StringIO())
+        self.assertEqual(self._sold(), 1)
+        call_command('rebuild_seat_inventory', '--check-only', stdout=StringIO())
+
+
+class CaisseReadModelTests(TestCase):
+    """
+    caisse/read_model.py: the dashboard's reserved/paid data is maintained by
+    the order and transaction writes, and the state/ endpoint serves deltas.
+    """
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name="Congress", start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location="Algiers",
+        )
+        EventBlocConfig.objects.create(event=self.event, show_status=True)
+        self.status_item = BlocItem.objects.create(event=self.event, bloc='status', name='Adherent', price=Decimal('1000'))
+        call_command('sync_paid_bloc_items')
+        self.payable = PayableItem.objects.get(bloc_item=self.status_item)
+
+        self.user = User.objects.create_user(username='karim', email='k@example.com', password='x')
+        self.participant = create_participant_for_event(self.user, self.event)
+
+        self.caisse = Caisse.objects.create(name='Caisse 1', email='caisse@example.com', event=self.event)
+        session = self.client.session
+        session['caisse_id'] = str(self.caisse.id)
+        session['caisse_name'] = self.caisse.name
+        session.save()
+
+    def _make_order(self):
+        return RegistrationOrder.objects.create(
+            event=self.event, email=self.user.email, full_name='Karim B',
+            participant=self.participant, status='pending',
+            items_snapshot=[{'bloc': 'status', 'type': 'item', 'id': self.status_item.id, 'name': 'Adherent', 'price': '1000.00'}],
+            receipt_file=SimpleUploadedFile('r.pdf', b'x', content_type='application/pdf'),
+        )
+
+    def _changes(self, since):
+        response = self.client.get(reverse('caisse:dashboard_state'), {'since': since})
+        self.assertTrue(response.json()['success'])
+        return response.json()
+
+    def test_orders_and_transactions_flow_into_the_delta_feed(self):
+        version = self.client.get(reverse('caisse:dashboard')).context['state_version']
+        self.assertEqual(self._changes(version)['tallies'], {})
+
+        order = self._make_order()
+        changes = self._changes(version)
+        participant_id = str(self.participant.id)
+        self.assertEqual(changes['reserved'], {participant_id: [self.payable.id]})
+        self.assertEqual(changes['summary'][participant_id][0]['payable_ids'], [self.payable.id])
+        self.assertEqual(changes['tallies'], {str(self.payable.id): {'reserved': 1, 'confirmed': 0}})
+
+        version = changes['version']
+        txn = CaisseTransaction.objects.create(
+            caisse=self.caisse, participant=self.participant, total_amount=Decimal('1000'), status='completed',
+        )
+        txn.items.add(self.payable)
+        changes = self._changes(version)
+        self.assertEqual(changes['paid'], {participant_id: [self.payable.id]})
+        self.assertEqual(changes['reserved'], {participant_id: []})
+        self.assertEqual(changes['tallies'], {str(self.payable.id): {'reserved': 0, 'confirmed': 1}})
+
+        txn.status = 'cancelled'
+        txn.save()
+        order.status = 'rejected'
+        order.save()
+        item_data = next(
+            d for d in self.client.get(reverse('caisse:dashboard')).context['payable_items_with_capacity']
+            if d['item'].id == self.payable.id
+        )
+        self.assertEqual((item_data['reserved_count'], item_data['confirmed_count']), (0, 0))
+        self.assertEqual(self._changes(changes['version'])['tallies'], {str(self.payable.id): {'reserved': 0, 'confirmed': 0}})
+
+    def test_sale_refreshes_the_read_model_once(self):
+        from .read_model import refresh_participant
+        with patch('events.signals.refresh_participant', wraps=refresh_participant) as refresh:
+            response = self.client.post(
+                reverse('caisse:process_transaction'),
+                data={'participant_id': str(self.participant.id), 'items': [str(self.payable.id)], 'notes': ''},
+                content_type='application/json',
+            )
+        self.assertTrue(response.json()['success'], response.json())
+        self.assertEqual(refresh.call_count, 1)
+
+    def test_rebuild_command_checks_and_repairs(self):
+        self._make_order()
+        self.client.get(reverse('caisse:dashboard'))
+        call_command('rebuild_caisse_state', '--check-only', stdout=StringIO())
+
+        # Written behind the read model's back -- --check-only must flag it.
+        RegistrationOrder.objects.filter(event=self.event).update(status='rejected')
+        with self.assertRaises(CommandError):
+            call_command('rebuild_caisse_state', '--check-only', stdout=StringIO())
+
+        call_command('rebuild_caisse_state', stdout=StringIO())
+        call_command('rebuild_caisse_state', '--check-only', stdout=StringIO())
+        response = self.client.get(reverse('caisse:dashboard'))
+        self.assertEqual(response.context['participant_reserved_items_json'], '{}')
+
+
+class ParticipantRosterTests(TestCase):
+    """caisse/roster.py: normalized search rows, keyset pages, counts in the same query."""
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name="Congress", start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location="Algiers",
+        )
+        self.caisse = Caisse.objects.create(name='Caisse 1', email='caisse@example.com', event=self.event)
+        self.other_caisse = Caisse.objects.create(name='Caisse 2', email='caisse2@example.com', event=self.event)
+        self.participants = {}
+        for username, first_name, last_name in [
+            ('elise', 'Élise', 'Benali'), ('amine', 'Amine', 'Zerrouki'), ('nadia', 'Nadia', 'Cherif'),
+        ]:
+            user = User.objects.create_user(
+                username=username, email=f'{username}@example.com', password='x',
+                first_name=first_name, last_name=last_name,
+            )
+            self.participants[username] = create_participant_for_event(user, self.event)
+        self.dinner = PayableItem.objects.create(
+            event=self.event, name='Dinner', item_type='dinner', price=Decimal('500'),
+        )
+
+        session = self.client.session
+        session['caisse_id'] = str(self.caisse.id)
+        session['caisse_name'] = self.caisse.name
+        session.save()
+
+    def _roster(self, **params):
+        response = self.client.get(reverse('caisse:participant_roster'), params)
+        self.assertTrue(response.json()['success'])
+        return response.json()
+
+    def test_search_ignores_case_and_accents_and_reads_badge_ids(self):
+        elise = self.participants['elise']
+        self.assertEqual([p['id'] for p in self._roster(q='ELISE')['participants']], [elise.id])
+        self.assertEqual([p['id'] for p in self._roster(q='benali élise')['participants']], [elise.id])
+        self.assertEqual([p['id'] for p in self._roster(q=elise.badge_id)['participants']], [elise.id])
+        scanned = json.dumps({'badge_id': elise.badge_id, 'user_id': elise.user_id})
+        self.assertEqual([p['id'] for p in self._roster(q=scanned)['participants']], [elise.id])
+
+        # Renames reach the search rows
+        elise.user.last_name = 'Haddad'
+        elise.user.save()
+        self.assertEqual(self._roster(q='benali')['count'], 0)
+        self.assertEqual(self._roster(q='haddad')['count'], 1)
+
+    def test_pages_follow_the_cursor_with_counts_in_one_query(self):
+        amine = self.participants['amine']
+        txn = CaisseTransaction.objects.create(
+            caisse=self.other_caisse, participant=amine, total_amount=Decimal('500'), status='completed',
+        )
+        txn.items.add(self.dinner)
+        CaisseTransaction.objects.create(
+            caisse=self.caisse, participant=amine, total_amount=Decimal('500'), status='completed',
+        )
+
+        with self.assertNumQueries(1):
+            first = roster_page(self.caisse, limit=2)
+        self.assertEqual([p['name'] for p in first['participants']], ['Amine Zerrouki', 'Élise Benali'])
+        self.assertEqual(first['participants'][0]['transaction_count'], 2)
+        self.assertTrue(first['participants'][0]['checked_in'])
+        self.assertFalse(first['participants'][1]['checked_in'])
+
+        second = roster_page(self.caisse, cursor=first['next_cursor'], limit=2)
+        self.assertEqual([p['name'] for p in second['participants']], ['Nadia Cherif'])
+        self.assertIsNone(second['next_cursor'])
+
+        page = self._roster()
+        self.assertEqual((page['count'], len(page['participants']), page['next_cursor']), (3, 3, None))
+        self.assertFalse(self.client.get(reverse('caisse:participant_roster'), {'cursor': 'nope'}).json()['success'])
+
+    def test_dashboard_lists_the_first_page_and_fills_missing_rows(self):
+        CaisseRosterEntry.objects.all().delete()
+        response = self.client.get(reverse('caisse:dashboard'))
+        self.assertEqual(response.context['participant_total'], 3)
+        self.assertEqual(len(response.context['roster_participants']), 3)
+        self.assertEqual(CaisseRosterEntry.objects.filter(event=self.event).count(), 3)
+
+
+class CaisseStatsTests(TestCase):
+    """caisse/stats.py: aggregate queries, and the hourly buckets kept by transaction writes."""
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name="Congress", start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location="Algiers",
+        )
+        self.caisse = Caisse.objects.create(name='Caisse 1', email='caisse@example.com', event=self.event)
+        self.other_caisse = Caisse.objects.create(name='Caisse 2', email='caisse2@example.com', event=self.event)
+        self.alice, self.bob = [
+            create_participant_for_event(User.objects.create_user(username=name, password='x'), self.event)
+            for name in ('alice', 'bob')
+        ]
+        two_hours_ago = timezone.now() - timedelta(hours=2)
+        for caisse, participant, amount, method, created_at in [
+            (self.caisse, self.alice, '1000', 'cash', two_hours_ago),
+            (self.caisse, self.alice, '500', 'bank_transfer', timezone.now()),
+            (self.caisse, self.bob, '250', 'cash', timezone.now()),
+            (self.other_caisse, self.bob, '700', 'cash', timezone.now()),
+        ]:
+            CaisseTransaction.objects.create(
+                caisse=caisse, participant=participant, total_amount=Decimal(amount),
+                payment_method=method, created_at=created_at,
+            )
+        self.cancelled = CaisseTransaction.objects.create(
+            caisse=self.caisse, participant=self.bob, total_amount=Decimal('300'), payment_method='cash',
+        )
+        self.cancelled.cancel(cancelled_by='test', reason='Erreur')
+
+    def test_summary_matches_the_transactions(self):
+        live = transaction_stats(self.caisse.transactions.all())
+        self.assertEqual(live['total_amount'], Decimal('1750'))
+        self.assertEqual((live['transaction_count'], live['total_participants']), (3, 2))
+        self.assertEqual((live['cancelled_count'], live['cancelled_amount']), (1, Decimal('300')))
+        self.assertEqual(live['by_payment_method']['cash'], {'count': 2, 'amount': Decimal('1250')})
+        self.assertEqual(live['by_payment_method']['bank_transfer'], {'count': 1, 'amount': Decimal('500')})
+
+        with self.assertNumQueries(2):
+            summary = summary_stats([self.caisse.id, self.other_caisse.id])
+        self.assertEqual(summary[self.caisse.id], live)
+        self.assertEqual(summary[self.other_caisse.id]['total_amount'], Decimal('700'))
+        self.assertEqual(self.caisse.get_total_amount(), Decimal('1750'))
+
+        event = event_stats(self.event)
+        self.assertEqual((event['total_amount'], event['total_participants']), (Decimal('2450'), 2))
+
+        buckets = CaisseStatsBucket.objects.filter(caisse=self.caisse)
+        self.assertEqual(
+            [(row['count'], row['amount']) for row in hourly_summary(buckets)],
+            [(row['count'], row['amount']) for row in hourly_breakdown(self.caisse.transactions.all())],
+        )
+        self.assertEqual([row['count'] for row in hourly_summary(buckets)], [1, 2])
+
+    def test_deleting_a_transaction_empties_its_bucket(self):
+        self.other_caisse.transactions.all().delete()
+        self.assertFalse(CaisseStatsBucket.objects.filter(caisse=self.other_caisse).exists())
+        self.assertEqual(summary_stats([self.other_caisse.id])[self.other_caisse.id]['transaction_count'], 0)
+
+    def test_rebuild_command_checks_and_repairs(self):
+        call_command('rebuild_caisse_stats', '--check-only', stdout=StringIO())
+
+        # Written behind the buckets' back -- --check-only must flag it.
+        CaisseTransaction.objects.filter(caisse=self.other_caisse).update(payment_method='mixed')
+        with self.assertRaises(CommandError):
+            call_command('rebuild_caisse_stats', '--check-only', stdout=StringIO())
+
+        call_command('rebuild_caisse_stats', stdout=StringIO())
+        call_command('rebuild_caisse_stats', '--check-only', stdout=StringIO())
+        self.assertEqual(
+            summary_stats([self.other_caisse.id])[self.other_caisse.id]['by_payment_method']['mixed'],
+            {'count': 1, 'amount': Decimal('700')},
+        )
+
+
+class ReconciliationReportTests(TestCase):
+    """caisse/reconciliation.py: batched rows with their items, totals per caisse and payment method."""
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name="Congress", start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location="Algiers",
+        )
+        self.caisse = Caisse.objects.create(name='Caisse 1', email='caisse7@example.com', event=self.event)
+        self.other_caisse = Caisse.objects.create(name='Caisse 2', email='caisse8@example.com', event=self.event)
+        self.workshop = PayableItem.objects.create(event=self.event, name='Atelier A', price=Decimal('500'))
+        self.dinner = PayableItem.objects.create(event=self.event, name='Dîner', price=Decimal('250'))
+        alice = create_participant_for_event(
+            User.objects.create_user(username='alice', email='alice@example.com', password='x',
+                                     first_name='Alice', last_name='Benali'),
+            self.event,
+        )
+        moment = timezone.now() - timedelta(hours=1)
+        for i, (caisse, amount, method) in enumerate([
+            (self.caisse, '750', 'cash'), (self.caisse, '500', 'bank_transfer'), (self.caisse, '250', 'cash'),
+            (self.other_caisse, '500', 'cash'), (self.other_caisse, '250', 'mixed'),
+        ]):
+            transaction = CaisseTransaction.objects.create(
+                caisse=caisse, participant=alice, total_amount=Decimal(amount), payment_method=method,
+                created_at=moment + timedelta(minutes=i % 2),  # ties on created_at, broken by id
+            )
+            transaction.items.add(*([self.workshop, self.dinner] if amount == '750' else
+                                    [self.workshop] if amount == '500' else [self.dinner]))
+        CaisseTransaction.objects.filter(caisse=self.caisse, total_amount=Decimal('250')).get().cancel(
+            cancelled_by='Superviseur', reason='Doublon',
+        )
+
+    def test_rows_come_in_batches_with_their_items(self):
+        totals = {}
+        with self.assertNumQueries(6):  # 5 transactions by 2: 3 batches, 2 queries each
+            rows = list(transaction_rows(report_transactions(event_id=self.event.id), totals, batch_size=2))
+
+        self.assertEqual(len({row[2] for row in rows}), 5)
+        self.assertEqual([row[0] for row in rows], sorted(row[0] for row in rows))
+        first = next(row for row in rows if row[8] == Decimal('750'))
+        self.assertEqual(first[3:8], ['Alice Benali', 'alice@example.com', first[5], 'Atelier A, Dîner', 'Espèces'])
+        cancelled = next(row for row in rows if row[9] == 'Annulée')
+        self.assertEqual((cancelled[11], cancelled[12]), ('Superviseur', 'Doublon'))
+        self.assertIsNotNone(cancelled[10])
+
+        by_caisse = {row[0]: row[2:] for row in total_rows(totals) if row[0].startswith('Total')}
+        self.assertEqual(by_caisse['Total Caisse 1'], [2, Decimal('1250'), 1, Decimal('250')])
+        self.assertEqual(by_caisse['Total Caisse 2'], [2, Decimal('750'), 0, Decimal('0')])
+        self.assertEqual(by_caisse['Total général'], [4, Decimal('2000'), 1, Decimal('250')])
+
+    def test_filters(self):
+        self.assertEqual(report_transactions(caisse_id=self.caisse.id, status='completed').count(), 2)
+        today = timezone.localdate()
+        self.assertEqual(report_transactions(date_from=str(today - timedelta(days=1)), date_to=str(today)).count(), 5)
+        self.assertEqual(report_transactions(date_from=str(today + timedelta(days=1))).count(), 0)
+        with self.assertRaises(ValueError):
+            report_transactions(date_from='yesterday')
+
+    def test_csv_and_xlsx_downloads(self):
+        from openpyxl import load_workbook
+
+        staff = User.objects.create_user(username='finance', password='x', is_staff=True)
+        self.client.force_login(staff)
+        url = reverse('dashboard:caisse_report')
+
+        response = self.client.get(url, {'format': 'csv', 'event': self.event.id})
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertTrue(lines[0].startswith('Date,Caisse,Transaction'))
+        self.assertEqual(len(lines), 1 + 5 + 1 + 1 + 4 + 2 + 1)  # rows, blank, totals header, totals
+        self.assertEqual(lines[-1], 'Total général,,4,2000.00,1,250.00')
+
+        response = self.client.get(url, {'format': 'xlsx', 'caisse': self.other_caisse.id})
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(workbook.sheetnames, ['Transactions', 'Totaux'])
+        self.assertEqual(workbook['Transactions'].max_row, 3)
+        self.assertEqual(
+            [cell.value for cell in list(workbook['Totaux'].iter_rows())[-1]],
+            ['Total général', None, 2, 750, 0, 0],
+        )
+
+        self.assertEqual(self.client.get(url, {'format': 'pdf'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_to': '17/10'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'event': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'caisse': 'abc'}).status_code, 400)
+
+    def test_user_text_cannot_start_a_formula(self):
+        import csv
+        from openpyxl import load_workbook
+
+        CaisseTransaction.objects.filter(status='cancelled').update(
+            cancelled_by='@SUM(A1)', notes='=HYPERLINK("http://evil.example","x")',
+        )
+        Caisse.objects.filter(pk=self.caisse.pk).update(name='+Caisse')
+        staff = User.objects.create_user(username='finance', password='x', is_staff=True)
+        self.client.force_login(staff)
+        url = reverse('dashboard:caisse_report')
+
+        response = self.client.get(url, {'format': 'csv', 'status': 'cancelled'})
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        row = next(csv.reader(lines[1:2]))
+        self.assertEqual((row[1], row[11], row[12]), ("'+Caisse", "'@SUM(A1)", '\'=HYPERLINK("http://evil.example","x")'))
+        self.assertIn("'+Caisse,Espèces", '\n'.join(lines))
+
+        response = self.client.get(url, {'format': 'xlsx', 'status': 'cancelled'})
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        cells = [cell.value for cell in list(workbook['Transactions'].iter_rows())[1]]
+        self.assertEqual((cells[11], cells[12]), ("'@SUM(A1)", '\'=HYPERLINK("http://evil.example","x")'))
+
+
+class EntitlementSnapshotTests(TestCase):
+    """
+    The offline gate snapshot (GET /api/events/<id>/entitlements/): full
+    download keyed by user_id, then only what changed since the version a
+    device already has.
+    """
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name="Congress", start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location="Algiers",
+        )
+        room = Room.objects.create(event=self.event, name='Hall A', capacity=100, location='1st floor')
+        self.session = Session.objects.create(
+            event=self.event, room=room, title='Machine Learning', session_type='atelier',
+            start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1),
+            is_paid=True, price=Decimal('2000'),
+        )
+        self.caisse = Caisse.objects.create(name='Caisse 1', email='caisse5@example.com', event=self.event)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paying_user = User.objects.create_user(username='paying', email='p@example.com', password='x')
+            self.paying = create_participant_for_event(self.paying_user, self.event)
+            self.other_user = User.objects.create_user(username='other', email='o@example.com', password='x')
+            self.other = create_participant_for_event(self.other_user, self.event)
+        self._pay(self.paying)
+
+        self.controller = User.objects.create_user(username='ctrl', email='ctrl@example.com', password='x')
+        UserEventAssignment.objects.create(user=self.controller, event=self.event, role='controlleur_des_badges')
+        self.api = APIClient()
+        self.api.force_authenticate(self.controller)
+
+    def _pay(self, participant):
+        txn = CaisseTransaction.objects.create(
+            caisse=self.caisse, participant=participant, total_amount=Decimal('2000'), status='completed',
+        )
+        txn.items.add(PayableItem.objects.get(session=self.session))
+        refresh_entitlement(participant.id, self.event)
+
+    def _snapshot(self, since=None, **headers):
+        url = f'/api/events/{self.event.id}/entitlements/'
+        if since is not None:
+            url += f'?since={since}'
+        response = self.api.get(url, **headers)
+        if response.status_code == 200:
+            response.payload = json.loads(b''.join(response.streaming_content))
+        return response
+
+    def test_full_snapshot_then_deltas(self):
+        full = self._snapshot().payload
+        self.assertTrue(full['full'])
+        self.assertEqual(full['participants'][str(self.paying_user.id)], {
+            'registered': True, 'badge_id': self.paying.badge_id, 'paid_sessions': [str(self.session.id)],
+        })
+        self.assertEqual(full['participants'][str(self.other_user.id)]['paid_sessions'], [])
+
+        self.assertEqual(self._snapshot(since=full['version']).payload['participants'], {})
+
+        self._pay(self.other)
+        delta = self._snapshot(since=full['version']).payload
+        self.assertFalse(delta['full'])
+        self.assertGreater(delta['version'], full['version'])
+        self.assertEqual(list(delta['participants']), [str(self.other_user.id)])
+
+    def test_removed_registration_shows_up_in_delta(self):
+        version = self._snapshot().payload['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.registrations.get(event=self.event).delete()
+
+        delta = self._snapshot(since=version).payload
+        self.assertEqual(delta['participants'], {
+            str(self.other_user.id): {'registered': False, 'badge_id': self.other.badge_id, 'paid_sessions': []},
+        })
+
+    def test_registrations_without_a_row_are_indexed_first(self):
+        version = self._snapshot().payload['version']
+        # Registered before the index existed: no row, no signal
+        ParticipantEntitlement.objects.filter(participant=self.other).delete()
+
+        full = self._snapshot().payload
+        self.assertEqual(full['participants'][str(self.other_user.id)]['registered'], True)
+        delta = self._snapshot(since=version).payload
+        self.assertEqual(list(delta['participants']), [str(self.other_user.id)])
+
+    def test_unchanged_snapshot_is_not_modified(self):
+        response = self._snapshot()
+        self.assertEqual(self._snapshot(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_only_event_controllers_can_download(self):
+        self.api.force_authenticate(self.paying_user)
+        self.assertEqual(self._snapshot().status_code, 403)
+
+
+@override_settings(QR_IMAGE_CACHE_DIR=tempfile.mkdtemp(prefix='qr-cache-test-'))
+class BadgePrintingTests(TestCase):
+    """
+    Badge QR images come from the content-addressed cache with proper
+    validators, and the whole event prints as one multi-page PDF.
+    """
+
+    def setUp(self):
+        clear_qr_memory_cache()
+        self.event = Event.objects.create(
+            name="Congress", start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location="Algiers",
+        )
+        self.participants = [
+            create_participant_for_event(
+                User.objects.create_user(username=f'guest{i}', email=f'g{i}@example.com', password='x',
+                                         first_name=f'Guest{i}', last_name='Test'),
+                self.event,
+            )
+            for i in range(9)
+        ]
+        self.caisse = Caisse.objects.create(name='Caisse 1', email='caisse6@example.com', event=self.event)
+        session = self.client.session
+        session['caisse_id'] = str(self.caisse.id)
+        session.save()
+
+    def test_badge_qr_is_cached_and_revalidated(self):
+        participant = self.participants[0]
+        page = self.client.get(reverse('caisse:print_badge', args=[participant.id]))
+        qr_url = page.context['qr_code_url']
+        self.assertNotContains(page, 'base64')
+
+        response = self.client.get(qr_url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        with patch('events.qr_cache.render_qr_image') as render:
+            clear_qr_memory_cache()  # must come back from disk, not re-render
+            again = self.client.get(qr_url)
+            render.assert_not_called()
+        self.assertEqual(again.content, response.content)
+
+        not_modified = self.client.get(qr_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_print_event_badges_pdf(self):
+        response = self.client.get(reverse('caisse:print_event_badges'))
+
+        pdf = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(pdf.startswith(b'%PDF-'))
+        self.assertIn(b'/Count 2', pdf)  # 9 badges, 8 per page
+        self.assertTrue(pdf.rstrip().endswith(b'%%EOF'))
+
+    @override_settings(CAISSE_BADGES_PER_REQUEST=8)
+    def test_print_event_badges_refuses_large_events(self):
+        with patch('caisse.views.render_event_badges_pdf') as render:
+            response = self.client.get(reverse('caisse:print_event_badges'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('print_event_badges', response.json()['message'])
+        render.assert_not_called()
+
+    def test_print_event_badges_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as output:
+            stdout = StringIO()
+            call_command('print_event_badges', '--event', str(self.event.id), '--output', output.name,
+                         '--workers', '0', stdout=stdout)
+            self.assertIn('Wrote 9 badges on 2 pages', stdout.getvalue())
+            self.assertTrue(output.read().startswith(b'%PDF-'))
@@ -14,9 +14,11 @@ urlpatterns = [
     
     # Dashboard
     path('', views.caisse_dashboard, name='dashboard'),
+    path('state/', views.dashboard_state, name='dashboard_state'),
     
     # Participant Search
     path('search/', views.search_participant, name='search_participant'),
+    path('roster/', views.participant_roster, name='participant_roster'),
     path('participant-paid-items/<int:participant_id>/', views.get_participant_paid_items, name='participant_paid_items'),
     
     # Transaction Processing
@@ -24,7 +26,13 @@ urlpatterns = [
     path('reject-reservation/', views.reject_reservation, name='reject_reservation'),
     path('transactions/', views.transaction_history, name='transaction_history'),
     path('transactions/<int:transaction_id>/cancel/', views.cancel_transaction, name='cancel_transaction'),
+
+    # Seat Inventory
+    path('seats/', views.seat_inventory, name='seat_inventory'),
+    path('seats/hold/', views.hold_cart_seats, name='hold_cart_seats'),
     
     # Badge Printing
     path('print-badge/<int:participant_id>/', views.print_badge, name='print_badge'),
+    path('badge-qr/<int:participant_id>/', views.badge_qr, name='badge_qr'),
+    path('print-badges/', views.print_event_badges, name='print_event_badges'),
 ]
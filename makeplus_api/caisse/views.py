@@ -2,84 +2,29 @@
 Views for Caisse (Cash Register) Operators
 """
 
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.cache import never_cache
-from django.db.models import Q
 from django.utils import timezone
 import json
 from decimal import Decimal
-import qrcode
-from io import BytesIO
-import base64
-
-from caisse.models import Caisse, PayableItem, CaisseTransaction
+import tempfile
+
+from caisse.badges import BADGE_QR_OPTIONS, event_badge_count, render_event_badges_pdf
+from caisse import read_model, roster
+from caisse.entitlements import schedule_refresh
+from caisse.models import Caisse, PayableItem, CaisseTransaction, CaisseParticipantState
+from caisse.seats import SeatsUnavailable, claim_seats, hold_seats, release_seats, seat_status
+from caisse.stats import caisse_stats
 from events.models import Participant, Event
+from events.qr_cache import badge_qr_content, etag_matches, get_qr_png, qr_cache_key
 from dashboard.blocs_service import resolve_catalog_prices
 
 
-def _reservation_data(event, payable_items):
-    """
-    Map registration-form reservations onto this event's PayableItems, so
-    the caisse can pre-check what a participant already reserved and tally
-    reserved-vs-confirmed counts. No admin review gates this: an order is
-    reserved the moment it's submitted and email-verified.
-
-    Deliberately NOT filtered to status='pending' here: orders approved
-    under the since-removed admin-review flow (or otherwise carrying a
-    stale 'approved' status) can still have items with no actual
-    CaisseTransaction behind them -- nothing was really handed out. Only
-    'rejected' orders are excluded; _pending_orders_with_payable_ids
-    (which this feeds) does the real work of subtracting out whatever a
-    completed CaisseTransaction already covers.
-
-    Returns:
-        key_to_payable_ids: {(kind, external_id): [payable_item_id, ...]}
-        participant_reservations: {participant_id: {(kind, external_id), ...}}
-        reservation_participants: {(kind, external_id): {participant_id, ...}}
-    where kind is 'item' (BlocItem) or 'session' (paid workshop Session).
-    """
-    from dashboard.models_blocs import RegistrationOrder
-
-    # Keys are always (kind, str(external_id)): BlocItem ids are ints,
-    # Session ids are UUIDs, and items_snapshot JSON round-trips session
-    # ids as strings -- casting everything to str keeps both sides
-    # comparable (a bare int/UUID vs str mismatch meant session-based
-    # workshop reservations, and their price coherence, silently never
-    # matched anything).
-    key_to_payable_ids = {}
-    for item in payable_items:
-        key = None
-        if item.bloc_item_id:
-            key = ('item', str(item.bloc_item_id))
-        elif item.session_id:
-            key = ('session', str(item.session_id))
-        if key:
-            key_to_payable_ids.setdefault(key, []).append(item.id)
-
-    reserved_orders = RegistrationOrder.objects.exclude(status='rejected').filter(
-        event=event, participant__isnull=False
-    ).only('participant_id', 'items_snapshot')
-
-    participant_reservations = {}
-    reservation_participants = {}
-    for order in reserved_orders:
-        keys = set()
-        for entry in order.items_snapshot or []:
-            kind = entry.get('type')
-            ext_id = entry.get('id')
-            if kind in ('item', 'session') and ext_id is not None:
-                key = (kind, str(ext_id))
-                keys.add(key)
-                reservation_participants.setdefault(key, set()).add(order.participant_id)
-        if keys:
-            participant_reservations.setdefault(order.participant_id, set()).update(keys)
-
-    return key_to_payable_ids, participant_reservations, reservation_participants
-
-
 def _pending_orders_with_payable_ids(participant, event, key_to_payable_ids=None):
     """
     This participant's MOST RECENT non-rejected RegistrationOrder for this
@@ -100,14 +45,11 @@ def _pending_orders_with_payable_ids(participant, event, key_to_payable_ids=None
     which can be stale 'approved' from the since-removed admin-review flow
     even though nothing was ever actually handed out at the counter.
 
-    key_to_payable_ids: optional, from a caller's own _reservation_data()
-    call. It only depends on `event` (not on `participant`), so a caller
-    looping over many participants (caisse_dashboard) can compute it once
-    and pass it in here instead of this function re-scanning every
-    RegistrationOrder for the whole event on every single call -- that
-    per-participant re-scan was the main cause of caisse dashboard/login
-    slowness on events with many participants. Recomputed as before if
-    omitted, so the other (single-participant) call sites are unaffected.
+    key_to_payable_ids: optional, {reservation key: [payable_item_id, ...]}
+    from caisse.read_model.key_to_payable_ids() -- it only depends on
+    `event`, so a caller that already has it can pass it in. caisse_dashboard
+    itself reads the same answer, maintained, from the read model
+    (CaisseParticipantState.pending_order) instead of calling this.
 
     Returns: [(RegistrationOrder, {payable_item_id, ...})] -- at most one
     entry (the latest order), omitted entirely if it has nothing pending.
@@ -115,8 +57,9 @@ def _pending_orders_with_payable_ids(participant, event, key_to_payable_ids=None
     from dashboard.models_blocs import RegistrationOrder
 
     if key_to_payable_ids is None:
-        payable_items = PayableItem.objects.filter(event=event, is_active=True)
-        key_to_payable_ids, _, _ = _reservation_data(event, payable_items)
+        key_to_payable_ids = read_model.key_to_payable_ids(
+            PayableItem.objects.filter(event=event, is_active=True).only('id', 'bloc_item_id', 'session_id')
+        )
 
     confirmed_ids = set()
     for txn in CaisseTransaction.objects.filter(
@@ -130,14 +73,8 @@ def _pending_orders_with_payable_ids(participant, event, key_to_payable_ids=None
 
     result = []
     if order:
-        keys = set()
-        for entry in order.items_snapshot or []:
-            kind = entry.get('type')
-            ext_id = entry.get('id')
-            if kind in ('item', 'session') and ext_id is not None:
-                keys.add((kind, str(ext_id)))
         payable_ids = set()
-        for key in keys:
+        for key in read_model.order_keys(order.items_snapshot):
             payable_ids.update(key_to_payable_ids.get(key, []))
         pending_ids = payable_ids - confirmed_ids
         if pending_ids:
@@ -145,68 +82,6 @@ def _pending_orders_with_payable_ids(participant, event, key_to_payable_ids=None
     return result
 
 
-def _pending_orders_with_payable_ids_bulk(participants, event, key_to_payable_ids, participant_paid_items):
-    """
-    Bulk version of _pending_orders_with_payable_ids() for caisse_dashboard's
-    reserved-items summary panel, which needs this for every participant
-    with a pending reservation -- calling the single-participant version in
-    a loop still ran 2-3 queries *per participant* (a CaisseTransaction
-    query + a per-transaction .items query that bypasses prefetch, plus a
-    RegistrationOrder query), which was still enough to time out the whole
-    dashboard/login request on events with many participants even after
-    fixing the bigger _reservation_data() re-scan. This does the whole
-    thing in exactly one query.
-
-    Only the latest order per participant is considered -- same reasoning
-    as _pending_orders_with_payable_ids(): a participant can have several
-    RegistrationOrders if they submitted more than once, and the newest
-    submission is treated as authoritative.
-
-    participant_paid_items: {str(participant_id): [payable_item_id, ...]}
-    -- caisse_dashboard already builds this correctly (from its own
-    prefetch_related() on event_registrations), so it's reused here
-    instead of re-querying CaisseTransaction per participant. Same
-    semantics as _pending_orders_with_payable_ids()'s confirmed_ids
-    (all of a participant's completed transactions, not event-scoped --
-    harmless here since payable_ids is already scoped to this event via
-    key_to_payable_ids).
-
-    Returns: {participant_id: [(RegistrationOrder, {payable_item_id, ...})]}
-    -- at most one entry (the latest order) per participant, participants
-    with nothing pending are omitted.
-    """
-    from dashboard.models_blocs import RegistrationOrder
-
-    participant_ids = [p.id for p in participants]
-    latest_order_by_participant = {}
-    for order in RegistrationOrder.objects.exclude(status='rejected').filter(
-        event=event, participant_id__in=participant_ids
-    ).order_by('-created_at'):
-        # First order seen per participant, in -created_at order, is the
-        # latest -- setdefault skips any older ones that follow.
-        latest_order_by_participant.setdefault(order.participant_id, order)
-
-    result = {}
-    for participant in participants:
-        order = latest_order_by_participant.get(participant.id)
-        if order is None:
-            continue
-        confirmed_ids = set(participant_paid_items.get(str(participant.id), []))
-        keys = set()
-        for entry in order.items_snapshot or []:
-            kind = entry.get('type')
-            ext_id = entry.get('id')
-            if kind in ('item', 'session') and ext_id is not None:
-                keys.add((kind, str(ext_id)))
-        payable_ids = set()
-        for key in keys:
-            payable_ids.update(key_to_payable_ids.get(key, []))
-        pending_ids = payable_ids - confirmed_ids
-        if pending_ids:
-            result[participant.id] = [(order, pending_ids)]
-    return result
-
-
 def caisse_required(view_func):
     """Decorator to check if caisse is logged in"""
     def wrapper(request, *args, **kwargs):
@@ -280,11 +155,13 @@ def caisse_dashboard(request):
         is_active=True
     ).select_related('session', 'bloc_item').order_by('item_type', 'name')
 
-    # Reservations made via the (bloc-enabled) registration form -- who
-    # reserved what, so it can be pre-checked/tallied at the caisse.
-    key_to_payable_ids, participant_reservations, reservation_participants = _reservation_data(
-        event, payable_items
-    )
+    # Reservation keys ("item:<bloc item id>" / "session:<session id>")
+    # mapped onto this event's PayableItems. Who reserved/paid what comes
+    # from the read model (caisse/read_model.py), kept current by the order
+    # and transaction writes instead of recomputed on every load.
+    key_to_payable_ids = read_model.key_to_payable_ids(payable_items)
+    state_version = read_model.current_version(event.id)
+    tallies = read_model.item_tallies(event.id)
 
     # Live-current prices, resolved through BlocItemStatusRule exactly like
     # the registration form (dashboard.blocs_service.resolve_catalog_prices)
@@ -301,16 +178,9 @@ def caisse_dashboard(request):
         bloc_config = None
     live_prices = resolve_catalog_prices(event, bloc_config, timezone.now().date()) if bloc_config else {}
 
-    # Precompute, in one query, which participants have a completed
-    # CaisseTransaction covering each payable item -- both branches below
-    # used to run their own "CaisseTransaction.objects.filter(items=item)"
-    # query per item (2 queries x N payable items); this replaces that
-    # with a single upfront query grouped by item.
-    item_confirmed_participant_ids = {}
-    for row in CaisseTransaction.objects.filter(
-        status='completed', items__in=payable_items
-    ).values('items__id', 'participant_id').distinct():
-        item_confirmed_participant_ids.setdefault(row['items__id'], set()).add(row['participant_id'])
+    # Seats sold/held per capacity-limited session, from the seat inventory
+    # (caisse/seats.py) -- the same counters process_transaction claims.
+    seats = seat_status(payable_items)
 
     # Calculate capacity info for each payable item linked to a session, and
     # reserved/confirmed counts for items that come from a registration bloc
@@ -348,38 +218,25 @@ def caisse_dashboard(request):
             'confirmed_count': 0,
         }
 
-        if item.session:
-            session = item.session
-            if session.max_participants:
-                # Count how many participants have paid for this session
-                registered_count = len(item_confirmed_participant_ids.get(item.id, set()))
-
-                available_spots = session.max_participants - registered_count
-                is_full = available_spots <= 0
-                capacity_percentage = int((registered_count / session.max_participants) * 100)
-
-                item_data.update({
-                    'has_capacity_limit': True,
-                    'max_participants': session.max_participants,
-                    'registered_count': registered_count,
-                    'available_spots': max(0, available_spots),
-                    'is_full': is_full,
-                    'capacity_percentage': capacity_percentage
-                })
-
-        reservation_key = None
-        if item.bloc_item_id:
-            reservation_key = ('item', str(item.bloc_item_id))
-        elif item.session_id:
-            reservation_key = ('session', str(item.session_id))
+        seat = seats.get(item.session_id)
+        if seat:
+            # Seats held by carts in progress at other caisses count as taken
+            item_data.update({
+                'has_capacity_limit': True,
+                'max_participants': seat['max_participants'],
+                'registered_count': seat['sold'],
+                'available_spots': seat['available'],
+                'is_full': seat['is_full'],
+                'capacity_percentage': min(100, int((seat['sold'] / seat['max_participants']) * 100)),
+            })
 
+        reservation_key = read_model.item_key(item)
         if reservation_key:
-            reserved_participant_ids = reservation_participants.get(reservation_key, set())
-            confirmed_participant_ids = item_confirmed_participant_ids.get(item.id, set())
+            reserved_count, confirmed_count = tallies.get(reservation_key, (0, 0))
             item_data.update({
                 'is_reservable': True,
-                'reserved_count': len(reserved_participant_ids - confirmed_participant_ids),
-                'confirmed_count': len(confirmed_participant_ids),
+                'reserved_count': reserved_count,
+                'confirmed_count': confirmed_count,
             })
 
         payable_items_with_capacity.append(item_data)
@@ -439,81 +296,25 @@ def caisse_dashboard(request):
     }
 
     # Statistics
-    total_amount = caisse.get_total_amount()
-    total_participants = caisse.get_total_participants()
-    transaction_count = caisse.get_transaction_count()
-    
-    # Get only participants (users with role 'participant') for this event
-    from events.models import UserEventAssignment, ParticipantEventRegistration
-    participant_user_ids = UserEventAssignment.objects.filter(
-        event=event,
-        role='participant'
-    ).values_list('user_id', flat=True)
-    
-    # Get participants registered for this event via ParticipantEventRegistration
-    event_registrations = ParticipantEventRegistration.objects.filter(
-        event=event,
-        participant__user_id__in=participant_user_ids
-    ).select_related('participant__user').prefetch_related(
-        'participant__caisse_transactions__items',
-        'participant__caisse_transactions__caisse'
-    ).order_by('participant__user__first_name', 'participant__user__last_name')
-    
-    # Extract participants from registrations
-    all_participants = [reg.participant for reg in event_registrations]
-    
-    # Build a dictionary of participant paid items for quick lookup.
-    # .all() (not .filter()/.values_list(), which would each issue a fresh
-    # query) so this reads from the prefetch_related() above instead of
-    # re-querying per participant/transaction.
-    participant_paid_items = {}
-    for participant in all_participants:
-        completed_transactions = [
-            t for t in participant.caisse_transactions.all() if t.status == 'completed'
-        ]
-        paid_item_ids = set()
-        for transaction in completed_transactions:
-            paid_item_ids.update(item.id for item in transaction.items.all())
-        participant_paid_items[str(participant.id)] = list(paid_item_ids)
-
-    # Items reserved via the registration form (approved bloc orders) that
-    # aren't confirmed yet -- these get pre-checked (but not disabled) so
-    # the caisse operator can just confirm the transaction.
-    participant_reserved_items = {}
-    for participant in all_participants:
-        reserved_keys = participant_reservations.get(participant.id, set())
-        reserved_payable_ids = set()
-        for key in reserved_keys:
-            reserved_payable_ids.update(key_to_payable_ids.get(key, []))
-        already_confirmed = set(participant_paid_items.get(str(participant.id), []))
-        pending = reserved_payable_ids - already_confirmed
-        if pending:
-            participant_reserved_items[str(participant.id)] = list(pending)
-
-    # Discount summary for participants with a pending bloc reservation, so
-    # the operator sees the real (already paid) amount, not the raw catalog
-    # sum -- e.g. "15000 DZD -25% -> already paid 11250 DZD".
-    participants_with_pending = [
-        p for p in all_participants if str(p.id) in participant_reserved_items
-    ]
-    pending_orders_by_participant = _pending_orders_with_payable_ids_bulk(
-        participants_with_pending, event, key_to_payable_ids, participant_paid_items
+    stats = caisse_stats(caisse)
+    
+    # First page of the participant roster (caisse/roster.py); the rest is
+    # paged and searched through roster/.
+    roster.ensure_roster(event)
+    roster_first_page = roster.roster_page(caisse)
+    participant_total = roster.roster_queryset(caisse).count()
+
+    # Paid items, reserved-but-unconfirmed items (pre-checked, not
+    # disabled, so the operator can just confirm the transaction) and the
+    # discount summary of the pending bloc reservation -- so the operator
+    # sees the real (already paid) amount, not the raw catalog sum, e.g.
+    # "15000 DZD -25% -> already paid 11250 DZD". One query on the read
+    # model, covering every participant of the event whatever roster page
+    # they're on; participants without a state row have nothing paid or
+    # reserved.
+    participant_paid_items, participant_reserved_items, participant_reserved_summary = read_model.participant_views(
+        CaisseParticipantState.objects.filter(event=event), key_to_payable_ids,
     )
-    participant_reserved_summary = {}
-    for participant in participants_with_pending:
-        pending_orders = pending_orders_by_participant.get(participant.id)
-        if pending_orders:
-            participant_reserved_summary[str(participant.id)] = [
-                {
-                    'total_before': str(order.total_before_reduction),
-                    'period_discount_percent': str(order.period_discount_percent),
-                    'blocs_discount_percent': str(order.blocs_discount_percent),
-                    'discount_percent': str(order.total_discount_percent),
-                    'total_after': str(order.total_after_reduction),
-                    'payable_ids': list(pending_ids),
-                }
-                for order, pending_ids in pending_orders
-            ]
 
     # Recent transactions
     recent_transactions = caisse.transactions.filter(
@@ -527,15 +328,18 @@ def caisse_dashboard(request):
         'payable_items_with_capacity': payable_items_with_capacity,
         'bloc_groups': bloc_groups,
         'other_items': other_items,
-        'total_amount': total_amount,
-        'total_participants': total_participants,
-        'transaction_count': transaction_count,
-        'all_participants': all_participants,
+        'total_amount': stats['total_amount'],
+        'total_participants': stats['total_participants'],
+        'transaction_count': stats['transaction_count'],
+        'roster_participants': roster_first_page['participants'],
+        'roster_next_cursor': roster_first_page['next_cursor'],
+        'participant_total': participant_total,
         'participant_paid_items_json': json.dumps(participant_paid_items),
         'participant_reserved_items_json': json.dumps(participant_reserved_items),
         'participant_reserved_summary_json': json.dumps(participant_reserved_summary),
         'blocs_enabled_json': json.dumps(blocs_enabled),
         'bloc_pct_json': json.dumps(bloc_pct),
+        'state_version': state_version,
         'recent_transactions': recent_transactions
     }
     
@@ -549,60 +353,39 @@ def caisse_dashboard(request):
 def search_participant(request):
     """Search for participant by name, email, or QR code"""
     query = request.GET.get('q', '').strip()
-    caisse = request.caisse
-    event = caisse.event
     
     if not query:
         return JsonResponse({'success': False, 'message': 'Please enter a search term'})
     
-    # Get only users with 'participant' role
-    from events.models import UserEventAssignment, ParticipantEventRegistration
-    participant_user_ids = UserEventAssignment.objects.filter(
-        event=event,
-        role='participant'
-    ).values_list('user_id', flat=True)
-    
-    # Search participants with participant role only - get via ParticipantEventRegistration
-    event_registrations = ParticipantEventRegistration.objects.filter(
-        event=event,
-        participant__user_id__in=participant_user_ids
-    ).filter(
-        Q(participant__user__first_name__icontains=query) |
-        Q(participant__user__last_name__icontains=query) |
-        Q(participant__user__email__icontains=query) |
-        Q(participant__user__username__icontains=query) |
-        Q(participant__qr_code_data__icontains=query)
-    ).select_related('participant__user').prefetch_related('participant__caisse_transactions')[:10]
-    
-    if not event_registrations.exists():
+    # One query on the roster's search rows, checked-in/transaction counts included
+    results = roster.roster_page(request.caisse, query, limit=10)['participants']
+    if not results:
         return JsonResponse({'success': False, 'message': 'No participants found'})
     
-    results = []
-    for registration in event_registrations:
-        participant = registration.participant
-        # Check if already checked in
-        has_transaction = participant.caisse_transactions.filter(
-            caisse=caisse,
-            status='completed'
-        ).exists()
-        
-        # Get previous transactions
-        transaction_count = participant.caisse_transactions.filter(
-            status='completed'
-        ).count()
-        
-        results.append({
-            'id': participant.id,
-            'name': participant.user.get_full_name() or participant.user.username,
-            'email': participant.user.email,
-            'qr_code': participant.qr_code_data,
-            'checked_in': has_transaction,
-            'transaction_count': transaction_count
-        })
-    
     return JsonResponse({'success': True, 'participants': results})
 
 
+@never_cache
+@caisse_required
+@require_http_methods(["GET"])
+def participant_roster(request):
+    """
+    One page (ROSTER_PAGE_SIZE) of the event's participants, filtered by
+    ?q= (name, email, username, badge id or scanned QR); pass the returned
+    next_cursor as ?cursor= for the following page. The first page also
+    carries the total count of matches.
+    """
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor') or None
+    try:
+        page = roster.roster_page(request.caisse, query, cursor)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid cursor'})
+    if cursor is None:
+        page['count'] = roster.roster_queryset(request.caisse, query).count()
+    return JsonResponse({'success': True, **page})
+
+
 @caisse_required
 @require_http_methods(["GET"])
 def get_participant_paid_items(request, participant_id):
@@ -629,12 +412,14 @@ def get_participant_paid_items(request, participant_id):
         paid_item_ids.update(transaction.items.values_list('id', flat=True))
 
     # Items reserved via the registration form (approved bloc orders) not
-    # yet confirmed at the caisse.
-    payable_items = PayableItem.objects.filter(event=caisse.event, is_active=True)
-    key_to_payable_ids, participant_reservations, _ = _reservation_data(caisse.event, payable_items)
-    reserved_keys = participant_reservations.get(participant.id, set())
+    # yet confirmed at the caisse, from the read model.
+    read_model.current_version(caisse.event_id)
+    state = CaisseParticipantState.objects.filter(participant=participant, event=caisse.event).first()
+    key_to_payable_ids = read_model.key_to_payable_ids(
+        PayableItem.objects.filter(event=caisse.event, is_active=True).only('id', 'bloc_item_id', 'session_id')
+    )
     reserved_item_ids = set()
-    for key in reserved_keys:
+    for key in (state.reserved_keys if state else []):
         reserved_item_ids.update(key_to_payable_ids.get(key, []))
     reserved_item_ids -= paid_item_ids
 
@@ -693,31 +478,13 @@ def process_transaction(request):
         return JsonResponse({'success': False, 'message': 'Please select at least one item'})
     
     # Get items and calculate total
-    items = PayableItem.objects.filter(id__in=item_ids, event=caisse.event, is_active=True)
+    items = PayableItem.objects.filter(
+        id__in=item_ids, event=caisse.event, is_active=True
+    ).select_related('session', 'bloc_item')
     if not items.exists():
         return JsonResponse({'success': False, 'message': 'Invalid items selected'})
-    
-    # Check capacity for each item linked to a session
-    capacity_errors = []
-    for item in items:
-        if item.session and item.session.max_participants:
-            # Count current registrations for this session
-            registered_count = CaisseTransaction.objects.filter(
-                status='completed',
-                items=item
-            ).values('participant').distinct().count()
-            
-            available_spots = item.session.max_participants - registered_count
-            
-            if available_spots <= 0:
-                capacity_errors.append(f"{item.name} is full (0/{item.session.max_participants} spots available)")
-    
-    # If any capacity errors, return them
-    if capacity_errors:
-        return JsonResponse({
-            'success': False,
-            'message': 'Cannot process transaction:\n' + '\n'.join(capacity_errors)
-        })
+    # Workshop capacity is checked -- and the seats taken -- under a lock
+    # inside the transaction below (caisse/seats.py claim_seats).
 
     # Enforce single-choice blocs the same way the registration form does --
     # reject if more than one item from a single-select bloc is chosen
@@ -956,6 +723,11 @@ def process_transaction(request):
 
     try:
         with db_transaction.atomic():
+            # Take the workshop seats first: the inventory rows stay locked
+            # until this commits, so a concurrent sale of the last seat waits
+            # and then finds it gone.
+            claim_seats(participant, items)
+
             # Create the transaction record
             transaction = CaisseTransaction.objects.create(
                 caisse=caisse,
@@ -969,11 +741,10 @@ def process_transaction(request):
             
             # Link items to transaction using add() instead of set()
             # This ensures the many-to-many relationship is properly saved
-            for item in items:
-                transaction.items.add(item)
-            
-            # Explicitly save the transaction
-            transaction.save()
+            # -- in one call, so the read model refreshes once. No save()
+            # after it: create() already stored every field, and another
+            # post_save would refresh the read model and stats bucket again.
+            transaction.items.add(*items)
 
             # Mark each fully-confirmed reservation as confirmed -- the
             # caisse operator's confirmation is the final validation, no
@@ -984,10 +755,19 @@ def process_transaction(request):
                 order.reviewed_at = timezone.now()
                 order.save(update_fields=['status', 'reviewed_by_caisse', 'reviewed_at'])
 
+            schedule_refresh(participant.id, caisse.event)
+
             logger.info(f"[CAISSE] ✅ Transaction {transaction.id} created successfully")
             logger.info(f"[CAISSE] Participant: {participant.user.email}")
             logger.info(f"[CAISSE] Items to link: {len(items)}")
             
+    except SeatsUnavailable as e:
+        return JsonResponse({
+            'success': False,
+            'message': 'Cannot process transaction:\n' + '\n'.join(
+                f"{item.name} is full (0/{item.session.max_participants} spots available)" for item in e.items
+            )
+        })
     except Exception as e:
         logger.error(f"[CAISSE] ❌ Failed to create transaction: {str(e)}")
         return JsonResponse({
@@ -1151,6 +931,7 @@ def transaction_history(request):
 def cancel_transaction(request, transaction_id):
     """Cancel a transaction and remove granted access"""
     import json
+    from django.db import transaction as db_transaction
     from events.models import Session
     
     caisse = request.caisse
@@ -1203,8 +984,11 @@ def cancel_transaction(request, transaction_id):
             participant.metadata['allowed_rooms'] = new_allowed_rooms
             participant.save()
     
-    # Cancel the transaction
-    transaction.cancel(cancelled_by=caisse.name, reason=reason)
+    # Cancel the transaction and give its workshop seats back
+    with db_transaction.atomic():
+        release_seats(transaction)
+        transaction.cancel(cancelled_by=caisse.name, reason=reason)
+        schedule_refresh(participant.id, caisse.event)
     
     # Verify transaction was cancelled
     transaction.refresh_from_db()
@@ -1253,6 +1037,78 @@ def cancel_transaction(request, transaction_id):
     })
 
 
+# ==================== Seat Inventory ====================
+
+def _seats_payload(event):
+    """Seats left per capacity-limited session item of the event, for the dashboard"""
+    items = PayableItem.objects.filter(
+        event=event, is_active=True, session__isnull=False
+    ).select_related('session')
+    seats = seat_status(items)
+    return [
+        {'item_id': item.id, 'session_id': str(item.session_id), **seats[item.session_id]}
+        for item in items
+        if item.session_id in seats
+    ]
+
+
+@never_cache
+@caisse_required
+@require_http_methods(["GET"])
+def seat_inventory(request):
+    """Live "seats left" feed, polled by the caisse dashboard"""
+    return JsonResponse({'success': True, 'seats': _seats_payload(request.caisse.event)})
+
+
+@caisse_required
+@require_http_methods(["POST"])
+def hold_cart_seats(request):
+    """
+    Hold the workshop seats of the cart being built at this caisse (sent
+    whenever the selection changes), so other caisses can't sell them in
+    the meantime. Without a participant, releases this caisse's holds.
+    """
+    caisse = request.caisse
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid JSON'})
+
+    participant = None
+    items = []
+    if data.get('participant_id'):
+        participant = Participant.objects.filter(id=data['participant_id']).first()
+        if participant is None or not participant.is_registered_for_event(caisse.event):
+            return JsonResponse({'success': False, 'message': 'Participant not found'})
+        items = PayableItem.objects.filter(
+            id__in=data.get('items') or [], event=caisse.event, is_active=True
+        ).select_related('session')
+
+    unavailable = hold_seats(caisse, participant, items)
+    return JsonResponse({
+        'success': True,
+        'unavailable': [{'item_id': item.id, 'name': item.name} for item in unavailable],
+        'seats': _seats_payload(caisse.event),
+    })
+
+
+@never_cache
+@caisse_required
+@require_http_methods(["GET"])
+def dashboard_state(request):
+    """
+    What changed in the dashboard's reservation data since the version it
+    rendered (?since=N) -- paid/reserved items and pending order summaries
+    of the participants whose state moved, and the reserved/confirmed
+    counts that moved (caisse/read_model.py). Polled by the dashboard.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid version'})
+    return JsonResponse({'success': True, **read_model.changes_since(request.caisse.event_id, since)})
+
+
 # ==================== Badge Printing ====================
 
 @caisse_required
@@ -1270,21 +1126,11 @@ def print_badge(request, participant_id):
         messages.error(request, 'Participant introuvable')
         return redirect('caisse:dashboard')
     
-    # Generate QR code image
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(participant.badge_id)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    qr_code_base64 = base64.b64encode(buffer.getvalue()).decode()
-    
+    # The QR image is served separately (badge_qr below) from the rendered
+    # image cache, under a URL versioned by its content hash, so the
+    # browser can keep it instead of getting it base64-inlined each time.
+    qr_key = qr_cache_key(badge_qr_content(participant.user_id), **BADGE_QR_OPTIONS)
+
     context = {
         'caisse': caisse,
         'participant': participant,
@@ -1292,7 +1138,50 @@ def print_badge(request, participant_id):
         'name': participant.user.get_full_name() or participant.user.username,
         'email': participant.user.email,
         'badge_id': participant.badge_id,
-        'qr_code_base64': qr_code_base64
+        'qr_code_url': f"{reverse('caisse:badge_qr', args=[participant.id])}?v={qr_key}",
     }
     
     return render(request, 'caisse/print_badge.html', context)
+
+
+@caisse_required
+def badge_qr(request, participant_id):
+    """Badge QR image (PNG) for print_badge, from events/qr_cache.py."""
+    participant = get_object_or_404(Participant, id=participant_id)
+    if not participant.is_registered_for_event(request.caisse.event):
+        return HttpResponse(status=404)
+
+    png, etag = get_qr_png(badge_qr_content(participant.user_id), **BADGE_QR_OPTIONS)
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(png, content_type='image/png')
+    response['ETag'] = etag
+    if request.GET.get('v') == etag.strip('"'):
+        # Content-addressed URL: this exact query can never change content
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@caisse_required
+def print_event_badges(request):
+    """
+    Every badge for the caisse's event as one printable multi-page PDF
+    (caisse/badges.py), rendered in this worker process. Events with more
+    than CAISSE_BADGES_PER_REQUEST badges are refused: the
+    print_event_badges management command renders them in a process pool,
+    without a request timeout.
+    """
+    event = request.caisse.event
+    limit = getattr(settings, 'CAISSE_BADGES_PER_REQUEST', 2000)
+    if event_badge_count(event) > limit:
+        return JsonResponse({
+            'success': False,
+            'message': f'More than {limit} badges: use the print_event_badges management command',
+        }, status=400)
+    output = tempfile.TemporaryFile()
+    render_event_badges_pdf(event, output, workers=0)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=f"badges-{event.id}.pdf", content_type='application/pdf')
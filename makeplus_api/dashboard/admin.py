@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models_email import (
     EmailTemplate, EventEmailTemplate, EmailLog,
-    EmailCampaign, EmailRecipient, EmailLink, EmailClick, EmailOpen
+    EmailCampaign, EmailRecipient, EmailLink, EmailClick, EmailOpen, CampaignSendJob,
+    BrevoEmailEvent, EmailEventCursor
 )
 from .models_form import (
     FormConfiguration, FormSubmission,
@@ -81,6 +82,30 @@ class EmailRecipientAdmin(admin.ModelAdmin):
                        'last_opened_at', 'open_count', 'click_count', 'created_at']
 
 
+@admin.register(CampaignSendJob)
+class CampaignSendJobAdmin(admin.ModelAdmin):
+    list_display = ['campaign', 'mode', 'status', 'total', 'sent_count', 'failed_count', 'worker', 'heartbeat_at', 'created_at']
+    list_filter = ['status', 'mode', 'created_at']
+    search_fields = ['campaign__name', 'worker']
+    readonly_fields = ['total', 'sent_count', 'failed_count', 'last_error', 'worker', 'attempts',
+                       'heartbeat_at', 'started_at', 'finished_at', 'created_at', 'updated_at']
+
+
+@admin.register(BrevoEmailEvent)
+class BrevoEmailEventAdmin(admin.ModelAdmin):
+    list_display = ['email', 'event', 'message_id', 'occurred_at', 'source', 'received_at']
+    list_filter = ['event', 'source', 'occurred_at']
+    search_fields = ['email', 'message_id']
+    readonly_fields = ['event_key', 'event', 'email', 'message_id', 'link', 'occurred_at',
+                       'source', 'payload', 'received_at']
+
+
+@admin.register(EmailEventCursor)
+class EmailEventCursorAdmin(admin.ModelAdmin):
+    list_display = ['name', 'position', 'synced_at', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(EmailLink)
 class EmailLinkAdmin(admin.ModelAdmin):
     list_display = ['original_url', 'campaign', 'total_clicks', 'unique_clicks', 'get_click_rate']
@@ -95,18 +120,18 @@ class EmailLinkAdmin(admin.ModelAdmin):
 
 @admin.register(EmailClick)
 class EmailClickAdmin(admin.ModelAdmin):
-    list_display = ['recipient', 'link', 'clicked_at', 'ip_address']
-    list_filter = ['clicked_at', 'link__campaign']
+    list_display = ['recipient', 'link', 'clicked_at', 'ip_address', 'counted']
+    list_filter = ['clicked_at', 'counted', 'link__campaign']
     search_fields = ['recipient__email', 'link__original_url', 'ip_address']
-    readonly_fields = ['clicked_at']
+    readonly_fields = ['clicked_at', 'counted']
 
 
 @admin.register(EmailOpen)
 class EmailOpenAdmin(admin.ModelAdmin):
-    list_display = ['recipient', 'opened_at', 'ip_address']
-    list_filter = ['opened_at', 'recipient__campaign']
+    list_display = ['recipient', 'opened_at', 'ip_address', 'counted']
+    list_filter = ['opened_at', 'counted', 'recipient__campaign']
     search_fields = ['recipient__email', 'ip_address']
-    readonly_fields = ['opened_at']
+    readonly_fields = ['opened_at', 'counted']
 
 
 @admin.register(FormAnalytics)
@@ -5,55 +5,68 @@ Complete implementation for transactional emails, contact management,
 campaign management, and statistics tracking.
 """
 
-import json
-import urllib.request
-import urllib.error
+from itertools import groupby
+
+import requests
 from django.conf import settings
 
+from makeplus_api.outbound_http import get_http_client
+
+
+class BrevoAPIError(Exception):
+    """A failed Brevo call; `status` is the HTTP status, None if the request never got an answer."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
 
 class BrevoClient:
     """Brevo API v3 client for email operations"""
     
     BASE_URL = "https://api.brevo.com/v3"
     
-    def __init__(self, api_key=None):
+    # Brevo's limit on personalized versions in one /smtp/email call
+    MAX_MESSAGE_VERSIONS = 1000
+    
+    def __init__(self, api_key=None, base_url=None, http=None, retries=None):
+        # retries: HTTP-level retries per call, None for the HTTPClient's
+        # default; the campaign worker passes 0 and retries itself
         self.api_key = api_key or getattr(settings, 'BREVO_API_KEY', '')
         if not self.api_key:
             raise ValueError("BREVO_API_KEY not configured in settings")
+        self.base_url = base_url or getattr(settings, 'BREVO_API_URL', '') or self.BASE_URL
+        self.http = http or get_http_client()
+        self.retries = retries
     
     def _make_request(self, endpoint, method='GET', data=None):
         """Make HTTP request to Brevo API"""
-        url = f"{self.BASE_URL}{endpoint}"
+        url = f"{self.base_url}{endpoint}"
         headers = {
             'api-key': self.api_key,
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
         
-        request_data = json.dumps(data).encode('utf-8') if data else None
-        
         try:
-            req = urllib.request.Request(
-                url,
-                data=request_data,
-                headers=headers,
-                method=method
+            response = self.http.request(
+                method, url, json=data if data else None, headers=headers, retries=self.retries,
             )
-            
-            with urllib.request.urlopen(req, timeout=30) as response:
-                response_data = response.read().decode('utf-8')
-                return json.loads(response_data) if response_data else {}
-                
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode('utf-8') if e.fp else str(e)
+        except requests.RequestException as e:
+            raise BrevoAPIError(f'Request failed: {str(e)}')
+        
+        if response.status_code >= 400:
             try:
-                error_json = json.loads(error_body)
+                error_json = response.json()
                 error_msg = error_json.get('message', str(error_json))
-            except:
-                error_msg = error_body
-            raise Exception(f'Brevo API error {e.code}: {error_msg}')
-        except Exception as e:
-            raise Exception(f'Request failed: {str(e)}')
+            except ValueError:
+                error_msg = response.text
+            raise BrevoAPIError(f'Brevo API error {response.status_code}: {error_msg}', status=response.status_code)
+        
+        try:
+            return response.json() if response.content else {}
+        except ValueError as e:
+            raise BrevoAPIError(f'Request failed: invalid JSON response ({e})', status=response.status_code)
     
     def send_transactional_email(self, to_email, to_name, subject, html_content, 
                                  from_email=None, from_name=None, 
@@ -96,6 +109,67 @@ class BrevoClient:
         
         return self._make_request('/smtp/email', method='POST', data=data)
     
+    def send_transactional_batch(self, messages, from_email=None, from_name=None,
+                                 track_opens=True, track_clicks=True):
+        """
+        Send up to MAX_MESSAGE_VERSIONS personalized emails in ONE call,
+        as Brevo messageVersions (one version per recipient, each with its
+        own subject and HTML body)
+        
+        Args:
+            messages: List of dicts with to_email, to_name, subject, html_content
+            from_email: Sender email (optional, uses DEFAULT_FROM_EMAIL)
+            from_name: Sender name (optional, defaults to 'MakePlus')
+            track_opens: Enable open tracking (default: True)
+            track_clicks: Enable click tracking (default: True)
+        
+        Returns:
+            list: Brevo messageId of each message, in the order given
+
+        Raises:
+            BrevoAPIError: Also when Brevo answers with fewer messageIds
+                than messages -- which ones went out is then unknown
+        """
+        if not messages:
+            return []
+        if len(messages) > self.MAX_MESSAGE_VERSIONS:
+            raise ValueError(f"At most {self.MAX_MESSAGE_VERSIONS} messages per batch call")
+        
+        versions = []
+        for message in messages:
+            to = {'email': message['to_email']}
+            if message.get('to_name'):
+                to['name'] = message['to_name']
+            versions.append({
+                'to': [to],
+                'subject': message['subject'],
+                'htmlContent': message['html_content'],
+            })
+        
+        data = {
+            'sender': {
+                'name': from_name or 'MakePlus',
+                'email': from_email or settings.DEFAULT_FROM_EMAIL
+            },
+            # Defaults for the versions -- every version overrides both
+            'subject': messages[0]['subject'],
+            'htmlContent': messages[0]['html_content'],
+            'messageVersions': versions,
+            'params': {
+                'trackOpens': track_opens,
+                'trackClicks': track_clicks
+            }
+        }
+        
+        result = self._make_request('/smtp/email', method='POST', data=data)
+        message_ids = result.get('messageIds') or []
+        if len(message_ids) != len(messages):
+            # Accepted (201), so not a transient error to resend on
+            raise BrevoAPIError(
+                f'Brevo returned {len(message_ids)} messageIds for {len(messages)} messages', status=201,
+            )
+        return message_ids
+    
     def get_message_stats(self, message_id):
         """
         Get statistics for a specific message (transactional email)
@@ -150,7 +224,8 @@ class BrevoClient:
         
         return self._make_request(endpoint)
     
-    def get_email_events(self, email=None, event_type=None, days=30, limit=100, offset=0, message_id=None, tags=None):
+    def get_email_events(self, email=None, event_type=None, days=30, limit=100, offset=0, message_id=None, tags=None,
+                         start_date=None, end_date=None, sort=None):
         """
         Get email events (opens, clicks, etc.)
         
@@ -162,6 +237,9 @@ class BrevoClient:
             offset: Pagination offset (default: 0)
             message_id: Filter by message ID
             tags: Filter by tags
+            start_date: First day (date), replaces `days` (needs end_date)
+            end_date: Last day (date)
+            sort: 'asc' or 'desc' by event date
         
         Returns:
             dict: Events data
@@ -169,8 +247,14 @@ class BrevoClient:
         params = {
             'limit': limit,
             'offset': offset,
-            'days': days
         }
+        if start_date and end_date:
+            params['startDate'] = start_date.isoformat()
+            params['endDate'] = end_date.isoformat()
+        else:
+            params['days'] = days
+        if sort:
+            params['sort'] = sort
         
         if email:
             params['email'] = email
@@ -433,7 +517,9 @@ class BrevoClient:
     
     def send_batch_emails(self, emails_data):
         """
-        Send multiple emails in batch (using transactional API)
+        Send multiple emails in batch, MAX_MESSAGE_VERSIONS per API call
+        (consecutive emails with the same sender and tracking settings
+        share a call)
         
         Args:
             emails_data: List of dicts with email data:
@@ -441,35 +527,37 @@ class BrevoClient:
                 - to_name: Recipient name
                 - subject: Email subject
                 - html_content: HTML body
-                - params: Optional dict of template variables
+                - from_email / from_name / track_opens / track_clicks: optional
         
         Returns:
             list: List of results for each email
         """
+        def call_key(email_data):
+            return (
+                email_data.get('from_email'), email_data.get('from_name'),
+                email_data.get('track_opens', True), email_data.get('track_clicks', True),
+            )
+        
         results = []
-        for email_data in emails_data:
-            try:
-                result = self.send_transactional_email(
-                    to_email=email_data['to_email'],
-                    to_name=email_data.get('to_name', ''),
-                    subject=email_data['subject'],
-                    html_content=email_data['html_content'],
-                    from_email=email_data.get('from_email'),
-                    from_name=email_data.get('from_name'),
-                    track_opens=email_data.get('track_opens', True),
-                    track_clicks=email_data.get('track_clicks', True)
+        for (from_email, from_name, track_opens, track_clicks), group in groupby(emails_data, key=call_key):
+            group = list(group)
+            for start in range(0, len(group), self.MAX_MESSAGE_VERSIONS):
+                chunk = group[start:start + self.MAX_MESSAGE_VERSIONS]
+                try:
+                    message_ids = self.send_transactional_batch(
+                        chunk, from_email=from_email, from_name=from_name,
+                        track_opens=track_opens, track_clicks=track_clicks,
+                    )
+                except Exception as e:
+                    results.extend(
+                        {'email': email_data['to_email'], 'success': False, 'error': str(e)}
+                        for email_data in chunk
+                    )
+                    continue
+                results.extend(
+                    {'email': email_data['to_email'], 'success': True, 'message_id': message_id}
+                    for email_data, message_id in zip(chunk, message_ids)
                 )
-                results.append({
-                    'email': email_data['to_email'],
-                    'success': True,
-                    'message_id': result.get('messageId')
-                })
-            except Exception as e:
-                results.append({
-                    'email': email_data['to_email'],
-                    'success': False,
-                    'error': str(e)
-                })
         
         return results
     
@@ -487,6 +575,6 @@ class BrevoClient:
             return False
 
 
-def get_brevo_client():
+def get_brevo_client(retries=None):
     """Get configured Brevo client instance"""
-    return BrevoClient()
+    return BrevoClient(retries=retries)
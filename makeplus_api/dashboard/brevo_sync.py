@@ -1,222 +1,371 @@
 """
-Brevo Statistics Synchronization Module
+Brevo statistics: event ingestion and incremental aggregation.
 
-Syncs email campaign statistics from Brevo servers to local database.
-Uses email + time-based filtering since messageId filtering doesn't work for transactional emails.
+The manual sync used to zero every recipient's stats, then call the Brevo
+events API once per recipient and save() each one, all inside a single
+transaction -- minutes of locked rows for a large campaign, redone from
+scratch on every click. Stats are now built from an append-only event log:
+
+- Brevo pushes events to the webhook (views_tracking.brevo_webhook), and
+  pull_brevo_events() reads the events API -- only what is newer than the
+  'brevo_api' cursor -- for whatever the webhook missed. Both append into
+  BrevoEmailEvent, keyed by event_key, so the same event arriving twice
+  (or from both sources) is stored once;
+- aggregate_events() folds events past the 'aggregate' cursor into the
+  EmailRecipient / EmailCampaign counters, a batch per short transaction,
+  matching events to recipients by Brevo message ID (external_id). Run it
+  periodically with `manage.py sync_email_events`. The delivery worker
+  stores external_id once Brevo has answered the send, so an event can
+  arrive before its recipient is matchable: the cursor stops at an
+  unmatched event until it is MATCH_GRACE_SECONDS old, and only then is
+  the event passed over as not one of ours.
+
+Only opens, clicks, deliveries, hard bounces and unsubscribes move
+counters; the other event types are stored for reference. Opens and clicks
+of campaigns sent with our own pixel / redirects (own_open_tracking,
+own_click_tracking) are left to tracking_rollup: Brevo tracks the same
+mail, and counting both would count every open twice.
 """
+import hashlib
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
-from datetime import datetime, timedelta
+
 from .brevo_client import get_brevo_client
-from .models_email import EmailCampaign, EmailRecipient
+from .models_email import BrevoEmailEvent, EmailCampaign, EmailEventCursor, EmailRecipient
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_CURSOR = 'aggregate'
+API_CURSOR = 'brevo_api'
+
+# Brevo only keeps a month of events; the first pull goes back that far
+LOOKBACK_DAYS = 30
+EVENTS_PAGE_SIZE = 2500
+AGGREGATE_BATCH_SIZE = 1000
+
+# The aggregator leaves alone events received in the last few seconds, so
+# an insert that commits after a higher-numbered one is not skipped
+SETTLE_SECONDS = 5
+
+# How long an event whose message ID matches no recipient yet is waited
+# for before the cursor moves past it
+MATCH_GRACE_SECONDS = 600
+
+# Webhook and events-API names -> BrevoEmailEvent.event. Unlisted types
+# (requests, deferred, proxy opens, unique_opened duplicates) are dropped.
+EVENT_TYPES = {
+    'delivered': 'delivered',
+    'opened': 'opened',
+    'click': 'clicked',
+    'clicks': 'clicked',
+    'hard_bounce': 'hard_bounce',
+    'hardBounces': 'hard_bounce',
+    'soft_bounce': 'soft_bounce',
+    'softBounces': 'soft_bounce',
+    'blocked': 'blocked',
+    'spam': 'spam',
+    'unsubscribed': 'unsubscribed',
+}
+
+RECIPIENT_FIELDS = [
+    'status', 'delivered_at', 'first_opened_at', 'last_opened_at',
+    'open_count', 'opens_count', 'click_count', 'clicks_count',
+]
+
+
+def _event_time(raw):
+    """Event time from a webhook (ts_epoch ms / ts_event s) or API (ISO date) payload."""
+    if raw.get('ts_epoch'):
+        return datetime.fromtimestamp(int(raw['ts_epoch']) / 1000, tz=dt_timezone.utc)
+    if raw.get('ts_event'):
+        return datetime.fromtimestamp(int(raw['ts_event']), tz=dt_timezone.utc)
+    date_str = raw.get('date') or ''
+    if date_str.endswith('Z'):
+        date_str = date_str[:-1] + '+00:00'
+    occurred_at = datetime.fromisoformat(date_str)
+    if occurred_at.tzinfo is None:
+        occurred_at = timezone.make_aware(occurred_at)
+    return occurred_at
+
+
+def event_key(message_id, email, event, occurred_at, link=''):
+    """Idempotency key: the same event from the webhook and the API hashes alike (to the second)."""
+    second = int(occurred_at.timestamp())
+    data = f"{message_id}|{email.lower()}|{event}|{second}|{link}"
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def normalize_event(raw, source):
+    """BrevoEmailEvent (unsaved) for a webhook/API event dict, or None if it is not tracked."""
+    event = EVENT_TYPES.get(raw.get('event'))
+    email = (raw.get('email') or '').strip()
+    if event is None or not email:
+        return None
+    try:
+        occurred_at = _event_time(raw)
+    except (TypeError, ValueError):
+        return None
+    message_id = raw.get('message-id') or raw.get('messageId') or ''
+    link = raw.get('link') or ''
+    return BrevoEmailEvent(
+        event_key=event_key(message_id, email, event, occurred_at, link),
+        event=event,
+        email=email,
+        message_id=message_id,
+        link=link,
+        occurred_at=occurred_at,
+        source=source,
+        payload=raw,
+    )
+
+
+def store_events(raw_events, source):
+    """
+    Append events to the log, skipping any already stored
+
+    Args:
+        raw_events: Iterable of Brevo event dicts (webhook or API shape)
+        source: 'webhook' or 'api'
+
+    Returns:
+        int: Number of events that were new
+    """
+    events = {}
+    for raw in raw_events:
+        event = normalize_event(raw, source)
+        if event is not None:
+            events.setdefault(event.event_key, event)
+    if not events:
+        return 0
+
+    existing = set(
+        BrevoEmailEvent.objects.filter(event_key__in=list(events)).values_list('event_key', flat=True)
+    )
+    new_events = [event for key, event in events.items() if key not in existing]
+    # ignore_conflicts covers a concurrent delivery of the same event
+    BrevoEmailEvent.objects.bulk_create(new_events, ignore_conflicts=True)
+    return len(new_events)
+
+
+def ingest_webhook_payload(payload):
+    """Store a webhook POST body: one event, or a list of them (batched webhooks)."""
+    raw_events = payload if isinstance(payload, list) else [payload]
+    return store_events([raw for raw in raw_events if isinstance(raw, dict)], 'webhook')
+
+
+def pull_brevo_events(client=None, now=None):
+    """
+    Read the Brevo events API from the 'brevo_api' cursor to now
+
+    The API filters by day, so the cursor's own day is read again; events
+    already stored are skipped by their key.
+
+    Returns:
+        dict: {'fetched': events read, 'stored': events that were new}
+    """
+    client = client or get_brevo_client()
+    now = now or timezone.now()
+    cursor, _ = EmailEventCursor.objects.get_or_create(name=API_CURSOR)
+    start = now - timedelta(days=LOOKBACK_DAYS)
+    if cursor.synced_at is not None:
+        start = max(cursor.synced_at, start)
+
+    fetched = stored = 0
+    offset = 0
+    while True:
+        page = client.get_email_events(
+            start_date=timezone.localdate(start),
+            end_date=timezone.localdate(now),
+            limit=EVENTS_PAGE_SIZE,
+            offset=offset,
+            sort='asc',
+        ).get('events') or []
+        fetched += len(page)
+        stored += store_events(page, 'api')
+        if len(page) < EVENTS_PAGE_SIZE:
+            break
+        offset += EVENTS_PAGE_SIZE
+
+    cursor.synced_at = now
+    cursor.save(update_fields=['synced_at', 'updated_at'])
+    return {'fetched': fetched, 'stored': stored}
+
+
+def _own_tracked_events(campaign_ids):
+    """{campaign_id: event types counted by our own tracking instead of Brevo's}"""
+    own = {}
+    for pk, opens, clicks in EmailCampaign.objects.filter(pk__in=campaign_ids).values_list(
+        'pk', 'own_open_tracking', 'own_click_tracking',
+    ):
+        own[pk] = {event for event, tracked in (('opened', opens), ('clicked', clicks)) if tracked}
+    return own
+
+
+def _apply(recipient, event, deltas):
+    """Fold one event into a recipient; campaign counter changes go into `deltas`."""
+    if event.event == 'opened':
+        if recipient.first_opened_at is None:
+            recipient.first_opened_at = event.occurred_at
+            deltas['unique_opens'] += 1
+        else:
+            recipient.first_opened_at = min(recipient.first_opened_at, event.occurred_at)
+        recipient.last_opened_at = max(recipient.last_opened_at or event.occurred_at, event.occurred_at)
+        recipient.open_count += 1
+        recipient.opens_count += 1
+        deltas['total_opened'] += 1
+    elif event.event == 'clicked':
+        if recipient.click_count == 0:
+            deltas['unique_clicks'] += 1
+        recipient.click_count += 1
+        recipient.clicks_count += 1
+        deltas['total_clicked'] += 1
+    elif event.event == 'delivered':
+        if recipient.delivered_at is None:
+            recipient.delivered_at = event.occurred_at
+            deltas['total_delivered'] += 1
+        if recipient.status == 'sent':
+            recipient.status = 'delivered'
+    elif event.event == 'hard_bounce':
+        if recipient.status in ('sent', 'delivered'):
+            recipient.status = 'bounced'
+    elif event.event == 'unsubscribed':
+        recipient.status = 'unsubscribed'
+    else:
+        return False
+    return True
+
+
+def _fold_batch(batch_size, cutoff, match_cutoff):
+    """
+    Fold the next batch past the aggregate cursor, in one transaction. The
+    batch ends before the first event received after `match_cutoff` whose
+    message ID no recipient carries yet.
+
+    Returns:
+        tuple: (events folded, {campaign_id: {'opens', 'clicks', 'recipients'}})
+    """
+    with transaction.atomic():
+        cursor, _ = EmailEventCursor.objects.select_for_update().get_or_create(name=AGGREGATE_CURSOR)
+        events = []
+        for event in BrevoEmailEvent.objects.filter(pk__gt=cursor.position).order_by('pk')[:batch_size]:
+            if event.received_at > cutoff:
+                break
+            events.append(event)
+        if not events:
+            return 0, {}
+
+        message_ids = {event.message_id for event in events if event.message_id}
+        recipients = {
+            recipient.external_id: recipient
+            for recipient in EmailRecipient.objects.select_for_update().filter(external_id__in=message_ids)
+        }
+        for index, event in enumerate(events):
+            if event.message_id and event.message_id not in recipients and event.received_at > match_cutoff:
+                events = events[:index]
+                break
+        if not events:
+            return 0, {}
+
+        own_tracked = _own_tracked_events({recipient.campaign_id for recipient in recipients.values()})
+        deltas = defaultdict(lambda: defaultdict(int))
+        touched = {}
+        for event in events:
+            recipient = recipients.get(event.message_id)
+            if recipient is None or event.event in own_tracked.get(recipient.campaign_id, ()):
+                continue
+            if _apply(recipient, event, deltas[recipient.campaign_id]):
+                touched[recipient.pk] = recipient
+
+        EmailRecipient.objects.bulk_update(touched.values(), RECIPIENT_FIELDS)
+        summary = {}
+        for campaign_id, campaign_deltas in deltas.items():
+            if campaign_deltas:
+                EmailCampaign.objects.filter(pk=campaign_id).update(
+                    **{field: F(field) + value for field, value in campaign_deltas.items()}
+                )
+            summary[campaign_id] = {
+                'opens': campaign_deltas['total_opened'],
+                'clicks': campaign_deltas['total_clicked'],
+                'recipients': sum(1 for r in touched.values() if r.campaign_id == campaign_id),
+            }
+
+        cursor.position = events[-1].pk
+        cursor.save(update_fields=['position', 'updated_at'])
+    return len(events), summary
+
+
+def aggregate_events(batch_size=AGGREGATE_BATCH_SIZE, settle_seconds=SETTLE_SECONDS,
+                     match_grace_seconds=MATCH_GRACE_SECONDS):
+    """
+    Fold every settled event past the aggregate cursor into the counters
+
+    Args:
+        batch_size: Events per transaction
+        settle_seconds: Leave events received more recently than this
+        match_grace_seconds: Stop at an event matching no recipient until
+            it was received this long ago
+
+    Returns:
+        dict: {'events': folded, 'campaigns': {campaign_id: {'opens', 'clicks', 'recipients'}}}
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settle_seconds)
+    match_cutoff = now - timedelta(seconds=match_grace_seconds)
+    total = 0
+    campaigns = defaultdict(lambda: defaultdict(int))
+    while True:
+        folded, summary = _fold_batch(batch_size, cutoff, match_cutoff)
+        if not folded:
+            break
+        total += folded
+        for campaign_id, counts in summary.items():
+            for name, value in counts.items():
+                campaigns[campaign_id][name] += value
+    return {'events': total, 'campaigns': {pk: dict(counts) for pk, counts in campaigns.items()}}
 
 
 def sync_campaign_stats_from_brevo(campaign):
     """
-    Sync campaign statistics from Brevo using email-based filtering
-    
-    Since Brevo's transactional email API doesn't support messageId filtering,
-    we filter by email address and time window.
-    
+    Manual sync: pull events newer than the cursor, then fold them
+
     Args:
         campaign: EmailCampaign instance
-    
+
     Returns:
-        dict: Sync results with counts
+        dict: Sync results with counts for this campaign
     """
-    try:
-        client = get_brevo_client()
-        
-        # Get all recipients that were sent
-        recipients = campaign.recipients.filter(
-            status__in=['sent', 'delivered']
-        ).all()
-        
-        if not recipients.exists():
-            return {
-                'success': False,
-                'error': 'No sent recipients found for this campaign'
-            }
-        
-        print(f"\n{'='*70}")
-        print(f"SYNCING STATS FOR CAMPAIGN: {campaign.name}")
-        print(f"Campaign ID: {campaign.id}")
-        print(f"Sent at: {campaign.sent_at}")
-        print(f"Total recipients: {recipients.count()}")
-        print(f"{'='*70}\n")
-        
-        # Track counts
-        opens_synced = 0
-        clicks_synced = 0
-        recipients_updated = 0
-        errors = []
-        
-        # Calculate days to fetch (from campaign sent date)
-        campaign_sent_time = campaign.sent_at or timezone.now()
-        days_since_sent = (timezone.now() - campaign_sent_time).days + 1
-        days_to_fetch = min(days_since_sent + 1, 30)
-        
-        print(f"Fetching events from last {days_to_fetch} days\n")
-        
-        with transaction.atomic():
-            # STEP 1: RESET ALL STATS TO ZERO
-            print("STEP 1: Resetting all recipient stats to 0...")
-            for recipient in recipients:
-                recipient.open_count = 0
-                recipient.opens_count = 0
-                recipient.click_count = 0
-                recipient.clicks_count = 0
-                recipient.first_opened_at = None
-                recipient.last_opened_at = None
-                recipient.save()
-            print(f"✓ Reset {recipients.count()} recipients\n")
-            
-            # STEP 2: FETCH EVENTS FOR EACH RECIPIENT
-            print("STEP 2: Fetching events from Brevo...\n")
-            
-            for recipient in recipients:
-                try:
-                    print(f"→ {recipient.email}")
-                    print(f"  Sent at: {recipient.sent_at}")
-                    
-                    # Fetch events for this specific email
-                    events_result = client.get_email_events(
-                        email=recipient.email,
-                        days=days_to_fetch,
-                        limit=1000
-                    )
-                    
-                    events = events_result.get('events', [])
-                    print(f"  Total events found: {len(events)}")
-                    
-                    # Filter events to only those AFTER this recipient was sent the email
-                    recipient_sent_time = recipient.sent_at or campaign_sent_time
-                    if recipient_sent_time.tzinfo is None:
-                        recipient_sent_time = timezone.make_aware(recipient_sent_time)
-                    
-                    recipient_opens = 0
-                    recipient_clicks = 0
-                    first_open_time = None
-                    last_open_time = None
-                    
-                    matched_events = 0
-                    skipped_time = 0
-                    
-                    for event in events:
-                        event_type = event.get('event')
-                        event_date_str = event.get('date')
-                        
-                        # Parse event date
-                        try:
-                            if event_date_str.endswith('Z'):
-                                event_date_str = event_date_str[:-1] + '+00:00'
-                            event_date = datetime.fromisoformat(event_date_str)
-                            if event_date.tzinfo is None:
-                                event_date = timezone.make_aware(event_date)
-                        except:
-                            continue
-                        
-                        # Filter 1: Event must be AFTER email was sent
-                        if event_date < recipient_sent_time:
-                            skipped_time += 1
-                            continue
-                        
-                        # Filter 2: Event must be within 7 days of sending
-                        time_diff = (event_date - recipient_sent_time).total_seconds()
-                        if time_diff > (7 * 24 * 3600):
-                            skipped_time += 1
-                            continue
-                        
-                        # NOTE: We don't filter by subject because Brevo personalizes it before sending
-                        # So the event subject will have "test123" instead of "{{first_name}}"
-                        
-                        matched_events += 1
-                        
-                        # Count opens
-                        if event_type == 'opened':
-                            recipient_opens += 1
-                            if first_open_time is None:
-                                first_open_time = event_date
-                            last_open_time = event_date
-                            print(f"    ✓ Open at {event_date}")
-                        
-                        # Count clicks
-                        elif event_type == 'clicks':
-                            recipient_clicks += 1
-                            print(f"    ✓ Click at {event_date}")
-                    
-                    print(f"  Matched events: {matched_events}")
-                    print(f"  Skipped (time): {skipped_time}")
-                    print(f"  Opens: {recipient_opens}, Clicks: {recipient_clicks}")
-                    
-                    # Update recipient
-                    if recipient_opens > 0 or recipient_clicks > 0:
-                        recipient.open_count = recipient_opens
-                        recipient.opens_count = recipient_opens
-                        recipient.click_count = recipient_clicks
-                        recipient.clicks_count = recipient_clicks
-                        
-                        if first_open_time:
-                            recipient.first_opened_at = first_open_time
-                        if last_open_time:
-                            recipient.last_opened_at = last_open_time
-                        
-                        recipient.save()
-                        recipients_updated += 1
-                        
-                        opens_synced += recipient_opens
-                        clicks_synced += recipient_clicks
-                        
-                        print(f"  ✓ UPDATED\n")
-                    else:
-                        recipient.save()
-                        print(f"  - No activity\n")
-                    
-                except Exception as e:
-                    error_msg = f"{recipient.email}: {str(e)}"
-                    print(f"  ✗ ERROR: {error_msg}\n")
-                    errors.append(error_msg)
-                    continue
-            
-            # STEP 3: UPDATE CAMPAIGN TOTALS
-            print("\nSTEP 3: Calculating campaign totals...")
-            campaign.unique_opens = campaign.recipients.filter(open_count__gt=0).count()
-            campaign.unique_clicks = campaign.recipients.filter(click_count__gt=0).count()
-            campaign.total_opened = sum(r.open_count for r in campaign.recipients.all())
-            campaign.total_clicked = sum(r.click_count for r in campaign.recipients.all())
-            campaign.save()
-            
-            print(f"\n{'='*70}")
-            print(f"SYNC COMPLETE")
-            print(f"{'='*70}")
-            print(f"Recipients updated: {recipients_updated}")
-            print(f"Total opens synced: {opens_synced}")
-            print(f"Total clicks synced: {clicks_synced}")
-            print(f"Errors: {len(errors)}")
-            print(f"\nCAMPAIGN TOTALS:")
-            print(f"  Unique opens: {campaign.unique_opens} ({campaign.unique_opens / recipients.count() * 100:.1f}%)")
-            print(f"  Unique clicks: {campaign.unique_clicks} ({campaign.unique_clicks / recipients.count() * 100:.1f}%)")
-            print(f"  Total opens: {campaign.total_opened}")
-            print(f"  Total clicks: {campaign.total_clicked}")
-            print(f"{'='*70}\n")
-        
+    if not campaign.recipients.filter(status__in=['sent', 'delivered']).exists():
         return {
-            'success': True,
-            'opens': opens_synced,
-            'clicks': clicks_synced,
-            'recipients_updated': recipients_updated,
-            'errors': errors
+            'success': False,
+            'error': 'No sent recipients found for this campaign'
         }
-        
+
+    try:
+        pulled = pull_brevo_events()
     except Exception as e:
-        import traceback
-        print(f"\n{'='*70}")
-        print(f"FATAL ERROR")
-        print(f"{'='*70}")
-        traceback.print_exc()
-        print(f"{'='*70}\n")
+        logger.exception("Brevo event pull failed for campaign %s", campaign.pk)
         return {
             'success': False,
             'error': str(e)
         }
+
+    # Fold the pulled events now rather than on the next run, once they
+    # are out of the settle window
+    time.sleep(SETTLE_SECONDS)
+    aggregated = aggregate_events(settle_seconds=SETTLE_SECONDS)
+    counts = aggregated['campaigns'].get(campaign.pk, {})
+    return {
+        'success': True,
+        'opens': counts.get('opens', 0),
+        'clicks': counts.get('clicks', 0),
+        'recipients_updated': counts.get('recipients', 0),
+        'events_fetched': pulled['fetched'],
+        'events_new': pulled['stored'],
+        'errors': []
+    }
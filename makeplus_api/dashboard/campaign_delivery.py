@@ -0,0 +1,468 @@
+"""
+Background delivery of email campaigns.
+
+campaign_send used to send the whole campaign inside the HTTP request:
+one build_recipient_context + send_transactional_email + recipient.save()
+per recipient, serially, so a few thousand recipients tied up a gunicorn
+worker for minutes and died on the request timeout halfway through. The
+view now only enqueues a CampaignSendJob (a plain DB table -- no broker to
+run) and the send_campaign_jobs worker command drains the queue:
+
+- recipients are taken in batches of CAMPAIGN_SEND_BATCH_SIZE, still
+  'pending' ones only, so a job that stops (worker restart, quota hit,
+  cancel) resumes exactly where it left off;
+- each batch is rendered in the worker thread (all DB access stays there,
+  with the recipient contexts fetched for the whole batch at once), cut
+  into chunks of CAMPAIGN_SEND_VERSIONS_PER_CALL personalized messages --
+  one Brevo call each, as messageVersions -- and posted by a pool of
+  CAMPAIGN_SEND_THREADS threads, paced by one token bucket
+  (CAMPAIGN_SEND_RATE calls per second, bursts of CAMPAIGN_SEND_BURST) so
+  the pool never outruns the Brevo rate limit;
+- 429s, 5xx and network errors are retried with exponential backoff and
+  jitter, up to CAMPAIGN_SEND_MAX_RETRIES times; an exhausted-credits
+  answer pauses the job instead of failing every remaining recipient, and
+  a chunk Brevo rejects outright (another 4xx, e.g. one malformed
+  address) is split in halves and resent, so only the bad recipients fail;
+- outcomes are written back with one bulk_update per batch, along with
+  the job's progress counters and heartbeat.
+
+A worker holds a job through its heartbeat: a 'running' job whose
+heartbeat is older than CAMPAIGN_JOB_LEASE_SECONDS is claimed again by the
+next worker. Delivery is at-least-once -- a worker killed mid-batch
+resends that batch's unrecorded messages when the job is picked up again.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .brevo_client import BrevoAPIError, BrevoClient, get_brevo_client
+from .models_email import CampaignSendJob, EmailCampaign, EmailRecipient
+from .utils_campaign import campaign_templates, iter_recipient_contexts
+
+logger = logging.getLogger(__name__)
+
+# Campaign statuses a send can be (re)started from.
+SENDABLE_STATUSES = ('draft', 'paused', 'failed')
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+# Per-recipient outcomes of one batch
+SENT = 'sent'
+FAILED = 'failed'
+SKIPPED = 'skipped'  # not attempted, stays pending (job stopping)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() blocks until a token is available.
+    Refills `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(self.rate, 1))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def is_retryable(error):
+    """Rate limited, Brevo-side failure, or no answer at all."""
+    return isinstance(error, BrevoAPIError) and (
+        error.status is None or error.status == 429 or error.status >= 500
+    )
+
+
+def is_rejected(error):
+    """Brevo refused the request itself (4xx other than a rate limit): resending it as is won't help."""
+    return (
+        isinstance(error, BrevoAPIError) and error.status is not None
+        and 400 <= error.status < 500 and error.status != 429
+    )
+
+
+def is_quota_error(error):
+    """Out of sending credits -- nothing will go out until the plan refills."""
+    if isinstance(error, BrevoAPIError) and error.status == 402:
+        return True
+    message = str(error).lower()
+    return 'credit' in message or 'quota' in message
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for retry number `attempt` (0-based)."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return delay * (0.5 + random.random() / 2)
+
+
+def send_with_retry(send, bucket, max_retries, sleep=time.sleep):
+    """Make one Brevo call (`send()`), retrying transient errors. Returns its result."""
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            return send()
+        except Exception as error:
+            if attempt >= max_retries or not is_retryable(error) or is_quota_error(error):
+                raise
+            sleep(backoff_delay(attempt))
+
+
+# -- Queue ------------------------------------------------------------------
+
+def enqueue_campaign(campaign, mode='transactional', user=None):
+    """
+    Queue `campaign` for delivery, or return its job if one is already
+    queued/running. A paused job is resumed rather than duplicated.
+
+    Returns (job, created).
+    """
+    with transaction.atomic():
+        campaign = EmailCampaign.objects.select_for_update().get(pk=campaign.pk)
+        job = campaign.send_jobs.filter(status__in=('queued', 'running', 'paused')).order_by('-created_at').first()
+        if job is not None and job.is_active:
+            return job, False
+
+        pending = campaign.recipients.filter(status='pending').count()
+        if job is not None:
+            job.status = 'queued'
+            job.mode = mode
+            job.total = job.sent_count + job.failed_count + pending
+            job.last_error = ''
+            job.save(update_fields=['status', 'mode', 'total', 'last_error', 'updated_at'])
+            created = False
+        else:
+            job = CampaignSendJob.objects.create(campaign=campaign, mode=mode, total=pending, created_by=user)
+            created = True
+
+        campaign.status = 'sending'
+        campaign.save(update_fields=['status', 'updated_at'])
+    return job, created
+
+
+def claim_next_job(worker):
+    """
+    Take the oldest queued job, or a running one whose worker stopped
+    heartbeating. The claim is a compare-and-swap on (status,
+    heartbeat_at), so two workers can never both get the same job.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=_setting('CAMPAIGN_JOB_LEASE_SECONDS', 300))
+    candidates = CampaignSendJob.objects.filter(
+        Q(status='queued') | Q(status='running', heartbeat_at__lt=stale_before)
+    ).order_by('created_at').values_list('pk', 'status', 'heartbeat_at')[:10]
+
+    for pk, status, heartbeat_at in candidates:
+        claimed = CampaignSendJob.objects.filter(pk=pk, status=status, heartbeat_at=heartbeat_at).update(
+            status='running',
+            worker=worker,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+            started_at=Coalesce('started_at', Value(now)),
+        )
+        if claimed:
+            return CampaignSendJob.objects.select_related('campaign__event').get(pk=pk)
+    return None
+
+
+def release_job(job):
+    """Hand a running job back to the queue (worker shutting down) so the next worker resumes it at once."""
+    CampaignSendJob.objects.filter(pk=job.pk, status='running', worker=job.worker).update(status='queued', worker='')
+
+
+def cancel_job(job):
+    """Stop a queued/running job after its current batch; recipients not sent stay pending."""
+    CampaignSendJob.objects.filter(pk=job.pk, status__in=CampaignSendJob.ACTIVE_STATUSES).update(
+        status='cancelled', finished_at=timezone.now(),
+    )
+    EmailCampaign.objects.filter(pk=job.campaign_id, status='sending').update(status='paused')
+
+
+# -- Delivery ---------------------------------------------------------------
+
+def _sender(campaign):
+    return (
+        campaign.from_email or settings.DEFAULT_FROM_EMAIL,
+        campaign.from_name or 'MakePlus',
+    )
+
+
+def build_message(campaign, recipient, context):
+    """send_transactional_email kwargs for one recipient, from its iter_recipient_contexts() context."""
+    from_email, from_name = _sender(campaign)
+    templates = campaign_templates(campaign, tracked=True)
+    subject, html_content = templates.render(context, tracking_token=recipient.tracking_token)
+    return {
+        'to_email': recipient.email,
+        'to_name': context.get('first_name', '') or recipient.name or recipient.email.split('@')[0],
+        'subject': subject,
+        'html_content': html_content,
+        'from_email': from_email,
+        'from_name': from_name,
+        'track_opens': campaign.track_opens,
+        'track_clicks': campaign.track_clicks,
+    }
+
+
+def _record_tracking(campaign):
+    """
+    Remember whether this send carries our own pixel / click redirects.
+    Brevo keeps tracking the mail either way (it's an account setting, not
+    a per-message one), so brevo_sync ignores its opens/clicks for such
+    campaigns rather than counting them twice.
+    """
+    templates = campaign_templates(campaign, tracked=True)
+    tracking = {'own_open_tracking': templates.tracks_opens, 'own_click_tracking': templates.tracks_clicks}
+    if any(getattr(campaign, field) != value for field, value in tracking.items()):
+        # update(), not save(): updated_at keys the compiled template cache
+        EmailCampaign.objects.filter(pk=campaign.pk).update(**tracking)
+        for field, value in tracking.items():
+            setattr(campaign, field, value)
+
+
+def _send_call(client, messages):
+    """One Brevo call for `messages` (same campaign). Returns their messageIds, in order."""
+    if len(messages) == 1:
+        return [(client.send_transactional_email(**messages[0]) or {}).get('messageId', '')]
+    first = messages[0]
+    return client.send_transactional_batch(
+        messages,
+        from_email=first['from_email'],
+        from_name=first['from_name'],
+        track_opens=first['track_opens'],
+        track_clicks=first['track_clicks'],
+    )
+
+
+def _deliver(client, messages, bucket, stop, max_retries, sleep):
+    """One chunk of recipients -- one Brevo call -- in a pool thread. Returns [(outcome, detail)]."""
+    if stop.is_set():
+        return [(SKIPPED, None)] * len(messages)
+    try:
+        message_ids = send_with_retry(lambda: _send_call(client, messages), bucket, max_retries, sleep)
+    except Exception as error:
+        if is_quota_error(error):
+            stop.set()
+            return [(SKIPPED, error)] * len(messages)
+        if len(messages) > 1 and is_rejected(error):
+            # Find the message(s) Brevo refuses; the rest still go out
+            middle = len(messages) // 2
+            return (
+                _deliver(client, messages[:middle], bucket, stop, max_retries, sleep)
+                + _deliver(client, messages[middle:], bucket, stop, max_retries, sleep)
+            )
+        return [(FAILED, error)] * len(messages)
+    return [(SENT, message_id) for message_id in message_ids]
+
+
+def _record_batch(job, batch, outcomes):
+    """Write a batch's outcomes back with one bulk_update. Returns (sent, failed)."""
+    now = timezone.now()
+    changed, sent, failed, last_error = [], 0, 0, ''
+    for recipient, (outcome, detail) in zip(batch, outcomes):
+        if outcome == SENT:
+            recipient.status = 'sent'
+            recipient.sent_at = now
+            recipient.external_id = detail or recipient.external_id
+            recipient.error_message = ''
+            sent += 1
+        elif outcome == FAILED:
+            recipient.status = 'failed'
+            recipient.error_message = str(detail)[:500]
+            last_error = recipient.error_message
+            failed += 1
+        else:
+            continue
+        changed.append(recipient)
+
+    with transaction.atomic():
+        EmailRecipient.objects.bulk_update(changed, ['status', 'sent_at', 'external_id', 'error_message'])
+        updates = {
+            'sent_count': F('sent_count') + sent,
+            'failed_count': F('failed_count') + failed,
+            'heartbeat_at': now,
+        }
+        if last_error:
+            updates['last_error'] = last_error
+        CampaignSendJob.objects.filter(pk=job.pk).update(**updates)
+    return sent, failed
+
+
+def _still_ours(job):
+    """False once the job was cancelled, or re-claimed by another worker after our lease lapsed."""
+    return CampaignSendJob.objects.filter(pk=job.pk, status='running', worker=job.worker).exists()
+
+
+def _pause(job, campaign, error):
+    logger.warning("Campaign %s paused: %s", campaign.pk, error)
+    CampaignSendJob.objects.filter(pk=job.pk).update(status='paused', last_error=str(error)[:500])
+    EmailCampaign.objects.filter(pk=campaign.pk).update(status='paused')
+
+
+def _fail(job, campaign, error):
+    logger.exception("Campaign %s send job %s failed", campaign.pk, job.pk)
+    CampaignSendJob.objects.filter(pk=job.pk).update(
+        status='failed', last_error=str(error)[:500], finished_at=timezone.now(),
+    )
+    EmailCampaign.objects.filter(pk=campaign.pk).update(status='failed')
+
+
+def _complete(job, campaign):
+    """Close the job and roll the recipient outcomes up into the campaign totals."""
+    now = timezone.now()
+    counts = dict(campaign.recipients.values_list('status').annotate(n=Count('pk')).values_list('status', 'n'))
+    delivered = counts.get('sent', 0) + counts.get('delivered', 0)
+    CampaignSendJob.objects.filter(pk=job.pk).update(status='completed', finished_at=now, heartbeat_at=now)
+    EmailCampaign.objects.filter(pk=campaign.pk).update(
+        status='sent',
+        sent_at=Coalesce('sent_at', Value(now)),
+        completed_at=now,
+        total_sent=delivered,
+        total_delivered=delivered,
+        total_failed=counts.get('failed', 0),
+    )
+
+
+def run_job(job, client=None, bucket=None, sleep=time.sleep):
+    """Deliver a claimed job until it completes, pauses or is cancelled."""
+    campaign = job.campaign
+    try:
+        # No HTTP-level retries: send_with_retry paces every retry through the bucket
+        client = client or get_brevo_client(retries=0)
+        if job.mode == 'campaign_api':
+            return _run_campaign_api(job, campaign, client)
+        return _run_transactional(job, campaign, client, bucket, sleep)
+    except Exception as error:
+        _fail(job, campaign, error)
+
+
+def _run_transactional(job, campaign, client, bucket, sleep):
+    batch_size = _setting('CAMPAIGN_SEND_BATCH_SIZE', 500)
+    per_call = max(1, min(_setting('CAMPAIGN_SEND_VERSIONS_PER_CALL', 100), BrevoClient.MAX_MESSAGE_VERSIONS))
+    max_retries = _setting('CAMPAIGN_SEND_MAX_RETRIES', 3)
+    bucket = bucket or TokenBucket(_setting('CAMPAIGN_SEND_RATE', 10), _setting('CAMPAIGN_SEND_BURST', 20))
+    stop = threading.Event()
+
+    _record_tracking(campaign)
+    pending = campaign.recipients.filter(status='pending').order_by('created_at', 'pk')
+    with ThreadPoolExecutor(max_workers=_setting('CAMPAIGN_SEND_THREADS', 4), thread_name_prefix='campaign-send') as pool:
+        while _still_ours(job):
+            batch = list(pending[:batch_size])
+            if not batch:
+                _complete(job, campaign)
+                return
+
+            outcomes, sendable, messages = {}, [], []
+            contexts = iter_recipient_contexts([recipient.email for recipient in batch], campaign.event)
+            for recipient, context in zip(batch, contexts):
+                try:
+                    messages.append(build_message(campaign, recipient, context))
+                except Exception as error:
+                    outcomes[recipient.pk] = (FAILED, error)
+                    continue
+                sendable.append(recipient)
+
+            chunks = [
+                (sendable[start:start + per_call], messages[start:start + per_call])
+                for start in range(0, len(messages), per_call)
+            ]
+            results = pool.map(
+                lambda chunk: _deliver(client, chunk[1], bucket, stop, max_retries, sleep), chunks,
+            )
+            for (recipients, _messages), chunk_outcomes in zip(chunks, results):
+                outcomes.update(zip((recipient.pk for recipient in recipients), chunk_outcomes))
+            outcomes = [outcomes[recipient.pk] for recipient in batch]
+            _record_batch(job, batch, outcomes)
+
+            if stop.is_set():
+                quota_error = next(detail for outcome, detail in outcomes if outcome == SKIPPED and detail)
+                _pause(job, campaign, quota_error)
+                return
+
+
+def _run_campaign_api(job, campaign, client):
+    """
+    Brevo Campaign API: one contact list + one Brevo campaign for every
+    pending recipient. Brevo does the fan-out, so this is a handful of calls.
+    """
+    recipients = list(campaign.recipients.filter(status='pending'))
+    if not recipients:
+        _complete(job, campaign)
+        return
+
+    from_email, from_name = _sender(campaign)
+    list_name = f"Campaign_{campaign.id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
+    list_id = client.create_contact_list(name=list_name)['id']
+
+    contacts = []
+    contexts = iter_recipient_contexts([recipient.email for recipient in recipients], campaign.event)
+    for recipient, context in zip(recipients, contexts):
+        contacts.append({
+            'email': recipient.email,
+            'attributes': {
+                'FIRSTNAME': context.get('first_name', ''),
+                'LASTNAME': context.get('last_name', ''),
+                'NAME': context.get('first_name', '') + ' ' + context.get('last_name', ''),
+            },
+        })
+    client.import_contacts_to_list(list_id, contacts)
+
+    html_content = campaign.body_html or campaign.body_text
+    html_content = html_content.replace('{{first_name}}', '{{ contact.FIRSTNAME }}')
+    html_content = html_content.replace('{{last_name}}', '{{ contact.LASTNAME }}')
+    html_content = html_content.replace('{{email}}', '{{ contact.EMAIL }}')
+    if campaign.event:
+        event = campaign.event
+        html_content = html_content.replace('{{event_name}}', event.name)
+        html_content = html_content.replace('{{event_location}}', event.location or '')
+        html_content = html_content.replace(
+            '{{event_start_date}}', event.start_date.strftime('%B %d, %Y') if event.start_date else '')
+        html_content = html_content.replace(
+            '{{event_end_date}}', event.end_date.strftime('%B %d, %Y') if event.end_date else '')
+
+    try:
+        brevo_campaign = client.create_email_campaign(
+            name=campaign.name,
+            subject=campaign.subject,
+            sender_name=from_name,
+            sender_email=from_email,
+            html_content=html_content,
+            recipients_list_ids=[list_id],
+        )
+        EmailCampaign.objects.filter(pk=campaign.pk).update(external_campaign_id=str(brevo_campaign['id']))
+        client.send_email_campaign(brevo_campaign['id'])
+    except Exception as error:
+        if is_quota_error(error):
+            _pause(job, campaign, error)
+            return
+        raise
+
+    _record_batch(job, recipients, [(SENT, '')] * len(recipients))
+    _complete(job, campaign)
@@ -0,0 +1,164 @@
+"""
+Campaign HTML preprocessing for our own open/click tracking.
+
+EmailLink rows and recipient tracking tokens existed, but nothing put them
+into the sent HTML, so campaigns were tracked by Brevo alone. Rewriting
+links per recipient would mean parsing every message; instead the body is
+parsed once per campaign revision, at send time:
+
+- every trackable <a>/<area> href becomes an EmailLink (created in bulk)
+  and is replaced by its /track/email/click/<link>/<recipient>/ redirect;
+- {{unsubscribe_url}} becomes the recipient's /track/email/unsubscribe/
+  link, and the open pixel is added before </body>;
+- the recipient part of those URLs is left as a {{__tracking_token}}
+  placeholder, so the result compiles into the campaign's CompiledTemplate
+  (utils_campaign) and each message only splices its token into
+  precomputed slots, in the same pass as the other variables.
+
+Only the href values are rewritten -- the rest of the markup is kept byte
+for byte, which matters for editor-generated (Unlayer) HTML. Links that
+are personalized ({{...}}) and anything but http(s) URLs -- anchors,
+mailto:, tel: -- are left alone.
+
+Tracking URLs are built on CAMPAIGN_TRACKING_URL; while it is unset,
+campaigns keep relying on Brevo's tracking and this module is not used.
+"""
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.urls import reverse
+
+from .models_email import EmailLink
+
+# Placeholder filled with EmailRecipient.tracking_token when rendering
+TOKEN_SLOT = '__tracking_token'
+_SLOT = '{{%s}}' % TOKEN_SLOT
+_SENTINEL = 'tracking-slot'
+
+HREF_RE = re.compile(r'''(?<![\w-])(href\s*=\s*)("[^"]*"|'[^']*'|[^\s"'>]+)''', re.IGNORECASE)
+BODY_CLOSE_RE = re.compile(r'</body\s*>', re.IGNORECASE)
+
+
+def tracking_base_url():
+    """Absolute base for tracking URLs, or '' when our own tracking is off"""
+    return (getattr(settings, 'CAMPAIGN_TRACKING_URL', '') or '').rstrip('/')
+
+
+class _AnchorScanner(HTMLParser):
+    """Offsets and raw text of the start tags carrying an href"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.anchors = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('a', 'area'):
+            href = dict(attrs).get('href')
+            if href is not None:
+                self.anchors.append((self.getpos(), self.get_starttag_text(), href.strip()))
+
+    handle_startendtag = handle_starttag
+
+
+def _is_trackable(url, base_url):
+    return (
+        url.lower().startswith(('http://', 'https://'))
+        and '{{' not in url
+        and not url.startswith(base_url)
+    )
+
+
+def _scan(html):
+    """[(absolute offset, raw start tag, href)] of every <a>/<area> with an href"""
+    scanner = _AnchorScanner()
+    scanner.feed(html)
+    scanner.close()
+    line_starts = [0]
+    for line in html.split('\n')[:-1]:
+        line_starts.append(line_starts[-1] + len(line) + 1)
+    return [
+        (line_starts[line - 1] + column, raw, href)
+        for (line, column), raw, href in scanner.anchors
+    ]
+
+
+def ensure_links(campaign, urls):
+    """
+    EmailLink tracking token for each url of `campaign`, creating the
+    missing rows with one bulk insert
+
+    Returns:
+        dict: url -> link tracking_token
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    tokens = dict(
+        EmailLink.objects.filter(campaign=campaign, original_url__in=urls).values_list('original_url', 'tracking_token')
+    )
+    missing = [url for url in urls if url not in tokens]
+    if missing:
+        # ignore_conflicts: a concurrent render may have created some already
+        EmailLink.objects.bulk_create(
+            [
+                EmailLink(campaign=campaign, original_url=url, tracking_token=EmailLink.generate_token(campaign.pk, url))
+                for url in missing
+            ],
+            ignore_conflicts=True,
+        )
+        tokens.update(
+            EmailLink.objects.filter(campaign=campaign, original_url__in=missing)
+            .values_list('original_url', 'tracking_token')
+        )
+    return tokens
+
+
+def _url(base_url, name, *args):
+    path = reverse(f'tracking:{name}', args=[*args, _SENTINEL])
+    return base_url + path.replace(_SENTINEL, _SLOT)
+
+
+def prepare_tracked_html(campaign, html, base_url=None):
+    """
+    `html` with tracked links, unsubscribe links and open pixel, the
+    recipient token left as the {{__tracking_token}} placeholder
+
+    Args:
+        campaign: EmailCampaign the links belong to
+        html: Campaign body (may contain {{variables}})
+        base_url: Absolute tracking base (default: CAMPAIGN_TRACKING_URL)
+
+    Returns:
+        str: Template HTML for compile_template()
+    """
+    base_url = tracking_base_url() if base_url is None else base_url.rstrip('/')
+    if not html or not base_url:
+        return html
+
+    if campaign.track_clicks:
+        anchors = [anchor for anchor in _scan(html) if _is_trackable(anchor[2], base_url)]
+        link_tokens = ensure_links(campaign, [href for _offset, _raw, href in anchors])
+        parts, position = [], 0
+        for offset, raw, href in anchors:
+            redirect = _url(base_url, 'track_link_click', link_tokens[href])
+            parts.append(html[position:offset])
+            parts.append(HREF_RE.sub(lambda match: f'{match.group(1)}"{redirect}"', raw, count=1))
+            position = offset + len(raw)
+        parts.append(html[position:])
+        html = ''.join(parts)
+
+    html = html.replace('{{unsubscribe_url}}', _url(base_url, 'unsubscribe'))
+
+    if campaign.track_opens:
+        pixel = (
+            f'<img src="{_url(base_url, "track_email_open")}" width="1" height="1" alt="" '
+            f'style="display:block;width:1px;height:1px;border:0;" />'
+        )
+        closings = list(BODY_CLOSE_RE.finditer(html))
+        if closings:
+            at = closings[-1].start()
+            html = html[:at] + pixel + html[at:]
+        else:
+            html += pixel
+    return html
@@ -9,22 +9,23 @@ Full integration with MailerLite API v2 for:
 - Stats synchronization
 """
 
-import json
-import urllib.request
-import urllib.error
+import requests
 from django.conf import settings
 from django.utils import timezone
 
+from makeplus_api.outbound_http import get_http_client
+
 
 class MailerLiteClient:
     """MailerLite API v2 Client"""
     
     BASE_URL = "https://connect.mailerlite.com/api"
     
-    def __init__(self, api_token=None):
+    def __init__(self, api_token=None, http=None):
         self.api_token = api_token or getattr(settings, 'MAILERLITE_API_TOKEN', '')
         if not self.api_token:
             raise ValueError("MailerLite API token not configured")
+        self.http = http or get_http_client()
     
     def _make_request(self, method, endpoint, data=None):
         """Make HTTP request to MailerLite API"""
@@ -36,28 +37,24 @@ class MailerLiteClient:
             'Accept': 'application/json'
         }
         
-        body = json.dumps(data).encode('utf-8') if data else None
-        
         try:
-            req = urllib.request.Request(url, data=body, headers=headers, method=method)
-            
-            with urllib.request.urlopen(req, timeout=60) as response:
-                response_data = response.read().decode('utf-8')
-                if response_data:
-                    return {'success': True, 'data': json.loads(response_data), 'status': response.status}
-                return {'success': True, 'data': {}, 'status': response.status}
-                
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode('utf-8') if e.fp else str(e)
-            try:
-                error_json = json.loads(error_body)
-            except:
-                error_json = {'message': error_body}
-            return {'success': False, 'error': error_json, 'status': e.code}
-        except urllib.error.URLError as e:
-            return {'success': False, 'error': {'message': str(e.reason)}, 'status': 0}
-        except Exception as e:
+            response = self.http.request(
+                method, url, json=data if data else None, headers=headers, timeout=(5, 60),
+            )
+        except requests.RequestException as e:
             return {'success': False, 'error': {'message': str(e)}, 'status': 0}
+        
+        if response.status_code >= 400:
+            try:
+                error_json = response.json()
+            except ValueError:
+                error_json = {'message': response.text}
+            return {'success': False, 'error': error_json, 'status': response.status_code}
+        
+        try:
+            return {'success': True, 'data': response.json() if response.content else {}, 'status': response.status_code}
+        except ValueError as e:
+            return {'success': False, 'error': {'message': str(e)}, 'status': response.status_code}
     
     # ==================== SUBSCRIBERS ====================
     
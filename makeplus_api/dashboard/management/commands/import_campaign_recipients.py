@@ -0,0 +1,56 @@
+"""
+Import campaign recipients from an "email,name" CSV file
+(dashboard/recipient_import.py), printing progress as chunks go in:
+
+    python manage.py import_campaign_recipients <campaign id> addresses.csv
+
+For lists too large to upload through the campaign page.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.models_email import EmailCampaign
+from dashboard.recipient_import import IMPORT_CHUNK_SIZE, import_recipients, iter_csv_rows
+
+
+class Command(BaseCommand):
+    help = 'Import campaign recipients from an "email,name" CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_id', help='EmailCampaign id')
+        parser.add_argument('csv_path', help='CSV file, one "email,name" row per recipient')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help=f'Rows per duplicate check and bulk insert (default: {IMPORT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            campaign = EmailCampaign.objects.get(pk=options['campaign_id'])
+        except (EmailCampaign.DoesNotExist, ValueError):
+            raise CommandError(f"Campaign {options['campaign_id']} not found")
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.processed} rows: {report.added} added, "
+                f"{report.duplicates} duplicates, {report.rejected_count} rejected"
+            )
+
+        try:
+            with open(options['csv_path'], 'rb') as csv_file:
+                report = import_recipients(
+                    campaign, iter_csv_rows(csv_file), chunk_size=options['chunk_size'], on_progress=progress,
+                )
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['csv_path']}: {e}")
+
+        for label, value, reason in report.rejected:
+            self.stdout.write(self.style.WARNING(f"Rejected {label}: {value!r} ({reason})"))
+        if report.rejected_count > len(report.rejected):
+            self.stdout.write(self.style.WARNING(f"... and {report.rejected_count - len(report.rejected)} more"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {report.added} recipient(s) to « {campaign.name} » "
+            f"({report.duplicates} duplicates, {report.rejected_count} rejected); "
+            f"{campaign.recipient_count} in total"
+        ))
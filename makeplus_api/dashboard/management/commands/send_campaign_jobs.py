@@ -0,0 +1,64 @@
+"""
+Worker for the campaign send queue (dashboard/campaign_delivery.py).
+
+Claims queued CampaignSendJobs one at a time and delivers them. Run one
+or more of these next to gunicorn:
+
+    python manage.py send_campaign_jobs
+
+or from cron with --once, which drains the queue and exits.
+"""
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from dashboard.campaign_delivery import claim_next_job, release_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued email campaigns (background worker for campaign_send)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling for new jobs',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the queue is empty (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Campaign send worker {worker} started")
+
+        job = None
+        try:
+            while True:
+                close_old_connections()
+                job = claim_next_job(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f"Sending '{job.campaign.name}' (job {job.pk}, {job.total} recipients)")
+                run_job(job)
+                job.refresh_from_db()
+                style = self.style.SUCCESS if job.status == 'completed' else self.style.WARNING
+                self.stdout.write(style(
+                    f"Job {job.pk} {job.status}: {job.sent_count} sent, {job.failed_count} failed"
+                    + (f" -- {job.last_error}" if job.last_error and job.status != 'completed' else '')
+                ))
+                job = None
+        except KeyboardInterrupt:
+            if job is not None:
+                release_job(job)
+            self.stdout.write(self.style.WARNING('Stopped; unfinished jobs resume on the next run'))
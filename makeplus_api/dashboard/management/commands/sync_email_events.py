@@ -0,0 +1,49 @@
+"""
+Fold new email events into campaign statistics: Brevo events
+(dashboard/brevo_sync.py) and our own open/click hits
+(dashboard/tracking_rollup.py).
+
+The webhook and the tracking endpoints only append; run this every minute
+or so from cron to update recipient, link and campaign counters:
+
+    python manage.py sync_email_events
+
+--pull first reads the Brevo events API from the stored cursor, for
+deployments without the webhook or to catch up after an outage.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.brevo_sync import AGGREGATE_BATCH_SIZE, aggregate_events, pull_brevo_events
+from dashboard.tracking_rollup import rollup_tracking_hits
+
+
+class Command(BaseCommand):
+    help = 'Fold new Brevo events and open/click hits into campaign statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pull',
+            action='store_true',
+            help='Fetch events newer than the cursor from the Brevo API first',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=AGGREGATE_BATCH_SIZE,
+            help=f'Events/hits folded per transaction (default: {AGGREGATE_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['pull']:
+            try:
+                pulled = pull_brevo_events()
+            except Exception as e:
+                raise CommandError(f"Brevo event pull failed: {e}")
+            self.stdout.write(f"Fetched {pulled['fetched']} events from Brevo, {pulled['stored']} new")
+
+        hits = rollup_tracking_hits(batch_size=options['batch_size'])
+        result = aggregate_events(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {hits['opens']} opens and {hits['clicks']} clicks; "
+            f"folded {result['events']} Brevo events into {len(result['campaigns'])} campaign(s)"
+        ))
@@ -0,0 +1,75 @@
+"""
+Add CampaignSendJob: the DB-backed queue campaign_send enqueues into and
+the send_campaign_jobs worker drains (dashboard/campaign_delivery.py),
+instead of sending the whole campaign inside the HTTP request.
+
+Follows the idempotent SeparateDatabaseAndState pattern established in
+this app (0026+, 0029): this production database has repeatedly lost its
+django_migrations bookkeeping between deploys, so a plain CreateModel can
+crash with "relation already exists" on a re-run even though the table is
+already correctly in place.
+"""
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _table_names(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        return set(schema_editor.connection.introspection.table_names(cursor))
+
+
+def create_schema(apps, schema_editor):
+    from dashboard.models_email import CampaignSendJob
+
+    if 'dashboard_campaignsendjob' not in _table_names(schema_editor):
+        schema_editor.create_model(CampaignSendJob)
+
+
+def reverse_noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0043_registrationorder_payment_link_sent_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='CampaignSendJob',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('mode', models.CharField(choices=[('transactional', 'Transactional API'), ('campaign_api', 'Campaign API')], default='transactional', max_length=20)),
+                        ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('paused', 'Paused'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=20)),
+                        ('total', models.IntegerField(default=0)),
+                        ('sent_count', models.IntegerField(default=0)),
+                        ('failed_count', models.IntegerField(default=0)),
+                        ('last_error', models.TextField(blank=True)),
+                        ('worker', models.CharField(blank=True, max_length=100)),
+                        ('attempts', models.IntegerField(default=0)),
+                        ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                        ('started_at', models.DateTimeField(blank=True, null=True)),
+                        ('finished_at', models.DateTimeField(blank=True, null=True)),
+                        ('created_at', models.DateTimeField(auto_now_add=True)),
+                        ('updated_at', models.DateTimeField(auto_now=True)),
+                        ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='send_jobs', to='dashboard.emailcampaign')),
+                        ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='campaign_send_jobs', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'verbose_name': 'Campaign Send Job',
+                        'verbose_name_plural': 'Campaign Send Jobs',
+                        'ordering': ['created_at'],
+                        'indexes': [models.Index(fields=['status', 'created_at'], name='dashboard_c_status_76be2f_idx')],
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_schema, reverse_noop),
+            ],
+        ),
+    ]
@@ -0,0 +1,80 @@
+"""
+Add BrevoEmailEvent (append-only log of Brevo webhook/API events) and
+EmailEventCursor (high-water marks for the event pull and aggregator),
+which replace the full per-recipient resync in dashboard/brevo_sync.py.
+
+Follows the idempotent SeparateDatabaseAndState pattern established in
+this app (0026+, 0029, 0044): this production database has repeatedly
+lost its django_migrations bookkeeping between deploys, so a plain
+CreateModel can crash with "relation already exists" on a re-run.
+"""
+from django.db import migrations, models
+
+
+def _table_names(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        return set(schema_editor.connection.introspection.table_names(cursor))
+
+
+def create_schema(apps, schema_editor):
+    from dashboard.models_email import BrevoEmailEvent, EmailEventCursor
+
+    existing = _table_names(schema_editor)
+    for model in (BrevoEmailEvent, EmailEventCursor):
+        if model._meta.db_table not in existing:
+            schema_editor.create_model(model)
+
+
+def reverse_noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0044_campaignsendjob'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='BrevoEmailEvent',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('event_key', models.CharField(max_length=64, unique=True)),
+                        ('event', models.CharField(choices=[('delivered', 'Delivered'), ('opened', 'Opened'), ('clicked', 'Clicked'), ('hard_bounce', 'Hard bounce'), ('soft_bounce', 'Soft bounce'), ('blocked', 'Blocked'), ('spam', 'Spam complaint'), ('unsubscribed', 'Unsubscribed')], max_length=20)),
+                        ('email', models.EmailField(max_length=200)),
+                        ('message_id', models.CharField(blank=True, db_index=True, max_length=200)),
+                        ('link', models.TextField(blank=True)),
+                        ('occurred_at', models.DateTimeField()),
+                        ('source', models.CharField(choices=[('webhook', 'Webhook'), ('api', 'Events API')], max_length=10)),
+                        ('payload', models.JSONField(blank=True, default=dict)),
+                        ('received_at', models.DateTimeField(auto_now_add=True)),
+                    ],
+                    options={
+                        'verbose_name': 'Brevo Email Event',
+                        'verbose_name_plural': 'Brevo Email Events',
+                        'ordering': ['id'],
+                    },
+                ),
+                migrations.CreateModel(
+                    name='EmailEventCursor',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('name', models.CharField(max_length=50, unique=True)),
+                        ('position', models.BigIntegerField(default=0)),
+                        ('synced_at', models.DateTimeField(blank=True, null=True)),
+                        ('updated_at', models.DateTimeField(auto_now=True)),
+                    ],
+                    options={
+                        'verbose_name': 'Email Event Cursor',
+                        'verbose_name_plural': 'Email Event Cursors',
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_schema, reverse_noop),
+            ],
+        ),
+    ]
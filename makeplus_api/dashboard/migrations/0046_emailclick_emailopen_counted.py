@@ -0,0 +1,83 @@
+"""
+Add EmailOpen.counted / EmailClick.counted and a partial index on the
+uncounted rows: the tracking endpoints now only append hits and
+dashboard/tracking_rollup.py folds them into the counters later. Hits
+that already exist were counted by the old inline save() path, so they
+are marked counted when the column is added.
+
+Follows the idempotent SeparateDatabaseAndState pattern established in
+this app (0026+, 0043): this production database has repeatedly lost its
+django_migrations bookkeeping between deploys, so a plain AddField can
+crash with "column already exists" on a re-run.
+"""
+from django.db import migrations, models
+
+
+def _columns(schema_editor, table):
+    with schema_editor.connection.cursor() as cursor:
+        return {
+            col.name for col in
+            schema_editor.connection.introspection.get_table_description(cursor, table)
+        }
+
+
+def _index_names(schema_editor, table):
+    with schema_editor.connection.cursor() as cursor:
+        return set(schema_editor.connection.introspection.get_constraints(cursor, table).keys())
+
+
+def add_columns(apps, schema_editor):
+    from dashboard.models_email import EmailClick, EmailOpen
+
+    for model, date_field, index_name in (
+        (EmailOpen, 'opened_at', 'emailopen_uncounted_idx'),
+        (EmailClick, 'clicked_at', 'emailclick_uncounted_idx'),
+    ):
+        table = model._meta.db_table
+        if 'counted' not in _columns(schema_editor, table):
+            schema_editor.add_field(model, model._meta.get_field('counted'))
+            model.objects.using(schema_editor.connection.alias).update(counted=True)
+        if index_name not in _index_names(schema_editor, table):
+            schema_editor.add_index(
+                model,
+                models.Index(fields=[date_field], condition=models.Q(counted=False), name=index_name),
+            )
+
+
+def reverse_noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0045_brevoemailevent_emaileventcursor'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='emailclick',
+                    name='counted',
+                    field=models.BooleanField(default=False),
+                ),
+                migrations.AddField(
+                    model_name='emailopen',
+                    name='counted',
+                    field=models.BooleanField(default=False),
+                ),
+                migrations.AddIndex(
+                    model_name='emailclick',
+                    index=models.Index(condition=models.Q(('counted', False)), fields=['clicked_at'], name='emailclick_uncounted_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='emailopen',
+                    index=models.Index(condition=models.Q(('counted', False)), fields=['opened_at'], name='emailopen_uncounted_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_columns, reverse_noop),
+            ],
+        ),
+    ]
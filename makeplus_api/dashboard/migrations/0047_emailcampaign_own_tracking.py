@@ -0,0 +1,59 @@
+"""
+Add EmailCampaign.own_open_tracking / own_click_tracking: set by the send
+worker when a campaign's mail carries our own pixel and click redirects,
+so the Brevo event aggregator leaves those opens/clicks to
+tracking_rollup instead of counting them a second time.
+
+Follows the idempotent SeparateDatabaseAndState pattern established in
+this app (0026+, 0043, 0046).
+"""
+from django.db import migrations, models
+
+
+def _columns(schema_editor, table):
+    with schema_editor.connection.cursor() as cursor:
+        return {
+            col.name for col in
+            schema_editor.connection.introspection.get_table_description(cursor, table)
+        }
+
+
+def add_columns(apps, schema_editor):
+    from dashboard.models_email import EmailCampaign
+
+    table = EmailCampaign._meta.db_table
+    existing = _columns(schema_editor, table)
+    for name in ('own_open_tracking', 'own_click_tracking'):
+        if name not in existing:
+            schema_editor.add_field(EmailCampaign, EmailCampaign._meta.get_field(name))
+
+
+def reverse_noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0046_emailclick_emailopen_counted'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='emailcampaign',
+                    name='own_open_tracking',
+                    field=models.BooleanField(default=False, help_text='Opens counted from our own pixel'),
+                ),
+                migrations.AddField(
+                    model_name='emailcampaign',
+                    name='own_click_tracking',
+                    field=models.BooleanField(default=False, help_text='Clicks counted from our own redirects'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_columns, reverse_noop),
+            ],
+        ),
+    ]
@@ -231,6 +231,10 @@ class EmailCampaign(models.Model):
     # Tracking
     track_opens = models.BooleanField(default=True, help_text="Track email opens")
     track_clicks = models.BooleanField(default=True, help_text="Track link clicks")
+    # Set by the send worker when the mail carried our own pixel / click
+    # redirects (campaign_html); Brevo's open/click events are then ignored
+    own_open_tracking = models.BooleanField(default=False, help_text="Opens counted from our own pixel")
+    own_click_tracking = models.BooleanField(default=False, help_text="Clicks counted from our own redirects")
     
     # Recipients
     recipient_count = models.IntegerField(default=0)
@@ -349,36 +353,134 @@ class EmailRecipient(models.Model):
             data = f"{self.campaign.id}{self.email}{timezone.now().isoformat()}"
             self.tracking_token = hashlib.sha256(data.encode()).hexdigest()
         super().save(*args, **kwargs)
-    
-    def record_open(self, user_agent='', ip_address=None):
-        """Record an email open"""
-        now = timezone.now()
-        if not self.first_opened_at:
-            self.first_opened_at = now
-            # Update campaign unique opens
-            self.campaign.unique_opens += 1
-            self.campaign.save(update_fields=['unique_opens'])
-        
-        self.last_opened_at = now
-        self.open_count += 1
-        self.opens_count += 1
-        self.user_agent = user_agent
-        self.ip_address = ip_address
-        self.save(update_fields=['first_opened_at', 'last_opened_at', 'open_count', 'opens_count', 'user_agent', 'ip_address'])
-        
-        # Update campaign total opens
-        self.campaign.total_opened += 1
-        self.campaign.save(update_fields=['total_opened'])
-    
-    def record_click(self, link_url):
-        """Record a link click"""
-        if not self.first_opened_at:
-            # First click also counts as open
-            self.record_open()
-        
-        self.click_count += 1
-        self.clicks_count += 1
-        self.save(update_fields=['click_count', 'clicks_count'])
+
+
+class CampaignSendJob(models.Model):
+    """Queued delivery of a campaign, run by the send_campaign_jobs worker"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('paused', 'Paused'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    MODE_CHOICES = [
+        ('transactional', 'Transactional API'),
+        ('campaign_api', 'Campaign API'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    campaign = models.ForeignKey(EmailCampaign, on_delete=models.CASCADE, related_name='send_jobs')
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='transactional')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+
+    # Progress (recipients), updated once per batch by the worker
+    total = models.IntegerField(default=0)
+    sent_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    # Worker lease: a running job whose heartbeat goes stale is picked up again
+    worker = models.CharField(max_length=100, blank=True)
+    attempts = models.IntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='campaign_send_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Campaign Send Job'
+        verbose_name_plural = 'Campaign Send Jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign.name} - {self.status} ({self.sent_count + self.failed_count}/{self.total})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def get_progress(self):
+        """Progress payload for the live progress endpoint"""
+        done = self.sent_count + self.failed_count
+        return {
+            'job_id': self.pk,
+            'status': self.status,
+            'mode': self.mode,
+            'total': self.total,
+            'sent': self.sent_count,
+            'failed': self.failed_count,
+            'remaining': max(self.total - done, 0),
+            'percent': round(done * 100 / self.total, 1) if self.total else 100.0,
+            'last_error': self.last_error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class BrevoEmailEvent(models.Model):
+    """
+    Append-only log of Brevo email events (webhook pushes and API pulls),
+    folded into recipient/campaign counters by dashboard/brevo_sync.py
+    """
+    EVENT_CHOICES = [
+        ('delivered', 'Delivered'),
+        ('opened', 'Opened'),
+        ('clicked', 'Clicked'),
+        ('hard_bounce', 'Hard bounce'),
+        ('soft_bounce', 'Soft bounce'),
+        ('blocked', 'Blocked'),
+        ('spam', 'Spam complaint'),
+        ('unsubscribed', 'Unsubscribed'),
+    ]
+    SOURCE_CHOICES = [
+        ('webhook', 'Webhook'),
+        ('api', 'Events API'),
+    ]
+
+    # Brevo has no event ID shared by webhooks and the events API: the key
+    # is a hash of message ID, email, event type, second and link
+    event_key = models.CharField(max_length=64, unique=True)
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    email = models.EmailField(max_length=200)
+    message_id = models.CharField(max_length=200, blank=True, db_index=True)
+    link = models.TextField(blank=True)
+    occurred_at = models.DateTimeField()
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    payload = models.JSONField(default=dict, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Brevo Email Event'
+        verbose_name_plural = 'Brevo Email Events'
+
+    def __str__(self):
+        return f"{self.email} {self.event} at {self.occurred_at}"
+
+
+class EmailEventCursor(models.Model):
+    """Named high-water mark for the Brevo event pull and aggregator"""
+    name = models.CharField(max_length=50, unique=True)
+    # Last BrevoEmailEvent.id folded into the counters (aggregator)
+    position = models.BigIntegerField(default=0)
+    # Time the events API was last read up to (pull)
+    synced_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Email Event Cursor'
+        verbose_name_plural = 'Email Event Cursors'
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
 
 
 class EmailLink(models.Model):
@@ -407,11 +509,16 @@ class EmailLink(models.Model):
     def __str__(self):
         return f"{self.original_url[:50]} ({self.total_clicks} clicks)"
     
+    @staticmethod
+    def generate_token(campaign_id, original_url):
+        """Unique tracking token for a link (also used for bulk-created links)"""
+        data = f"{campaign_id}{original_url}{timezone.now().isoformat()}"
+        return hashlib.sha256(data.encode()).hexdigest()[:32]
+    
     def save(self, *args, **kwargs):
         if not self.tracking_token:
             # Generate unique tracking token for link
-            data = f"{self.campaign.id}{self.original_url}{timezone.now().isoformat()}"
-            self.tracking_token = hashlib.sha256(data.encode()).hexdigest()[:32]
+            self.tracking_token = self.generate_token(self.campaign_id, self.original_url)
         super().save(*args, **kwargs)
     
     def get_click_rate(self):
@@ -433,6 +540,9 @@ class EmailClick(models.Model):
     user_agent = models.TextField(blank=True)
     referer = models.TextField(blank=True)
     
+    # Folded into the link/recipient/campaign counters (tracking_rollup.py)
+    counted = models.BooleanField(default=False)
+    
     class Meta:
         ordering = ['-clicked_at']
         verbose_name = 'Email Click'
@@ -440,34 +550,11 @@ class EmailClick(models.Model):
         indexes = [
             models.Index(fields=['recipient', 'link']),
             models.Index(fields=['clicked_at']),
+            models.Index(fields=['clicked_at'], condition=models.Q(counted=False), name='emailclick_uncounted_idx'),
         ]
     
     def __str__(self):
         return f"{self.recipient.email} clicked {self.link.original_url[:50]}"
-    
-    def save(self, *args, **kwargs):
-        # Check if this is a new record by seeing if it exists in the database
-        is_new = not EmailClick.objects.filter(pk=self.pk).exists()
-        super().save(*args, **kwargs)
-        
-        if is_new:
-            # Update link statistics
-            self.link.total_clicks += 1
-            # Check if this is first click from this recipient for this link
-            if not EmailClick.objects.filter(recipient=self.recipient, link=self.link).exclude(pk=self.pk).exists():
-                self.link.unique_clicks += 1
-            self.link.save(update_fields=['total_clicks', 'unique_clicks'])
-            
-            # Update recipient click count
-            self.recipient.record_click(self.link.original_url)
-            
-            # Update campaign statistics
-            campaign = self.recipient.campaign
-            campaign.total_clicked += 1
-            # Check if this is first click from this recipient in campaign
-            if self.recipient.click_count == 1:
-                campaign.unique_clicks += 1
-            campaign.save(update_fields=['total_clicked', 'unique_clicks'])
 
 
 class EmailOpen(models.Model):
@@ -479,12 +566,16 @@ class EmailOpen(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     
+    # Folded into the recipient/campaign counters (tracking_rollup.py)
+    counted = models.BooleanField(default=False)
+    
     class Meta:
         ordering = ['-opened_at']
         verbose_name = 'Email Open'
         verbose_name_plural = 'Email Opens'
         indexes = [
             models.Index(fields=['recipient', 'opened_at']),
+            models.Index(fields=['opened_at'], condition=models.Q(counted=False), name='emailopen_uncounted_idx'),
         ]
     
     def __str__(self):
@@ -2,7 +2,7 @@ from datetime import timedelta
 
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
@@ -1339,6 +1339,28 @@ class EventOwnerSubmissionsTests(TestCase):
         self.client.post(reverse('dashboard:registration_delete', args=[order.id]), {'confirm_paid': '1'})
         self.assertFalse(RegistrationOrder.objects.filter(id=order.id).exists())
 
+    def test_delete_confirmed_revokes_paid_items_from_entitlement(self):
+        """The refunded items must leave the scan index even when a duplicate
+        order keeps the participant registered for the event."""
+        from caisse.models import ParticipantEntitlement
+
+        order, participant, _user, session = self._create_order_with_participant()
+        RegistrationOrder.objects.create(
+            event=self.event, participant=participant, full_name='Real Participant', email='p1@example.com',
+            items_snapshot=[], total_before_reduction=Decimal('0'), total_after_reduction=Decimal('0'),
+        )
+        self.client.force_login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('dashboard:registration_status_save', args=[order.id]), {'status': 'approved'})
+        entitlement = ParticipantEntitlement.objects.get(participant=participant, event=self.event)
+        self.assertIn(str(session.id), [item['id'] for item in entitlement.paid_items])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('dashboard:registration_delete', args=[order.id]), {'confirm_paid': '1'})
+        entitlement.refresh_from_db()
+        self.assertEqual(entitlement.paid_items, [])
+        self.assertTrue(entitlement.is_registered)
+
     def test_stranger_cannot_change_status_or_delete(self):
         order, _participant, _user, _session = self._create_order_with_participant()
         self.client.force_login(self.stranger)
@@ -1788,3 +1810,993 @@ class RegistrationOrderBlocsEditTests(TestCase):
         self.order.refresh_from_db()
         item_ids = {it['id'] for it in self.order.items_snapshot}
         self.assertNotIn(self.lunch.id, item_ids)
+
+
+class DownloadQRCodeTests(TestCase):
+    def setUp(self):
+        self.staff_user = User.objects.create_user(username="qrstaff", password="testpass123", is_staff=True)
+        self.user = User.objects.create_user(username="qrguest", password="testpass123")
+        self.client.force_login(self.staff_user)
+
+    def test_download_has_etag_and_honours_if_none_match(self):
+        url = reverse('dashboard:download_qr_code', args=[self.user.id])
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response['ETag'])
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+
+class FakeBrevoClient:
+    """Records transactional sends; `errors` maps an address to exceptions to raise first."""
+
+    def __init__(self, errors=None, quota_after=None):
+        import threading
+        self.errors = errors or {}
+        self.quota_after = quota_after
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send_transactional_email(self, to_email, **kwargs):
+        from .brevo_client import BrevoAPIError
+        with self._lock:
+            if self.errors.get(to_email):
+                raise self.errors[to_email].pop(0)
+            if self.quota_after is not None and len(self.sent) >= self.quota_after:
+                raise BrevoAPIError('Brevo API error 402: not enough credits', status=402)
+            self.sent.append(to_email)
+        return {'messageId': f'<{to_email}>'}
+
+
+class CampaignDeliveryTests(TestCase):
+    def setUp(self):
+        from .models_email import EmailCampaign, EmailRecipient
+        self.staff = User.objects.create_user(username='mailer', password='pw', is_staff=True)
+        self.campaign = EmailCampaign.objects.create(
+            name='Relance', subject='Bonjour {{first_name}}', from_email='events@example.com',
+            body_html='<p>Salut {{email}}</p>', created_by=self.staff,
+        )
+        self.emails = [f'guest{i}@example.com' for i in range(5)]
+        for email in self.emails:
+            EmailRecipient.objects.create(campaign=self.campaign, email=email)
+
+    def _run(self, client):
+        from .campaign_delivery import TokenBucket, claim_next_job, run_job
+        job = claim_next_job('test-worker')
+        self.assertIsNotNone(job)
+        run_job(job, client=client, bucket=TokenBucket(1000, 1000), sleep=lambda seconds: None)
+        job.refresh_from_db()
+        self.campaign.refresh_from_db()
+        return job
+
+    def test_send_view_only_enqueues_the_campaign(self):
+        from .models_email import CampaignSendJob
+        self.client.force_login(self.staff)
+        url = reverse('dashboard:campaign_send', args=[self.campaign.id])
+
+        with patch('dashboard.brevo_client.BrevoClient.send_transactional_email') as send:
+            self.client.post(url)
+            self.client.post(url)
+        send.assert_not_called()
+
+        job = CampaignSendJob.objects.get(campaign=self.campaign)
+        self.assertEqual((job.status, job.total, job.mode), ('queued', 5, 'transactional'))
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'sending')
+        self.assertEqual(self.campaign.recipients.filter(status='pending').count(), 5)
+
+        progress = self.client.get(reverse('dashboard:campaign_send_progress', args=[self.campaign.id])).json()
+        self.assertEqual(progress['job']['remaining'], 5)
+        self.assertEqual(progress['job']['status'], 'queued')
+        detail = self.client.get(reverse('dashboard:campaign_detail', args=[self.campaign.id]))
+        self.assertContains(detail, 'id="sendProgressCard" data-active="1"')
+
+    @override_settings(CAMPAIGN_SEND_BATCH_SIZE=2, CAMPAIGN_SEND_THREADS=3, CAMPAIGN_SEND_VERSIONS_PER_CALL=1)
+    def test_worker_sends_every_recipient_and_completes(self):
+        from .campaign_delivery import enqueue_campaign
+        enqueue_campaign(self.campaign)
+        client = FakeBrevoClient()
+
+        job = self._run(client)
+
+        self.assertEqual(sorted(client.sent), self.emails)
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('completed', 5, 0))
+        self.assertEqual(self.campaign.status, 'sent')
+        self.assertEqual(self.campaign.total_sent, 5)
+        recipient = self.campaign.recipients.get(email='guest3@example.com')
+        self.assertEqual(recipient.status, 'sent')
+        self.assertEqual(recipient.external_id, '<guest3@example.com>')
+
+    @override_settings(CAMPAIGN_SEND_BATCH_SIZE=2, CAMPAIGN_SEND_THREADS=2, CAMPAIGN_SEND_MAX_RETRIES=2,
+                       CAMPAIGN_SEND_VERSIONS_PER_CALL=1)
+    def test_transient_errors_are_retried_and_permanent_ones_recorded(self):
+        from .brevo_client import BrevoAPIError
+        from .campaign_delivery import enqueue_campaign
+        enqueue_campaign(self.campaign)
+        client = FakeBrevoClient(errors={
+            'guest1@example.com': [BrevoAPIError('Brevo API error 503: busy', status=503),
+                                   BrevoAPIError('Request failed: timed out')],
+            'guest2@example.com': [BrevoAPIError('Brevo API error 400: invalid email', status=400)],
+        })
+
+        job = self._run(client)
+
+        self.assertIn('guest1@example.com', client.sent)
+        self.assertNotIn('guest2@example.com', client.sent)
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('completed', 4, 1))
+        failed = self.campaign.recipients.get(email='guest2@example.com')
+        self.assertEqual(failed.status, 'failed')
+        self.assertIn('invalid email', failed.error_message)
+        self.assertEqual(self.campaign.total_failed, 1)
+
+    @override_settings(CAMPAIGN_SEND_BATCH_SIZE=2, CAMPAIGN_SEND_THREADS=1, CAMPAIGN_SEND_VERSIONS_PER_CALL=1)
+    def test_quota_pauses_the_job_and_resume_picks_up_the_rest(self):
+        from .campaign_delivery import enqueue_campaign
+        enqueue_campaign(self.campaign)
+
+        job = self._run(FakeBrevoClient(quota_after=2))
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('paused', 2, 0))
+        self.assertIn('credits', job.last_error)
+        self.assertEqual(self.campaign.status, 'paused')
+        self.assertEqual(self.campaign.recipients.filter(status='pending').count(), 3)
+
+        resumed, created = enqueue_campaign(self.campaign)
+        self.assertFalse(created)
+        self.assertEqual(resumed.pk, job.pk)
+        client = FakeBrevoClient()
+        job = self._run(client)
+
+        self.assertEqual(len(client.sent), 3)
+        self.assertEqual((job.status, job.sent_count, job.total), ('completed', 5, 5))
+        self.assertEqual(self.campaign.status, 'sent')
+
+    def test_stale_running_job_is_reclaimed_once(self):
+        from .campaign_delivery import claim_next_job, enqueue_campaign
+        job, _ = enqueue_campaign(self.campaign)
+        self.assertEqual(claim_next_job('worker-a').worker, 'worker-a')
+        # Lease still fresh: nobody else may take it
+        self.assertIsNone(claim_next_job('worker-b'))
+
+        job.__class__.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        reclaimed = claim_next_job('worker-b')
+        self.assertEqual((reclaimed.pk, reclaimed.worker, reclaimed.attempts), (job.pk, 'worker-b', 2))
+        self.assertIsNone(claim_next_job('worker-c'))
+
+    def test_token_bucket_paces_sends_to_the_rate(self):
+        from .campaign_delivery import TokenBucket
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(6):
+            bucket.acquire()
+        # 2 tokens up front, then 4 more at 2/s
+        self.assertAlmostEqual(now[0], 2.0)
+
+
+class RecipientContextTests(TestCase):
+    def setUp(self):
+        from .models_form import FormConfiguration, FormSubmission
+        owner = User.objects.create_user(username='formowner', password='pw')
+        self.event = Event.objects.create(
+            name='Context Congress', start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=1), location='Oran',
+        )
+        form = FormConfiguration.objects.create(name='Inscription', slug='ctx-inscription', event=self.event, created_by=owner)
+        self.emails = []
+        for i in range(12):
+            email = f'Guest{i}@Example.com'
+            self.emails.append(email)
+            FormSubmission.objects.create(form=form, data={
+                'email': email.lower(), 'prenom': f'Prenom{i}', 'nom': f'Nom{i}', 'field_0': f'Hopital {i}',
+            })
+        user = User.objects.create_user(username='guest3', email='guest3@example.com', password='pw')
+        participant = Participant.objects.create(user=user, badge_id='BADGE-3')
+        ParticipantEventRegistration.objects.create(participant=participant, event=self.event, is_checked_in=True)
+        self.emails.append('nobody@example.com')
+
+    def test_contexts_for_a_whole_list_take_constant_queries(self):
+        from .utils_campaign import iter_recipient_contexts
+        with self.assertNumQueries(4):
+            contexts = list(iter_recipient_contexts(self.emails, self.event))
+
+        self.assertEqual(len(contexts), 13)
+        self.assertEqual(contexts[5]['first_name'], 'Prenom5')
+        self.assertEqual(contexts[5]['field_0'], 'Hopital 5')
+        self.assertEqual((contexts[3]['badge_id'], contexts[3]['is_checked_in']), ('BADGE-3', 'Yes'))
+        self.assertEqual((contexts[4]['badge_id'], contexts[4]['is_checked_in']), ('', 'No'))
+        self.assertEqual((contexts[12]['email'], contexts[12]['first_name']), ('nobody@example.com', ''))
+        self.assertEqual(contexts[0]['event_name'], 'Context Congress')
+
+    def test_chunks_are_resolved_lazily(self):
+        from .utils_campaign import iter_recipient_contexts
+        contexts = iter_recipient_contexts(self.emails, self.event, chunk_size=5)
+        with self.assertNumQueries(4):
+            first = next(contexts)
+        self.assertEqual(first['last_name'], 'Nom0')
+        # Next chunk: submissions + participants (no registration lookup
+        # when none of them has a participant profile)
+        with self.assertNumQueries(2):
+            for _ in range(5):
+                next(contexts)
+
+    def test_single_context_matches_the_bulk_one(self):
+        from .utils_campaign import build_recipient_context, iter_recipient_contexts
+        self.assertEqual(
+            build_recipient_context('guest3@example.com', self.event),
+            next(iter_recipient_contexts(['guest3@example.com'], self.event)),
+        )
+
+
+class CompiledTemplateTests(TestCase):
+    def test_render_matches_replace_semantics(self):
+        from .utils_campaign import compile_template
+        template = compile_template('Bonjour {{first_name}} {{last_name}}, {{ contact.FIRSTNAME }} {{missing}} {{badge_id}}!')
+        self.assertEqual(template.placeholders, ('first_name', 'last_name', 'missing', 'badge_id'))
+        self.assertEqual(
+            template.render({'first_name': 'Amina', 'last_name': None, 'badge_id': 0}),
+            'Bonjour Amina , {{ contact.FIRSTNAME }} {{missing}} !',
+        )
+        self.assertEqual(
+            template.render({'first_name': 'Amina', 'last_name': None, 'badge_id': 0}, blank_falsy=False),
+            'Bonjour Amina None, {{ contact.FIRSTNAME }} {{missing}} 0!',
+        )
+        self.assertIs(compile_template('Bonjour {{first_name}} {{last_name}}, {{ contact.FIRSTNAME }} {{missing}} {{badge_id}}!'), template)
+
+    def test_keys_with_spaces_are_placeholders(self):
+        from .utils_campaign import compile_template
+        template = compile_template('{{Nom complet}} / {{Ville natale}} / {{ contact.FIRSTNAME }}')
+        self.assertEqual(template.placeholders, ('Nom complet', 'Ville natale'))
+        self.assertEqual(
+            template.render({'Nom complet': 'Amina B'}),
+            'Amina B / {{Ville natale}} / {{ contact.FIRSTNAME }}',
+        )
+        self.assertEqual(template.unknown_placeholders({'Nom complet'}), ['Ville natale'])
+
+    def test_campaign_templates_report_unknown_variables_and_follow_revisions(self):
+        from .models_email import EmailCampaign
+        from .models_form import FormConfiguration
+        from .utils_campaign import campaign_templates
+        owner = User.objects.create_user(username='tplowner', password='pw')
+        event = Event.objects.create(
+            name='Tpl Congress', start_date=timezone.now(), end_date=timezone.now() + timedelta(days=1),
+        )
+        FormConfiguration.objects.create(
+            name='Form', slug='tpl-form', event=event, created_by=owner,
+            fields_config=[{'name': 'specialite', 'label': 'Spécialité', 'type': 'text'}],
+        )
+        campaign = EmailCampaign.objects.create(
+            name='Tpl', event=event, subject='{{event_name}} - {{prenom}}', from_email='a@example.com',
+            body_html='<p>{{specialite}} {{typo_name}} {{badge_id}}</p>',
+        )
+
+        templates = campaign_templates(campaign)
+        self.assertEqual(templates.unknown, ['typo_name'])
+        self.assertIs(campaign_templates(campaign), templates)
+        self.assertEqual(
+            templates.render({'event_name': 'Tpl Congress', 'prenom': 'Ali', 'specialite': 'Cardio', 'badge_id': 'B1'}),
+            ('Tpl Congress - Ali', '<p>Cardio {{typo_name}} B1</p>'),
+        )
+
+        campaign.body_html = '<p>{{specialite}}</p>'
+        campaign.save()
+        self.assertEqual(campaign_templates(campaign).unknown, [])
+
+
+class StubBrevoServer:
+    """Local HTTP server answering /smtp/email like Brevo; records every request body."""
+
+    def __init__(self, responses=None):
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.requests = []
+        self.peers = set()
+        self.responses = list(responses or [])
+        # Addresses answered with a 400, like Brevo does for an invalid one
+        self.rejected = set()
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with lock:
+                    status, payload = stub.responses.pop(0) if stub.responses else (201, None)
+                    versions = body.get('messageVersions') or [body]
+                    if stub.rejected & {version['to'][0]['email'] for version in versions}:
+                        status, payload = 400, {'code': 'invalid_parameter', 'message': 'email is not valid'}
+                    stub.requests.append((self.path, self.headers.get('api-key'), body, status))
+                    stub.peers.add(self.client_address)
+                if payload is None:
+                    payload = {'messageIds': [f"<{version['to'][0]['email']}>" for version in versions]}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class BrevoBatchSendTests(TestCase):
+    def setUp(self):
+        self.stub = StubBrevoServer()
+        self.addCleanup(self.stub.close)
+
+    def _client(self):
+        from .brevo_client import BrevoClient
+        return BrevoClient(api_key='test-key', base_url=self.stub.url)
+
+    def test_batch_call_sends_one_version_per_message(self):
+        messages = [
+            {'to_email': f'p{i}@example.com', 'to_name': f'P{i}', 'subject': f'Hi {i}', 'html_content': f'<p>{i}</p>'}
+            for i in range(3)
+        ]
+        message_ids = self._client().send_transactional_batch(messages, from_email='events@example.com')
+
+        self.assertEqual(message_ids, ['<p0@example.com>', '<p1@example.com>', '<p2@example.com>'])
+        self.assertEqual(len(self.stub.requests), 1)
+        path, api_key, body, _status = self.stub.requests[0]
+        self.assertEqual((path, api_key), ('/smtp/email', 'test-key'))
+        self.assertEqual(body['sender']['email'], 'events@example.com')
+        self.assertEqual(body['messageVersions'][2], {
+            'to': [{'email': 'p2@example.com', 'name': 'P2'}], 'subject': 'Hi 2', 'htmlContent': '<p>2</p>',
+        })
+
+    def test_send_batch_emails_reports_each_email(self):
+        self.stub.responses = [(400, {'message': 'invalid sender'})]
+        results = self._client().send_batch_emails([
+            {'to_email': 'a@example.com', 'subject': 'S', 'html_content': 'H', 'from_email': 'bad@example.com'},
+            {'to_email': 'b@example.com', 'subject': 'S', 'html_content': 'H', 'from_email': 'ok@example.com'},
+            {'to_email': 'c@example.com', 'subject': 'S', 'html_content': 'H', 'from_email': 'ok@example.com'},
+        ])
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertEqual([result['success'] for result in results], [False, True, True])
+        self.assertIn('invalid sender', results[0]['error'])
+        self.assertEqual(results[2]['message_id'], '<c@example.com>')
+
+    @override_settings(CAMPAIGN_SEND_BATCH_SIZE=120, CAMPAIGN_SEND_VERSIONS_PER_CALL=50, CAMPAIGN_SEND_THREADS=2)
+    def test_worker_sends_a_campaign_in_a_handful_of_calls(self):
+        from .campaign_delivery import TokenBucket, claim_next_job, enqueue_campaign, run_job
+        from .models_email import EmailCampaign, EmailRecipient
+        campaign = EmailCampaign.objects.create(
+            name='Batch', subject='Bonjour {{email}}', from_email='events@example.com', body_html='<p>{{email}}</p>',
+        )
+        EmailRecipient.objects.bulk_create([
+            EmailRecipient(campaign=campaign, email=f'guest{i}@example.com', tracking_token=f'token-{i}')
+            for i in range(130)
+        ])
+        self.stub.responses = [(503, {'message': 'busy'})]
+        enqueue_campaign(campaign)
+
+        job = claim_next_job('batch-worker')
+        run_job(job, client=self._client(), bucket=TokenBucket(1000, 1000), sleep=lambda seconds: None)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('completed', 130, 0))
+        # Batches of 120 + 10, in calls of at most 50 versions: 50, 50, 20,
+        # 10 -- 4 calls for 130 emails, plus the retried 503
+        self.assertEqual(len(self.stub.requests), 5)
+        recipient = campaign.recipients.get(email='guest77@example.com')
+        self.assertEqual(recipient.external_id, '<guest77@example.com>')
+        versions = [
+            version for _path, _key, body, status in self.stub.requests if status == 201
+            for version in body['messageVersions']
+        ]
+        self.assertEqual(len(versions), 130)
+        version = next(v for v in versions if v['to'][0]['email'] == recipient.email)
+        self.assertEqual(version['subject'], 'Bonjour guest77@example.com')
+
+
+    @override_settings(CAMPAIGN_SEND_VERSIONS_PER_CALL=4, CAMPAIGN_SEND_THREADS=1)
+    def test_rejected_chunk_is_split_until_only_the_bad_address_fails(self):
+        from .campaign_delivery import TokenBucket, claim_next_job, enqueue_campaign, run_job
+        from .models_email import EmailCampaign, EmailRecipient
+        campaign = EmailCampaign.objects.create(
+            name='Split', subject='S', from_email='events@example.com', body_html='<p>x</p>',
+        )
+        EmailRecipient.objects.bulk_create([
+            EmailRecipient(campaign=campaign, email=f'guest{i}@example.com', tracking_token=f'split-{i}')
+            for i in range(4)
+        ])
+        self.stub.rejected = {'guest2@example.com'}
+        enqueue_campaign(campaign)
+
+        job = claim_next_job('split-worker')
+        run_job(job, client=self._client(), bucket=TokenBucket(1000, 1000), sleep=lambda seconds: None)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('completed', 3, 1))
+        failed = campaign.recipients.get(status='failed')
+        self.assertEqual(failed.email, 'guest2@example.com')
+        self.assertIn('email is not valid', failed.error_message)
+        # 4 rejected, 0-1 sent, 2-3 rejected, then 2 and 3 alone
+        self.assertEqual([status for *_rest, status in self.stub.requests], [400, 201, 400, 400, 201])
+
+    def test_client_without_retries_leaves_429s_to_the_caller(self):
+        from .brevo_client import BrevoAPIError, BrevoClient
+        self.stub.responses = [(429, {'message': 'too many requests'})]
+        client = BrevoClient(api_key='test-key', base_url=self.stub.url, retries=0)
+        with self.assertRaises(BrevoAPIError) as raised:
+            client.send_transactional_email('a@example.com', 'A', 'S', 'H')
+        self.assertEqual(raised.exception.status, 429)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_short_message_ids_answer_is_an_error(self):
+        from .brevo_client import BrevoAPIError
+        self.stub.responses = [(201, {'messageIds': ['<p0@example.com>']})]
+        messages = [
+            {'to_email': f'p{i}@example.com', 'subject': 'S', 'html_content': 'H'} for i in range(2)
+        ]
+        with self.assertRaises(BrevoAPIError) as raised:
+            self._client().send_transactional_batch(messages)
+        self.assertEqual(raised.exception.status, 201)
+
+
+class FakeSession:
+    """Stands in for requests.Session: replays queued responses/exceptions, records calls."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        import requests
+        self.calls.append((method, url, timeout))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = b'{"ok": true}'
+        return response
+
+
+class OutboundHTTPClientTests(TestCase):
+    def _client(self, outcomes, **kwargs):
+        from makeplus_api.outbound_http import HTTPClient
+        self.sleeps = []
+        self.session = FakeSession(outcomes)
+        return HTTPClient(session=self.session, max_retries=2, backoff=1, sleep=self.sleeps.append, **kwargs)
+
+    def test_get_is_retried_on_5xx_with_backoff(self):
+        client = self._client([503, 502, 200])
+        response = client.get('https://api.example.com/ping')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.session.calls), 3)
+        self.assertEqual(len(self.sleeps), 2)
+        # Jittered between half and all of 1s, then 2s
+        self.assertTrue(0.5 <= self.sleeps[0] <= 1 and 1 <= self.sleeps[1] <= 2)
+
+    def test_post_is_retried_on_429_only(self):
+        client = self._client([500])
+        self.assertEqual(client.post('https://api.example.com/send').status_code, 500)
+        self.assertEqual(len(self.session.calls), 1)
+
+        client = self._client([(429, {'Retry-After': '3'}), 201])
+        self.assertEqual(client.post('https://api.example.com/send').status_code, 201)
+        self.assertEqual(self.sleeps, [3.0])
+
+    def test_network_errors_are_raised_once_retries_are_spent(self):
+        import requests
+        client = self._client([requests.ConnectionError('down')] * 3)
+        with self.assertRaises(requests.ConnectionError):
+            client.head('https://cdn.example.com/file.png')
+        self.assertEqual(len(self.session.calls), 3)
+
+        client = self._client([requests.ConnectionError('down')])
+        with self.assertRaises(requests.ConnectionError):
+            client.post('https://cdn.example.com/upload')
+        self.assertEqual(len(self.session.calls), 1)
+
+    def test_default_timeout_and_per_host_stats(self):
+        client = self._client([503, 200, 404], timeout=(1, 2))
+        client.get('https://a.example.com/x')
+        client.get('https://b.example.com/y', retries=0, timeout=(3, 4))
+
+        self.assertEqual([call[2] for call in self.session.calls], [(1, 2), (1, 2), (3, 4)])
+        hosts = client.stats()['hosts']
+        self.assertEqual(hosts['a.example.com']['requests'], 2)
+        self.assertEqual(hosts['a.example.com']['errors'], 1)
+        self.assertEqual(hosts['a.example.com']['retries'], 1)
+        self.assertEqual(hosts['a.example.com']['statuses'], {'200': 1, '503': 1})
+        self.assertEqual(hosts['b.example.com']['statuses'], {'404': 1})
+
+        client.reset()
+        self.assertEqual(client.stats()['hosts'], {})
+
+    def test_provider_clients_share_the_injected_client(self):
+        from .brevo_client import BrevoAPIError, BrevoClient
+        from .mailerlite_client import MailerLiteClient
+        client = self._client([(400, {}), 200])
+
+        with self.assertRaises(BrevoAPIError) as caught:
+            BrevoClient(api_key='k', base_url='https://brevo.test', http=client).get_account_info()
+        self.assertEqual(caught.exception.status, 400)
+        result = MailerLiteClient(api_token='t', http=client)._make_request('GET', '/groups')
+        self.assertEqual(result, {'success': True, 'data': {'ok': True}, 'status': 200})
+        self.assertEqual(set(client.stats()['hosts']), {'brevo.test', 'connect.mailerlite.com'})
+
+    def test_keep_alive_reuses_one_connection_against_a_local_server(self):
+        from makeplus_api.outbound_http import HTTPClient
+        from .brevo_client import BrevoClient
+        stub = StubBrevoServer()
+        self.addCleanup(stub.close)
+        brevo = BrevoClient(api_key='k', base_url=stub.url, http=HTTPClient())
+        for i in range(3):
+            brevo.send_transactional_email(f'p{i}@example.com', f'P{i}', 'S', 'H')
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual(len(stub.peers), 1)
+
+
+class FakeEventsClient:
+    """Brevo client stand-in for the events API: one page of `events`, records each call."""
+
+    def __init__(self, events):
+        self.events = events
+        self.calls = []
+
+    def get_email_events(self, **kwargs):
+        self.calls.append(kwargs)
+        return {'events': self.events if kwargs.get('offset', 0) == 0 else []}
+
+
+@override_settings(BREVO_WEBHOOK_TOKEN='hook-secret')
+class BrevoEventSyncTests(TestCase):
+    def setUp(self):
+        from .models_email import EmailCampaign, EmailRecipient
+        self.campaign = EmailCampaign.objects.create(
+            name='Stats', subject='S', from_email='events@example.com', body_html='<p>x</p>', status='sent',
+        )
+        self.alice = EmailRecipient.objects.create(
+            campaign=self.campaign, email='alice@example.com', status='sent', external_id='<m-alice>',
+        )
+        self.bob = EmailRecipient.objects.create(
+            campaign=self.campaign, email='bob@example.com', status='sent', external_id='<m-bob>',
+        )
+        self.url = reverse('tracking:brevo_webhook') + '?token=hook-secret'
+
+    def _webhook(self, event, email, message_id, ts, **extra):
+        return {'event': event, 'email': email, 'message-id': message_id, 'ts_event': ts, **extra}
+
+    def _post(self, payload, url=None):
+        import json
+        return self.client.post(url or self.url, data=json.dumps(payload), content_type='application/json')
+
+    def test_webhook_requires_token_and_stores_each_event_once(self):
+        from .models_email import BrevoEmailEvent
+        event = self._webhook('opened', 'alice@example.com', '<m-alice>', 1_700_000_000)
+
+        self.assertEqual(self._post(event, url=reverse('tracking:brevo_webhook')).status_code, 403)
+        self.assertEqual(self._post(event).json(), {'success': True, 'stored': 1})
+        # Redelivery, and a batched body carrying it again plus an untracked type
+        self.assertEqual(self._post(event).json()['stored'], 0)
+        self.assertEqual(self._post([event, self._webhook('request', 'alice@example.com', '<m-alice>', 1)]).json()['stored'], 0)
+        self.assertEqual(BrevoEmailEvent.objects.count(), 1)
+
+    def test_aggregator_folds_new_events_incrementally(self):
+        from .brevo_sync import aggregate_events
+        self._post([
+            self._webhook('delivered', 'alice@example.com', '<m-alice>', 1_700_000_000),
+            self._webhook('opened', 'alice@example.com', '<m-alice>', 1_700_000_100),
+            self._webhook('opened', 'alice@example.com', '<m-alice>', 1_700_000_200),
+            self._webhook('click', 'alice@example.com', '<m-alice>', 1_700_000_210, link='https://example.com'),
+            self._webhook('hard_bounce', 'bob@example.com', '<m-bob>', 1_700_000_000),
+            self._webhook('opened', 'stranger@example.com', '<other>', 1_700_000_000),
+        ])
+
+        # Just received: left for the next run unless the settle window is skipped
+        self.assertEqual(aggregate_events()['events'], 0)
+        result = aggregate_events(settle_seconds=0, match_grace_seconds=0)
+        self.assertEqual(result['events'], 6)
+        self.assertEqual(result['campaigns'][self.campaign.pk], {'opens': 2, 'clicks': 1, 'recipients': 2})
+
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.status, self.alice.open_count, self.alice.click_count), ('delivered', 2, 1))
+        self.assertEqual(int(self.alice.first_opened_at.timestamp()), 1_700_000_100)
+        self.assertEqual(int(self.alice.last_opened_at.timestamp()), 1_700_000_200)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.status, 'bounced')
+        self.campaign.refresh_from_db()
+        self.assertEqual(
+            (self.campaign.total_delivered, self.campaign.total_opened, self.campaign.unique_opens,
+             self.campaign.total_clicked, self.campaign.unique_clicks),
+            (1, 2, 1, 1, 1),
+        )
+
+        # Nothing new: the cursor holds; one more open only adds that open
+        self.assertEqual(aggregate_events(settle_seconds=0)['events'], 0)
+        self._post(self._webhook('opened', 'alice@example.com', '<m-alice>', 1_700_000_300))
+        aggregate_events(settle_seconds=0)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.total_opened, self.campaign.unique_opens), (3, 1))
+
+    def test_aggregator_waits_for_the_recipient_of_an_unmatched_event(self):
+        from .brevo_sync import aggregate_events
+        from .models_email import EmailRecipient
+        carol = EmailRecipient.objects.create(campaign=self.campaign, email='carol@example.com', status='sent')
+        self._post([
+            self._webhook('opened', 'alice@example.com', '<m-alice>', 1_700_000_100),
+            # Delivered before the worker stored carol's message ID
+            self._webhook('opened', 'carol@example.com', '<m-carol>', 1_700_000_100),
+            self._webhook('opened', 'bob@example.com', '<m-bob>', 1_700_000_100),
+        ])
+
+        self.assertEqual(aggregate_events(settle_seconds=0)['events'], 1)
+        carol.external_id = '<m-carol>'
+        carol.save()
+        self.assertEqual(aggregate_events(settle_seconds=0)['events'], 2)
+        carol.refresh_from_db()
+        self.assertEqual(carol.open_count, 1)
+
+    def test_open_seen_by_our_pixel_and_brevo_counts_once(self):
+        from .brevo_sync import aggregate_events
+        from .tracking_rollup import rollup_tracking_hits
+        self.campaign.own_open_tracking = True
+        self.campaign.own_click_tracking = True
+        self.campaign.save()
+
+        self.client.get(reverse('tracking:track_email_open', args=[self.alice.tracking_token]))
+        self._post([
+            self._webhook('delivered', 'alice@example.com', '<m-alice>', 1_700_000_000),
+            self._webhook('opened', 'alice@example.com', '<m-alice>', 1_700_000_100),
+            self._webhook('click', 'alice@example.com', '<m-alice>', 1_700_000_110, link='https://example.com'),
+        ])
+        rollup_tracking_hits()
+        aggregate_events(settle_seconds=0)
+
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.status, self.alice.open_count, self.alice.click_count), ('delivered', 1, 0))
+        self.campaign.refresh_from_db()
+        self.assertEqual(
+            (self.campaign.total_delivered, self.campaign.total_opened, self.campaign.unique_opens,
+             self.campaign.total_clicked),
+            (1, 1, 1, 0),
+        )
+
+    def test_manual_sync_pulls_from_the_cursor_and_skips_known_events(self):
+        from .brevo_sync import sync_campaign_stats_from_brevo
+        from .models_email import BrevoEmailEvent
+        self._post(self._webhook('opened', 'alice@example.com', '<m-alice>', 1_700_000_100))
+        api_events = [
+            # Same open as the webhook's, in the events API shape
+            {'event': 'opened', 'email': 'alice@example.com', 'messageId': '<m-alice>', 'date': '2023-11-14T22:15:00.000+00:00'},
+            {'event': 'clicks', 'email': 'bob@example.com', 'messageId': '<m-bob>', 'date': '2023-11-14T23:00:00+01:00', 'link': 'https://x.test'},
+        ]
+        client = FakeEventsClient(api_events)
+
+        with patch('dashboard.brevo_sync.get_brevo_client', return_value=client), \
+                patch('dashboard.brevo_sync.SETTLE_SECONDS', 0), patch('dashboard.brevo_sync.time.sleep'):
+            first = sync_campaign_stats_from_brevo(self.campaign)
+            second = sync_campaign_stats_from_brevo(self.campaign)
+
+        self.assertTrue(first['success'])
+        self.assertEqual((first['events_fetched'], first['events_new']), (2, 1))
+        self.assertEqual((first['opens'], first['clicks'], first['recipients_updated']), (1, 1, 2))
+        self.assertEqual((second['events_new'], second['opens'], second['clicks']), (0, 0, 0))
+        self.assertEqual(BrevoEmailEvent.objects.count(), 2)
+        # The first pull looks back a month; the second starts at the cursor
+        self.assertEqual(client.calls[0]['end_date'] - client.calls[0]['start_date'], timedelta(days=30))
+        self.assertEqual(client.calls[1]['start_date'], timezone.localdate())
+
+
+class TrackingRollupTests(TestCase):
+    def setUp(self):
+        from .models_email import EmailCampaign, EmailLink, EmailRecipient
+        from .tracking_cache import link_tokens, recipient_tokens
+        link_tokens.clear()
+        recipient_tokens.clear()
+        self.campaign = EmailCampaign.objects.create(
+            name='Pixel', subject='S', from_email='events@example.com', body_html='<p>x</p>', status='sent',
+        )
+        self.alice = EmailRecipient.objects.create(campaign=self.campaign, email='alice@example.com', status='sent')
+        self.bob = EmailRecipient.objects.create(campaign=self.campaign, email='bob@example.com', status='sent')
+        self.link = EmailLink.objects.create(campaign=self.campaign, original_url='https://example.com/programme')
+
+    def _open(self, recipient):
+        return self.client.get(reverse('tracking:track_email_open', args=[recipient.tracking_token]))
+
+    def _click(self, recipient):
+        return self.client.get(
+            reverse('tracking:track_link_click', args=[self.link.tracking_token, recipient.tracking_token])
+        )
+
+    def test_endpoints_only_append_hits(self):
+        from .models_email import EmailClick, EmailOpen
+        # Token lookup + insert; no counter is touched on the request path
+        with self.assertNumQueries(2):
+            response = self._open(self.alice)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        # Alice's token is cached by now: only the link lookup + insert
+        with self.assertNumQueries(2):
+            response = self._click(self.alice)
+        self.assertEqual(response['Location'], 'https://example.com/programme')
+        self.assertEqual(self._open(type('R', (), {'tracking_token': 'unknown'})).status_code, 200)
+
+        self.assertEqual(EmailOpen.objects.filter(counted=False).count(), 1)
+        self.assertEqual(EmailClick.objects.filter(counted=False).count(), 1)
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.open_count, self.alice.click_count), (0, 0))
+
+    def test_rollup_folds_hits_once_into_every_counter(self):
+        from .tracking_rollup import rollup_tracking_hits
+        for _ in range(3):
+            self._open(self.alice)
+        self._click(self.alice)
+        self._click(self.alice)
+        # Bob clicks with images blocked: the click counts as his open
+        self._click(self.bob)
+
+        self.assertEqual(rollup_tracking_hits(batch_size=2), {'opens': 3, 'clicks': 3})
+        self.assertEqual(rollup_tracking_hits(), {'opens': 0, 'clicks': 0})
+
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.open_count, self.alice.opens_count, self.alice.click_count), (3, 3, 2))
+        self.assertIsNotNone(self.alice.first_opened_at)
+        self.bob.refresh_from_db()
+        self.assertEqual((self.bob.open_count, self.bob.click_count), (1, 1))
+        self.link.refresh_from_db()
+        self.assertEqual((self.link.total_clicks, self.link.unique_clicks), (3, 2))
+        self.campaign.refresh_from_db()
+        self.assertEqual(
+            (self.campaign.total_opened, self.campaign.unique_opens,
+             self.campaign.total_clicked, self.campaign.unique_clicks),
+            (4, 2, 3, 2),
+        )
+
+        # A later click on the same link is not unique again
+        self._click(self.bob)
+        rollup_tracking_hits()
+        self.link.refresh_from_db()
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.link.total_clicks, self.link.unique_clicks), (4, 2))
+        self.assertEqual((self.campaign.total_opened, self.campaign.unique_clicks), (4, 2))
+
+
+@override_settings(CAMPAIGN_TRACKING_URL='https://events.example.com/')
+class CampaignHtmlTests(TestCase):
+    BODY = (
+        '<html><body>\n<p>Bonjour {{first_name}},</p>\n'
+        '<a class="btn" href="https://example.com/programme?a=1&amp;b=2" data-href="keep">Programme</a>\n'
+        "<a href='https://example.com/programme?a=1&amp;b=2'>Again</a> <a href=\"#top\">Top</a>\n"
+        '<a href="mailto:info@example.com">Mail</a> <a href="https://example.com/?u={{email}}">Perso</a>\n'
+        '<a href="{{unsubscribe_url}}">Se désinscrire</a>\n</body></html>'
+    )
+
+    def setUp(self):
+        from .models_email import EmailCampaign, EmailRecipient
+        self.campaign = EmailCampaign.objects.create(
+            name='Tracked', subject='Hi {{first_name}}', from_email='events@example.com', body_html=self.BODY,
+        )
+        self.recipient = EmailRecipient.objects.create(campaign=self.campaign, email='ana@example.com')
+
+    def test_links_become_tracked_slots_and_the_rest_is_untouched(self):
+        from .campaign_html import prepare_tracked_html
+        from .models_email import EmailLink
+
+        with self.assertNumQueries(3):  # existing links, bulk insert, tokens
+            html = prepare_tracked_html(self.campaign, self.BODY)
+        link = EmailLink.objects.get(campaign=self.campaign)
+        self.assertEqual(link.original_url, 'https://example.com/programme?a=1&b=2')
+
+        click = f'https://events.example.com/track/email/click/{link.tracking_token}/{{{{__tracking_token}}}}/'
+        self.assertEqual(html.count(click), 2)
+        self.assertIn(f'<a class="btn" href="{click}" data-href="keep">Programme</a>', html)
+        for kept in ('href="#top"', 'href="mailto:info@example.com"', 'href="https://example.com/?u={{email}}"', '{{first_name}}'):
+            self.assertIn(kept, html)
+        self.assertIn('href="https://events.example.com/track/email/unsubscribe/{{__tracking_token}}/"', html)
+        self.assertTrue(html.endswith(
+            '<img src="https://events.example.com/track/email/open/{{__tracking_token}}/" width="1" height="1" alt="" '
+            'style="display:block;width:1px;height:1px;border:0;" /></body></html>'
+        ))
+
+        # Links already created are reused, not duplicated
+        with self.assertNumQueries(1):
+            prepare_tracked_html(self.campaign, self.BODY)
+
+    def test_worker_messages_carry_the_recipient_token_and_record_own_tracking(self):
+        from .campaign_delivery import _record_tracking, build_message
+        _record_tracking(self.campaign)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.own_open_tracking, self.campaign.own_click_tracking), (True, True))
+
+        message = build_message(self.campaign, self.recipient, {'first_name': 'Ana', 'email': self.recipient.email})
+        self.assertIn('Bonjour Ana', message['html_content'])
+        self.assertNotIn('__tracking_token', message['html_content'])
+        self.assertIn(f'/track/email/open/{self.recipient.tracking_token}/', message['html_content'])
+
+        # The rendered redirect resolves to the original link
+        import re
+        path = re.search(r'https://events\.example\.com(/track/email/click/[^"]+)"', message['html_content']).group(1)
+        response = self.client.get(path)
+        self.assertEqual(response['Location'], 'https://example.com/programme?a=1&b=2')
+
+    @override_settings(CAMPAIGN_TRACKING_URL='')
+    def test_without_a_tracking_url_brevo_keeps_tracking(self):
+        from .campaign_delivery import _record_tracking, build_message
+        from .models_email import EmailLink
+        _record_tracking(self.campaign)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.own_open_tracking, self.campaign.own_click_tracking), (False, False))
+
+        message = build_message(self.campaign, self.recipient, {'first_name': 'Ana'})
+        self.assertIn('href="https://example.com/programme?a=1&amp;b=2"', message['html_content'])
+        self.assertFalse(EmailLink.objects.exists())
+
+
+class TrackingHotPathTests(TestCase):
+    def setUp(self):
+        from .models_email import EmailCampaign, EmailLink, EmailRecipient
+        from .tracking_cache import link_tokens, recipient_tokens
+        link_tokens.clear()
+        recipient_tokens.clear()
+        campaign = EmailCampaign.objects.create(
+            name='Hot', subject='S', from_email='events@example.com', body_html='<p>x</p>', status='sent',
+        )
+        self.recipient = EmailRecipient.objects.create(campaign=campaign, email='ana@example.com', status='sent')
+        self.link = EmailLink.objects.create(campaign=campaign, original_url='https://example.com/agenda')
+        self.click_url = reverse('tracking:track_link_click', args=[self.link.tracking_token, self.recipient.tracking_token])
+
+    def test_token_cache_is_an_lru_with_a_ttl(self):
+        from .tracking_cache import TokenCache
+        now = [0.0]
+        cache = TokenCache('test:', maxsize=2, ttl=10, clock=lambda: now[0])
+        loads = []
+
+        def loader(value):
+            return lambda: loads.append(value) or value
+
+        self.assertEqual(cache.get('a', loader('A')), 'A')
+        self.assertEqual(cache.get('a', loader('stale')), 'A')
+        cache.get('b', loader('B'))
+        cache.get('a', loader('A'))   # a is now the most recent
+        cache.get('c', loader('C'))   # evicts b
+        self.assertEqual(cache.get('b', loader('B2')), 'B2')
+        self.assertIsNone(cache.get('missing', loader(None)))
+        self.assertIsNone(cache.get('missing', loader(None)))   # unknown tokens are not cached
+        now[0] = 11
+        self.assertEqual(cache.get('c', loader('C2')), 'C2')   # expired
+        self.assertEqual(loads, ['A', 'B', 'C', 'B2', None, None, 'C2'])
+        self.assertEqual(cache.metrics()['hits'], 2)
+
+    def test_shared_django_cache_warms_other_processes(self):
+        from django.core.cache import cache as default_cache
+        from .tracking_cache import TokenCache
+        self.addCleanup(default_cache.clear)
+        first = TokenCache('test:shared:', alias='default')
+        second = TokenCache('test:shared:', alias='default')
+        first.get('tok', lambda: ('id', 'https://example.com'))
+        self.assertEqual(second.get('tok', lambda: self.fail('should come from the shared cache')), ('id', 'https://example.com'))
+        self.assertEqual(second.metrics()['shared_hits'], 1)
+
+    def test_warm_click_redirects_without_touching_the_database(self):
+        from .models_email import EmailClick
+        from .tracking_cache import hit_writer
+        self.client.get(self.click_url)   # warms both tokens
+
+        with patch.object(hit_writer, 'asynchronous', True), patch.object(hit_writer, '_ensure_started'):
+            with self.assertNumQueries(0):
+                response = self.client.get(self.click_url)
+            self.assertEqual(response['Location'], 'https://example.com/agenda')
+            self.assertEqual(EmailClick.objects.count(), 1)
+            hit_writer.flush()
+        self.assertEqual(EmailClick.objects.filter(recipient=self.recipient, link=self.link).count(), 2)
+
+    def test_failed_batch_keeps_the_valid_hits(self):
+        from .models_email import EmailOpen
+        from .tracking_cache import TrackingHitWriter
+        writer = TrackingHitWriter()
+        hits = [EmailOpen(recipient_id=self.recipient.pk), EmailOpen(recipient_id=self.recipient.pk)]
+        real_save = EmailOpen.save
+        calls = []
+
+        def flaky_save(hit, *args, **kwargs):
+            calls.append(hit)
+            if len(calls) == 2:
+                raise RuntimeError('recipient deleted')
+            return real_save(hit, *args, **kwargs)
+
+        with patch.object(EmailOpen.objects, 'bulk_create', side_effect=RuntimeError('batch failed')), \
+                patch.object(EmailOpen, 'save', flaky_save):
+            writer._write(hits)
+        self.assertEqual(EmailOpen.objects.count(), 1)
+        self.assertEqual((writer.metrics()['flushed_total'], writer.metrics()['failed_total']), (1, 1))
+
+
+class RecipientImportTests(TestCase):
+    def setUp(self):
+        from .models_email import EmailCampaign, EmailRecipient
+        self.campaign = EmailCampaign.objects.create(
+            name='Import', subject='S', from_email='events@example.com', body_html='<p>x</p>',
+        )
+        EmailRecipient.objects.create(campaign=self.campaign, email='Existing@Example.com')
+        self.user = User.objects.create_user(username='importer', password='pw', is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_chunks_dedupe_and_reject(self):
+        from .recipient_import import import_recipients, iter_text_rows
+        text = '\n'.join([
+            'ana@example.com,Ana',
+            ' ANA@example.com ,Ana again',
+            'existing@example.com,Already there',
+            'not-an-email,Nobody',
+            ',No email',
+            'bob@example.com',
+            'carl@example.com,Carl',
+        ])
+        progress = []
+        # count before, then per chunk of 3: one duplicate query + one insert; count after + save
+        with self.assertNumQueries(1 + 3 * 2 + 2):
+            report = import_recipients(
+                self.campaign, iter_text_rows(text), chunk_size=3,
+                on_progress=lambda r: progress.append(r.processed),
+            )
+        self.assertEqual(progress, [3, 6, 7])
+        self.assertEqual((report.added, report.duplicates, report.rejected_count), (3, 2, 2))
+        self.assertEqual(
+            [(label, reason) for label, _value, reason in report.rejected],
+            [('ligne 4', 'e-mail invalide'), ('ligne 5', 'e-mail manquant')],
+        )
+        emails = set(self.campaign.recipients.values_list('email', flat=True))
+        self.assertEqual(emails, {'Existing@Example.com', 'ana@example.com', 'bob@example.com', 'carl@example.com'})
+        self.assertEqual(self.campaign.recipients.get(email='ana@example.com').name, 'Ana')
+        self.assertEqual(len(set(self.campaign.recipients.values_list('tracking_token', flat=True))), 4)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.recipient_count, 4)
+
+    def test_csv_upload_streams_the_file(self):
+        from django.contrib.messages import get_messages
+        upload = SimpleUploadedFile(
+            'list.csv', '﻿email,name\nzoe@example.com,Zoé\nexisting@example.com,X\nbad,Y\n'.encode('utf-8'),
+            content_type='text/csv',
+        )
+        response = self.client.post(
+            reverse('dashboard:campaign_bulk_add_recipients', args=[self.campaign.id]), {'csv_file': upload},
+        )
+        self.assertRedirects(response, reverse('dashboard:campaign_detail', args=[self.campaign.id]), fetch_redirect_response=False)
+        self.assertEqual(self.campaign.recipients.get(email='zoe@example.com').name, 'Zoé')
+        texts = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertIn('1 destinataire(s) ajouté(s) avec succès !', texts)
+        self.assertIn('1 doublon(s) ignoré(s).', texts)
+        self.assertTrue(any('ligne 4' in text and 'e-mail invalide' in text for text in texts))
+
+    def test_form_submissions_import(self):
+        from .models_form import FormConfiguration, FormSubmission
+        event = Event.objects.create(
+            name='Congress', start_date=timezone.now(), end_date=timezone.now() + timedelta(days=1), location='Oran',
+        )
+        self.campaign.event = event
+        self.campaign.save()
+        form = FormConfiguration.objects.create(name='Reg', slug='reg-import', event=event, created_by=self.user)
+        old = FormSubmission.objects.create(form=form, email='LINA@example.com', status='approved', data={'nom': 'Old'})
+        FormSubmission.objects.filter(pk=old.pk).update(submitted_at=timezone.now() - timedelta(days=1))
+        # Newest submission first (FormSubmission ordering): it wins over the older duplicate
+        FormSubmission.objects.create(form=form, email='lina@example.com', status='approved',
+                                      data={'first_name': 'Lina', 'last_name': 'B'})
+        FormSubmission.objects.create(form=form, email='', status='approved', data={})
+        FormSubmission.objects.create(form=form, email='pending@example.com', status='pending', data={})
+
+        self.client.post(reverse('dashboard:campaign_import_form_submissions', args=[self.campaign.id]))
+        self.assertEqual(
+            set(self.campaign.recipients.values_list('email', 'name')),
+            {('Existing@Example.com', ''), ('lina@example.com', 'Lina B')},
+        )
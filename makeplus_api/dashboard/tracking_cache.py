@@ -0,0 +1,239 @@
+"""
+Hot-path helpers for the open pixel and click redirect.
+
+Both endpoints resolved their tokens with unique-index lookups (EmailLink
+and EmailRecipient) and wrote the hit before answering, so a click's
+redirect waited on two SELECTs and an INSERT against the remote database.
+Now:
+
+- tokens resolve through TokenCache: a process-local LRU with a TTL
+  (TRACKING_TOKEN_CACHE_SIZE entries, TRACKING_TOKEN_CACHE_TTL seconds),
+  optionally backed by a shared Django cache (TRACKING_TOKEN_CACHE_ALIAS)
+  so a token warmed by one worker is warm for all. A token always maps to
+  the same ids and URL, so entries never need invalidating; unknown
+  tokens are not cached;
+- hits are queued on TrackingHitWriter and written by a background thread
+  with bulk_create -- every TRACKING_HITS_BATCH_SIZE hits or
+  TRACKING_HITS_FLUSH_INTERVAL_MS -- with a final flush at exit, the same
+  way events/scan_audit.py buffers ControllerScan rows.
+
+A warm click is therefore answered without touching the database. Like
+the scan audit log, recording is best effort: a hit still queued when the
+process is killed is lost, and opened_at / clicked_at are stamped at
+flush time, at most one flush interval late.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from .models_email import EmailClick, EmailLink, EmailOpen, EmailRecipient
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """LRU of token -> value with a TTL, in front of an optional Django cache."""
+
+    def __init__(self, prefix, maxsize=10000, ttl=3600, alias='', clock=time.monotonic):
+        self.prefix = prefix
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.alias = alias
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, token, load):
+        """Cached value for `token`, else load() -- cached unless None."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+
+        value = None
+        if self.alias:
+            value = caches[self.alias].get(self.prefix + token)
+            if value is not None:
+                self.shared_hits += 1
+        if value is None:
+            self.misses += 1
+            value = load()
+            if value is None:
+                return None
+            if self.alias:
+                caches[self.alias].set(self.prefix + token, value, self.ttl)
+
+        with self._lock:
+            self._entries[token] = (value, now + self.ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+        }
+
+
+class TrackingHitWriter:
+    """In-process queue of EmailOpen/EmailClick rows plus the thread that writes them."""
+
+    def __init__(self, batch_size=200, flush_interval_ms=1000, max_queue_size=50000, asynchronous=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.asynchronous = asynchronous
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+        self.flushed_total = 0
+        self.failed_total = 0
+        self.dropped_total = 0
+
+    def record(self, hit):
+        """Queue one unsaved EmailOpen or EmailClick for writing."""
+        if not self.asynchronous:
+            self._write([hit])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(hit)
+        except queue.Full:
+            self.dropped_total += 1
+            logger.warning("[TRACKING] Queue full, dropping %s", type(hit).__name__)
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything queued so far, in batch_size chunks."""
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _write(self, batch):
+        for model in (EmailOpen, EmailClick):
+            rows = [hit for hit in batch if type(hit) is model]
+            if not rows:
+                continue
+            try:
+                model.objects.bulk_create(rows)
+                self.flushed_total += len(rows)
+            except Exception as e:
+                # Usually one hit for a since-deleted recipient: keep the rest
+                logger.warning(f"[TRACKING] Bulk insert of {len(rows)} {model.__name__} failed ({e}), retrying one by one")
+                for row in rows:
+                    try:
+                        row.save(force_insert=True)
+                        self.flushed_total += 1
+                    except Exception:
+                        self.failed_total += 1
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='tracking-hit-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+        self.flush()
+
+    def shutdown(self, timeout=5):
+        """Stop the background thread after a last flush of the queue."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def metrics(self):
+        return {
+            'asynchronous': self.asynchronous,
+            'queue_depth': self._queue.qsize(),
+            'flushed_total': self.flushed_total,
+            'failed_total': self.failed_total,
+            'dropped_total': self.dropped_total,
+        }
+
+
+def _token_cache(prefix):
+    return TokenCache(
+        prefix,
+        maxsize=getattr(settings, 'TRACKING_TOKEN_CACHE_SIZE', 10000),
+        ttl=getattr(settings, 'TRACKING_TOKEN_CACHE_TTL', 3600),
+        alias=getattr(settings, 'TRACKING_TOKEN_CACHE_ALIAS', ''),
+    )
+
+
+link_tokens = _token_cache('tracking:link:')
+recipient_tokens = _token_cache('tracking:recipient:')
+
+hit_writer = TrackingHitWriter(
+    batch_size=getattr(settings, 'TRACKING_HITS_BATCH_SIZE', 200),
+    flush_interval_ms=getattr(settings, 'TRACKING_HITS_FLUSH_INTERVAL_MS', 1000),
+    asynchronous=getattr(settings, 'TRACKING_HITS_ASYNC', True),
+)
+
+
+def lookup_link(token):
+    """(link_id, original_url) for an EmailLink tracking token, or None."""
+    return link_tokens.get(
+        token,
+        lambda: EmailLink.objects.filter(tracking_token=token).values_list('pk', 'original_url').first(),
+    )
+
+
+def lookup_recipient(token):
+    """(recipient_id, campaign_id) for an EmailRecipient tracking token, or None."""
+    return recipient_tokens.get(
+        token,
+        lambda: EmailRecipient.objects.filter(tracking_token=token).values_list('pk', 'campaign_id').first(),
+    )
+
+
+def record_hit(hit):
+    """Queue an EmailOpen/EmailClick on the process-wide writer."""
+    hit_writer.record(hit)
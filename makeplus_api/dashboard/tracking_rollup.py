@@ -0,0 +1,143 @@
+"""
+Roll-up of open/click tracking hits into the engagement counters.
+
+The pixel and click-redirect endpoints used to update every counter
+inline: record_open ran up to three save() calls -- including a
+read-modify-write of campaign.total_opened that lost updates when many
+opens landed at once -- and EmailClick.save added an exists() query and
+more of the same. When a big campaign went out, the pixel endpoint got
+slower exactly when it was hit hardest.
+
+The endpoints now only append an EmailOpen / EmailClick row. This module
+folds the uncounted rows into the recipient, link and campaign counters in
+batches, one short transaction each: recipients are locked while their new
+values are computed, campaign and link totals move with F() increments,
+and the hits are marked counted in the same transaction. It runs from
+`manage.py sync_email_events` (cron) and before the stats pages are
+refreshed by the sync button.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from .models_email import EmailCampaign, EmailClick, EmailLink, EmailOpen, EmailRecipient
+
+ROLLUP_BATCH_SIZE = 1000
+
+
+def _increment(model, deltas):
+    """One F() UPDATE per row: {pk: {field: amount}}."""
+    for pk, fields in deltas.items():
+        fields = {name: F(name) + value for name, value in fields.items() if value}
+        if fields:
+            model.objects.filter(pk=pk).update(**fields)
+
+
+def _count_open(recipient, first_at, last_at, campaign_deltas, times=1):
+    if recipient.first_opened_at is None:
+        campaign_deltas[recipient.campaign_id]['unique_opens'] += 1
+        recipient.first_opened_at = first_at
+    else:
+        recipient.first_opened_at = min(recipient.first_opened_at, first_at)
+    recipient.last_opened_at = max(recipient.last_opened_at or last_at, last_at)
+    recipient.open_count += times
+    recipient.opens_count += times
+    campaign_deltas[recipient.campaign_id]['total_opened'] += times
+
+
+def _fold_opens(batch_size):
+    with transaction.atomic():
+        hits = list(
+            EmailOpen.objects.select_for_update(skip_locked=True)
+            .filter(counted=False).order_by('opened_at')[:batch_size]
+        )
+        if not hits:
+            return 0
+
+        by_recipient = defaultdict(list)
+        for hit in hits:
+            by_recipient[hit.recipient_id].append(hit)
+        recipients = list(EmailRecipient.objects.select_for_update().filter(pk__in=by_recipient))
+
+        campaign_deltas = defaultdict(lambda: defaultdict(int))
+        for recipient in recipients:
+            opens = by_recipient[recipient.pk]
+            _count_open(recipient, opens[0].opened_at, opens[-1].opened_at, campaign_deltas, times=len(opens))
+            recipient.user_agent = opens[-1].user_agent
+            recipient.ip_address = opens[-1].ip_address
+        EmailRecipient.objects.bulk_update(recipients, [
+            'first_opened_at', 'last_opened_at', 'open_count', 'opens_count', 'user_agent', 'ip_address',
+        ])
+
+        _increment(EmailCampaign, campaign_deltas)
+        EmailOpen.objects.filter(pk__in=[hit.pk for hit in hits]).update(counted=True)
+    return len(hits)
+
+
+def _fold_clicks(batch_size):
+    with transaction.atomic():
+        hits = list(
+            EmailClick.objects.select_for_update(skip_locked=True)
+            .filter(counted=False).order_by('clicked_at')[:batch_size]
+        )
+        if not hits:
+            return 0
+
+        by_recipient = defaultdict(list)
+        for hit in hits:
+            by_recipient[hit.recipient_id].append(hit)
+        recipients = list(EmailRecipient.objects.select_for_update().filter(pk__in=by_recipient))
+
+        # (recipient, link) pairs clicked before this batch: not unique again
+        seen = set(
+            EmailClick.objects.filter(counted=True, recipient_id__in=by_recipient, link_id__in={hit.link_id for hit in hits})
+            .values_list('recipient_id', 'link_id').distinct()
+        )
+        link_deltas = defaultdict(lambda: defaultdict(int))
+        for hit in hits:
+            pair = (hit.recipient_id, hit.link_id)
+            link_deltas[hit.link_id]['total_clicks'] += 1
+            if pair not in seen:
+                seen.add(pair)
+                link_deltas[hit.link_id]['unique_clicks'] += 1
+
+        campaign_deltas = defaultdict(lambda: defaultdict(int))
+        for recipient in recipients:
+            clicks = by_recipient[recipient.pk]
+            if recipient.first_opened_at is None:
+                # A click without a recorded open (images blocked) counts as one
+                _count_open(recipient, clicks[0].clicked_at, clicks[0].clicked_at, campaign_deltas)
+            if recipient.click_count == 0:
+                campaign_deltas[recipient.campaign_id]['unique_clicks'] += 1
+            recipient.click_count += len(clicks)
+            recipient.clicks_count += len(clicks)
+            campaign_deltas[recipient.campaign_id]['total_clicked'] += len(clicks)
+        EmailRecipient.objects.bulk_update(recipients, [
+            'first_opened_at', 'last_opened_at', 'open_count', 'opens_count', 'click_count', 'clicks_count',
+        ])
+
+        _increment(EmailLink, link_deltas)
+        _increment(EmailCampaign, campaign_deltas)
+        EmailClick.objects.filter(pk__in=[hit.pk for hit in hits]).update(counted=True)
+    return len(hits)
+
+
+def rollup_tracking_hits(batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Fold every uncounted open and click into the counters
+
+    Opens go first, so a click whose open landed in the same window does
+    not count a second, implicit open.
+
+    Returns:
+        dict: {'opens': hits folded, 'clicks': hits folded}
+    """
+    result = {'opens': 0, 'clicks': 0}
+    for key, fold in (('opens', _fold_opens), ('clicks', _fold_clicks)):
+        while True:
+            folded = fold(batch_size)
+            result[key] += folded
+            if folded < batch_size:
+                break
+    return result
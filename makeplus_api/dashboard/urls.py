@@ -55,6 +55,7 @@ urlpatterns = [
     # Caisse Management
     path('caisses/', views.caisse_list, name='caisse_list'),
     path('caisses/create/', views.caisse_create, name='caisse_create'),
+    path('caisses/report/', views.caisse_report, name='caisse_report'),
     path('caisses/<int:caisse_id>/', views.caisse_detail, name='caisse_detail'),
     path('caisses/<int:caisse_id>/edit/', views.caisse_edit, name='caisse_edit'),
     path('caisses/<int:caisse_id>/delete/', views.caisse_delete, name='caisse_delete'),
@@ -101,6 +102,8 @@ urlpatterns = [
     path('campaigns/<uuid:campaign_id>/unarchive/', views_email.campaign_unarchive, name='campaign_unarchive'),
     path('campaigns/<uuid:campaign_id>/test/', views_email.campaign_send_test, name='campaign_send_test'),
     path('campaigns/<uuid:campaign_id>/send/', views_email.campaign_send, name='campaign_send'),
+    path('campaigns/<uuid:campaign_id>/send/progress/', views_email.campaign_send_progress, name='campaign_send_progress'),
+    path('campaigns/<uuid:campaign_id>/send/cancel/', views_email.campaign_send_cancel, name='campaign_send_cancel'),
     path('campaigns/<uuid:campaign_id>/sync-stats/', views_email.campaign_sync_stats, name='campaign_sync_stats'),
     path('campaigns/<uuid:campaign_id>/add-recipient/', views_email.campaign_add_recipient, name='campaign_add_recipient'),
     path('campaigns/<uuid:campaign_id>/bulk-add-recipients/', views_email.campaign_bulk_add_recipients, name='campaign_bulk_add_recipients'),
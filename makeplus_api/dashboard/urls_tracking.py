@@ -17,6 +17,9 @@ urlpatterns = [
     # Unsubscribe
     path('email/unsubscribe/<str:token>/', views_tracking.unsubscribe_recipient, name='unsubscribe'),
     
+    # Brevo event webhook (opens, clicks, deliveries, bounces)
+    path('brevo/webhook/', views_tracking.brevo_webhook, name='brevo_webhook'),
+    
     # Form view tracking
     path('form/view/<uuid:form_id>/', views_tracking.track_form_view, name='track_form_view'),
     
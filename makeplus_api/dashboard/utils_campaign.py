@@ -3,28 +3,35 @@ Campaign Utilities - Variable Replacement System
 
 Handles dynamic variable replacement in email campaigns based on
 registration form data and participant information.
+
+Subjects and bodies are compiled once (CompiledTemplate) into literal
+segments and {{placeholders}}; rendering a recipient is then a single
+join, and placeholders no context will ever fill are reported when the
+campaign is compiled rather than discovered in sent mail.
 """
 
+import functools
+import logging
+import re
+import threading
+from collections import ChainMap
+
 from django.conf import settings
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Lower
 from .models_form import FormSubmission
 from events.models import Participant
 
+logger = logging.getLogger(__name__)
 
-def build_recipient_context(recipient_email, event):
-    """
-    Build context dictionary for variable replacement
-    
-    Fetches data from FormSubmission by email and creates a context
-    with all available variables for replacement.
-    
-    Args:
-        recipient_email: Recipient's email address
-        event: Event instance
-    
-    Returns:
-        dict: Context with all variables
-    """
-    context = {
+# Recipients resolved per round of queries by iter_recipient_contexts --
+# keeps the IN (...) lists well under database parameter limits.
+CONTEXT_CHUNK_SIZE = 500
+
+
+def _base_context(recipient_email, event):
+    """Event info and defaults, before any per-recipient lookup"""
+    return {
         # Event info
         'event_name': event.name if event else '',
         'event_location': event.location if event else '',
@@ -47,65 +54,251 @@ def build_recipient_context(recipient_email, event):
         'unsubscribe_url': f"{settings.SITE_URL}/unsubscribe/",
         'view_online_url': f"{settings.SITE_URL}/view-email/",
     }
+
+
+def _submissions_by_email(form_config, emails):
+    """Latest submission data of `form_config` per lower-cased email (one query)"""
+    submissions = FormSubmission.objects.filter(form=form_config).annotate(
+        email_key=Lower(KeyTextTransform('email', 'data')),
+    ).filter(email_key__in=emails).values_list('email_key', 'data')
     
-    # Try to get form submission data
+    # Ordered newest first (FormSubmission.Meta) -- keep the first seen
+    found = {}
+    for email, data in submissions:
+        found.setdefault(email, data)
+    return found
+
+
+def _participants_by_email(event, emails):
+    """(badge_id, is_checked_in) per lower-cased user email (two queries)"""
+    from events.models import ParticipantEventRegistration
+    
+    participants = list(
+        Participant.objects.annotate(email_key=Lower('user__email'))
+        .filter(email_key__in=emails)
+        .values_list('email_key', 'pk', 'badge_id')
+    )
+    checked_in = dict(
+        ParticipantEventRegistration.objects.filter(
+            event=event, participant_id__in=[pk for _, pk, _ in participants],
+        ).values_list('participant_id', 'is_checked_in')
+    )
+    return {
+        email: (badge_id, checked_in.get(pk, False))
+        for email, pk, badge_id in participants
+    }
+
+
+def iter_recipient_contexts(recipient_emails, event, chunk_size=CONTEXT_CHUNK_SIZE):
+    """
+    Yield the variable-replacement context of each email in
+    `recipient_emails`, in order, for one event.
+    
+    Same context as build_recipient_context(), but the form submissions,
+    users and event registrations behind it are fetched for a whole chunk
+    of recipients at once, matched on lower-cased email: a constant
+    number of queries per chunk instead of ~5 per recipient. Contexts are
+    built lazily, one chunk at a time.
+    
+    Args:
+        recipient_emails: Iterable of email addresses
+        event: Event instance (or None)
+    
+    Yields:
+        dict: Context with all variables
+    """
+    form_config = None
     if event:
-        try:
-            # Get the registration form for this event
-            from .models_form import FormConfiguration
-            form_config = FormConfiguration.objects.filter(event=event).first()
+        from .models_form import FormConfiguration
+        form_config = FormConfiguration.objects.filter(event=event).first()
+    
+    emails = list(recipient_emails)
+    for start in range(0, len(emails), chunk_size):
+        chunk = emails[start:start + chunk_size]
+        keys = {email.lower() for email in chunk}
+        
+        submissions = {}
+        if form_config:
+            try:
+                submissions = _submissions_by_email(form_config, keys)
+            except Exception:
+                logger.exception("Error fetching form submissions")
+        
+        participants = {}
+        if event:
+            try:
+                participants = _participants_by_email(event, keys)
+            except Exception:
+                logger.exception("Error fetching participant data")
+        
+        for email in chunk:
+            context = _base_context(email, event)
             
-            if form_config:
-                # Get the form submission by email
-                submission = FormSubmission.objects.filter(
-                    form=form_config,
-                    data__email=recipient_email
-                ).first()
+            form_data = submissions.get(email.lower())
+            if form_data:
+                # Update basic fields
+                context['first_name'] = form_data.get('first_name', form_data.get('prenom', ''))
+                context['last_name'] = form_data.get('last_name', form_data.get('nom', ''))
+                context['email'] = form_data.get('email', email)
                 
-                if submission and submission.data:
-                    # Add all form fields to context
-                    form_data = submission.data
-                    
-                    # Update basic fields
-                    context['first_name'] = form_data.get('first_name', form_data.get('prenom', ''))
-                    context['last_name'] = form_data.get('last_name', form_data.get('nom', ''))
-                    context['email'] = form_data.get('email', recipient_email)
-                    
-                    # Add all custom fields (field_0, field_1, etc.)
-                    for key, value in form_data.items():
-                        if key.startswith('field_'):
-                            context[key] = value
-                        else:
-                            # Also add non-field keys directly
-                            context[key] = value
-        except Exception as e:
-            print(f"Error fetching form submission: {e}")
-    
-    # Try to get participant data
-    try:
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
-        user = User.objects.filter(email=recipient_email).first()
-        if user and event:
-            # Get participant profile (one per user)
-            participant = Participant.objects.filter(user=user).first()
+                # Add all form fields (field_0, field_1, ... and named keys)
+                for key, value in form_data.items():
+                    context[key] = value
             
+            participant = participants.get(email.lower())
             if participant:
-                # Get event registration to check is_checked_in
-                from events.models import ParticipantEventRegistration
-                event_registration = ParticipantEventRegistration.objects.filter(
-                    participant=participant,
-                    event=event
-                ).first()
-                
-                context['badge_id'] = participant.badge_id or ''
+                badge_id, is_checked_in = participant
+                context['badge_id'] = badge_id or ''
                 context['qr_code_url'] = ''  # QR code is now in qr_code_data JSON field
-                context['is_checked_in'] = 'Yes' if (event_registration and event_registration.is_checked_in) else 'No'
-    except Exception as e:
-        print(f"Error fetching participant data: {e}")
+                context['is_checked_in'] = 'Yes' if is_checked_in else 'No'
+            
+            yield context
+
+
+def build_recipient_context(recipient_email, event):
+    """
+    Build context dictionary for variable replacement
+    
+    Fetches data from FormSubmission by email and creates a context
+    with all available variables for replacement. For more than one
+    recipient use iter_recipient_contexts(), which batches the lookups.
+    
+    Args:
+        recipient_email: Recipient's email address
+        event: Event instance
     
-    return context
+    Returns:
+        dict: Context with all variables
+    """
+    return next(iter_recipient_contexts([recipient_email], event))
+
+
+# {{key}} for any key, spaces inside included ("{{Nom complet}}" form
+# fields), as replace_variables matched it. Only names padded with spaces
+# are skipped, so Brevo's own "{{ contact.FIRSTNAME }}" syntax is left alone.
+PLACEHOLDER_RE = re.compile(r'\{\{(?!\s)([^{}]*[^{}\s])\}\}')
+
+# Form data keys the context always maps, whatever the form's fields
+FORM_NAME_KEYS = {'first_name', 'last_name', 'prenom', 'nom'}
+
+
+class CompiledTemplate:
+    """
+    A subject/body parsed once into literal segments and placeholders.
+    
+    render() is then one pass over the segments and a single join, instead
+    of a full-string replace per context key. Placeholders missing from
+    the context are left as written, like replace_variables did.
+    """
+    
+    def __init__(self, text):
+        self.text = text or ''
+        # re.split with one group: literal, name, literal, name, ..., literal
+        parts = PLACEHOLDER_RE.split(self.text)
+        self.literals = parts[0::2]
+        self.placeholders = tuple(parts[1::2])
+    
+    def unknown_placeholders(self, known_keys):
+        """Placeholders no context key will fill, in order of first use"""
+        return list(dict.fromkeys(name for name in self.placeholders if name not in known_keys))
+    
+    def render(self, context, blank_falsy=True):
+        """
+        Fill the placeholders from `context`. blank_falsy renders falsy
+        values (None, '', 0...) as '' -- replace_variables' rule; without it
+        every value goes through str(), as replace_template_variables did.
+        """
+        if not self.placeholders:
+            return self.text
+        out = [self.literals[0]]
+        for name, literal in zip(self.placeholders, self.literals[1:]):
+            if name in context:
+                value = context[name]
+                out.append(str(value) if value or not blank_falsy else '')
+            else:
+                out.append(f'{{{{{name}}}}}')
+            out.append(literal)
+        return ''.join(out)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(text):
+    """Compiled form of `text`, cached by content"""
+    return CompiledTemplate(text)
+
+
+def known_variables(event):
+    """Keys every recipient context of `event` can fill: base context plus the event's form fields"""
+    keys = set(_base_context('', event)) | FORM_NAME_KEYS
+    if event:
+        from .models_form import FormConfiguration
+        for fields_config in FormConfiguration.objects.filter(event=event).values_list('fields_config', flat=True):
+            keys.update(field['name'] for field in fields_config or [] if isinstance(field, dict) and field.get('name'))
+    return keys
+
+
+class CampaignTemplates:
+    """
+    A campaign's subject and body, compiled, plus the placeholders nothing
+    will fill. With `tracked`, the body is first run through the tracking
+    preprocessor (campaign_html) when CAMPAIGN_TRACKING_URL is set, and
+    tracks_opens / tracks_clicks say whether our own pixel / redirects are in it.
+    """
+    
+    def __init__(self, campaign, tracked=False):
+        from .campaign_html import prepare_tracked_html, tracking_base_url
+        
+        body = campaign.body_html or campaign.body_text or ''
+        self.subject = compile_template(campaign.subject or '')
+        known = known_variables(campaign.event)
+        self.unknown = list(dict.fromkeys(
+            self.subject.unknown_placeholders(known) + compile_template(body).unknown_placeholders(known)
+        ))
+        if self.unknown:
+            logger.warning(
+                "Campaign %s uses unknown variables: %s", campaign.pk, ', '.join(self.unknown),
+            )
+        
+        tracked = tracked and bool(campaign.body_html) and bool(tracking_base_url())
+        self.tracks_opens = tracked and campaign.track_opens
+        self.tracks_clicks = tracked and campaign.track_clicks
+        self.body = compile_template(prepare_tracked_html(campaign, body) if tracked else body)
+    
+    def render(self, context, tracking_token=None):
+        """(subject, html) for one recipient context (and its EmailRecipient.tracking_token)"""
+        from .campaign_html import TOKEN_SLOT
+        
+        if tracking_token:
+            context = ChainMap({TOKEN_SLOT: tracking_token}, context)
+        return self.subject.render(context), self.body.render(context)
+
+
+# (campaign pk, updated_at) -> CampaignTemplates, oldest evicted first
+_campaign_templates = {}
+_campaign_templates_lock = threading.Lock()
+CAMPAIGN_TEMPLATE_CACHE_SIZE = 64
+
+
+def campaign_templates(campaign, tracked=False):
+    """
+    Compiled templates of `campaign`, compiled once per campaign revision
+    (updated_at) and shared by the send worker and the test send. Only the
+    send worker asks for `tracked` ones -- preprocessing creates EmailLinks.
+    """
+    from .campaign_html import tracking_base_url
+    
+    if campaign.pk is None or campaign.updated_at is None:
+        return CampaignTemplates(campaign, tracked)
+    key = (campaign.pk, campaign.updated_at, tracking_base_url() if tracked else None)
+    with _campaign_templates_lock:
+        templates = _campaign_templates.get(key)
+    if templates is None:
+        templates = CampaignTemplates(campaign, tracked)
+        with _campaign_templates_lock:
+            if len(_campaign_templates) >= CAMPAIGN_TEMPLATE_CACHE_SIZE:
+                _campaign_templates.pop(next(iter(_campaign_templates)))
+            _campaign_templates[key] = templates
+    return templates
 
 
 def replace_variables(content, context):
@@ -121,19 +314,7 @@ def replace_variables(content, context):
     """
     if not content:
         return content
-    
-    print(f"Replacing variables in content (length: {len(content)})")
-    print(f"Context keys: {list(context.keys())}")
-    
-    for key, value in context.items():
-        placeholder = f"{{{{{key}}}}}"
-        if placeholder in content:
-            print(f"  Replacing {placeholder} with '{value}'")
-            content = content.replace(placeholder, str(value) if value else '')
-        else:
-            print(f"  Placeholder {placeholder} not found in content")
-    
-    return content
+    return compile_template(content).render(context)
 
 
 def send_campaign_email(recipient, campaign):
@@ -153,8 +334,7 @@ def send_campaign_email(recipient, campaign):
     context = build_recipient_context(recipient.email, campaign.event)
     
     # Replace variables in subject and body
-    subject = replace_variables(campaign.subject, context)
-    html_content = replace_variables(campaign.body_html, context)
+    subject, html_content = campaign_templates(campaign).render(context)
     
     # Send email via Brevo API
     success, error, message_id = send_email(
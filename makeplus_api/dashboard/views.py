@@ -16,8 +16,6 @@ from django.core.cache import cache
 from django.views.decorators.cache import cache_page, never_cache
 from datetime import timedelta
 import json
-import qrcode
-import io
 import base64
 
 # Cache invalidation helper
@@ -974,17 +972,11 @@ def user_detail(request, user_id):
     # Get QR code
     qr_data = UserProfile.get_qr_for_user(user)
 
-    # Generate QR code image -- just the user id, same as the mobile app
-    # (see _qr_display_payload for why).
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(_qr_display_payload(qr_data))
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    qr_image = base64.b64encode(buffer.getvalue()).decode()
+    # QR code image -- just the user id, same as the mobile app (see
+    # _qr_display_payload for why). Same cached render as download_qr_code.
+    from events.qr_cache import get_qr_png
+    png, _etag = get_qr_png(_qr_display_payload(qr_data), box_size=10, border=5)
+    qr_image = base64.b64encode(png).decode()
     
     # Get user's event assignments with role details
     assignments = UserEventAssignment.objects.filter(
@@ -1165,22 +1157,22 @@ def user_change_role(request, assignment_id):
 def download_qr_code(request, user_id):
     """Download QR code as PNG"""
 
+    from events.qr_cache import etag_matches, get_qr_png
+
     user = get_object_or_404(User, id=user_id)
     qr_data = UserProfile.get_qr_for_user(user)
 
     # Same QR content as user_detail -- see the note on _qr_display_payload.
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(_qr_display_payload(qr_data))
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    response = HttpResponse(buffer.getvalue(), content_type='image/png')
-    response['Content-Disposition'] = f'attachment; filename="{user.username}_qr_code.png"'
-    
+    # Rendered once per content/options and served from events/qr_cache.py.
+    png, etag = get_qr_png(_qr_display_payload(qr_data), box_size=10, border=5)
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(png, content_type='image/png')
+        response['Content-Disposition'] = f'attachment; filename="{user.username}_qr_code.png"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private'
+
     return response
 
 
@@ -1414,14 +1406,19 @@ def caisse_list(request):
     if event_id:
         caisses = caisses.filter(event_id=event_id)
     
-    # Get statistics for each caisse
+    # Get statistics for each caisse -- two queries for the whole list,
+    # from the rolling summary (caisse/stats.py)
+    from caisse.stats import summary_stats
+    caisses = list(caisses)
+    stats_by_caisse = summary_stats([caisse.id for caisse in caisses])
     caisse_stats = []
     for caisse in caisses:
+        stats = stats_by_caisse[caisse.id]
         caisse_stats.append({
             'caisse': caisse,
-            'total_amount': caisse.get_total_amount(),
-            'total_participants': caisse.get_total_participants(),
-            'transaction_count': caisse.get_transaction_count()
+            'total_amount': stats['total_amount'],
+            'total_participants': stats['total_participants'],
+            'transaction_count': stats['transaction_count'],
         })
     
     events = Event.objects.all().order_by('-start_date')
@@ -1556,18 +1553,12 @@ def caisse_detail(request, caisse_id):
     if transactions.exists():
         print(f"DEBUG: First transaction: {transactions[0].id} - {transactions[0].created_at}")
     
-    # Statistics
-    total_amount = caisse.get_total_amount()
-    total_participants = caisse.get_total_participants()
-    transaction_count = caisse.get_transaction_count()
-    
-    # Cancelled transactions stats
-    cancelled_transactions = caisse.transactions.filter(status='cancelled')
-    cancelled_count = cancelled_transactions.count()
-    cancelled_amount = cancelled_transactions.aggregate(total=Sum('total_amount'))['total'] or 0
+    # Statistics, cancelled transactions included (caisse/stats.py)
+    from caisse.stats import caisse_stats
+    stats = caisse_stats(caisse)
     
     # Get cancelled transactions with reasons
-    cancelled_with_reasons = cancelled_transactions.select_related(
+    cancelled_with_reasons = caisse.transactions.filter(status='cancelled').select_related(
         'participant__user'
     ).prefetch_related('items').order_by('-cancelled_at')[:20]
     
@@ -1585,11 +1576,11 @@ def caisse_detail(request, caisse_id):
     context = {
         'caisse': caisse,
         'transactions': transactions,
-        'total_amount': total_amount,
-        'total_participants': total_participants,
-        'transaction_count': transaction_count,
-        'cancelled_count': cancelled_count,
-        'cancelled_amount': cancelled_amount,
+        'total_amount': stats['total_amount'],
+        'total_participants': stats['total_participants'],
+        'transaction_count': stats['transaction_count'],
+        'cancelled_count': stats['cancelled_count'],
+        'cancelled_amount': stats['cancelled_amount'],
         'cancelled_with_reasons': cancelled_with_reasons,
         'revenue_by_type': revenue_by_type,
         'status_filter': status_filter,
@@ -1606,6 +1597,48 @@ def caisse_detail(request, caisse_id):
     return response
 
 
+@never_cache
+@login_required
+@user_passes_test(is_staff_user)
+def caisse_report(request):
+    """
+    Reconciliation report of the caisses (caisse/reconciliation.py), as
+    ?format=csv (streamed) or xlsx -- filtered by event, caisse, status and
+    date_from/date_to like caisse_detail.
+    """
+    import tempfile
+    from django.http import FileResponse, HttpResponseBadRequest, StreamingHttpResponse
+    from caisse.reconciliation import report_transactions, stream_csv, write_xlsx
+
+    report_format = request.GET.get('format', 'csv')
+    if report_format not in ('csv', 'xlsx'):
+        return HttpResponseBadRequest('format must be csv or xlsx')
+    try:
+        transactions = report_transactions(
+            event_id=request.GET.get('event') or None,
+            caisse_id=request.GET.get('caisse') or None,
+            status=request.GET.get('status', ''),
+            date_from=request.GET.get('date_from', ''),
+            date_to=request.GET.get('date_to', ''),
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    filename = f"rapprochement-caisses-{timezone.localdate()}.{report_format}"
+    if report_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(transactions), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    output = tempfile.TemporaryFile()
+    write_xlsx(transactions, output)
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
 @login_required
 @user_passes_test(is_staff_user)
 def payable_items_list(request, event_id):
@@ -18,9 +18,8 @@ import re
 
 def replace_template_variables(text, context):
     """Replace template variables like {{event_name}} with actual values"""
-    for key, value in context.items():
-        text = text.replace(f"{{{{{key}}}}}", str(value))
-    return text
+    from .utils_campaign import compile_template
+    return compile_template(text).render(context, blank_falsy=False)
 
 
 def build_default_unlayer_design(html_body):
@@ -600,6 +599,7 @@ def event_email_logs(request, event_id):
 def send_email_to_registrants(request, event_id, template_id):
     """Send email to event registrants (not yet participants)"""
     from events.models import EventRegistration
+    from .utils_campaign import iter_recipient_contexts
     
     event = get_object_or_404(Event, id=event_id)
     template = get_object_or_404(EventEmailTemplate, id=template_id, event=event)
@@ -627,10 +627,13 @@ def send_email_to_registrants(request, event_id, template_id):
         failed_count = 0
         errors = []
         
-        for registration in registrations:
+        registrations = list(registrations)
+        contexts = iter_recipient_contexts([registration.email for registration in registrations], event)
+        for registration, context in zip(registrations, contexts):
             try:
-                # Build context for template variables
-                context = {
+                # Form/participant variables from the batched context, with
+                # the registration's own details on top
+                context.update({
                     'event_name': event.name,
                     'event_location': event.location,
                     'event_start_date': event.start_date.strftime('%d/%m/%Y'),
@@ -641,7 +644,7 @@ def send_email_to_registrants(request, event_id, template_id):
                     'email': registration.email,
                     'telephone': registration.telephone,
                     'etablissement': registration.etablissement,
-                }
+                })
                 
                 # Replace variables in subject and body
                 personalized_subject = replace_template_variables(template.subject, context)
@@ -1443,9 +1446,13 @@ def campaign_detail(request, campaign_id):
     sent_count = recipients.filter(status='sent').count()
     delivered_count = recipients.filter(status='delivered').count()
     failed_count = recipients.filter(status='failed').count()
+    send_job = campaign.send_jobs.order_by('-created_at').first()
     
     context = {
         'campaign': campaign,
+        'send_job': send_job,
+        'send_progress': send_job.get_progress() if send_job else None,
+        'can_resume': campaign.status in ('paused', 'failed') and pending_count > 0,
         'recipients': recipients,
         'recipient_count': recipients.count(),
         'pending_count': pending_count,
@@ -1564,74 +1571,40 @@ def campaign_add_recipient(request, campaign_id):
     return redirect('dashboard:campaign_detail', campaign_id=campaign.id)
 
 
+def _report_import(request, report, added_message):
+    """Flash an ImportReport: added, duplicates and a sample of rejected rows"""
+    if report.added > 0:
+        messages.success(request, added_message.format(count=report.added))
+    if report.duplicates > 0:
+        messages.info(request, f'{report.duplicates} doublon(s) ignoré(s).')
+    if report.rejected_count > 0:
+        examples = ', '.join(
+            f'{label} : « {value or ""} » ({reason})' for label, value, reason in report.rejected[:5]
+        )
+        more = '…' if report.rejected_count > 5 else ''
+        messages.warning(request, f'{report.rejected_count} ligne(s) rejetée(s) — {examples}{more}')
+
+
 @login_required
 def campaign_bulk_add_recipients(request, campaign_id):
     """Bulk add recipients to a campaign via CSV or text"""
-    from .models_email import EmailCampaign, EmailRecipient
-    import secrets
-    import csv
-    from io import StringIO
+    from .models_email import EmailCampaign
+    from .recipient_import import import_recipients, iter_csv_rows, iter_text_rows
     
     campaign = get_object_or_404(EmailCampaign, id=campaign_id)
     
     if request.method == 'POST':
-        added_count = 0
-        skipped_count = 0
-        
         # Handle CSV file upload
         if 'csv_file' in request.FILES:
-            csv_file = request.FILES['csv_file']
-            file_data = csv_file.read().decode('utf-8')
-            csv_reader = csv.reader(StringIO(file_data))
-            
-            for row in csv_reader:
-                if len(row) >= 1:
-                    email = row[0].strip()
-                    name = row[1].strip() if len(row) > 1 else ''
-                    
-                    if email and not EmailRecipient.objects.filter(campaign=campaign, email=email).exists():
-                        tracking_token = secrets.token_urlsafe(32)
-                        EmailRecipient.objects.create(
-                            campaign=campaign,
-                            email=email,
-                            name=name,
-                            tracking_token=tracking_token
-                        )
-                        added_count += 1
-                    else:
-                        skipped_count += 1
-        
+            rows = iter_csv_rows(request.FILES['csv_file'])
         # Handle text input
         elif 'email_list' in request.POST:
-            email_list = request.POST.get('email_list', '')
-            lines = email_list.strip().split('\n')
-            
-            for line in lines:
-                parts = line.strip().split(',')
-                if len(parts) >= 1:
-                    email = parts[0].strip()
-                    name = parts[1].strip() if len(parts) > 1 else ''
-                    
-                    if email and not EmailRecipient.objects.filter(campaign=campaign, email=email).exists():
-                        tracking_token = secrets.token_urlsafe(32)
-                        EmailRecipient.objects.create(
-                            campaign=campaign,
-                            email=email,
-                            name=name,
-                            tracking_token=tracking_token
-                        )
-                        added_count += 1
-                    else:
-                        skipped_count += 1
-        
-        # Update campaign recipient count
-        campaign.recipient_count = campaign.recipients.count()
-        campaign.save()
+            rows = iter_text_rows(request.POST.get('email_list', ''))
+        else:
+            rows = []
         
-        if added_count > 0:
-            messages.success(request, f'{added_count} destinataire(s) ajouté(s) avec succès !')
-        if skipped_count > 0:
-            messages.info(request, f'{skipped_count} doublon(s) ignoré(s).')
+        report = import_recipients(campaign, rows)
+        _report_import(request, report, '{count} destinataire(s) ajouté(s) avec succès !')
     
     return redirect('dashboard:campaign_detail', campaign_id=campaign.id)
 
@@ -1663,9 +1636,9 @@ def campaign_delete_recipient(request, campaign_id, recipient_id):
 @login_required
 def campaign_import_form_submissions(request, campaign_id):
     """Import form submissions from event registration form as campaign recipients"""
-    from .models_email import EmailCampaign, EmailRecipient
+    from .models_email import EmailCampaign
     from .models_form import FormConfiguration, FormSubmission
-    import secrets
+    from .recipient_import import import_recipients, iter_submission_rows
     
     campaign = get_object_or_404(EmailCampaign, id=campaign_id)
     
@@ -1689,50 +1662,11 @@ def campaign_import_form_submissions(request, campaign_id):
             messages.warning(request, 'Aucune soumission de formulaire approuvée trouvée.')
             return redirect('dashboard:campaign_detail', campaign_id=campaign.id)
         
-        added_count = 0
-        skipped_count = 0
-        
-        for submission in submissions:
-            email = submission.email
-            
-            if not email:
-                skipped_count += 1
-                continue
-            
-            # Check if recipient already exists
-            if EmailRecipient.objects.filter(campaign=campaign, email=email).exists():
-                skipped_count += 1
-                continue
-            
-            # Extract name from submission data
-            name = ''
-            if submission.data:
-                first_name = submission.data.get('first_name', '')
-                last_name = submission.data.get('last_name', '')
-                if first_name or last_name:
-                    name = f"{first_name} {last_name}".strip()
-                else:
-                    # Try other common name fields
-                    name = submission.data.get('name', '') or submission.data.get('nom', '')
-            
-            # Create recipient
-            tracking_token = secrets.token_urlsafe(32)
-            EmailRecipient.objects.create(
-                campaign=campaign,
-                email=email,
-                name=name,
-                tracking_token=tracking_token
-            )
-            added_count += 1
-        
-        # Update campaign recipient count
-        campaign.recipient_count = campaign.recipients.count()
-        campaign.save()
-        
-        if added_count > 0:
-            messages.success(request, f'{added_count} destinataire(s) importé(s) avec succès depuis les soumissions de formulaire !')
-        if skipped_count > 0:
-            messages.info(request, f'{skipped_count} soumission(s) ignorée(s) (doublons ou e-mail manquant).')
+        report = import_recipients(campaign, iter_submission_rows(submissions))
+        _report_import(
+            request, report,
+            '{count} destinataire(s) importé(s) avec succès depuis les soumissions de formulaire !',
+        )
     
     return redirect('dashboard:campaign_detail', campaign_id=campaign.id)
 
@@ -1740,9 +1674,9 @@ def campaign_import_form_submissions(request, campaign_id):
 @login_required
 def campaign_send_test(request, campaign_id):
     """Send a test email for a campaign using configured SMTP backend."""
-    from .models_email import EmailCampaign, EmailRecipient
+    from .models_email import EmailCampaign
     from .email_sender import send_email
-    from .utils_campaign import build_recipient_context, replace_variables as utils_replace_vars
+    from .utils_campaign import campaign_templates, iter_recipient_contexts
     from django.http import JsonResponse
     import json
     
@@ -1756,19 +1690,12 @@ def campaign_send_test(request, campaign_id):
             if not test_email:
                 return JsonResponse({'success': False, 'error': 'Email address is required'})
             
-            # Create a temporary recipient object to use build_recipient_context
-            temp_recipient = EmailRecipient(
-                campaign=campaign,
-                email=test_email,
-                name='Test User'
-            )
-            
             # Build context with real form data if available
-            context = build_recipient_context(temp_recipient, campaign)
+            context = next(iter_recipient_contexts([test_email], campaign.event))
             
-            # Replace template variables using utils function
-            subject = utils_replace_vars(campaign.subject, context)
-            body_html = utils_replace_vars(campaign.body_html or campaign.body_text, context)
+            # Same compiled templates the send worker renders
+            templates = campaign_templates(campaign)
+            subject, body_html = templates.render(context)
             
             # Use custom from_email if provided, otherwise use default
             from_address = campaign.from_email if campaign.from_email else settings.DEFAULT_FROM_EMAIL
@@ -1789,6 +1716,8 @@ def campaign_send_test(request, campaign_id):
                 if message_id:
                     response_data['message_id'] = message_id
                     response_data['message'] += ' (Tracking enabled)'
+                if templates.unknown:
+                    response_data['unknown_variables'] = templates.unknown
                 return JsonResponse(response_data)
             else:
                 return JsonResponse({'success': False, 'error': error})
@@ -1801,234 +1730,93 @@ def campaign_send_test(request, campaign_id):
 
 @login_required
 def campaign_send(request, campaign_id):
-    """Send campaign to all recipients via configured SMTP backend."""
-    from .models_email import EmailCampaign, EmailRecipient
-    from .email_sender import send_email
-    from .utils_campaign import build_recipient_context, replace_variables as utils_replace_vars
-    
+    """Queue a campaign for delivery by the send_campaign_jobs worker."""
+    from .models_email import EmailCampaign
+    from .campaign_delivery import SENDABLE_STATUSES, enqueue_campaign
+    from .utils_campaign import campaign_templates
+
     campaign = get_object_or_404(EmailCampaign, id=campaign_id)
-    
-    # Only allow sending from draft status
-    if campaign.status != 'draft':
+
+    # Already queued or sending -- the detail page shows its progress
+    if campaign.status == 'sending':
+        messages.info(request, "Cette campagne est déjà en cours d'envoi.")
+        return redirect('dashboard:campaign_detail', campaign_id=campaign.id)
+
+    # Only allow sending from draft status (or resuming a paused/failed send)
+    if campaign.status not in SENDABLE_STATUSES:
         messages.warning(request, 'Cette campagne a déjà été envoyée.')
         return redirect('dashboard:campaign_detail', campaign_id=campaign.id)
-    
+
     # Check if there are recipients
-    recipients = list(campaign.recipients.filter(status='pending'))
-    if not recipients:
+    recipient_count = campaign.recipients.filter(status='pending').count()
+    if not recipient_count:
         messages.error(request, "Aucun destinataire trouvé pour cette campagne. Veuillez d'abord ajouter des destinataires.")
         return redirect('dashboard:campaign_detail', campaign_id=campaign.id)
-    
+
     if request.method == 'POST':
-        # Update campaign status immediately
-        campaign.status = 'sending'
-        campaign.save()
-        
-        from_address = campaign.from_email if campaign.from_email else settings.DEFAULT_FROM_EMAIL
-        from_name = campaign.from_name if campaign.from_name else 'MakePlus'
-        
-        # Check if user wants to use Campaign API (bulk) or Transactional API (individual)
         # Campaign API = faster but has Brevo branding on free plan
         # Transactional API = slower but less branding on free plan
         use_campaign_api = request.POST.get('use_campaign_api', 'false') == 'true'
-        
-        if use_campaign_api:
-            # Use Brevo Campaign API (bulk sending with branding on free plan)
-            try:
-                from .brevo_client import get_brevo_client
-                client = get_brevo_client()
-                
-                # Check Brevo account limits
-                try:
-                    account_info = client.get_account_info()
-                    plan_info = account_info.get('plan', [{}])[0] if isinstance(account_info.get('plan'), list) else account_info.get('plan', {})
-                    daily_limit = plan_info.get('creditsRemaining', 0)
-                    
-                    print(f"Brevo daily limit remaining: {daily_limit}")
-                    
-                    recipient_count = len(recipients)
-                    
-                    if daily_limit > 0 and recipient_count > daily_limit:
-                        messages.warning(
-                            request, 
-                            f'Campaign has {recipient_count} recipients but only {daily_limit} credits remaining. '
-                            f'Campaign will be sent in batches over multiple days.'
-                        )
-                except Exception as e:
-                    print(f"Could not check account limits: {str(e)}")
-                
-                print(f"Creating Brevo campaign for: {campaign.name}")
-                
-                # Create contact list and campaign (existing code)
-                list_name = f"Campaign_{campaign.id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
-                contact_list = client.create_contact_list(name=list_name)
-                list_id = contact_list['id']
-                
-                print(f"Created contact list: {list_name} (ID: {list_id})")
-                
-                contacts_to_import = []
-                for recipient in recipients:
-                    try:
-                        context = build_recipient_context(recipient.email, campaign.event)
-                        contacts_to_import.append({
-                            'email': recipient.email,
-                            'attributes': {
-                                'FIRSTNAME': context.get('first_name', ''),
-                                'LASTNAME': context.get('last_name', ''),
-                                'NAME': context.get('first_name', '') + ' ' + context.get('last_name', ''),
-                            }
-                        })
-                    except Exception as e:
-                        print(f"Error preparing contact {recipient.email}: {str(e)}")
-                
-                print(f"Importing {len(contacts_to_import)} contacts to list...")
-                client.import_contacts_to_list(list_id, contacts_to_import)
-                
-                html_content = campaign.body_html or campaign.body_text
-                html_content = html_content.replace('{{first_name}}', '{{ contact.FIRSTNAME }}')
-                html_content = html_content.replace('{{last_name}}', '{{ contact.LASTNAME }}')
-                html_content = html_content.replace('{{email}}', '{{ contact.EMAIL }}')
-                
-                if campaign.event:
-                    html_content = html_content.replace('{{event_name}}', campaign.event.name)
-                    html_content = html_content.replace('{{event_location}}', campaign.event.location or '')
-                    html_content = html_content.replace('{{event_start_date}}', 
-                        campaign.event.start_date.strftime('%B %d, %Y') if campaign.event.start_date else '')
-                    html_content = html_content.replace('{{event_end_date}}', 
-                        campaign.event.end_date.strftime('%B %d, %Y') if campaign.event.end_date else '')
-                
-                print("Creating Brevo email campaign...")
-                
-                brevo_campaign = client.create_email_campaign(
-                    name=campaign.name,
-                    subject=campaign.subject,
-                    sender_name=from_name,
-                    sender_email=from_address,
-                    html_content=html_content,
-                    recipients_list_ids=[list_id]
-                )
-                
-                brevo_campaign_id = brevo_campaign['id']
-                campaign.external_campaign_id = str(brevo_campaign_id)
-                campaign.save()
-                
-                print(f"Created Brevo campaign ID: {brevo_campaign_id}")
-                print("Sending campaign...")
-                client.send_email_campaign(brevo_campaign_id)
-                
-                sent_count = len(recipients)
-                for recipient in recipients:
-                    recipient.status = 'sent'
-                    recipient.sent_at = timezone.now()
-                    recipient.save()
-                
-                campaign.status = 'sent'
-                campaign.sent_at = timezone.now()
-                campaign.total_sent = sent_count
-                campaign.total_delivered = sent_count
-                campaign.save()
-                
-                print(f"✓ Campaign sent successfully to {sent_count} recipients")
-                
-                messages.success(
-                    request, 
-                    f'Campaign successfully sent to {sent_count} recipients via Brevo Campaign API! '
-                    f'Note: Brevo branding appears on free plans. Upgrade to remove it.'
-                )
-                
-            except Exception as e:
-                import traceback
-                print(f"Campaign sending error: {str(e)}")
-                traceback.print_exc()
-                
-                error_str = str(e).lower()
-                if 'quota' in error_str or 'limit' in error_str or 'credit' in error_str:
-                    campaign.status = 'draft'
-                    campaign.save()
-                    messages.error(
-                        request, 
-                        f'Daily sending limit reached. Please try again tomorrow or upgrade your Brevo plan. Error: {str(e)}'
-                    )
-                else:
-                    campaign.status = 'failed'
-                    campaign.save()
-                    
-                    for recipient in recipients:
-                        recipient.status = 'failed'
-                        recipient.error_message = f"Campaign send error: {str(e)}"[:500]
-                        recipient.save()
-                    
-                    messages.error(request, f"Échec de l'envoi de la campagne : {str(e)}")
-        
-        else:
-            # Use Transactional Email API (individual emails, less branding)
-            print("Using Transactional Email API (less branding)")
-            
-            from .brevo_client import get_brevo_client
-            client = get_brevo_client()
-            
-            sent_count = 0
-            failed_count = 0
-            
-            for recipient in recipients:
-                try:
-                    context = build_recipient_context(recipient.email, campaign.event)
-                    recipient_name = context.get('first_name', '') or recipient.name or recipient.email.split('@')[0]
-                    
-                    subject = utils_replace_vars(campaign.subject, context)
-                    body_html = utils_replace_vars(campaign.body_html or campaign.body_text, context)
-                    
-                    result = client.send_transactional_email(
-                        to_email=recipient.email,
-                        to_name=recipient_name,
-                        subject=subject,
-                        html_content=body_html,
-                        from_email=from_address,
-                        from_name=from_name,
-                        track_opens=campaign.track_opens,
-                        track_clicks=campaign.track_clicks
-                    )
-                    
-                    recipient.status = 'sent'
-                    recipient.sent_at = timezone.now()
-                    if result.get('messageId'):
-                        recipient.external_id = result['messageId']
-                    recipient.save()
-                    sent_count += 1
-                    
-                except Exception as e:
-                    recipient.status = 'failed'
-                    recipient.error_message = str(e)[:500]
-                    recipient.save()
-                    failed_count += 1
-                    print(f"Failed to send to {recipient.email}: {str(e)}")
-            
-            campaign.status = 'sent'
-            campaign.sent_at = timezone.now()
-            campaign.total_sent = sent_count
-            campaign.total_delivered = sent_count
-            campaign.save()
-            
-            if failed_count > 0:
-                messages.warning(request, f'Campagne envoyée à {sent_count} destinataires. {failed_count} échec(s).')
-            else:
-                messages.success(request, f'Campagne envoyée avec succès à {sent_count} destinataires !')
-
+        enqueue_campaign(
+            campaign,
+            mode='campaign_api' if use_campaign_api else 'transactional',
+            user=request.user,
+        )
+        messages.success(
+            request,
+            f"Campagne mise en file d'envoi pour {recipient_count} destinataire(s). "
+            f"La progression s'affiche ci-dessous.",
+        )
         return redirect('dashboard:campaign_detail', campaign_id=campaign.id)
-    
+
     # GET request - show confirmation page
     context = {
         'campaign': campaign,
-        'recipient_count': len(recipients),
+        'recipient_count': recipient_count,
+        'unknown_variables': campaign_templates(campaign).unknown,
     }
     return render(request, 'dashboard/campaign_send_confirm.html', context)
 
 
+@login_required
+def campaign_send_progress(request, campaign_id):
+    """Live progress of the campaign's latest send job (polled by the detail page)."""
+    from .models_email import EmailCampaign
+    from django.http import JsonResponse
+
+    campaign = get_object_or_404(EmailCampaign, id=campaign_id)
+    job = campaign.send_jobs.order_by('-created_at').first()
+    return JsonResponse({
+        'success': True,
+        'campaign_status': campaign.status,
+        'job': job.get_progress() if job else None,
+    })
+
+
+@login_required
+def campaign_send_cancel(request, campaign_id):
+    """Stop the running send after its current batch; unsent recipients stay pending."""
+    from .models_email import EmailCampaign
+    from .campaign_delivery import cancel_job
+    from django.http import JsonResponse
+
+    campaign = get_object_or_404(EmailCampaign, id=campaign_id)
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+
+    job = campaign.send_jobs.filter(status__in=('queued', 'running')).first()
+    if job is None:
+        return JsonResponse({'success': False, 'error': "Aucun envoi en cours pour cette campagne."})
+    cancel_job(job)
+    return JsonResponse({'success': True, 'message': "Envoi interrompu. Les destinataires restants sont conservés."})
+
+
 @login_required
 def campaign_sync_stats(request, campaign_id):
     """Sync campaign statistics from Brevo API"""
     from .models_email import EmailCampaign
     from .brevo_sync import sync_campaign_stats_from_brevo
+    from .tracking_rollup import rollup_tracking_hits
     from django.http import JsonResponse
     import traceback
     
@@ -2036,7 +1824,8 @@ def campaign_sync_stats(request, campaign_id):
     
     if request.method == 'POST':
         try:
-            # Sync stats from Brevo
+            # Fold pending open/click hits, then sync stats from Brevo
+            rollup_tracking_hits()
             result = sync_campaign_stats_from_brevo(campaign)
             
             if result['success']:
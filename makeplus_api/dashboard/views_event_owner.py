@@ -17,6 +17,7 @@ from decimal import Decimal
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
+from django.db import transaction as db_transaction
 from django.db.models import Q
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
@@ -25,6 +26,8 @@ from django.utils import timezone
 from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_POST
 
+from caisse.entitlements import schedule_refresh
+from caisse.seats import release_seats
 from caisse.services import (
     cancel_registration_order, confirm_registration_order, resync_confirmed_registration_order,
     unconfirm_registration_order,
@@ -696,7 +699,10 @@ def registration_delete(request, order_id):
 
     if order.caisse_transaction_id and order.caisse_transaction.status == 'completed':
         cancel_label = request.user.get_full_name() or request.user.email
-        order.caisse_transaction.cancel(cancelled_by=cancel_label, reason='Registration deleted by event owner.')
+        with db_transaction.atomic():
+            release_seats(order.caisse_transaction)
+            order.caisse_transaction.cancel(cancelled_by=cancel_label, reason='Registration deleted by event owner.')
+            schedule_refresh(order.caisse_transaction.participant_id, order.event)
 
     if participant:
         # Only revoke this event's access if this was the participant's
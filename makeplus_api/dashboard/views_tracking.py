@@ -2,14 +2,18 @@
 Email Campaign and Form Tracking Views
 Handles open/click tracking and form analytics
 """
+from django.conf import settings
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from .models_email import EmailRecipient, EmailLink, EmailClick, EmailOpen, EmailCampaign
 from .models_form import FormConfiguration, FormView, FormFieldInteraction, FormAnalytics
+from .tracking_cache import lookup_link, lookup_recipient, record_hit
 import base64
+import hmac
 import json
 
 
@@ -19,31 +23,25 @@ TRACKING_PIXEL = base64.b64decode(
 )
 
 
+@never_cache
 @require_http_methods(["GET"])
 def track_email_open(request, token):
     """
     Track email open via tracking pixel
-    Returns a 1x1 transparent pixel
+    Returns a 1x1 transparent pixel (never cached: the site cache
+    middleware would otherwise swallow every repeat open for 5 minutes)
     """
     try:
-        recipient = EmailRecipient.objects.get(tracking_token=token)
-        
-        # Get user agent and IP
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
-        ip_address = get_client_ip(request)
-        
-        # Record the open
-        recipient.record_open(user_agent=user_agent, ip_address=ip_address)
+        recipient = lookup_recipient(token)
         
-        # Create EmailOpen record
-        EmailOpen.objects.create(
-            recipient=recipient,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
+        # Queue the hit only; written by tracking_cache.hit_writer, counted by tracking_rollup.py
+        if recipient is not None:
+            record_hit(EmailOpen(
+                recipient_id=recipient[0],
+                ip_address=get_client_ip(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', '')
+            ))
         
-    except EmailRecipient.DoesNotExist:
-        pass  # Invalid token, but still return pixel
     except Exception:
         pass  # Don't break tracking for any error
     
@@ -56,30 +54,24 @@ def track_link_click(request, link_token, recipient_token):
     """
     Track link click and redirect to original URL
     """
-    try:
-        link = EmailLink.objects.get(tracking_token=link_token)
-        recipient = EmailRecipient.objects.get(tracking_token=recipient_token)
-        
-        # Get user agent and IP
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
-        ip_address = get_client_ip(request)
-        referer = request.META.get('HTTP_REFERER', '')
-        
-        # Create click record (this will auto-update all stats via model save)
-        EmailClick.objects.create(
-            recipient=recipient,
-            link=link,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            referer=referer
-        )
-        
-        # Redirect to original URL
-        return HttpResponseRedirect(link.original_url)
-        
-    except (EmailLink.DoesNotExist, EmailRecipient.DoesNotExist):
+    link = lookup_link(link_token)
+    recipient = lookup_recipient(recipient_token)
+    if link is None or recipient is None:
         # Invalid tokens, redirect to homepage
         return HttpResponseRedirect('/')
+    
+    link_id, original_url = link
+    # Queue the hit only; written by tracking_cache.hit_writer, counted by tracking_rollup.py
+    record_hit(EmailClick(
+        recipient_id=recipient[0],
+        link_id=link_id,
+        ip_address=get_client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        referer=request.META.get('HTTP_REFERER', '')
+    ))
+    
+    # Redirect to original URL
+    return HttpResponseRedirect(original_url)
 
 
 @require_http_methods(["GET", "POST"])
@@ -228,6 +220,31 @@ def track_form_interaction(request, form_id):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def brevo_webhook(request):
+    """
+    Brevo transactional webhook: appends the event(s) to the event log
+    (dashboard/brevo_sync.py) and returns at once -- counters are updated
+    by the sync_email_events aggregator. Configure the webhook URL as
+    /track/brevo/webhook/?token=<BREVO_WEBHOOK_TOKEN>.
+    """
+    from .brevo_sync import ingest_webhook_payload
+
+    expected = getattr(settings, 'BREVO_WEBHOOK_TOKEN', '')
+    token = request.GET.get('token', '')
+    if not expected or not hmac.compare_digest(token, expected):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    stored = ingest_webhook_payload(payload)
+    return JsonResponse({'success': True, 'stored': stored})
+
+
 def get_client_ip(request):
     """Get client IP address from request"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
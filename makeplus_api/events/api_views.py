@@ -5,11 +5,13 @@ These views return JSON responses, not HTML templates
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework import status
 from rest_framework.renderers import JSONRenderer
 from django.db.models import Count, Q
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
 from .models import (
     UserEventAssignment, Session, RoomAccess, Room,
     Participant, Event
@@ -517,3 +519,42 @@ class UserDataExportAPIView(APIView):
             data['questions_asked'] = []
 
         return Response(data)
+
+
+@method_decorator(never_cache, name='dispatch')
+class ScanAuditMetricsAPIView(APIView):
+    """
+    Health of the buffered ControllerScan writer (events/scan_audit.py) in
+    the process answering the request: queue depth, flush latency, totals.
+    Never cached -- the site-wide cache middleware would otherwise serve a
+    5-minute-old snapshot.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        from .scan_audit import scan_audit_writer
+        return Response(scan_audit_writer.metrics())
+
+
+@method_decorator(never_cache, name='dispatch')
+class RequestMetricsAPIView(APIView):
+    """
+    Per-view request latency percentiles and query counts recorded by
+    QueryMetricsMiddleware (events/request_metrics.py) in the process
+    answering the request, plus per-host counters for outbound provider
+    calls (makeplus_api/outbound_http.py). DELETE starts a fresh
+    measurement window for both.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        from makeplus_api.outbound_http import get_http_client
+        from .request_metrics import request_metrics
+        return Response({**request_metrics.snapshot(), 'outbound': get_http_client().stats()})
+
+    def delete(self, request):
+        from makeplus_api.outbound_http import get_http_client
+        from .request_metrics import request_metrics
+        request_metrics.reset()
+        get_http_client().reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -497,7 +497,7 @@ class MyEventsView(APIView):
 
         current_event_id = None
         event_context = getattr(request, 'event_context', None)
-        if event_context is not None:
+        if event_context:
             current_event_id = str(event_context.id)
 
         return Response({
@@ -0,0 +1,57 @@
+"""
+JWT authentication that decodes each request's token only once.
+
+EventContextMiddleware needs the token's event_id claim, and DRF's
+JWTAuthentication needs the same token to find the user -- each used to
+decode and verify it on its own. Both go through validated_token() now,
+which keeps the result on the underlying HttpRequest for whichever of the
+two asks second.
+"""
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def raw_bearer_token(request):
+    """The raw token from a "Bearer <token>" Authorization header, or None."""
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    parts = auth_header.split(' ')
+    return parts[1] if len(parts) == 2 and parts[1] else None
+
+
+def validated_token(request, raw_token):
+    """
+    The verified AccessToken for `raw_token`, or None if it doesn't verify,
+    decoded at most once per request. `request` is the Django HttpRequest.
+    """
+    cached = getattr(request, '_validated_jwt', None)
+    if cached is not None and cached[0] == raw_token:
+        return cached[1]
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        token = None
+    request._validated_jwt = (raw_token, token)
+    return token
+
+
+class SharedTokenJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication reusing the token EventContextMiddleware already decoded."""
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        if isinstance(raw_token, bytes):
+            raw_token = raw_token.decode()
+
+        token = validated_token(request._request, raw_token)
+        if token is None:
+            # Let simplejwt raise its usual InvalidToken response.
+            token = self.get_validated_token(raw_token)
+        return self.get_user(token), token
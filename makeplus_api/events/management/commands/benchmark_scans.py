@@ -0,0 +1,167 @@
+"""
+Benchmark the badge scan endpoints against a seeded event.
+
+Seeds a throwaway test database through create_multi_event_data
+(--participants N, --transactions M on its first event), then replays scan
+traffic through the full middleware/auth stack with real JWTs: mostly
+registered participants, some repeats, and a share of badges from other
+events. Reports p50/p95/p99 latency and query counts per endpoint, in the
+same shape as /api/metrics/requests/.
+
+Never touches the configured database -- it creates and drops a test
+database like the test runner does, so run it with the test settings:
+
+    python manage.py benchmark_scans --settings=makeplus_api.test_settings
+
+--json prints the report as JSON, e.g. to diff against a previous run.
+"""
+import json
+import logging
+import random
+import time
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from events.request_metrics import summarize
+
+SEED_EVENT_NAME = 'TechSummit Algeria 2025'
+OTHER_EVENT_SHARE = 0.05  # badges from another event (denied scans)
+REPEAT_SHARE = 0.2  # the same badge scanned again (double scans, re-entries)
+
+
+class Command(BaseCommand):
+    help = 'Seed an event and report latency percentiles and query counts for the scan endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, default=500, help='Registered participants to seed')
+        parser.add_argument('--transactions', type=int, default=1000, help='Caisse transactions to seed')
+        parser.add_argument('--requests', type=int, default=200, help='Scans to replay per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured scans per endpoint first')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the scan traffic')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        # Denied scans are part of the traffic; don't log a warning for each
+        request_logger = logging.getLogger('django.request')
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            report = self._run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            request_logger.setLevel(previous_level)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f"{'endpoint':<22} {'reqs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'q p50':>6} {'q max':>6} {'non-2xx':>8}"
+        )
+        for name, row in report['endpoints'].items():
+            self.stdout.write(
+                f"{name:<22} {row['requests']:>5} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} "
+                f"{row['queries_p50']:>6} {row['queries_max']:>6} {row['non_2xx']:>8}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['participants']} participants, {report['transactions']} transactions seeded"
+        ))
+
+    def _run(self, options):
+        from caisse.models import CaisseTransaction
+        from events.models import Event, Participant
+
+        call_command(
+            'create_multi_event_data',
+            participants=options['participants'], transactions=options['transactions'],
+            stdout=StringIO(),
+        )
+        event = Event.objects.get(name=SEED_EVENT_NAME)
+        room = event.rooms.order_by('name').first()
+        registered = list(
+            Participant.objects.filter(registrations__event=event).values_list('user_id', flat=True)
+        )
+        others = list(
+            Participant.objects.exclude(registrations__event=event).values_list('user_id', flat=True)
+        )
+
+        endpoints = {
+            'participant_scan': (
+                User.objects.get(username='tech_controleur'),
+                lambda user_id: ('/api/participants/scan/', {'qr_data': str(user_id)}),
+            ),
+            'room_scan': (
+                User.objects.get(username='tech_gestionnaire'),
+                lambda user_id: (f'/api/rooms/{room.id}/scan_participant/', {'qr_data': str(user_id)}),
+            ),
+            'exposant_scan': (
+                User.objects.get(username='tech_exposant1'),
+                lambda user_id: (
+                    '/api/exposant-scans/scan_participant/', {'qr_data': str(user_id), 'event_id': str(event.id)},
+                ),
+            ),
+        }
+
+        rng = random.Random(options['seed'])
+        report = {
+            'participants': len(registered),
+            'transactions': CaisseTransaction.objects.filter(caisse__event=event).count(),
+            'endpoints': {},
+        }
+        for name, (user, request_for) in endpoints.items():
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {self._access_token(user, event)}")
+            traffic = self._traffic(rng, registered, others, options['warmup'] + options['requests'])
+
+            durations, query_counts, non_2xx = [], [], 0
+            for index, user_id in enumerate(traffic):
+                path, body = request_for(user_id)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.post(path, body, content_type='application/json')
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                if index < options['warmup']:
+                    continue
+                durations.append(elapsed_ms)
+                query_counts.append(len(queries))
+                non_2xx += not 200 <= response.status_code < 300
+
+            report['endpoints'][name] = {
+                'requests': len(durations),
+                'non_2xx': non_2xx,
+                **summarize(durations, query_counts),
+            }
+        return report
+
+    @staticmethod
+    def _access_token(user, event):
+        refresh = RefreshToken.for_user(user)
+        refresh['event_id'] = str(event.id)
+        return str(refresh.access_token)
+
+    @staticmethod
+    def _traffic(rng, registered, others, count):
+        """Scanned user ids: mostly fresh registered badges, some repeats, a few strangers."""
+        scanned = []
+        for _ in range(count):
+            roll = rng.random()
+            if others and roll < OTHER_EVENT_SHARE:
+                scanned.append(rng.choice(others))
+            elif scanned and roll < OTHER_EVENT_SHARE + REPEAT_SHARE:
+                scanned.append(rng.choice(scanned))
+            else:
+                scanned.append(rng.choice(registered))
+        return scanned
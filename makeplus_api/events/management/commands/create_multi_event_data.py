@@ -1,14 +1,30 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from events.models import Event, Room, Session, Participant, RoomAccess, UserEventAssignment
+from events.models import (
+    Event, Room, Session, Participant, ParticipantEventRegistration, RoomAccess, UserEventAssignment,
+)
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 import uuid
 
 
 class Command(BaseCommand):
     help = 'Creates multiple events with comprehensive test data for all user roles'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--participants', type=int, default=0,
+            help='Extra registered participants to add to the first event (load testing, see benchmark_scans)',
+        )
+        parser.add_argument(
+            '--transactions', type=int, default=0,
+            help='Completed caisse transactions to spread over those extra participants',
+        )
+
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.SUCCESS('\n' + '='*80))
         self.stdout.write(self.style.SUCCESS('🚀 CREATING COMPREHENSIVE TEST DATA'))
@@ -332,20 +348,27 @@ class Command(BaseCommand):
                 badge_id = f"{prefix.upper()}-{uuid.uuid4().hex[:8].upper()}"
                 qr_data = f"{event.id}:{user.id}:{badge_id}"
                 
+                # Participant is per user; the event link and room access
+                # live on ParticipantEventRegistration
                 participant, part_created = Participant.objects.get_or_create(
                     user=user,
-                    event=event,
                     defaults={
                         'badge_id': badge_id,
                         'qr_code_data': qr_data,
-                        'is_checked_in': False,
                     }
                 )
+                registration, reg_created = ParticipantEventRegistration.objects.get_or_create(
+                    participant=participant,
+                    event=event,
+                )
                 
-                if part_created:
+                if reg_created:
                     # Give access to all rooms
-                    participant.allowed_rooms.set(rooms)
-                    self.stdout.write(f'  ✅ Created participant badge for: {user.username} (Badge: {badge_id})')
+                    registration.allowed_rooms.set(rooms)
+                    self.stdout.write(f'  ✅ Created participant badge for: {user.username} (Badge: {participant.badge_id})')
+            
+            if prefix == 'tech' and (kwargs['participants'] or kwargs['transactions']):
+                self._seed_load(event, prefix, rooms, gestionnaire, kwargs['participants'], kwargs['transactions'])
             
             self.stdout.write(self.style.SUCCESS(f'✅ Completed setup for: {event.name}\n'))
         
@@ -382,3 +405,80 @@ class Command(BaseCommand):
         self.stdout.write(f'   Total Sessions: {Session.objects.count()}')
         self.stdout.write(f'   Total Participants: {Participant.objects.count()}')
         self.stdout.write(self.style.SUCCESS('='*80 + '\n'))
+
+    def _seed_load(self, event, prefix, rooms, gestionnaire, participant_count, transaction_count):
+        """
+        Bulk participants registered for `event` and completed caisse
+        transactions over them, for load testing the scan paths. Inserted
+        with bulk_create (so no signals), then the entitlement index is
+        rebuilt for the event the way it is after a deploy.
+        """
+        from caisse.models import Caisse, CaisseTransaction, PayableItem
+
+        password = make_password('makeplus2025')
+        existing = User.objects.filter(username__startswith=f'{prefix}_load_').count()
+        users = User.objects.bulk_create([
+            User(
+                username=f'{prefix}_load_{i:05d}',
+                email=f'{prefix}.load.{i:05d}@example.com',
+                first_name='Participant',
+                last_name=f'{i:05d}',
+                password=password,
+            )
+            for i in range(existing, participant_count)
+        ], batch_size=1000)
+        participants = Participant.objects.bulk_create([
+            Participant(user=user, badge_id=f"{prefix.upper()}-LOAD-{uuid.uuid4().hex[:10].upper()}")
+            for user in users
+        ], batch_size=1000)
+        ParticipantEventRegistration.objects.bulk_create([
+            ParticipantEventRegistration(participant=participant, event=event)
+            for participant in participants
+        ], batch_size=1000)
+        self.stdout.write(f'  ✅ Created {len(participants)} load-test participants')
+
+        participants = list(Participant.objects.filter(user__username__startswith=f'{prefix}_load_'))
+        if transaction_count and participants:
+            caisse, _ = Caisse.objects.get_or_create(
+                email=f'caisse@{prefix}.makeplus.dz',
+                defaults={'name': 'Caisse Principale', 'event': event, 'password': password},
+            )
+            # Saved normally so sync_session_to_payable_item creates its PayableItem
+            atelier, _ = Session.objects.get_or_create(
+                event=event,
+                title='Atelier Pratique',
+                defaults={
+                    'room': rooms[1],
+                    'start_time': event.start_date.replace(hour=14, minute=0),
+                    'end_time': event.start_date.replace(hour=16, minute=0),
+                    'session_type': 'atelier',
+                    'is_paid': True,
+                    'price': Decimal('2000'),
+                    'created_by': gestionnaire,
+                },
+            )
+            atelier_item = PayableItem.objects.get(event=event, session=atelier)
+            access_item, _ = PayableItem.objects.get_or_create(
+                event=event,
+                name="Badge d'accès",
+                defaults={'item_type': 'access', 'price': Decimal('5000'), 'is_active': True},
+            )
+
+            transactions = CaisseTransaction.objects.bulk_create([
+                CaisseTransaction(
+                    caisse=caisse,
+                    participant=participants[i % len(participants)],
+                    total_amount=access_item.price + (atelier_item.price if i % 2 else 0),
+                )
+                for i in range(transaction_count)
+            ], batch_size=1000)
+            Through = CaisseTransaction.items.through
+            links = []
+            for i, txn in enumerate(transactions):
+                links.append(Through(caissetransaction_id=txn.id, payableitem_id=access_item.id))
+                if i % 2:
+                    links.append(Through(caissetransaction_id=txn.id, payableitem_id=atelier_item.id))
+            Through.objects.bulk_create(links, batch_size=1000)
+            self.stdout.write(f'  ✅ Created {len(transactions)} load-test caisse transactions')
+
+        call_command('rebuild_entitlements', event=str(event.id), stdout=StringIO())
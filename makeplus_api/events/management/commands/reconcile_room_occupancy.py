@@ -0,0 +1,63 @@
+"""
+Rebuild the incremental room occupancy counters (events/room_occupancy.py)
+and the per-session admission counters (events/room_access.py) from the
+rows they summarize, reporting any drift.
+
+Run once after deploying the occupancy tables, and any time room or
+session counts look off. --check-only reports drift without writing.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from events.models import Event, Room, SessionOccupancy
+from events.room_occupancy import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute room occupancy and session admission counters from the access logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=str,
+            help='Event ID to reconcile (optional, reconciles all events if not provided)',
+        )
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help='Only report counters that disagree with the access logs; write nothing',
+        )
+
+    def handle(self, *args, **options):
+        event_id = options.get('event')
+        check_only = options['check_only']
+
+        rooms = Room.objects.all()
+        sessions = SessionOccupancy.objects.all()
+        if event_id:
+            if not Event.objects.filter(id=event_id).exists():
+                raise CommandError(f"Event with ID {event_id} not found")
+            rooms = rooms.filter(event_id=event_id)
+            sessions = sessions.filter(session__event_id=event_id)
+
+        drift = reconcile(rooms, fix=not check_only)
+        for room, day, stored, actual in drift:
+            what = f"{day}" if day else "current_participants"
+            self.stdout.write(self.style.WARNING(f"  {room.name} ({room.id}) {what}: stored {stored}, actual {actual}"))
+
+        session_drift = 0
+        for occupancy in sessions.annotate(actual=Count('session__attendances')):
+            if occupancy.attendee_count != occupancy.actual:
+                session_drift += 1
+                self.stdout.write(self.style.WARNING(
+                    f"  session {occupancy.session_id}: stored {occupancy.attendee_count}, actual {occupancy.actual}"
+                ))
+                if not check_only:
+                    SessionOccupancy.objects.filter(pk=occupancy.pk).update(attendee_count=occupancy.actual)
+
+        total = len(drift) + session_drift
+        if check_only and total:
+            raise CommandError(f"{total} occupancy counters do not match the access logs")
+        if total:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {total} occupancy counters"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Occupancy counters match the access logs"))
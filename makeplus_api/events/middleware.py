@@ -1,47 +1,119 @@
 """
 Custom middleware for MakePlus API
 """
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+
+from .authentication import raw_bearer_token, validated_token
 from .models import Event
+from .request_metrics import QueryCounter, endpoint_name, request_metrics
+
+
+# Per-process cache of Event rows for EventContextMiddleware -- nearly every
+# API call carries the same handful of event_ids, and each used to cost an
+# Event query. Entries are dropped by the post_save/post_delete receivers in
+# events/signals.py; the TTL bounds how long another worker process can keep
+# serving an event edited elsewhere.
+EVENT_CACHE_TTL = 60  # seconds
+EVENT_CACHE_MAX_ENTRIES = 256
+
+_event_cache = OrderedDict()  # str(event_id) -> (expires_at, event or None)
+_event_cache_lock = threading.Lock()
+
+
+def get_cached_event(event_id):
+    """
+    The Event with this id (a copy -- callers may modify it), or None if it
+    doesn't exist; misses are cached too.
+    """
+    key = str(event_id)
+    now = time.monotonic()
+    with _event_cache_lock:
+        entry = _event_cache.get(key)
+        if entry is not None and entry[0] > now:
+            _event_cache.move_to_end(key)
+            return copy.copy(entry[1])
+
+    event = Event.objects.filter(id=event_id).first()
+    with _event_cache_lock:
+        _event_cache[key] = (now + EVENT_CACHE_TTL, event)
+        _event_cache.move_to_end(key)
+        while len(_event_cache) > EVENT_CACHE_MAX_ENTRIES:
+            _event_cache.popitem(last=False)
+    return copy.copy(event)
+
+
+def invalidate_cached_event(event_id):
+    with _event_cache_lock:
+        _event_cache.pop(str(event_id), None)
+
+
+def clear_event_cache():
+    with _event_cache_lock:
+        _event_cache.clear()
+
+
+def _resolve_event_context(request):
+    raw_token = raw_bearer_token(request)
+    if raw_token is None:
+        return None
+    token = validated_token(request, raw_token)
+    if token is None:
+        return None
+    event_id = token.get('event_id')
+    if not event_id:
+        return None
+    try:
+        return get_cached_event(event_id)
+    except Exception:
+        # Malformed event_id claim -- same as no event context
+        return None
 
 
 class EventContextMiddleware:
     """
     Middleware to extract event context from JWT token and attach it to request
+
+    request.event_context is lazy: the token is only looked at when a view
+    actually reads it (and then shares its decode with
+    SharedTokenJWTAuthentication), and the Event comes from the cache above.
+    Like request.user it's a lazy proxy, so test it for truthiness rather
+    than `is None`.
     """
     def __init__(self, get_response):
         self.get_response = get_response
-        self.jwt_auth = JWTAuthentication()
 
     def __call__(self, request):
-        # Initialize event_context to None
-        request.event_context = None
-        
-        # Try to extract event_id from JWT token in Authorization header
-        try:
-            # Get the raw token from the Authorization header
-            auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-                
-                # Decode the token to get claims
-                from rest_framework_simplejwt.tokens import AccessToken
-                access_token = AccessToken(token)
-                
-                # Extract event_id from token claims
-                event_id = access_token.get('event_id')
-                
-                if event_id:
-                    try:
-                        # Fetch the event object
-                        event = Event.objects.get(id=event_id)
-                        request.event_context = event
-                    except Event.DoesNotExist:
-                        pass
-        except (InvalidToken, TokenError, Exception):
-            # Silently fail - event_context remains None
-            pass
-
-        response = self.get_response(request)
+        request.event_context = SimpleLazyObject(lambda: _resolve_event_context(request))
+        return self.get_response(request)
+
+
+class QueryMetricsMiddleware:
+    """
+    Record each request's wall time, query count and query time per
+    resolved view (events/request_metrics.py). Disabled with
+    REQUEST_METRICS_ENABLED=False.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        endpoint = endpoint_name(request)
+        if endpoint is not None:
+            request_metrics.record(endpoint, duration_ms, counter.count, counter.duration_ms, response.status_code)
         return response
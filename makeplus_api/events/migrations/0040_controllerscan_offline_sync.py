@@ -0,0 +1,35 @@
+# Generated manually on 2026-10-17 10:00
+# ControllerScan was created with raw SQL in 0031 (it isn't in the
+# migration state), so its new columns are added the same way.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0039_add_password_reset_verification'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+            ALTER TABLE events_controllerscan
+                ADD COLUMN IF NOT EXISTS client_scanned_at TIMESTAMP WITH TIME ZONE NULL;
+
+            ALTER TABLE events_controllerscan
+                ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(100) NOT NULL DEFAULT '';
+
+            CREATE UNIQUE INDEX IF NOT EXISTS unique_controller_scan_idempotency_key
+                ON events_controllerscan (controller_id, idempotency_key)
+                WHERE idempotency_key <> '';
+            """,
+            reverse_sql="""
+            DROP INDEX IF EXISTS unique_controller_scan_idempotency_key;
+
+            ALTER TABLE events_controllerscan DROP COLUMN IF EXISTS idempotency_key;
+
+            ALTER TABLE events_controllerscan DROP COLUMN IF EXISTS client_scanned_at;
+            """
+        ),
+    ]
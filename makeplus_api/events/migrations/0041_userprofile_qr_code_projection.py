@@ -0,0 +1,66 @@
+"""
+Add UserProfile.qr_code_stale / qr_code_version (the QR payload is only
+rebuilt when one of its inputs changes).
+
+Hand-written for the same reasons as 0039: `makemigrations` also wants to
+bring in unrelated pre-existing drift on other events models, and the
+columns are added idempotently because this database has lost its
+django_migrations bookkeeping between deploys before. Existing profiles
+start out stale, so each is rebuilt once on its next read.
+"""
+from django.db import migrations, models
+
+
+def _column_names(schema_editor, table_name):
+    with schema_editor.connection.cursor() as cursor:
+        return {
+            column.name
+            for column in schema_editor.connection.introspection.get_table_description(cursor, table_name)
+        }
+
+
+def add_qr_code_projection_fields(apps, schema_editor):
+    # The pre-migration model (database_operations don't see the state
+    # operations), so the new fields are built here.
+    UserProfile = apps.get_model('events', 'UserProfile')
+    existing = _column_names(schema_editor, UserProfile._meta.db_table)
+    new_fields = {
+        'qr_code_stale': models.BooleanField(default=True),
+        'qr_code_version': models.PositiveIntegerField(default=0),
+    }
+    for name, field in new_fields.items():
+        field.contribute_to_class(UserProfile, name)
+        if name not in existing:
+            schema_editor.add_field(UserProfile, field)
+
+
+def reverse_noop(apps, schema_editor):
+    """No-op reverse: this is a resilience guard, not just a schema step."""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0040_controllerscan_offline_sync'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='userprofile',
+                    name='qr_code_stale',
+                    field=models.BooleanField(default=True),
+                ),
+                migrations.AddField(
+                    model_name='userprofile',
+                    name='qr_code_version',
+                    field=models.PositiveIntegerField(default=0),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_qr_code_projection_fields, reverse_noop),
+            ],
+        ),
+    ]
@@ -0,0 +1,65 @@
+"""
+Add SessionAttendance and SessionOccupancy (per-session admission counters
+for events/room_access.py).
+
+Hand-written for the same reasons as 0039: `makemigrations` also wants to
+bring in unrelated pre-existing drift on other events models, and the
+tables are created idempotently because this database has lost its
+django_migrations bookkeeping between deploys before.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_attendance_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        existing = set(schema_editor.connection.introspection.table_names(cursor))
+    for model_name in ('SessionAttendance', 'SessionOccupancy'):
+        model = apps.get_model('events', model_name)
+        if model._meta.db_table not in existing:
+            schema_editor.create_model(model)
+
+
+def reverse_noop(apps, schema_editor):
+    """No-op reverse: this is a resilience guard, not just a schema step."""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0041_userprofile_qr_code_projection'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='SessionAttendance',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('first_entered_at', models.DateTimeField(auto_now_add=True)),
+                        ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_attendances', to='events.participant')),
+                        ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to='events.session')),
+                    ],
+                    options={
+                        'unique_together': {('session', 'participant')},
+                    },
+                ),
+                migrations.CreateModel(
+                    name='SessionOccupancy',
+                    fields=[
+                        ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='events.session')),
+                        ('attendee_count', models.PositiveIntegerField(default=0)),
+                        ('updated_at', models.DateTimeField(auto_now=True)),
+                    ],
+                    options={
+                        'verbose_name_plural': 'Session occupancies',
+                    },
+                ),
+            ],
+            database_operations=[],
+        ),
+        # Separate step so the models above are in the state it reads.
+        migrations.RunPython(create_attendance_tables, reverse_noop),
+    ]
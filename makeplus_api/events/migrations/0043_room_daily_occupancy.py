@@ -0,0 +1,70 @@
+"""
+Add RoomDailyAttendance and RoomDailyOccupancy (incremental per-room,
+per-day occupancy for events/room_occupancy.py, replacing the RoomAccess
+recount signal).
+
+Hand-written for the same reasons as 0039: `makemigrations` also wants to
+bring in unrelated pre-existing drift on other events models, and the
+tables are created idempotently because this database has lost its
+django_migrations bookkeeping between deploys before. Run
+`manage.py reconcile_room_occupancy` once after deploying to fill them
+from the existing RoomAccess rows.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_occupancy_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        existing = set(schema_editor.connection.introspection.table_names(cursor))
+    for model_name in ('RoomDailyAttendance', 'RoomDailyOccupancy'):
+        model = apps.get_model('events', model_name)
+        if model._meta.db_table not in existing:
+            schema_editor.create_model(model)
+
+
+def reverse_noop(apps, schema_editor):
+    """No-op reverse: this is a resilience guard, not just a schema step."""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0042_session_attendance_counters'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RoomDailyAttendance',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('day', models.DateField()),
+                        ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_daily_attendances', to='events.participant')),
+                        ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendances', to='events.room')),
+                    ],
+                    options={
+                        'unique_together': {('room', 'day', 'participant')},
+                    },
+                ),
+                migrations.CreateModel(
+                    name='RoomDailyOccupancy',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('day', models.DateField()),
+                        ('participant_count', models.PositiveIntegerField(default=0)),
+                        ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_occupancy', to='events.room')),
+                    ],
+                    options={
+                        'verbose_name_plural': 'Room daily occupancies',
+                        'unique_together': {('room', 'day')},
+                    },
+                ),
+            ],
+            database_operations=[],
+        ),
+        # Separate step so the models above are in the state it reads.
+        migrations.RunPython(create_occupancy_tables, reverse_noop),
+    ]
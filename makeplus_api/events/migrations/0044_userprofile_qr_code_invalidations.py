@@ -0,0 +1,54 @@
+"""
+Add UserProfile.qr_code_invalidations (bumped by every invalidate_qr_code,
+so a QR rebuild only clears the stale flag if nothing changed meanwhile).
+
+Hand-written and idempotent like 0041: `makemigrations` also wants to bring
+in unrelated pre-existing drift on other events models, and this database
+has lost its django_migrations bookkeeping between deploys before.
+"""
+from django.db import migrations, models
+
+
+def _column_names(schema_editor, table_name):
+    with schema_editor.connection.cursor() as cursor:
+        return {
+            column.name
+            for column in schema_editor.connection.introspection.get_table_description(cursor, table_name)
+        }
+
+
+def add_qr_code_invalidations_field(apps, schema_editor):
+    # The pre-migration model (database_operations don't see the state
+    # operations), so the new field is built here.
+    UserProfile = apps.get_model('events', 'UserProfile')
+    field = models.PositiveIntegerField(default=0)
+    field.contribute_to_class(UserProfile, 'qr_code_invalidations')
+    if 'qr_code_invalidations' not in _column_names(schema_editor, UserProfile._meta.db_table):
+        schema_editor.add_field(UserProfile, field)
+
+
+def reverse_noop(apps, schema_editor):
+    """No-op reverse: this is a resilience guard, not just a schema step."""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0043_room_daily_occupancy'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='userprofile',
+                    name='qr_code_invalidations',
+                    field=models.PositiveIntegerField(default=0),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_qr_code_invalidations_field, reverse_noop),
+            ],
+        ),
+    ]
@@ -70,6 +70,15 @@ class UserProfile(models.Model):
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     qr_code_data = models.JSONField(default=dict, blank=True, help_text="User's QR code data (used across all events)")
+    # qr_code_data is a stored projection of the user's assignment,
+    # registration and caisse transactions. Those writes flag it stale (see
+    # invalidate_qr_code and the receivers in events/signals.py); reads
+    # rebuild it only then, and bump the version when they do. Every
+    # invalidation also bumps qr_code_invalidations, so a rebuild that raced
+    # with one leaves the flag set.
+    qr_code_stale = models.BooleanField(default=True)
+    qr_code_version = models.PositiveIntegerField(default=0)
+    qr_code_invalidations = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -79,10 +88,31 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"Profile: {self.user.username}"
-    
+
+    @staticmethod
+    def invalidate_qr_code(**filters):
+        """
+        Flag the QR payload of every profile matching `filters` (e.g.
+        user_id=..., user__event_assignments__event=...) for a rebuild on
+        its next read. One UPDATE, no rebuild here. Profiles already flagged
+        are bumped too: one of them may be mid-rebuild.
+        """
+        UserProfile.objects.filter(**filters).update(
+            qr_code_stale=True, qr_code_invalidations=models.F('qr_code_invalidations') + 1,
+        )
+
     def get_or_create_qr_code(self):
-        """Generate or return existing user-level QR code with full participant info"""
-        # Always regenerate to get latest data
+        """
+        Return the user-level QR code with full participant info, rebuilding
+        it only when one of its inputs changed since the last build.
+        """
+        if not self.qr_code_stale and self.qr_code_data:
+            return self.qr_code_data
+
+        # Inputs changed after this read must not be marked as built in
+        invalidations = UserProfile.objects.filter(pk=self.pk).values_list(
+            'qr_code_invalidations', flat=True
+        ).first()
         user = self.user
         
         # Get user's active event assignment
@@ -200,7 +230,16 @@ class UserProfile(models.Model):
                 }
         
         self.qr_code_data = qr_data
-        self.save()
+        # Only if no invalidation landed during the rebuild; otherwise the
+        # flag stays set and the next read rebuilds again.
+        saved = UserProfile.objects.filter(pk=self.pk, qr_code_invalidations=invalidations).update(
+            qr_code_data=qr_data, qr_code_stale=False,
+            qr_code_version=models.F('qr_code_version') + 1, updated_at=timezone.now(),
+        )
+        if saved:
+            self.qr_code_stale = False
+            self.qr_code_version += 1
+            self.qr_code_invalidations = invalidations
         return self.qr_code_data
     
     @staticmethod
@@ -589,6 +628,67 @@ class SessionAccess(models.Model):
         return f"{self.participant.user.username} - {self.session.title} ({self.payment_status})"
 
 
+class SessionAttendance(models.Model):
+    """A participant admitted into a session -- one row however many times they re-enter"""
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='attendances')
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='session_attendances')
+    first_entered_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('session', 'participant')
+
+    def __str__(self):
+        return f"{self.participant_id} - {self.session_id}"
+
+
+class SessionOccupancy(models.Model):
+    """
+    Distinct participants admitted into a session so far, kept by
+    events/room_access.py with F() increments alongside SessionAttendance
+    (never saved from a loaded instance, so a stale copy can't reset it)
+    """
+    session = models.OneToOneField(Session, on_delete=models.CASCADE, primary_key=True, related_name='occupancy')
+    attendee_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Session occupancies'
+
+    def __str__(self):
+        return f"{self.session_id}: {self.attendee_count}"
+
+
+class RoomDailyAttendance(models.Model):
+    """A participant granted into a room on a given (local) day -- one row however many scans"""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='daily_attendances')
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='room_daily_attendances')
+    day = models.DateField()
+
+    class Meta:
+        unique_together = ('room', 'day', 'participant')
+
+    def __str__(self):
+        return f"{self.participant_id} - {self.room_id} - {self.day}"
+
+
+class RoomDailyOccupancy(models.Model):
+    """
+    Distinct participants granted into a room on a given day, kept by
+    events/room_occupancy.py with F() increments alongside
+    RoomDailyAttendance
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='daily_occupancy')
+    day = models.DateField()
+    participant_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('room', 'day')
+        verbose_name_plural = 'Room daily occupancies'
+
+    def __str__(self):
+        return f"{self.room_id} {self.day}: {self.participant_count}"
+
+
 class Annonce(models.Model):
     """Event announcements targeted to specific user groups"""
     TARGET_CHOICES = [
@@ -723,15 +823,21 @@ def update_event_room_count(sender, instance, **kwargs):
     event.total_rooms = event.rooms.filter(is_active=True).count()
     event.save(update_fields=['total_rooms'])
 
-@receiver([post_save, post_delete], sender=RoomAccess)
-def update_room_participant_count(sender, instance, **kwargs):
-    """Auto-update room's current_participants count"""
-    room = instance.room
-    room.current_participants = room.accesses.filter(
-        status='granted',
-        accessed_at__date=room.event.start_date.date()
-    ).values('participant').distinct().count()
-    room.save(update_fields=['current_participants'])
+@receiver(post_save, sender=RoomAccess)
+def track_room_access(sender, instance, created, **kwargs):
+    """
+    Keep the room's occupancy counters in step with this access --
+    incrementally, see events/room_occupancy.py (bulk check-ins go through
+    record_room_accesses() there instead, one counter update per batch)
+    """
+    from .room_occupancy import sync_room_access
+    sync_room_access(instance, created=created)
+
+
+@receiver(post_delete, sender=RoomAccess)
+def untrack_room_access(sender, instance, **kwargs):
+    from .room_occupancy import sync_room_access
+    sync_room_access(instance, deleted=True)
 
 
 class EventRegistration(models.Model):
@@ -1148,7 +1254,15 @@ class ControllerScan(models.Model):
     # Metadata
     total_paid_items = models.IntegerField(default=0, help_text="Number of paid items at scan time")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Total amount paid")
-    
+
+    # Offline scans uploaded later through ParticipantViewSet.scan_sync --
+    # scanned_at is when the row reached the server, this is when the
+    # device actually scanned the badge.
+    client_scanned_at = models.DateTimeField(null=True, blank=True, help_text="Device time of an offline scan")
+    # Device-generated key for an offline scan, so a retried upload never
+    # logs the same scan twice. Empty for live scans.
+    idempotency_key = models.CharField(max_length=100, blank=True, default='', help_text="Client key of an offline scan")
+
     class Meta:
         ordering = ['-scanned_at']
         indexes = [
@@ -1156,6 +1270,13 @@ class ControllerScan(models.Model):
             models.Index(fields=['event', '-scanned_at']),
             models.Index(fields=['controller', 'event', '-scanned_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['controller', 'idempotency_key'],
+                condition=~models.Q(idempotency_key=''),
+                name='unique_controller_scan_idempotency_key',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.controller.username} scanned {self.participant_name} at {self.scanned_at}"
@@ -0,0 +1,123 @@
+"""
+Content-addressed cache of rendered badge QR PNGs.
+
+dashboard.views.download_qr_code and caisse.views.print_badge used to build
+a fresh qrcode.QRCode and encode a Pillow PNG on every request, for content
+that almost never changes (the QR only carries the user id). A rendered
+image is fully determined by its payload and render options, so it's
+stored under a hash of exactly those: first in a small per-process LRU,
+then in QR_IMAGE_CACHE_DIR on local disk, so a restarted worker doesn't
+have to re-render every badge either. The same hash is the image's ETag.
+
+Local disk on purpose, not default_storage: media goes to the cPanel HTTP
+storage, and a network round trip per lookup would cost more than the
+render it saves. Losing the directory (e.g. on redeploy) only costs a
+re-render.
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import qrcode
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CACHE_MAX_ENTRIES = 512
+
+ERROR_CORRECTION_LEVELS = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+_memory_cache = OrderedDict()  # key -> png bytes
+_memory_cache_lock = threading.Lock()
+
+
+def badge_qr_content(user_id):
+    """
+    What a badge QR encodes: the user id as plain text -- the same content
+    as dashboard/views.py _qr_display_payload and the mobile app, and the
+    only thing the scan endpoints read.
+    """
+    return str(user_id)
+
+
+def _cache_dir():
+    return getattr(settings, 'QR_IMAGE_CACHE_DIR', None) or os.path.join(tempfile.gettempdir(), 'makeplus-qr')
+
+
+def qr_cache_key(data, box_size=10, border=4, error_correction='M'):
+    return hashlib.sha256(f"{data}\x00{box_size}\x00{border}\x00{error_correction}".encode()).hexdigest()
+
+
+def render_qr_image(data, box_size=10, border=4, error_correction='M'):
+    """Uncached render, as a Pillow image (black on white)."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=ERROR_CORRECTION_LEVELS[error_correction],
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").get_image()
+
+
+def get_qr_png(data, box_size=10, border=4, error_correction='M'):
+    """
+    PNG bytes for this payload and render options, plus the ETag they're
+    served under: (png, etag).
+    """
+    key = qr_cache_key(data, box_size, border, error_correction)
+    etag = f'"{key}"'
+
+    with _memory_cache_lock:
+        png = _memory_cache.get(key)
+        if png is not None:
+            _memory_cache.move_to_end(key)
+            return png, etag
+
+    path = os.path.join(_cache_dir(), key[:2], f"{key}.png")
+    try:
+        with open(path, 'rb') as f:
+            png = f.read()
+    except OSError:
+        png = None
+
+    if png is None:
+        buffer = io.BytesIO()
+        render_qr_image(data, box_size, border, error_correction).save(buffer, format='PNG')
+        png = buffer.getvalue()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so a concurrent reader never sees half a file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"[QR CACHE] Could not write {path}: {e}")
+
+    with _memory_cache_lock:
+        _memory_cache[key] = png
+        while len(_memory_cache) > MEMORY_CACHE_MAX_ENTRIES:
+            _memory_cache.popitem(last=False)
+    return png, etag
+
+
+def clear_memory_cache():
+    with _memory_cache_lock:
+        _memory_cache.clear()
+
+
+def etag_matches(request, etag):
+    """True if the client already holds this image (If-None-Match)."""
+    if_none_match = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
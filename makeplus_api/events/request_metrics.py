@@ -0,0 +1,136 @@
+"""
+Per-endpoint request latency and query counts, measured in production.
+
+Nothing measured the scan paths (ParticipantViewSet.scan_participant,
+RoomViewSet.scan_participant, ExposantScanViewSet.scan_participant), so a
+change adding a query per scan only showed up as a slow gate on event day.
+QueryMetricsMiddleware (events/middleware.py) times every request and
+counts its queries through a connection execute_wrapper, and records them
+here per resolved view; RequestMetricsAPIView serves the snapshot.
+
+Per process, like the scan audit metrics: totals plus a window of the last
+REQUEST_METRICS_SAMPLE_SIZE requests per view for the percentiles. The
+benchmark_scans command reports in the same shape from a seeded event.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (pct in 0-100), or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def summarize(durations_ms, query_counts):
+    """p50/p95/p99 latency and query counts for one endpoint's samples."""
+    return {
+        'p50_ms': _round(percentile(durations_ms, 50)),
+        'p95_ms': _round(percentile(durations_ms, 95)),
+        'p99_ms': _round(percentile(durations_ms, 99)),
+        'max_ms': _round(max(durations_ms, default=None)),
+        'queries_p50': percentile(query_counts, 50),
+        'queries_max': max(query_counts, default=None),
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts and times every query it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration_ms += (time.perf_counter() - started) * 1000
+
+
+class _EndpointStats:
+    def __init__(self, sample_size):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.total_queries = 0
+        self.total_query_ms = 0.0
+        self.durations_ms = deque(maxlen=sample_size)
+        self.query_counts = deque(maxlen=sample_size)
+
+
+class RequestMetrics:
+    """Thread-safe per-endpoint request statistics for this process."""
+
+    def __init__(self, sample_size=1000):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.since = timezone.now()
+
+    def record(self, endpoint, duration_ms, query_count, query_ms, status_code):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _EndpointStats(self.sample_size)
+            stats.requests += 1
+            stats.errors += status_code >= 500
+            stats.total_ms += duration_ms
+            stats.total_queries += query_count
+            stats.total_query_ms += query_ms
+            stats.durations_ms.append(duration_ms)
+            stats.query_counts.append(query_count)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.since = timezone.now()
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {
+                endpoint: (stats.requests, stats.errors, stats.total_ms, stats.total_queries,
+                           stats.total_query_ms, list(stats.durations_ms), list(stats.query_counts))
+                for endpoint, stats in self._endpoints.items()
+            }
+            since = self.since
+
+        result = {}
+        for endpoint, (requests, errors, total_ms, total_queries, total_query_ms, durations, counts) in endpoints.items():
+            result[endpoint] = {
+                'requests': requests,
+                'errors': errors,
+                'mean_ms': _round(total_ms / requests),
+                'mean_queries': _round(total_queries / requests),
+                'mean_query_ms': _round(total_query_ms / requests),
+                **summarize(durations, counts),
+            }
+        return {
+            'since': since.isoformat(),
+            'sample_size': self.sample_size,
+            'endpoints': dict(sorted(result.items())),
+        }
+
+
+def endpoint_name(request):
+    """The key a request is recorded under: method plus resolved view name."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return f"{request.method} {match.view_name or match._func_path}"
+
+
+request_metrics = RequestMetrics(sample_size=getattr(settings, 'REQUEST_METRICS_SAMPLE_SIZE', 1000))
@@ -0,0 +1,173 @@
+"""
+One answer to "may participant P enter room R now?".
+
+RoomViewSet.verify_access, RoomViewSet.scan_participant and
+ParticipantViewSet.scan_participant each used to work this out on their
+own -- different registration checks (verify_access even required an
+active UserEventAssignment, which plain participants never have),
+different QR parsing, and paid sessions checked against SessionAccess in
+one place and the caisse entitlement index in another. All three go
+through decide_room_access() / decide_event_access() now, on top of the
+entitlement index (caisse/entitlements.py): one indexed lookup answers
+both "registered?" and "paid for which sessions?".
+
+Room capacity is enforced per session: the first admission of a
+participant into a session adds a SessionAttendance row and bumps
+SessionOccupancy.attendee_count with a conditional F() update
+(attendee_count < room capacity), so the check and the increment are one
+atomic statement and concurrent gates can't both take the last seat. The
+whole RoomAccess table is never recounted to decide anything; a
+participant already admitted walks back in without touching the counter.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from caisse.entitlements import get_entitlement
+from .models import Session, SessionAccess, SessionAttendance, SessionOccupancy
+
+GRANTED = 'granted'
+DENIED = 'denied'
+INVALID = 'invalid'
+
+# Why a decision isn't GRANTED, and the HTTP status the scan endpoints
+# answer it with.
+NOT_REGISTERED = 'not_registered'
+WRONG_ROOM = 'wrong_room'
+PAYMENT_REQUIRED = 'payment_required'
+ROOM_FULL = 'room_full'
+
+REASON_MESSAGES = {
+    NOT_REGISTERED: 'Participant not registered for this event',
+    WRONG_ROOM: 'Session is not in this room',
+    PAYMENT_REQUIRED: 'Payment required for this session',
+    ROOM_FULL: 'Room is full for this session',
+}
+
+REASON_HTTP_STATUS = {
+    NOT_REGISTERED: 403,
+    WRONG_ROOM: 400,
+    PAYMENT_REQUIRED: 402,
+    ROOM_FULL: 409,
+}
+
+
+class AccessDecision:
+    """The outcome of an access check, plus what it was decided from."""
+
+    def __init__(self, status, reason=None, entitlement=None, session=None, first_entry=False):
+        self.status = status
+        self.reason = reason
+        self.entitlement = entitlement
+        self.session = session
+        self.first_entry = first_entry
+
+    @property
+    def granted(self):
+        return self.status == GRANTED
+
+    @property
+    def message(self):
+        return REASON_MESSAGES.get(self.reason, 'Access granted successfully')
+
+    @property
+    def http_status(self):
+        return REASON_HTTP_STATUS.get(self.reason, 200)
+
+    def __repr__(self):
+        return f"<AccessDecision {self.status} reason={self.reason}>"
+
+
+def current_session(room, at=None):
+    """The active session running in `room` at `at` (default now), or None."""
+    at = at or timezone.now()
+    return Session.objects.filter(
+        room=room, is_active=True, start_time__lte=at, end_time__gt=at,
+    ).order_by('start_time').first()
+
+
+def has_paid_for_session(participant, session, entitlement):
+    """
+    True if the entitlement index lists `session` as paid, or an organizer
+    granted access by hand (SessionAccess, e.g. from the admin) -- only
+    the second needs a query, and only when the first says no.
+    """
+    session_id = str(session.id)
+    if any(item['id'] == session_id for item in entitlement.paid_items if 'session_details' in item):
+        return True
+    return SessionAccess.objects.filter(participant=participant, session=session, has_access=True).exists()
+
+
+def admit_to_session(participant, session, capacity):
+    """
+    Count `participant` into `session` unless that would take it past
+    `capacity` (None = unlimited). Re-entries are always admitted.
+
+    Returns (admitted, first_entry).
+    """
+    with transaction.atomic():
+        _attendance, created = SessionAttendance.objects.get_or_create(session=session, participant=participant)
+        if not created:
+            return True, False
+
+        occupancy = SessionOccupancy.objects.filter(session=session)
+        if capacity is not None:
+            occupancy = occupancy.filter(attendee_count__lt=capacity)
+        if occupancy.update(attendee_count=F('attendee_count') + 1):
+            return True, True
+
+        # Either full, or no counter row yet (first admission into this
+        # session) -- create it and try once more.
+        SessionOccupancy.objects.get_or_create(session=session)
+        if occupancy.update(attendee_count=F('attendee_count') + 1):
+            return True, True
+
+        # Full -- undo the attendance row.
+        transaction.set_rollback(True)
+        return False, False
+
+
+def session_occupancy(session_ids):
+    """{session_id: attendee_count} for these sessions (0 if nobody yet)."""
+    counts = dict(SessionOccupancy.objects.filter(session_id__in=session_ids).values_list('session_id', 'attendee_count'))
+    return {session_id: counts.get(session_id, 0) for session_id in session_ids}
+
+
+def decide_event_access(participant, event, entitlement=None):
+    """Event-level check (no room): is `participant` registered for `event`?"""
+    entitlement = entitlement or get_entitlement(participant, event)
+    if not entitlement.is_registered:
+        return AccessDecision(DENIED, NOT_REGISTERED, entitlement=entitlement)
+    return AccessDecision(GRANTED, entitlement=entitlement)
+
+
+def decide_room_access(participant, room, session=None, admit=True, entitlement=None):
+    """
+    May `participant` enter `room` now? `session` defaults to the one
+    currently running in the room (free entry when nothing is). With
+    admit=True a granted decision also counts the participant into the
+    session -- call it that way exactly once per physical entry; admit=False
+    only looks.
+    """
+    event = room.event
+    decision = decide_event_access(participant, event, entitlement)
+    if not decision.granted:
+        return decision
+    entitlement = decision.entitlement
+
+    if session is None:
+        session = current_session(room)
+    elif session.room_id != room.id:
+        return AccessDecision(INVALID, WRONG_ROOM, entitlement=entitlement, session=session)
+    if session is None:
+        return AccessDecision(GRANTED, entitlement=entitlement)
+
+    if session.is_paid and not has_paid_for_session(participant, session, entitlement):
+        return AccessDecision(DENIED, PAYMENT_REQUIRED, entitlement=entitlement, session=session)
+
+    first_entry = False
+    if admit:
+        admitted, first_entry = admit_to_session(participant, session, room.capacity)
+        if not admitted:
+            return AccessDecision(DENIED, ROOM_FULL, entitlement=entitlement, session=session)
+    return AccessDecision(GRANTED, entitlement=entitlement, session=session, first_entry=first_entry)
@@ -0,0 +1,184 @@
+"""
+Incremental room occupancy: distinct participants granted into each room
+per (local) day.
+
+The RoomAccess post_save/post_delete receiver used to recount every
+granted access of the room with a DISTINCT query and save the room again,
+on every single access -- O(n) per check-in, O(n^2) for a batch. Here
+each (room, day, participant) is one RoomDailyAttendance row (unique), and
+only the first granted access that creates it bumps the counters:
+RoomDailyOccupancy.participant_count for that day, and Room.
+current_participants when the day is the event's first day (what that
+field has always counted). Both are F() updates, never a recount.
+
+record_room_accesses() is the bulk path: one bulk_create for the accesses
+and one counter update per (room, day) for the whole batch. Deletes and
+status edits only look at the one participant concerned.
+
+reconcile() rebuilds everything from RoomAccess -- the
+reconcile_room_occupancy command, after deploying or if counters drift
+(e.g. two bulk batches racing on the same participant).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Room, RoomAccess, RoomDailyAttendance, RoomDailyOccupancy
+
+# Rows accepted by one bulk check-in request (RoomAccessViewSet.create)
+MAX_ACCESSES_PER_BATCH = 500
+
+
+def counted_day(event):
+    """The day Room.current_participants counts: the event's first (local) day."""
+    return timezone.localdate(event.start_date)
+
+
+def access_day(access):
+    return timezone.localdate(access.accessed_at)
+
+
+def _add_counts(counts, rooms):
+    """
+    Apply {(room_id, day): delta} to RoomDailyOccupancy and, for each
+    room's counted day, to Room.current_participants. `rooms` maps room_id
+    to a Room with its event loaded.
+    """
+    for (room_id, day), delta in counts.items():
+        if not delta:
+            continue
+        daily = RoomDailyOccupancy.objects.filter(room_id=room_id, day=day)
+        if delta < 0:
+            daily = daily.filter(participant_count__gte=-delta)
+        if not daily.update(participant_count=F('participant_count') + delta) and delta > 0:
+            RoomDailyOccupancy.objects.get_or_create(room_id=room_id, day=day)
+            daily.update(participant_count=F('participant_count') + delta)
+
+        if day == counted_day(rooms[room_id].event):
+            room = Room.objects.filter(pk=room_id)
+            if delta < 0:
+                room = room.filter(current_participants__gte=-delta)
+            room.update(current_participants=F('current_participants') + delta)
+
+
+def track_admission(room, participant_id, day):
+    """Count one granted access. Returns True if it was the participant's first that day."""
+    with transaction.atomic():
+        _attendance, created = RoomDailyAttendance.objects.get_or_create(
+            room=room, participant_id=participant_id, day=day,
+        )
+        if created:
+            _add_counts({(room.pk, day): 1}, {room.pk: room})
+    return created
+
+
+def untrack_admission(room, participant_id, day):
+    """
+    Uncount a participant's day in `room` if no granted access of theirs is
+    left for it (after a delete, or a status edit away from 'granted').
+    """
+    still_granted = RoomAccess.objects.filter(
+        room=room, participant_id=participant_id, status='granted', accessed_at__date=day,
+    ).exists()
+    if still_granted:
+        return
+    with transaction.atomic():
+        deleted, _ = RoomDailyAttendance.objects.filter(room=room, participant_id=participant_id, day=day).delete()
+        if deleted:
+            _add_counts({(room.pk, day): -1}, {room.pk: room})
+
+
+def sync_room_access(access, created=False, deleted=False):
+    """Keep the counters in step with one RoomAccess write (the model signals)."""
+    room, day = access.room, access_day(access)
+    if access.status == 'granted' and not deleted:
+        track_admission(room, access.participant_id, day)
+    elif not created:
+        untrack_admission(room, access.participant_id, day)
+
+
+def record_room_accesses(accesses):
+    """
+    Bulk check-in: insert these unsaved RoomAccess rows with one
+    bulk_create (no per-row signals) and update the counters once for the
+    whole batch. Returns the created rows.
+    """
+    with transaction.atomic():
+        accesses = RoomAccess.objects.bulk_create(accesses)
+        granted = {
+            (access.room_id, access.participant_id, access_day(access))
+            for access in accesses if access.status == 'granted'
+        }
+        if not granted:
+            return accesses
+
+        room_ids = {room_id for room_id, _, _ in granted}
+        already = set(
+            RoomDailyAttendance.objects.filter(
+                room_id__in=room_ids,
+                participant_id__in={participant_id for _, participant_id, _ in granted},
+                day__in={day for _, _, day in granted},
+            ).values_list('room_id', 'participant_id', 'day')
+        )
+        new = granted - already
+        RoomDailyAttendance.objects.bulk_create(
+            [RoomDailyAttendance(room_id=room_id, participant_id=participant_id, day=day)
+             for room_id, participant_id, day in new],
+            ignore_conflicts=True,
+        )
+        rooms = Room.objects.select_related('event').in_bulk(room_ids)
+        _add_counts(Counter((room_id, day) for room_id, _, day in new), rooms)
+    return accesses
+
+
+def room_occupancy(room, day=None):
+    """Distinct participants granted into `room` on `day` (default today)."""
+    day = day or timezone.localdate()
+    return RoomDailyOccupancy.objects.filter(room=room, day=day).values_list(
+        'participant_count', flat=True,
+    ).first() or 0
+
+
+def reconcile(rooms, fix=True):
+    """
+    Recompute the occupancy of `rooms` from their RoomAccess rows and, with
+    fix=True, store it. Returns the drift found, as a list of
+    (room, day, stored_count, actual_count); day is None for
+    Room.current_participants.
+    """
+    drift = []
+    for room in rooms.select_related('event'):
+        actual = set(
+            RoomAccess.objects.filter(room=room, status='granted').annotate(
+                day=TruncDate('accessed_at'),
+            ).values_list('participant_id', 'day').distinct()
+        )
+        actual_counts = Counter(day for _, day in actual)
+        stored_counts = dict(
+            RoomDailyOccupancy.objects.filter(room=room).values_list('day', 'participant_count')
+        )
+        for day in set(actual_counts) | set(stored_counts):
+            if actual_counts.get(day, 0) != stored_counts.get(day, 0):
+                drift.append((room, day, stored_counts.get(day, 0), actual_counts.get(day, 0)))
+        current = actual_counts.get(counted_day(room.event), 0)
+        if room.current_participants != current:
+            drift.append((room, None, room.current_participants, current))
+
+        if fix:
+            with transaction.atomic():
+                RoomDailyAttendance.objects.filter(room=room).delete()
+                RoomDailyAttendance.objects.bulk_create(
+                    [RoomDailyAttendance(room=room, participant_id=participant_id, day=day)
+                     for participant_id, day in actual],
+                    batch_size=1000,
+                )
+                RoomDailyOccupancy.objects.filter(room=room).delete()
+                RoomDailyOccupancy.objects.bulk_create(
+                    [RoomDailyOccupancy(room=room, day=day, participant_count=count)
+                     for day, count in actual_counts.items()],
+                )
+                Room.objects.filter(pk=room.pk).update(current_participants=current)
+    return drift
@@ -0,0 +1,168 @@
+"""
+Buffered ControllerScan audit log.
+
+Every badge scan (ParticipantViewSet.scan_participant) logs a ControllerScan
+row for the controller statistics. Written inline, that insert is a full
+round trip to the remote Supabase pooler on every scan, for a row nothing
+in the response depends on. Scans are queued here instead and a background
+thread writes them with bulk_create -- as soon as SCAN_AUDIT_BATCH_SIZE
+rows are waiting, or every SCAN_AUDIT_FLUSH_INTERVAL_MS otherwise -- with a
+final flush when the process exits.
+
+Like the inline create it replaces, the log is best effort: when a batch
+insert fails its rows are retried one by one, so one bad row (a since-
+deleted controller, say) costs only itself; failures are logged and
+counted, never raised to the scan. Queue depth and flush latency are
+exposed through metrics() (ScanAuditMetricsAPIView).
+
+Since scanned_at is auto_now_add, a buffered row is stamped when it is
+flushed, at most one flush interval after the scan itself.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ControllerScan
+
+logger = logging.getLogger(__name__)
+
+
+class ScanAuditWriter:
+    """In-process queue of ControllerScan rows plus the thread that writes them."""
+
+    def __init__(self, batch_size=100, flush_interval_ms=500, max_queue_size=10000, asynchronous=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.asynchronous = asynchronous
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+        self.flushed_total = 0
+        self.failed_total = 0
+        self.dropped_total = 0
+        self.last_flush_size = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self.last_flush_at = None
+
+    def record(self, **fields):
+        """Queue one ControllerScan (model field kwargs) for writing."""
+        scan = ControllerScan(**fields)
+        if not self.asynchronous:
+            self._write([scan])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(scan)
+        except queue.Full:
+            # DB unreachable for long enough to fill the queue -- drop
+            # rather than block scans on an audit row.
+            self.dropped_total += 1
+            logger.warning("[SCAN AUDIT] Queue full, dropping scan log")
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything queued so far, in batch_size chunks."""
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _write(self, batch):
+        started = time.monotonic()
+        written = len(batch)
+        try:
+            # Savepoints here and below: unbuffered (SCAN_AUDIT_ASYNC=False),
+            # this runs inside the scan request's own transaction
+            with transaction.atomic():
+                ControllerScan.objects.bulk_create(batch)
+        except Exception as e:
+            logger.warning(f"[SCAN AUDIT] Bulk insert of {len(batch)} scan logs failed ({e}), retrying one by one")
+            for scan in batch:
+                try:
+                    with transaction.atomic():
+                        scan.save(force_insert=True)
+                except Exception as e:
+                    written -= 1
+                    self.failed_total += 1
+                    logger.error(f"[SCAN AUDIT] Failed to save scan log: {str(e)}")
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.flushed_total += written
+        self.last_flush_size = len(batch)
+        self.last_flush_ms = round(elapsed_ms, 2)
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        self.last_flush_at = timezone.now()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='scan-audit-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # This thread keeps its own connection -- drop it if the
+            # pooler closed it or it outlived CONN_MAX_AGE.
+            close_old_connections()
+            self.flush()
+        self.flush()
+
+    def shutdown(self, timeout=5):
+        """Stop the background thread after a last flush of the queue."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def metrics(self):
+        return {
+            'asynchronous': self.asynchronous,
+            'queue_depth': self._queue.qsize(),
+            'batch_size': self.batch_size,
+            'flush_interval_ms': int(self.flush_interval * 1000),
+            'flushed_total': self.flushed_total,
+            'failed_total': self.failed_total,
+            'dropped_total': self.dropped_total,
+            'last_flush_size': self.last_flush_size,
+            'last_flush_ms': self.last_flush_ms,
+            'max_flush_ms': self.max_flush_ms,
+            'last_flush_at': self.last_flush_at.isoformat() if self.last_flush_at else None,
+        }
+
+
+scan_audit_writer = ScanAuditWriter(
+    batch_size=getattr(settings, 'SCAN_AUDIT_BATCH_SIZE', 100),
+    flush_interval_ms=getattr(settings, 'SCAN_AUDIT_FLUSH_INTERVAL_MS', 500),
+    asynchronous=getattr(settings, 'SCAN_AUDIT_ASYNC', True),
+)
+
+
+def record_scan(**fields):
+    """Queue a ControllerScan row on the process-wide writer."""
+    scan_audit_writer.record(**fields)
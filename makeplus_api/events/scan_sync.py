@@ -0,0 +1,160 @@
+"""
+Offline badge scans, uploaded in bulk (ParticipantViewSet.scan_sync).
+
+Controller devices keep scanning when the venue wifi drops and queue the
+scans locally; once back online they upload the whole queue in one POST.
+Running each queued scan through the live /participants/scan/ endpoint
+would cost a request plus ~6 queries and a ControllerScan insert per
+badge. Here the batch is resolved set-based instead -- one query each for
+users, participants, registrations and entitlements, whatever the batch
+size -- and every log row is written with a single bulk_create.
+
+Every scan carries a device-generated idempotency key, stored on the
+ControllerScan row (unique per controller), so re-uploading a batch after
+a dropped response is harmless: already-synced scans come back as
+'duplicate' with the status that was recorded the first time.
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from caisse.entitlements import get_entitlements
+from .models import ControllerScan, Participant, ParticipantEventRegistration
+
+MAX_SCANS_PER_SYNC = 500
+
+
+def parse_qr_user_id(qr_data):
+    """
+    The user id a badge QR carries, or None. Plain user id is the current
+    format (dashboard/views.py _qr_display_payload); the old rich-JSON
+    format is still accepted for badges printed before that change.
+    """
+    try:
+        parsed = json.loads(qr_data) if isinstance(qr_data, str) else qr_data
+    except (json.JSONDecodeError, TypeError):
+        parsed = qr_data
+    user_id = parsed.get('user_id') if isinstance(parsed, dict) else parsed
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_client_time(value):
+    """Aware datetime from the device's ISO timestamp, or None."""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def sync_controller_scans(controller, event, scans):
+    """
+    Resolve and log a batch of offline scans for `controller` at `event`.
+
+    `scans` is the uploaded list of {'idempotency_key', 'qr_data',
+    'scanned_at'} dicts. Returns one result dict per scan, in the same
+    order, each with the scan's idempotency_key and a status of
+    'success', 'not_registered', 'invalid' or 'duplicate'.
+    """
+    results = [None] * len(scans)
+    pending = []  # (index, key, user_id, client_time)
+    seen_keys = set()
+    for index, scan in enumerate(scans):
+        key = str(scan.get('idempotency_key') or '').strip() if isinstance(scan, dict) else ''
+        if not key or len(key) > 100:
+            results[index] = {'idempotency_key': key, 'status': 'invalid', 'message': 'idempotency_key is required'}
+            continue
+        if key in seen_keys:
+            results[index] = {'idempotency_key': key, 'status': 'duplicate', 'message': 'Repeated in this batch'}
+            continue
+        seen_keys.add(key)
+        user_id = parse_qr_user_id(scan.get('qr_data'))
+        if user_id is None:
+            results[index] = {'idempotency_key': key, 'status': 'invalid', 'message': 'Invalid QR code format'}
+            continue
+        pending.append((index, key, user_id, _parse_client_time(scan.get('scanned_at'))))
+
+    # Scans this controller already uploaded in an earlier (retried) batch.
+    already_synced = dict(
+        ControllerScan.objects.filter(
+            controller=controller, idempotency_key__in=[key for _, key, _, _ in pending]
+        ).order_by().values_list('idempotency_key', 'status')
+    )
+
+    user_ids = {user_id for _, key, user_id, _ in pending if key not in already_synced}
+    users = User.objects.in_bulk(user_ids)
+    participants = {
+        participant.user_id: participant
+        for participant in Participant.objects.filter(user_id__in=user_ids)
+    }
+    participant_ids = [participant.id for participant in participants.values()]
+    registered_ids = set(
+        ParticipantEventRegistration.objects.filter(
+            event=event, participant_id__in=participant_ids
+        ).values_list('participant_id', flat=True)
+    )
+    entitlements = get_entitlements(registered_ids, event) if registered_ids else {}
+
+    log_rows = []
+    for index, key, user_id, client_time in pending:
+        if key in already_synced:
+            results[index] = {'idempotency_key': key, 'status': 'duplicate', 'recorded_status': already_synced[key]}
+            continue
+        user = users.get(user_id)
+        participant = participants.get(user_id)
+        if user is None or participant is None:
+            results[index] = {
+                'idempotency_key': key, 'status': 'invalid',
+                'message': 'Invalid QR code - user not found' if user is None else 'Participant profile not found',
+            }
+            continue
+
+        result = {
+            'idempotency_key': key,
+            'participant': {
+                'id': str(participant.id),
+                'name': user.get_full_name(),
+                'email': user.email,
+                'badge_id': participant.badge_id,
+            },
+        }
+        log_row = ControllerScan(
+            controller=controller,
+            event=event,
+            participant_user_id=user.id,
+            badge_id=participant.badge_id,
+            participant_name=user.get_full_name() or f"{user.first_name} {user.last_name}",
+            participant_email=user.email,
+            client_scanned_at=client_time,
+            idempotency_key=key,
+        )
+        if participant.id in registered_ids:
+            entitlement = entitlements[participant.id]
+            result.update({
+                'status': 'success',
+                'total_paid_items': len(entitlement.paid_items),
+                'total_amount': float(entitlement.total_amount),
+            })
+            log_row.status = 'success'
+            log_row.total_paid_items = len(entitlement.paid_items)
+            log_row.total_amount = entitlement.total_amount
+        else:
+            result.update({'status': 'not_registered', 'message': 'Participant not registered for this event'})
+            log_row.status = 'not_registered'
+            log_row.error_message = 'Participant not registered for this event'
+        results[index] = result
+        log_rows.append(log_row)
+
+    # ignore_conflicts: two overlapping uploads of the same queue racing
+    # each other still end up with one row per key.
+    ControllerScan.objects.bulk_create(log_rows, batch_size=500, ignore_conflicts=True)
+    return results
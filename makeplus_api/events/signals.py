@@ -1,10 +1,21 @@
 """
-Signals for automatic syncing of paid sessions to payable items
+Signals for automatic syncing of paid sessions to payable items, and of
+the derived data kept at write time -- one section per consumer below
 """
-from django.db.models.signals import post_save, post_delete
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
-from events.models import Session
-from caisse.models import PayableItem
+from events.models import (
+    Event, Participant, ParticipantEventRegistration, Session, UserEventAssignment, UserProfile,
+)
+from caisse.models import CaisseRosterEntry, CaisseTransaction, PayableItem
+from caisse.entitlements import refresh_entitlement, schedule_item_refresh
+from caisse.read_model import refresh_participant
+from caisse.roster import add_registration, sync_participant
+from caisse.stats import refresh_bucket
+from dashboard.models_blocs import RegistrationOrder
+from events.middleware import invalidate_cached_event
 
 
 @receiver(post_save, sender=Session)
@@ -83,3 +94,186 @@ def deactivate_payable_item_on_session_delete(sender, instance, **kwargs):
         payable_item.save()
     except PayableItem.DoesNotExist:
         pass
+
+
+# --- Caisse entitlement index (caisse/entitlements.py) ---------------------
+# Registrations set is_registered; item and session edits change the
+# copies of names, prices, times and rooms the rows carry.
+
+def _refresh_registration_entitlement(participant_id, event_id):
+    # Skip when the registration went away because the participant or the
+    # event itself was deleted -- their entitlement rows are gone with them.
+    event = Event.objects.filter(pk=event_id).first()
+    if event is None or not Participant.objects.filter(pk=participant_id).exists():
+        return
+    refresh_entitlement(participant_id, event)
+
+
+@receiver(post_save, sender=ParticipantEventRegistration)
+@receiver(post_delete, sender=ParticipantEventRegistration)
+def sync_registration_to_entitlement(sender, instance, created=False, **kwargs):
+    """
+    Keep ParticipantEntitlement.is_registered (and so the offline gate
+    snapshot) in step with registrations. Plain saves (check-in, metadata)
+    don't change registration status and are ignored.
+    """
+    if kwargs.get('signal') is post_save and not created:
+        return
+    participant_id, event_id = instance.participant_id, instance.event_id
+    transaction.on_commit(lambda: _refresh_registration_entitlement(participant_id, event_id))
+
+
+@receiver(post_save, sender=PayableItem)
+def sync_payable_item_to_entitlements(sender, instance, created, **kwargs):
+    """Renamed or repriced: the entitlement rows of its buyers carry its name and price."""
+    if not created:
+        schedule_item_refresh(PayableItem.objects.filter(pk=instance.pk), instance.event)
+
+
+@receiver(post_save, sender=Session)
+def sync_session_to_entitlements(sender, instance, created, **kwargs):
+    """Moved in time or to another room: the entitlement rows of its buyers carry both."""
+    if not created:
+        schedule_item_refresh(PayableItem.objects.filter(session=instance), instance.event)
+
+
+# --- Caisse dashboard read model (caisse/read_model.py) --------------------
+# Refreshed in the same DB transaction as the order or transaction write.
+
+@receiver(post_save, sender=RegistrationOrder)
+def sync_order_to_caisse_state(sender, instance, **kwargs):
+    """Submitted, rejected or re-assigned: refresh the participant's caisse state in the same transaction."""
+    if instance.participant_id:
+        refresh_participant(instance.participant_id, instance.event_id)
+
+
+def _refresh_caisse_state(participant_id, event_id):
+    # Same guard as the entitlements: nothing to refresh once the
+    # participant or the event itself is gone.
+    if Event.objects.filter(pk=event_id).exists() and Participant.objects.filter(pk=participant_id).exists():
+        refresh_participant(participant_id, event_id)
+
+
+@receiver(post_delete, sender=RegistrationOrder)
+def sync_deleted_order_to_caisse_state(sender, instance, **kwargs):
+    # After commit: inside an event or participant cascade the state rows
+    # are being deleted along with the order.
+    if instance.participant_id:
+        participant_id, event_id = instance.participant_id, instance.event_id
+        transaction.on_commit(lambda: _refresh_caisse_state(participant_id, event_id))
+
+
+@receiver(post_save, sender=CaisseTransaction)
+def sync_transaction_to_caisse_state(sender, instance, created, **kwargs):
+    """Cancelled (or otherwise updated): refresh the participant's caisse state."""
+    # A new transaction has no items yet; the items m2m_changed below covers it
+    if not created:
+        refresh_participant(instance.participant_id, instance.caisse.event_id)
+
+
+@receiver(m2m_changed, sender=CaisseTransaction.items.through)
+def sync_transaction_items_to_caisse_state(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, CaisseTransaction):
+        refresh_participant(instance.participant_id, instance.caisse.event_id)
+
+
+# --- Caisse statistics buckets (caisse/stats.py) ---------------------------
+
+@receiver(post_save, sender=CaisseTransaction)
+@receiver(post_delete, sender=CaisseTransaction)
+def sync_transaction_to_caisse_stats(sender, instance, **kwargs):
+    """Sold, cancelled or deleted: re-sum its hour's bucket in the same transaction."""
+    refresh_bucket(instance.caisse_id, instance.created_at, instance.payment_method)
+
+
+# --- Caisse roster search rows (caisse/roster.py) --------------------------
+
+@receiver(post_save, sender=ParticipantEventRegistration)
+def add_registration_to_caisse_roster(sender, instance, created, **kwargs):
+    if created:
+        add_registration(instance.participant, instance.event_id)
+
+
+@receiver(post_delete, sender=ParticipantEventRegistration)
+def remove_registration_from_caisse_roster(sender, instance, **kwargs):
+    CaisseRosterEntry.objects.filter(participant_id=instance.participant_id, event_id=instance.event_id).delete()
+
+
+@receiver(post_save, sender=User)
+def sync_user_to_caisse_roster(sender, instance, update_fields=None, **kwargs):
+    # Only the name, email and username are searched
+    if update_fields is not None and not set(update_fields) & {'first_name', 'last_name', 'email', 'username'}:
+        return
+    participant = Participant.objects.filter(user=instance).first()
+    if participant is not None:
+        participant.user = instance
+        sync_participant(participant)
+
+
+@receiver(post_save, sender=Participant)
+def sync_participant_to_caisse_roster(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or 'badge_id' in update_fields):
+        sync_participant(instance)
+
+
+# --- EventContextMiddleware event cache ------------------------------------
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_context_cache(sender, instance, **kwargs):
+    """Drop a saved/deleted event from EventContextMiddleware's per-process cache."""
+    invalidate_cached_event(instance.pk)
+
+
+# --- UserProfile QR payload invalidation -----------------------------------
+# UserProfile.get_or_create_qr_code() only rebuilds qr_code_data once it's
+# flagged stale, so every write to one of its inputs has to flag it here.
+
+@receiver(post_save, sender=User)
+def invalidate_qr_on_user_change(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login only -- not part of the payload.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    UserProfile.invalidate_qr_code(user_id=instance.pk)
+
+
+@receiver(post_save, sender=Participant)
+def invalidate_qr_on_participant_change(sender, instance, **kwargs):
+    UserProfile.invalidate_qr_code(user_id=instance.user_id)
+
+
+@receiver(post_save, sender=UserEventAssignment)
+@receiver(post_delete, sender=UserEventAssignment)
+def invalidate_qr_on_assignment_change(sender, instance, **kwargs):
+    UserProfile.invalidate_qr_code(user_id=instance.user_id)
+
+
+@receiver(post_save, sender=ParticipantEventRegistration)
+@receiver(post_delete, sender=ParticipantEventRegistration)
+def invalidate_qr_on_registration_change(sender, instance, **kwargs):
+    # Includes check-in, which is a plain save of the registration
+    UserProfile.invalidate_qr_code(user__participant_profile=instance.participant_id)
+
+
+@receiver(post_save, sender=CaisseTransaction)
+def invalidate_qr_on_transaction_change(sender, instance, **kwargs):
+    # Completed or cancelled
+    UserProfile.invalidate_qr_code(user__participant_profile=instance.participant_id)
+
+
+@receiver(m2m_changed, sender=CaisseTransaction.items.through)
+def invalidate_qr_on_transaction_items_change(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, CaisseTransaction):
+        UserProfile.invalidate_qr_code(user__participant_profile=instance.participant_id)
+
+
+@receiver(post_save, sender=PayableItem)
+def invalidate_qr_on_payable_item_change(sender, instance, created, **kwargs):
+    if not created:
+        UserProfile.invalidate_qr_code(user__participant_profile__caisse_transactions__items=instance)
+
+
+@receiver(post_save, sender=Event)
+def invalidate_qr_on_event_change(sender, instance, created, **kwargs):
+    if not created:
+        UserProfile.invalidate_qr_code(user__event_assignments__event=instance)
@@ -1,21 +1,30 @@
 from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase
 from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 from .models import (
-    Event, Participant, ParticipantEventRegistration, Room, Session,
-    SessionQuestion, SignUpVerification, FormRegistrationVerification,
+    ControllerScan, UserProfile, Event, Participant, ParticipantEventRegistration, Room, RoomAccess,
+    RoomDailyOccupancy, Session,
+    SessionAccess, SessionAttendance, SessionOccupancy, SessionQuestion, SignUpVerification, FormRegistrationVerification,
     PasswordResetVerification, UserEventAssignment,
 )
 from .form_validation_service import get_or_create_user_by_email, verify_form_registration
 from .signup_service import send_signup_verification_code, verify_signup_code
 from .password_reset_service import request_password_reset, verify_password_reset
+from .middleware import clear_event_cache, get_cached_event
+from .room_access import decide_room_access
+from .request_metrics import percentile, request_metrics
+from .room_occupancy import room_occupancy
+from .scan_audit import ScanAuditWriter
 from dashboard.models_form import FormConfiguration
 
 
@@ -382,3 +391,522 @@ class SessionQuestionFlowTests(TestCase):
         }, format='json')
 
         self.assertEqual(response.status_code, 403, response.data)
+
+
+class ControllerScanSyncTests(TestCase):
+    """
+    Offline scan upload (POST /api/participants/scan/sync/, events/scan_sync.py):
+    per-scan results in order, one log row per idempotency key however many
+    times the batch is retried, and a query count that doesn't grow with
+    the batch.
+    """
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name='Congress', start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location='Algiers',
+        )
+        self.controller = User.objects.create_user(username='ctrl', email='ctrl@example.com', password='x')
+        UserEventAssignment.objects.create(user=self.controller, event=self.event, role='controlleur_des_badges', is_active=True)
+
+        self.registered = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'p{i}', email=f'p{i}@example.com', password='x')
+            participant = Participant.objects.create(user=user, badge_id=f'BADGE-{i}')
+            ParticipantEventRegistration.objects.create(participant=participant, event=self.event)
+            self.registered.append(user)
+        self.outsider = User.objects.create_user(username='out', email='out@example.com', password='x')
+        Participant.objects.create(user=self.outsider, badge_id='BADGE-OUT')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.controller)
+
+    def _sync(self, scans):
+        return self.client.post('/api/participants/scan/sync/', {'scans': scans}, format='json')
+
+    def test_batch_results_and_log_rows(self):
+        scans = [
+            {'idempotency_key': f'k{i}', 'qr_data': str(user.id), 'scanned_at': '2026-05-01T09:30:00Z'}
+            for i, user in enumerate(self.registered)
+        ] + [
+            {'idempotency_key': 'k-out', 'qr_data': str(self.outsider.id), 'scanned_at': '2026-05-01T09:31:00Z'},
+            {'idempotency_key': 'k-bad', 'qr_data': 'not-a-badge'},
+            {'qr_data': str(self.registered[0].id)},
+        ]
+        response = self._sync(scans)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['success'] * 3 + ['not_registered', 'invalid', 'invalid'])
+        self.assertEqual(ControllerScan.objects.filter(controller=self.controller).count(), 4)
+        logged = ControllerScan.objects.get(idempotency_key='k0')
+        self.assertEqual(logged.status, 'success')
+        self.assertEqual(logged.badge_id, 'BADGE-0')
+        self.assertEqual(logged.client_scanned_at.isoformat(), '2026-05-01T09:30:00+00:00')
+        self.assertEqual(ControllerScan.objects.get(idempotency_key='k-out').status, 'not_registered')
+
+    def test_retried_batch_is_not_logged_twice(self):
+        scans = [{'idempotency_key': 'k1', 'qr_data': str(self.registered[0].id)}]
+        self._sync(scans)
+        response = self._sync(scans + [{'idempotency_key': 'k1', 'qr_data': str(self.registered[1].id)}])
+
+        self.assertEqual(
+            [result['status'] for result in response.data['results']], ['duplicate', 'duplicate']
+        )
+        self.assertEqual(response.data['results'][0]['recorded_status'], 'success')
+        self.assertEqual(ControllerScan.objects.filter(idempotency_key='k1').count(), 1)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def batch(prefix, users):
+            return [{'idempotency_key': f'{prefix}{i}', 'qr_data': str(u.id)} for i, u in enumerate(users)]
+
+        # Warm the entitlement rows so both batches take the same path.
+        self._sync(batch('warm', self.registered))
+        with self.assertNumQueries(7):
+            self._sync(batch('a', self.registered[:1]))
+        with self.assertNumQueries(7):
+            self._sync(batch('b', self.registered * 10))
+
+    def test_requires_controller_assignment_and_list(self):
+        self.assertEqual(self._sync('nope').status_code, 400)
+        UserEventAssignment.objects.filter(user=self.controller).update(is_active=False)
+        self.assertEqual(self._sync([]).status_code, 403)
+
+
+class ScanAuditWriterTests(TestCase):
+    """
+    The buffered ControllerScan writer (events/scan_audit.py): scans queue
+    up and land in batches, failures are counted rather than raised, and
+    the background thread flushes on its own and on shutdown.
+    """
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name='Congress', start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location='Algiers',
+        )
+        self.controller = User.objects.create_user(username='ctrl', email='ctrl@example.com', password='x', is_staff=True)
+
+    def _scan_fields(self, i):
+        return {
+            'controller': self.controller, 'event': self.event, 'participant_user_id': i,
+            'badge_id': f'BADGE-{i}', 'participant_name': f'P {i}', 'participant_email': f'p{i}@example.com',
+        }
+
+    def test_queued_scans_are_written_in_batches(self):
+        writer = ScanAuditWriter(batch_size=2)
+        with patch.object(writer, '_ensure_started'):
+            for i in range(5):
+                writer.record(**self._scan_fields(i))
+
+        self.assertEqual(writer.metrics()['queue_depth'], 5)
+        self.assertEqual(ControllerScan.objects.count(), 0)
+        writer.flush()
+
+        self.assertEqual(ControllerScan.objects.count(), 5)
+        metrics = writer.metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['flushed_total'], metrics['last_flush_size']), (0, 5, 1))
+        self.assertIsNotNone(metrics['last_flush_ms'])
+
+    def test_failed_flush_and_full_queue_are_counted(self):
+        writer = ScanAuditWriter(max_queue_size=1)
+        with patch.object(writer, '_ensure_started'):
+            writer.record(**self._scan_fields(1))
+            writer.record(**self._scan_fields(2))
+        with patch.object(ControllerScan.objects, 'bulk_create', side_effect=RuntimeError('db down')), \
+                patch.object(ControllerScan, 'save', side_effect=RuntimeError('db down')):
+            writer.flush()
+
+        metrics = writer.metrics()
+        self.assertEqual((metrics['dropped_total'], metrics['failed_total']), (1, 1))
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        writer = ScanAuditWriter(batch_size=10)
+        with patch.object(writer, '_ensure_started'):
+            writer.record(**self._scan_fields(1))
+            writer.record(**{**self._scan_fields(2), 'participant_user_id': None})
+            writer.record(**self._scan_fields(3))
+        writer.flush()
+
+        self.assertEqual(
+            sorted(ControllerScan.objects.values_list('participant_user_id', flat=True)), [1, 3],
+        )
+        metrics = writer.metrics()
+        self.assertEqual((metrics['flushed_total'], metrics['failed_total']), (2, 1))
+
+    def test_background_thread_flushes_and_drains_on_shutdown(self):
+        written = []
+        writer = ScanAuditWriter(batch_size=50, flush_interval_ms=10)
+        with patch.object(writer, '_write', side_effect=written.extend), \
+                patch('events.scan_audit.close_old_connections'), patch('events.scan_audit.atexit'):
+            for i in range(3):
+                writer.record(**self._scan_fields(i))
+            writer.shutdown()
+
+        self.assertEqual([scan.participant_user_id for scan in written], [0, 1, 2])
+        self.assertFalse(writer._thread.is_alive())
+
+    def test_metrics_endpoint_is_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(self.controller)
+        response = client.get('/api/scans/audit-metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queue_depth', response.data)
+
+        client.force_authenticate(User.objects.create_user(username='plain', email='plain@example.com', password='x'))
+        self.assertEqual(client.get('/api/scans/audit-metrics/').status_code, 403)
+
+
+class EventContextCacheTests(TestCase):
+    """
+    EventContextMiddleware: request.event_context shares the token decode
+    with DRF authentication and serves events from the per-process cache,
+    which saves and deletes invalidate.
+    """
+
+    def setUp(self):
+        clear_event_cache()
+        # /api/auth/my-events/ is a GET the site-wide cache middleware
+        # stores -- don't leak it into other tests hitting the same URL.
+        self.addCleanup(cache.clear)
+        self.event = Event.objects.create(
+            name='Congress', start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location='Algiers',
+        )
+        self.user = User.objects.create_user(username='ctrl', email='ctrl@example.com', password='x')
+        UserEventAssignment.objects.create(user=self.user, event=self.event, role='controlleur_des_badges')
+        token = AccessToken.for_user(self.user)
+        token['event_id'] = str(self.event.id)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_token_decoded_once_per_request(self):
+        from . import authentication
+        with patch.object(authentication, 'AccessToken', wraps=authentication.AccessToken) as decode:
+            response = self.client.get('/api/auth/my-events/')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['current_event_id'], str(self.event.id))
+        self.assertEqual(decode.call_count, 1)
+
+    def test_event_served_from_cache_until_saved(self):
+        get_cached_event(self.event.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_event(self.event.id).name, 'Congress')
+
+        self.event.name = 'Renamed'
+        self.event.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_cached_event(self.event.id).name, 'Renamed')
+
+        event_id = self.event.id
+        self.event.delete()
+        self.assertIsNone(get_cached_event(event_id))
+
+    def test_invalid_token_still_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.client.get('/api/auth/my-events/').status_code, 401)
+
+
+class UserQRCodeProjectionTests(TestCase):
+    """
+    UserProfile.get_or_create_qr_code(): served as stored until one of its
+    inputs changes, rebuilt (and versioned) exactly then.
+    """
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name='Congress', start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=2), location='Algiers',
+        )
+        self.user = User.objects.create_user(username='amina', email='amina@example.com', password='x')
+        self.participant = Participant.objects.create(user=self.user, badge_id='BADGE-QR')
+        self.registration = ParticipantEventRegistration.objects.create(participant=self.participant, event=self.event)
+        UserEventAssignment.objects.create(user=self.user, event=self.event, role='participant')
+
+    def _version(self):
+        return UserProfile.objects.get(user=self.user).qr_code_version
+
+    def test_unchanged_payload_is_read_only(self):
+        first = UserProfile.get_qr_for_user(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(UserProfile.get_qr_for_user(self.user), first)
+        self.assertEqual(self._version(), 1)
+
+    def test_transaction_rebuilds_payload(self):
+        from caisse.models import Caisse, CaisseTransaction, PayableItem
+        UserProfile.get_qr_for_user(self.user)
+
+        caisse = Caisse.objects.create(name='Caisse 1', email='qr-caisse@example.com', event=self.event)
+        dinner = PayableItem.objects.create(event=self.event, name='Gala Dinner', price=500, item_type='dinner')
+        txn = CaisseTransaction.objects.create(caisse=caisse, participant=self.participant, total_amount=500)
+        txn.items.add(dinner)
+
+        payload = UserProfile.get_qr_for_user(self.user)
+        self.assertEqual([item['title'] for item in payload['paid_items']], ['Gala Dinner'])
+        self.assertEqual(self._version(), 2)
+
+        txn.cancel(cancelled_by='test')
+        self.assertEqual(UserProfile.get_qr_for_user(self.user)['paid_items'], [])
+
+    def test_check_in_rebuilds_but_login_does_not(self):
+        UserProfile.get_qr_for_user(self.user)
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        UserProfile.get_qr_for_user(self.user)
+        self.assertEqual(self._version(), 1)
+
+        self.registration.is_checked_in = True
+        self.registration.save()
+        self.assertTrue(UserProfile.get_qr_for_user(self.user)['is_checked_in'])
+        self.assertEqual(self._version(), 2)
+
+    def test_invalidation_during_rebuild_keeps_payload_stale(self):
+        real_now = timezone.now
+
+        def now_after_a_concurrent_write():
+            UserProfile.invalidate_qr_code(user_id=self.user.id)
+            return real_now()
+
+        UserProfile.objects.get_or_create(user=self.user)
+        with patch('events.models.timezone.now', side_effect=now_after_a_concurrent_write):
+            UserProfile.get_qr_for_user(self.user)
+        self.assertTrue(UserProfile.objects.get(user=self.user).qr_code_stale)
+
+        UserProfile.get_qr_for_user(self.user)
+        self.assertFalse(UserProfile.objects.get(user=self.user).qr_code_stale)
+
+
+class RoomAccessDecisionTests(TestCase):
+    """
+    RoomViewSet.verify_access / scan_participant through events/room_access.py:
+    registration and payment checks, and the per-session admission counter
+    enforcing room capacity without recounting RoomAccess.
+    """
+
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(
+            name='Congress', start_date=now, end_date=now + timedelta(days=2), location='Algiers',
+        )
+        self.room = Room.objects.create(event=self.event, name='Salle A', capacity=2, location='RDC')
+        self.session = Session.objects.create(
+            event=self.event, room=self.room, title='Atelier', is_paid=True, price=1000,
+            start_time=now - timedelta(minutes=10), end_time=now + timedelta(hours=1),
+        )
+        self.gate = User.objects.create_user(username='gate', email='gate@example.com', password='x', is_staff=True)
+
+        self.participants = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'p{i}', email=f'p{i}@example.com', password='x')
+            participant = Participant.objects.create(user=user, badge_id=f'BADGE-{i}')
+            ParticipantEventRegistration.objects.create(participant=participant, event=self.event)
+            SessionAccess.objects.create(participant=participant, session=self.session, has_access=True)
+            self.participants.append(participant)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.gate)
+
+    def _verify(self, participant):
+        return self.client.post(f'/api/rooms/{self.room.id}/verify_access/', {
+            'qr_data': str(participant.user_id), 'room_id': str(self.room.id), 'session_id': str(self.session.id),
+        }, format='json')
+
+    def _occupancy(self):
+        return SessionOccupancy.objects.get(session=self.session).attendee_count
+
+    def test_admission_counts_each_participant_once(self):
+        first = self._verify(self.participants[0])
+        again = self._verify(self.participants[0])
+
+        self.assertEqual(first.status_code, 200, first.data)
+        self.assertTrue(first.data['access']['first_entry'])
+        self.assertEqual(again.status_code, 200)
+        self.assertFalse(again.data['access']['first_entry'])
+        self.assertEqual(self._occupancy(), 1)
+        self.assertEqual(RoomAccess.objects.filter(status='granted').count(), 2)
+
+    def test_room_capacity_is_enforced_per_session(self):
+        self._verify(self.participants[0])
+        self._verify(self.participants[1])
+        response = self._verify(self.participants[2])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['reason'], 'room_full')
+        self.assertEqual(self._occupancy(), 2)
+        self.assertFalse(SessionAttendance.objects.filter(participant=self.participants[2]).exists())
+        # Already admitted participants still get back in
+        self.assertEqual(self._verify(self.participants[0]).status_code, 200)
+
+    def test_unpaid_and_unregistered_are_denied(self):
+        SessionAccess.objects.filter(participant=self.participants[0]).update(has_access=False)
+        ParticipantEventRegistration.objects.filter(participant=self.participants[1]).delete()
+
+        unpaid = self._verify(self.participants[0])
+        unregistered = self._verify(self.participants[1])
+
+        self.assertEqual(unpaid.status_code, 402)
+        self.assertEqual(unpaid.data['reason'], 'payment_required')
+        self.assertEqual(unregistered.status_code, 403)
+        self.assertFalse(SessionOccupancy.objects.filter(session=self.session, attendee_count__gt=0).exists())
+
+    def test_room_scan_reports_current_session_access_without_admitting(self):
+        response = self.client.post(
+            f'/api/rooms/{self.room.id}/scan_participant/', {'qr_data': str(self.participants[0].user_id)}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertTrue(response.data['has_access'])
+        self.assertEqual(response.data['current_session']['id'], str(self.session.id))
+        self.assertFalse(SessionAttendance.objects.exists())
+
+    def test_decision_without_a_running_session_is_free_entry(self):
+        Session.objects.filter(pk=self.session.pk).update(start_time=timezone.now() + timedelta(hours=3),
+                                                          end_time=timezone.now() + timedelta(hours=4))
+        decision = decide_room_access(self.participants[0], self.room)
+        self.assertTrue(decision.granted)
+        self.assertIsNone(decision.session)
+
+
+class RoomOccupancyTests(TestCase):
+    """
+    Incremental per-room, per-day occupancy (events/room_occupancy.py):
+    Room.current_participants counts distinct granted participants without
+    recounting RoomAccess, through single writes, the bulk check-in path
+    and the reconcile command.
+    """
+
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(
+            name='Congress', start_date=now, end_date=now + timedelta(days=2), location='Algiers',
+        )
+        self.room = Room.objects.create(event=self.event, name='Salle A', capacity=100, location='RDC')
+        self.gate = User.objects.create_user(username='gate', email='gate@example.com', password='x')
+        self.participants = []
+        for i in range(4):
+            user = User.objects.create_user(username=f'p{i}', email=f'p{i}@example.com', password='x')
+            self.participants.append(Participant.objects.create(user=user, badge_id=f'BADGE-{i}'))
+
+    def _current(self):
+        self.room.refresh_from_db()
+        return self.room.current_participants
+
+    def test_counts_distinct_granted_participants(self):
+        first, second = self.participants[:2]
+        RoomAccess.objects.create(participant=first, room=self.room, status='granted')
+        RoomAccess.objects.create(participant=first, room=self.room, status='granted')
+        denied = RoomAccess.objects.create(participant=second, room=self.room, status='denied')
+
+        self.assertEqual(self._current(), 1)
+        self.assertEqual(room_occupancy(self.room), 1)
+
+        denied.status = 'granted'
+        denied.save()
+        self.assertEqual(self._current(), 2)
+
+        # One of two granted accesses removed: still counted
+        RoomAccess.objects.filter(participant=first).first().delete()
+        self.assertEqual(self._current(), 2)
+        RoomAccess.objects.filter(participant=first).delete()
+        self.assertEqual(self._current(), 1)
+        self.assertEqual(room_occupancy(self.room), 1)
+
+    def test_bulk_check_in_updates_counters_once_per_batch(self):
+        RoomAccess.objects.create(participant=self.participants[0], room=self.room, status='granted')
+        client = APIClient()
+        client.force_authenticate(self.gate)
+        payload = [
+            {'participant': p.id, 'room': str(self.room.id), 'status': 'granted'}
+            for p in self.participants
+        ] + [{'participant': self.participants[1].id, 'room': str(self.room.id), 'status': 'granted'}]
+
+        response = client.post('/api/room-access/', payload, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(RoomAccess.objects.count(), 6)
+        self.assertEqual(self._current(), 4)
+        self.assertEqual(room_occupancy(self.room), 4)
+
+    def test_bulk_check_in_ignores_verified_by_and_caps_the_batch(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        client = APIClient()
+        client.force_authenticate(self.gate)
+        payload = [{
+            'participant': self.participants[0].id, 'room': str(self.room.id),
+            'status': 'granted', 'verified_by': other.id,
+        }]
+
+        response = client.post('/api/room-access/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(RoomAccess.objects.get().verified_by, self.gate)
+
+        with patch('events.room_occupancy.MAX_ACCESSES_PER_BATCH', 1):
+            response = client.post('/api/room-access/', payload * 2, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(RoomAccess.objects.count(), 1)
+
+    def test_reconcile_command_fixes_drift(self):
+        for participant in self.participants[:3]:
+            RoomAccess.objects.create(participant=participant, room=self.room, status='granted')
+        Room.objects.filter(pk=self.room.pk).update(current_participants=42)
+        RoomDailyOccupancy.objects.filter(room=self.room).update(participant_count=7)
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_room_occupancy', '--check-only', stdout=StringIO())
+        call_command('reconcile_room_occupancy', '--event', str(self.event.id), stdout=StringIO())
+
+        self.assertEqual(self._current(), 3)
+        self.assertEqual(room_occupancy(self.room), 3)
+        call_command('reconcile_room_occupancy', '--check-only', stdout=StringIO())
+
+
+class ScanInstrumentationTests(TestCase):
+    """
+    QueryMetricsMiddleware / GET /api/metrics/requests/ (events/request_metrics.py),
+    and the load-test seeding benchmark_scans relies on.
+    """
+
+    def setUp(self):
+        request_metrics.reset()
+        self.addCleanup(request_metrics.reset)
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_scan_requests_are_recorded_per_view(self):
+        for _ in range(3):
+            self.client.post('/api/participants/scan/', {'qr_data': '999999'}, format='json')
+
+        response = self.client.get('/api/metrics/requests/')
+
+        self.assertEqual(response.status_code, 200)
+        scan = response.data['endpoints']['POST events:participant-scan-participant']
+        self.assertEqual(scan['requests'], 3)
+        self.assertIsNotNone(scan['p95_ms'])
+        self.assertGreaterEqual(scan['queries_max'], 1)
+
+        self.assertEqual(self.client.delete('/api/metrics/requests/').status_code, 204)
+        self.assertNotIn('POST events:participant-scan-participant', self.client.get('/api/metrics/requests/').data['endpoints'])
+
+        self.client.force_authenticate(User.objects.create_user(username='ctrl', password='x'))
+        self.assertEqual(self.client.get('/api/metrics/requests/').status_code, 403)
+
+    def test_seed_data_with_load_participants_and_transactions(self):
+        from caisse.models import CaisseTransaction, ParticipantEntitlement
+
+        call_command('create_multi_event_data', participants=12, transactions=20, stdout=StringIO())
+
+        event = Event.objects.get(name='TechSummit Algeria 2025')
+        self.assertEqual(ParticipantEventRegistration.objects.filter(event=event).count(), 12 + 4)
+        self.assertEqual(CaisseTransaction.objects.filter(caisse__event=event).count(), 20)
+        paid = ParticipantEntitlement.objects.filter(event=event, participant__user__username='tech_load_00001').get()
+        self.assertEqual(len(paid.paid_items), 2)
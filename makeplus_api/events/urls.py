@@ -69,6 +69,8 @@ urlpatterns = [
     # Statistics endpoints (REST API for mobile)
     path('dashboard/stats/', api_views.DashboardStatsAPIView.as_view(), name='dashboard-stats'),
     path('my-room/statistics/', api_views.MyRoomStatisticsAPIView.as_view(), name='my-room-statistics'),
+    path('scans/audit-metrics/', api_views.ScanAuditMetricsAPIView.as_view(), name='scan-audit-metrics'),
+    path('metrics/requests/', api_views.RequestMetricsAPIView.as_view(), name='request-metrics'),
     
     # User endpoints (REST API for mobile)
     path('my-events/', api_views.MyEventsAPIView.as_view(), name='my-events'),
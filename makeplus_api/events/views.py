@@ -84,6 +84,61 @@ class EventViewSet(viewsets.ModelViewSet):
         
         return Response(stats)
 
+    @action(detail=True, methods=['get'])
+    def entitlements(self, request, pk=None):
+        """
+        Offline gate snapshot: every participant's registration status,
+        badge_id and paid session IDs, keyed by user_id, so controller
+        devices can validate badges locally. Pass ?since=<version> (the
+        "version" of the last pull) to get only the participants that
+        changed since; since=0 or omitted is a full snapshot.
+
+        Streamed, and answered with 304 when the device's ETag is current.
+        """
+        import json
+        from django.http import HttpResponse, StreamingHttpResponse
+        from caisse.entitlements import event_snapshot
+
+        event = self.get_object()
+        if not request.user.is_staff and not UserEventAssignment.objects.filter(
+            user=request.user, event=event, is_active=True,
+            role__in=['controlleur_des_badges', 'gestionnaire_des_salles'],
+        ).exists():
+            return Response({
+                'error': 'Only controllers of this event can download its entitlements'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            since = max(int(request.query_params.get('since', 0)), 0)
+        except (TypeError, ValueError):
+            return Response({'error': 'since must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        version, rows = event_snapshot(event, since)
+        if since > version:
+            # Device is ahead of us (e.g. restored from a backup of another
+            # event's data) -- start it over from a full snapshot.
+            since = 0
+            version, rows = event_snapshot(event)
+
+        etag = f'"{event.id}-{version}-{since}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=304)
+        else:
+            def stream():
+                yield json.dumps({
+                    'event_id': str(event.id), 'version': version, 'since': since, 'full': since == 0,
+                })[:-1] + ', "participants": {'
+                separator = ''
+                for user_id, entry in rows:
+                    yield f'{separator}"{user_id}": {json.dumps(entry)}'
+                    separator = ', '
+                yield '}}'
+
+            response = StreamingHttpResponse(stream(), content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
 
 class RoomViewSet(viewsets.ModelViewSet):
     """
@@ -260,7 +315,17 @@ class RoomViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def scan_participant(self, request, pk=None):
-        """Scan participant QR code and display all paid items (sessions, access, etc.) - ALWAYS FETCHES FRESH DATA"""
+        """
+        Scan participant QR code and display all paid items (sessions,
+        access, etc.) plus whether they may enter this room now -- a look
+        only, nobody is admitted (that's verify_access). The decision is
+        events/room_access.py.
+        """
+        from django.contrib.auth.models import User
+        from caisse.entitlements import paid_items_for_scan
+        from .room_access import NOT_REGISTERED, decide_room_access
+        from .scan_sync import parse_qr_user_id
+
         room = self.get_object()
         
         qr_data = request.data.get('qr_data')
@@ -271,19 +336,14 @@ class RoomViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Parse QR data
-            import json
-            qr_dict = json.loads(qr_data) if isinstance(qr_data, str) else qr_data
-            user_id = qr_dict.get('user_id')
-            
+            # Plain user id or the old rich-JSON format (see scan_sync.py)
+            user_id = parse_qr_user_id(qr_data)
             if not user_id:
                 return Response({
                     'status': 'invalid',
                     'message': 'Invalid QR code format'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get user
-            from django.contrib.auth.models import User
             user = User.objects.get(id=user_id)
             
             # Get participant profile
@@ -299,88 +359,25 @@ class RoomViewSet(viewsets.ModelViewSet):
                     }
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Check if participant is registered for this event
             event = room.event
-            if not participant.is_registered_for_event(event):
+            decision = decide_room_access(participant, room, admit=False)
+            if decision.reason == NOT_REGISTERED:
                 return Response({
                     'status': 'error',
-                    'message': 'Participant not registered for this event',
+                    'message': decision.message,
                     'participant': {
                         'id': str(participant.id),
                         'name': user.get_full_name(),
                         'email': user.email,
-                        'badge_id': qr_dict.get('badge_id')
-                    }
-                }, status=status.HTTP_403_FORBIDDEN)
-            
-            # ✅ FETCH ALL PAID ITEMS FROM CAISSE TRANSACTIONS (REAL-TIME DATA)
-            from caisse.models import CaisseTransaction
-            import logging
-            logger = logging.getLogger(__name__)
-            
-            # Query with explicit prefetch to avoid N+1 queries
-            completed_transactions = CaisseTransaction.objects.filter(
-                participant=participant,
-                status='completed'
-            ).prefetch_related('items', 'items__session').order_by('-created_at')
-            
-            # Debug logging
-            logger.info(f"[SCAN DEBUG] ==========================================")
-            logger.info(f"[SCAN DEBUG] Participant: {participant.user.email}")
-            logger.info(f"[SCAN DEBUG] Participant ID: {participant.id}")
-            logger.info(f"[SCAN DEBUG] Total completed transactions: {completed_transactions.count()}")
-            logger.info(f"[SCAN DEBUG] ==========================================")
-            
-            paid_items_list = []
-            seen_items = set()  # Track items by a unique key to avoid duplicates
-            
-            # Fetch all paid items from transactions
-            for transaction in completed_transactions:
-                items_in_tx = transaction.items.all()
-                logger.info(f"[SCAN DEBUG] Transaction {transaction.id}: {len(items_in_tx)} items, created at {transaction.created_at}")
-                for item in transaction.items.all():
-                    logger.info(f"[SCAN DEBUG]   Item: {item.name} ({item.item_type}) - {item.price} DA")
-                    
-                    # Create unique key for this item
-                    if item.session:
-                        # For session items, use session ID as key
-                        unique_key = f"session-{item.session.id}"
-                    else:
-                        # For non-session items (access, dinner, other), use item ID
-                        unique_key = f"{item.item_type}-{item.id}"
-                    
-                    # Skip if already added
-                    if unique_key in seen_items:
-                        logger.info(f"[SCAN DEBUG]   Skipping duplicate: {unique_key}")
-                        continue
-                    
-                    seen_items.add(unique_key)
-                    
-                    # Build paid item data
-                    paid_item = {
-                        'type': item.item_type,  # 'session', 'access', 'dinner', 'other'
-                        'id': str(item.session.id) if item.session else str(item.id),
-                        'title': item.name,
-                        'is_paid': True,
-                        'payment_status': 'paid',
-                        'amount_paid': float(item.price),
-                        'has_access': True,
-                        'transaction_date': transaction.created_at.isoformat()
+                        'badge_id': participant.badge_id
                     }
-                    
-                    # Add session details if it's a session item
-                    if item.session:
-                        paid_item['session_details'] = {
-                            'start_time': item.session.start_time.isoformat() if item.session.start_time else None,
-                            'end_time': item.session.end_time.isoformat() if item.session.end_time else None,
-                            'room': item.session.room.name if item.session.room else None
-                        }
-                    
-                    paid_items_list.append(paid_item)
-            
-            logger.info(f"[SCAN DEBUG] Total paid items found: {len(paid_items_list)}")
-            logger.info(f"[SCAN DEBUG] ==========================================")
+                }, status=decision.http_status)
             
+            # Paid items come from the precomputed entitlement index (kept
+            # up to date whenever a caisse transaction is created/cancelled,
+            # see caisse/entitlements.py) -- the same row the decision used.
+            paid_items_list = paid_items_for_scan(decision.entitlement)
+
             # Get all sessions in this room (to show free sessions too)
             room_sessions = Session.objects.filter(room=room).order_by('start_time')
             
@@ -406,7 +403,7 @@ class RoomViewSet(viewsets.ModelViewSet):
                     'id': str(participant.id),
                     'name': user.get_full_name(),
                     'email': user.email,
-                    'badge_id': qr_dict.get('badge_id')
+                    'badge_id': participant.badge_id
                 },
                 'room': {
                     'id': str(room.id),
@@ -420,7 +417,13 @@ class RoomViewSet(viewsets.ModelViewSet):
                 'free_items': free_items_list,
                 'total_paid_items': len(paid_items_list),
                 'total_free_items': len(free_items_list),
-                'has_access': True  # Participant always has access if registered for event
+                # For the session running in this room right now, if any
+                'has_access': decision.granted,
+                'access_reason': decision.reason,
+                'current_session': {
+                    'id': str(decision.session.id),
+                    'title': decision.session.title
+                } if decision.session else None
             })
             
         except User.DoesNotExist:
@@ -428,11 +431,6 @@ class RoomViewSet(viewsets.ModelViewSet):
                 'status': 'invalid',
                 'message': 'Invalid QR code - user not found'
             }, status=status.HTTP_404_NOT_FOUND)
-        except json.JSONDecodeError:
-            return Response({
-                'status': 'invalid',
-                'message': 'Invalid QR code format'
-            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'status': 'error',
@@ -519,68 +517,42 @@ class RoomViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def verify_access(self, request, pk=None):
-        """Verify QR code for SESSION access - Session-based access control"""
+        """
+        Verify a badge QR code for SESSION access and admit the participant
+        if allowed -- the decision itself (registration, payment, room
+        capacity for the session) is events/room_access.py
+        """
+        from django.contrib.auth.models import User
+        from .room_access import NOT_REGISTERED, WRONG_ROOM, decide_room_access
+        from .scan_sync import parse_qr_user_id
+
         room = self.get_object()
         serializer = QRVerificationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         qr_data = serializer.validated_data['qr_data']
-        session_id = serializer.validated_data.get('session')
+        # Already resolved to a Session by QRVerificationSerializer
+        session = serializer.validated_data.get('session')
         
         # SESSION ID IS REQUIRED - Access is always session-based
-        if not session_id:
+        if not session:
             return Response({
                 'status': 'invalid',
                 'message': 'Session ID is required for access verification'
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Parse QR data (user-level QR code)
-            import json
-            qr_dict = json.loads(qr_data) if isinstance(qr_data, str) else qr_data
-            user_id = qr_dict.get('user_id')
-            
+            # Plain user id or the old rich-JSON format (see scan_sync.py)
+            user_id = parse_qr_user_id(qr_data)
             if not user_id:
                 return Response({
                     'status': 'invalid',
                     'message': 'Invalid QR code format'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get user
-            from django.contrib.auth.models import User
             user = User.objects.get(id=user_id)
             
-            # Get session
-            session = Session.objects.get(id=session_id)
-            
-            # Verify session is in this room
-            if session.room_id != room.id:
-                return Response({
-                    'status': 'invalid',
-                    'message': 'Session is not in this room'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Check event access via UserEventAssignment
-            event = room.event
-            assignment = UserEventAssignment.objects.filter(
-                user=user,
-                event=event,
-                is_active=True
-            ).first()
-            
-            if not assignment:
-                return Response({
-                    'status': 'denied',
-                    'message': 'User does not have access to this event',
-                    'user': {
-                        'name': user.get_full_name(),
-                        'email': user.email
-                    }
-                }, status=status.HTTP_403_FORBIDDEN)
-            
-            # Get participant profile
             participant = Participant.objects.filter(user=user).first()
-            
             if not participant:
                 return Response({
                     'status': 'denied',
@@ -591,52 +563,42 @@ class RoomViewSet(viewsets.ModelViewSet):
                     }
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Check if participant is registered for this event
-            if not participant.is_registered_for_event(event):
+            decision = decide_room_access(participant, room, session=session)
+            participant_data = {
+                'id': str(participant.id),
+                'name': user.get_full_name(),
+                'email': user.email,
+                'badge_id': participant.badge_id
+            }
+
+            if decision.reason == WRONG_ROOM:
                 return Response({
-                    'status': 'denied',
-                    'message': 'Participant not registered for this event',
-                    'participant': {
-                        'id': str(participant.id),
-                        'name': user.get_full_name(),
-                        'badge_id': qr_dict.get('badge_id')
-                    }
-                }, status=status.HTTP_403_FORBIDDEN)
-            
-            # Check session access - ALWAYS check for paid sessions
-            if session.is_paid:
-                session_access = SessionAccess.objects.filter(
-                    participant=participant,
-                    session=session,
-                    has_access=True
-                ).first()
-                
-                if not session_access:
-                    # Create denied access record
+                    'status': 'invalid',
+                    'message': decision.message
+                }, status=decision.http_status)
+
+            if not decision.granted:
+                if decision.reason != NOT_REGISTERED:
                     RoomAccess.objects.create(
                         participant=participant,
                         room=room,
                         session=session,
                         verified_by=request.user,
                         status='denied',
-                        denial_reason='Payment required for this session'
+                        denial_reason=decision.message
                     )
-                    
-                    return Response({
-                        'status': 'denied',
-                        'message': 'Payment required for this session',
-                        'participant': {
-                            'id': str(participant.id),
-                            'name': user.get_full_name(),
-                            'badge_id': qr_dict.get('badge_id')
-                        },
-                        'session': {
-                            'id': str(session.id),
-                            'title': session.title,
-                            'price': str(session.price) if session.price else '0.00',
-                            'start_time': session.start_time.isoformat() if session.start_time else None
-                        }
-                    }, status=status.HTTP_402_PAYMENT_REQUIRED)
+                return Response({
+                    'status': 'denied',
+                    'reason': decision.reason,
+                    'message': decision.message,
+                    'participant': participant_data,
+                    'session': {
+                        'id': str(session.id),
+                        'title': session.title,
+                        'price': str(session.price) if session.price else '0.00',
+                        'start_time': session.start_time.isoformat() if session.start_time else None
+                    }
+                }, status=decision.http_status)
             
             # Grant access - all checks passed
             access = RoomAccess.objects.create(
@@ -650,12 +612,7 @@ class RoomViewSet(viewsets.ModelViewSet):
             return Response({
                 'status': 'granted',
                 'message': 'Access granted successfully',
-                'participant': {
-                    'id': str(participant.id),
-                    'name': user.get_full_name(),
-                    'email': user.email,
-                    'badge_id': qr_dict.get('badge_id')
-                },
+                'participant': participant_data,
                 'session': {
                     'id': str(session.id),
                     'title': session.title,
@@ -663,7 +620,8 @@ class RoomViewSet(viewsets.ModelViewSet):
                 },
                 'access': {
                     'id': str(access.id),
-                    'accessed_at': access.accessed_at.isoformat()
+                    'accessed_at': access.accessed_at.isoformat(),
+                    'first_entry': decision.first_entry
                 }
             }, status=status.HTTP_200_OK)
             
@@ -672,16 +630,6 @@ class RoomViewSet(viewsets.ModelViewSet):
                 'status': 'invalid',
                 'message': 'Invalid QR code - user not found'
             }, status=status.HTTP_404_NOT_FOUND)
-        except Session.DoesNotExist:
-            return Response({
-                'status': 'invalid',
-                'message': 'Session not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        except json.JSONDecodeError:
-            return Response({
-                'status': 'invalid',
-                'message': 'Invalid QR code format'
-            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'status': 'error',
@@ -922,25 +870,29 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             
             event = controller_assignment.event
             
-            # Check if participant is registered for this event
-            if not participant.is_registered_for_event(event):
-                # ✅ SAVE FAILED SCAN LOG
-                from .models import ControllerScan
-                try:
-                    ControllerScan.objects.create(
-                        controller=request.user,
-                        event=event,
-                        participant_user_id=user.id,
-                        badge_id=participant.badge_id,
-                        participant_name=user.get_full_name() or f"{user.first_name} {user.last_name}",
-                        participant_email=user.email,
-                        status='not_registered',
-                        error_message='Participant not registered for this event',
-                        total_paid_items=0,
-                        total_amount=0
-                    )
-                except Exception:
-                    pass  # Don't fail the request if logging fails
+            # Registration and paid items both come from the precomputed
+            # entitlement index (kept up to date whenever a registration or
+            # caisse transaction changes, see caisse/entitlements.py) -- one
+            # indexed lookup per scan, see events/room_access.py.
+            from caisse.entitlements import paid_items_for_scan
+            from .room_access import decide_event_access
+            decision = decide_event_access(participant, event)
+            if not decision.granted:
+                # ✅ SAVE FAILED SCAN LOG -- queued, written in the
+                # background (events/scan_audit.py)
+                from .scan_audit import record_scan
+                record_scan(
+                    controller=request.user,
+                    event=event,
+                    participant_user_id=user.id,
+                    badge_id=participant.badge_id,
+                    participant_name=user.get_full_name() or f"{user.first_name} {user.last_name}",
+                    participant_email=user.email,
+                    status='not_registered',
+                    error_message='Participant not registered for this event',
+                    total_paid_items=0,
+                    total_amount=0
+                )
 
                 return Response({
                     'status': 'error',
@@ -957,95 +909,28 @@ class ParticipantViewSet(viewsets.ModelViewSet):
                     }
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            # ✅ FETCH ALL PAID ITEMS FROM CAISSE TRANSACTIONS (REAL-TIME DATA)
-            from caisse.models import CaisseTransaction
-            
-            # Query with explicit prefetch to avoid N+1 queries
-            completed_transactions = CaisseTransaction.objects.filter(
-                participant=participant,
-                status='completed'
-            ).prefetch_related('items', 'items__session', 'items__session__room').order_by('-created_at')
-            
-            # Debug logging
-            logger.info(f"[SCAN] ==========================================")
-            logger.info(f"[SCAN] Controller: {request.user.email}")
-            logger.info(f"[SCAN] Participant: {participant.user.email}")
-            logger.info(f"[SCAN] Participant ID: {participant.id}")
-            logger.info(f"[SCAN] Event: {event.name}")
-            logger.info(f"[SCAN] Total completed transactions: {completed_transactions.count()}")
-            logger.info(f"[SCAN] ==========================================")
-            
-            paid_items_list = []
-            seen_items = set()  # Track items by a unique key to avoid duplicates
-            total_amount = 0
-            
-            # Fetch all paid items from transactions
-            for transaction in completed_transactions:
-                items_in_tx = transaction.items.all()
-                logger.info(f"[SCAN] Transaction {transaction.id}: {len(items_in_tx)} items, created at {transaction.created_at}")
-                
-                for item in items_in_tx:
-                    logger.info(f"[SCAN]   Item: {item.name} ({item.item_type}) - {item.price} DA")
-                    
-                    # Create unique key for this item
-                    if item.session:
-                        unique_key = f"session-{item.session.id}"
-                    else:
-                        unique_key = f"{item.item_type}-{item.id}"
-                    
-                    # Skip if already added
-                    if unique_key in seen_items:
-                        logger.info(f"[SCAN]   Skipping duplicate: {unique_key}")
-                        continue
-                    
-                    seen_items.add(unique_key)
-                    
-                    # Build paid item data
-                    paid_item = {
-                        'type': item.item_type,  # 'session', 'access', 'dinner', 'other'
-                        'id': str(item.session.id) if item.session else str(item.id),
-                        'title': item.name,
-                        'is_paid': True,
-                        'payment_status': 'paid',
-                        'amount_paid': float(item.price),
-                        'has_access': True,
-                        'transaction_date': transaction.created_at.isoformat()
-                    }
-                    
-                    # Add session details if it's a session item
-                    if item.session:
-                        paid_item['session_details'] = {
-                            'start_time': item.session.start_time.isoformat() if item.session.start_time else None,
-                            'end_time': item.session.end_time.isoformat() if item.session.end_time else None,
-                            'room': item.session.room.name if item.session.room else None,
-                            'room_id': str(item.session.room.id) if item.session.room else None
-                        }
-                    
-                    paid_items_list.append(paid_item)
-                    total_amount += float(item.price)
-            
-            logger.info(f"[SCAN] Total paid items found: {len(paid_items_list)}")
-            logger.info(f"[SCAN] Total amount: {total_amount} DA")
-            logger.info(f"[SCAN] ==========================================")
-            
-            # ✅ SAVE SCAN LOG TO DATABASE (for statistics)
-            from .models import ControllerScan
-            try:
-                ControllerScan.objects.create(
-                    controller=request.user,
-                    event=event,
-                    participant_user_id=user.id,
-                    badge_id=participant.badge_id,
-                    participant_name=user.get_full_name() or f"{user.first_name} {user.last_name}",
-                    participant_email=user.email,
-                    status='success',
-                    total_paid_items=len(paid_items_list),
-                    total_amount=total_amount
-                )
-                logger.info(f"[SCAN] ✅ Scan log saved to database")
-            except Exception as e:
-                logger.error(f"[SCAN] ❌ Failed to save scan log: {str(e)}")
-                # Don't fail the request if logging fails
+            entitlement = decision.entitlement
+            paid_items_list = paid_items_for_scan(entitlement)
+            total_amount = float(entitlement.total_amount)
+            logger.info(
+                f"[SCAN] {request.user.email} scanned {participant.user.email} @ {event.name}: "
+                f"{len(paid_items_list)} paid items, {total_amount} DA"
+            )
+
+            # ✅ SAVE SCAN LOG (for statistics) -- queued and written in
+            # batches off the request path, see events/scan_audit.py
+            from .scan_audit import record_scan
+            record_scan(
+                controller=request.user,
+                event=event,
+                participant_user_id=user.id,
+                badge_id=participant.badge_id,
+                participant_name=user.get_full_name() or f"{user.first_name} {user.last_name}",
+                participant_email=user.email,
+                status='success',
+                total_paid_items=len(paid_items_list),
+                total_amount=total_amount
+            )
 
             return Response({
                 'status': 'success',
@@ -1082,6 +967,55 @@ class ParticipantViewSet(viewsets.ModelViewSet):
                 'message': f'Error: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['post'], url_path='scan/sync')
+    def scan_sync(self, request):
+        """
+        Upload a controller device's queue of offline scans in one request.
+
+        Body: {"scans": [{"idempotency_key": "...", "qr_data": "...",
+        "scanned_at": "<ISO device time>"}, ...]}. Returns one result per
+        scan, in order -- see events/scan_sync.py. Safe to retry: scans
+        already synced come back as 'duplicate'.
+        """
+        import logging
+        from .scan_sync import MAX_SCANS_PER_SYNC, sync_controller_scans
+        logger = logging.getLogger(__name__)
+
+        scans = request.data.get('scans')
+        if not isinstance(scans, list):
+            return Response({
+                'status': 'invalid',
+                'message': 'scans must be a list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(scans) > MAX_SCANS_PER_SYNC:
+            return Response({
+                'status': 'invalid',
+                'message': f'At most {MAX_SCANS_PER_SYNC} scans per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        controller_assignment = UserEventAssignment.objects.filter(
+            user=request.user,
+            is_active=True
+        ).select_related('event').first()
+        if not controller_assignment:
+            return Response({
+                'status': 'error',
+                'message': 'No active event assignment found for controller'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        event = controller_assignment.event
+        results = sync_controller_scans(request.user, event, scans)
+        logger.info(f"[SCAN SYNC] {request.user.email} synced {len(scans)} offline scans @ {event.name}")
+
+        return Response({
+            'status': 'success',
+            'event': {
+                'id': str(event.id),
+                'name': event.name
+            },
+            'results': results,
+        })
+
 
 class RoomAccessViewSet(viewsets.ModelViewSet):
     """
@@ -1113,6 +1047,34 @@ class RoomAccessViewSet(viewsets.ModelViewSet):
         """Set verified_by on creation"""
         serializer.save(verified_by=self.request.user)
 
+    def create(self, request, *args, **kwargs):
+        """
+        A list body is a bulk check-in: all rows inserted at once and the
+        room occupancy counters updated once for the batch (see
+        events/room_occupancy.py), instead of once per row.
+        """
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        from .room_occupancy import MAX_ACCESSES_PER_BATCH, record_room_accesses
+
+        if len(request.data) > MAX_ACCESSES_PER_BATCH:
+            return Response({
+                'status': 'invalid',
+                'message': f'At most {MAX_ACCESSES_PER_BATCH} accesses per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        # verified_by is writable on the serializer; the caller always wins,
+        # as in perform_create
+        accesses = record_room_accesses([
+            RoomAccess(**{**attrs, 'verified_by': request.user}) for attrs in serializer.validated_data
+        ])
+        return Response({
+            'created': len(accesses),
+            'results': [{'id': access.id, 'status': access.status} for access in accesses],
+        }, status=status.HTTP_201_CREATED)
+
 
 class UserEventAssignmentViewSet(viewsets.ModelViewSet):
     """
@@ -3,13 +3,14 @@ cPanel HTTP Storage Backend
 Uploads files to cPanel via HTTP POST (no FTP, no memory issues)
 """
 import os
-import requests
 from io import BytesIO
 from django.core.files.storage import Storage
 from django.core.files.base import File, ContentFile
 from django.conf import settings
 from urllib.parse import urljoin
 
+from .outbound_http import get_http_client
+
 
 class CPanelHTTPStorage(Storage):
     """
@@ -21,6 +22,7 @@ class CPanelHTTPStorage(Storage):
         self.upload_url = settings.CPANEL_UPLOAD_URL
         self.upload_key = settings.CPANEL_UPLOAD_KEY
         self.base_url = settings.CPANEL_BASE_URL
+        self.http = get_http_client()
     
     def _save(self, name, content):
         """
@@ -39,11 +41,11 @@ class CPanelHTTPStorage(Storage):
             }
             
             # Upload to cPanel
-            response = requests.post(
+            response = self.http.post(
                 self.upload_url,
                 files=files,
                 data=data,
-                timeout=60,
+                timeout=(5, 60),
                 headers={'X-Upload-Key': self.upload_key}
             )
             
@@ -67,7 +69,7 @@ class CPanelHTTPStorage(Storage):
         """
         url = self.url(name)
         try:
-            response = requests.get(url, timeout=30)
+            response = self.http.get(url)
             response.raise_for_status()
             return ContentFile(response.content)
         except Exception as e:
@@ -79,7 +81,7 @@ class CPanelHTTPStorage(Storage):
         """
         url = self.url(name)
         try:
-            response = requests.head(url, timeout=10)
+            response = self.http.head(url, timeout=(5, 10))
             return response.status_code == 200
         except:
             return False
@@ -102,7 +104,7 @@ class CPanelHTTPStorage(Storage):
         """
         url = self.url(name)
         try:
-            response = requests.head(url, timeout=10)
+            response = self.http.head(url, timeout=(5, 10))
             return int(response.headers.get('Content-Length', 0))
         except:
             return 0
@@ -3,12 +3,13 @@ HTTP-based storage backend for uploading files to cPanel via HTTP POST
 This is more reliable than FTP and doesn't cause memory issues
 """
 import os
-import requests
 from django.core.files.storage import Storage
 from django.conf import settings
 from django.core.files.base import ContentFile
 from urllib.parse import urljoin
 
+from .outbound_http import get_http_client
+
 
 class HTTPStorage(Storage):
     """
@@ -19,6 +20,7 @@ class HTTPStorage(Storage):
         self.base_url = settings.HTTP_STORAGE_BASE_URL
         self.upload_url = settings.HTTP_STORAGE_UPLOAD_URL
         self.upload_key = settings.HTTP_STORAGE_KEY
+        self.http = get_http_client()
     
     def _save(self, name, content):
         """
@@ -34,11 +36,10 @@ class HTTPStorage(Storage):
             data = {'key': self.upload_key, 'path': name}
             
             # Upload to cPanel
-            response = requests.post(
+            response = self.http.post(
                 self.upload_url,
                 files=files,
                 data=data,
-                timeout=30
             )
             
             if response.status_code == 200:
@@ -56,7 +57,7 @@ class HTTPStorage(Storage):
         Open file from HTTP URL
         """
         url = self.url(name)
-        response = requests.get(url)
+        response = self.http.get(url)
         return ContentFile(response.content)
     
     def exists(self, name):
@@ -65,7 +66,7 @@ class HTTPStorage(Storage):
         """
         url = self.url(name)
         try:
-            response = requests.head(url, timeout=5)
+            response = self.http.head(url, timeout=(5, 5))
             return response.status_code == 200
         except:
             return False
@@ -88,7 +89,7 @@ class HTTPStorage(Storage):
         """
         url = self.url(name)
         try:
-            response = requests.head(url, timeout=5)
+            response = self.http.head(url, timeout=(5, 5))
             return int(response.headers.get('Content-Length', 0))
         except:
             return 0
@@ -0,0 +1,174 @@
+"""
+Shared outbound HTTP layer for provider clients.
+
+BrevoClient and MailerLiteClient opened a fresh urllib connection per
+call and the cPanel storage backends used module-level requests.post/
+get/head, so every provider call paid DNS + TCP + TLS setup again -- per
+recipient, in a campaign. Everything now goes through one HTTPClient per
+process: a requests.Session with a keep-alive connection pool per host
+(OUTBOUND_HTTP_POOL_SIZE connections), default (connect, read) timeouts,
+and retries with jittered exponential backoff on 429/5xx.
+
+Only idempotent methods are retried on 5xx and network errors; a POST is
+retried on 429 alone (the provider refused it, so it was not processed)
+-- callers that know better (the campaign worker) pass retries=0 and do
+their own retrying.
+
+Every call is counted per host (requests, errors, retries, latency);
+stats() is served with the request metrics at /api/metrics/requests/.
+
+Tests inject a `session` (anything with requests.Session.request) or
+point a client at a local server.
+"""
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+BACKOFF_MAX_SECONDS = 30.0
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def build_session(pool_size=None):
+    """A requests.Session with a keep-alive pool of `pool_size` connections per host."""
+    pool_size = pool_size or _setting('OUTBOUND_HTTP_POOL_SIZE', 10)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class _HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.statuses = {}
+
+
+class HTTPClient:
+    """Pooled, retrying HTTP client with per-host counters. Thread-safe."""
+
+    def __init__(self, session=None, timeout=None, max_retries=None, backoff=None, sleep=time.sleep):
+        self.session = session or build_session()
+        self.timeout = timeout or (
+            _setting('OUTBOUND_HTTP_CONNECT_TIMEOUT', 5), _setting('OUTBOUND_HTTP_READ_TIMEOUT', 30),
+        )
+        self.max_retries = _setting('OUTBOUND_HTTP_MAX_RETRIES', 2) if max_retries is None else max_retries
+        self.backoff = _setting('OUTBOUND_HTTP_BACKOFF_SECONDS', 0.5) if backoff is None else backoff
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self.since = timezone.now()
+
+    def request(self, method, url, timeout=None, retries=None, **kwargs):
+        """
+        requests.Session.request with the pool, default timeout and
+        retries. Returns the Response (any status); network errors raise
+        requests.RequestException once retries are spent.
+        """
+        method = method.upper()
+        host = urlsplit(url).netloc
+        retries = self.max_retries if retries is None else retries
+        idempotent = method in IDEMPOTENT_METHODS
+
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.RequestException:
+                self._record(host, started, None)
+                if not idempotent or attempt >= retries:
+                    raise
+                self._retry(host, attempt, None)
+                continue
+
+            self._record(host, started, response.status_code)
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            if not retryable or attempt >= retries:
+                return response
+            self._retry(host, attempt, response)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _retry(self, host, attempt, response):
+        with self._lock:
+            self._hosts[host].retries += 1
+        self._sleep(self._delay(attempt, response))
+
+    def _delay(self, attempt, response):
+        """Retry-After when the server sent one, else exponential backoff with jitter."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        return min(BACKOFF_MAX_SECONDS, self.backoff * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def _record(self, host, started, status_code):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self._hosts.get(host)
+            if stats is None:
+                stats = self._hosts[host] = _HostStats()
+            stats.requests += 1
+            stats.errors += status_code is None or status_code >= 500
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            key = str(status_code) if status_code is not None else 'network_error'
+            stats.statuses[key] = stats.statuses.get(key, 0) + 1
+
+    def stats(self):
+        """Per-host counters since the last reset."""
+        with self._lock:
+            hosts = {
+                host: {
+                    'requests': stats.requests,
+                    'errors': stats.errors,
+                    'retries': stats.retries,
+                    'mean_ms': round(stats.total_ms / stats.requests, 2) if stats.requests else None,
+                    'max_ms': round(stats.max_ms, 2),
+                    'statuses': dict(sorted(stats.statuses.items())),
+                }
+                for host, stats in self._hosts.items()
+            }
+            since = self.since
+        return {'since': since.isoformat(), 'hosts': dict(sorted(hosts.items()))}
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+            self.since = timezone.now()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """The process-wide HTTPClient (one connection pool for every provider)."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = HTTPClient()
+    return _default_client
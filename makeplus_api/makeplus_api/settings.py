@@ -64,6 +64,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be at top
+    # Per-view latency/query-count metrics (events/request_metrics.py);
+    # this high up so the timing covers the rest of the stack
+    'events.middleware.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files
     'django.middleware.gzip.GZipMiddleware',  # Compress responses
@@ -158,6 +161,41 @@ CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 300  # 5 minutes
 CACHE_MIDDLEWARE_KEY_PREFIX = 'makeplus'
 
+# Controller scan audit log (events/scan_audit.py): ControllerScan rows are
+# queued in-process and written in batches by a background thread, every
+# SCAN_AUDIT_BATCH_SIZE scans or SCAN_AUDIT_FLUSH_INTERVAL_MS, whichever
+# comes first. SCAN_AUDIT_ASYNC=False writes each row inside the request.
+SCAN_AUDIT_ASYNC = config('SCAN_AUDIT_ASYNC', default=True, cast=bool)
+SCAN_AUDIT_BATCH_SIZE = config('SCAN_AUDIT_BATCH_SIZE', default=100, cast=int)
+SCAN_AUDIT_FLUSH_INTERVAL_MS = config('SCAN_AUDIT_FLUSH_INTERVAL_MS', default=500, cast=int)
+
+# Caisse seat holds (caisse/seats.py): a workshop seat ticked in a cart at
+# one caisse is kept from the others for this many seconds, renewed while
+# the operator keeps editing the cart.
+CAISSE_SEAT_HOLD_SECONDS = config('CAISSE_SEAT_HOLD_SECONDS', default=300, cast=int)
+
+# Per-view request latency and query counts (events/request_metrics.py),
+# served at /api/metrics/requests/. Percentiles cover the last
+# REQUEST_METRICS_SAMPLE_SIZE requests per view in each process.
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=True, cast=bool)
+REQUEST_METRICS_SAMPLE_SIZE = config('REQUEST_METRICS_SAMPLE_SIZE', default=1000, cast=int)
+
+# Campaign delivery (dashboard/campaign_delivery.py): the send_campaign_jobs
+# worker takes CAMPAIGN_SEND_BATCH_SIZE recipients at a time and sends
+# them CAMPAIGN_SEND_VERSIONS_PER_CALL per Brevo call (messageVersions;
+# 1 = one call per email) from CAMPAIGN_SEND_THREADS threads, never more
+# than CAMPAIGN_SEND_RATE calls/second (bursts of CAMPAIGN_SEND_BURST) --
+# keep these within the Brevo plan's rate limit. A running job whose
+# worker hasn't reported for CAMPAIGN_JOB_LEASE_SECONDS is picked up by
+# another worker.
+CAMPAIGN_SEND_RATE = config('CAMPAIGN_SEND_RATE', default=10, cast=float)
+CAMPAIGN_SEND_BURST = config('CAMPAIGN_SEND_BURST', default=20, cast=int)
+CAMPAIGN_SEND_THREADS = config('CAMPAIGN_SEND_THREADS', default=4, cast=int)
+CAMPAIGN_SEND_BATCH_SIZE = config('CAMPAIGN_SEND_BATCH_SIZE', default=500, cast=int)
+CAMPAIGN_SEND_VERSIONS_PER_CALL = config('CAMPAIGN_SEND_VERSIONS_PER_CALL', default=100, cast=int)
+CAMPAIGN_SEND_MAX_RETRIES = config('CAMPAIGN_SEND_MAX_RETRIES', default=3, cast=int)
+CAMPAIGN_JOB_LEASE_SECONDS = config('CAMPAIGN_JOB_LEASE_SECONDS', default=300, cast=int)
+
 # Session optimization
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_CACHE_ALIAS = 'default'
@@ -165,7 +203,9 @@ SESSION_CACHE_ALIAS = 'default'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt's JWTAuthentication, sharing its token decode with
+        # EventContextMiddleware (see events/authentication.py)
+        'events.authentication.SharedTokenJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -357,7 +397,32 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='no-reply@makeplus.com
 
 # Brevo API Configuration (for transactional emails with tracking)
 BREVO_API_KEY = config('BREVO_API_KEY', default='')
+BREVO_API_URL = config('BREVO_API_URL', default='https://api.brevo.com/v3')
+# Shared secret for the event webhook (/track/brevo/webhook/?token=...); empty disables it
+BREVO_WEBHOOK_TOKEN = config('BREVO_WEBHOOK_TOKEN', default='')
+
+# Outbound HTTP (Brevo, MailerLite, cPanel storage) -- makeplus_api/outbound_http.py.
+# One keep-alive pool per host; 5xx/network errors retried on idempotent calls only.
+OUTBOUND_HTTP_POOL_SIZE = config('OUTBOUND_HTTP_POOL_SIZE', default=10, cast=int)
+OUTBOUND_HTTP_CONNECT_TIMEOUT = config('OUTBOUND_HTTP_CONNECT_TIMEOUT', default=5, cast=float)
+OUTBOUND_HTTP_READ_TIMEOUT = config('OUTBOUND_HTTP_READ_TIMEOUT', default=30, cast=float)
+OUTBOUND_HTTP_MAX_RETRIES = config('OUTBOUND_HTTP_MAX_RETRIES', default=2, cast=int)
+OUTBOUND_HTTP_BACKOFF_SECONDS = config('OUTBOUND_HTTP_BACKOFF_SECONDS', default=0.5, cast=float)
 
 # Site URL for tracking links
 SITE_URL = config('SITE_URL', default='http://127.0.0.1:8000')
+# Absolute base of our own campaign open/click/unsubscribe tracking URLs
+# (dashboard/campaign_html.py). Empty: campaigns rely on Brevo's tracking.
+CAMPAIGN_TRACKING_URL = config('CAMPAIGN_TRACKING_URL', default='')
+
+# Open pixel / click redirect hot path (dashboard/tracking_cache.py): tokens
+# resolve through a per-process LRU (optionally shared through the
+# TRACKING_TOKEN_CACHE_ALIAS Django cache) and hits are written in batches
+# by a background thread. TRACKING_HITS_ASYNC=False writes each hit inline.
+TRACKING_TOKEN_CACHE_SIZE = config('TRACKING_TOKEN_CACHE_SIZE', default=10000, cast=int)
+TRACKING_TOKEN_CACHE_TTL = config('TRACKING_TOKEN_CACHE_TTL', default=3600, cast=int)
+TRACKING_TOKEN_CACHE_ALIAS = config('TRACKING_TOKEN_CACHE_ALIAS', default='')
+TRACKING_HITS_ASYNC = config('TRACKING_HITS_ASYNC', default=True, cast=bool)
+TRACKING_HITS_BATCH_SIZE = config('TRACKING_HITS_BATCH_SIZE', default=200, cast=int)
+TRACKING_HITS_FLUSH_INTERVAL_MS = config('TRACKING_HITS_FLUSH_INTERVAL_MS', default=1000, cast=int)
 
@@ -31,3 +31,9 @@ STORAGES = {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
     },
 }
+
+# The audit writer's background thread has its own DB connection, which
+# can't see rows inside a TestCase transaction -- write scans inline.
+SCAN_AUDIT_ASYNC = False
+# Same for the tracking hit writer (dashboard/tracking_cache.py)
+TRACKING_HITS_ASYNC = False